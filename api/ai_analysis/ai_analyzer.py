@@ -2,16 +2,17 @@ import logging
 from typing import Dict, Optional, List, Union
 
 import pandas as pd
-from sqlalchemy import create_engine
 from pandasai import SmartDataframe
 from pandasai.llm.openai import OpenAI
 
+from ..database.db_utils import get_engine
+
 
 class AIAnalyzer:
     def __init__(self, config: Dict):
         self.config = config
         self.logger = logging.getLogger(__name__)
-        self.db_engine = create_engine(config['database_url'])
+        self.db_engine = get_engine(config['database_url'])
 
         llm = OpenAI(
             api_token=config.get('openai_api_key'),
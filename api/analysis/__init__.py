@@ -1,16 +1,32 @@
 """
 分析模块
 包含情感分析、热度分析和粉丝分析等功能
+
+各分析器依赖torch、transformers、pandas等较重的库，
+这里按需导入：只有第一次访问某个分析器类时才加载对应模块
 """
 
-from .sentiment.sentiment_analyzer import SentimentAnalyzer
-from .sentiment.black_fan_analyzer import BlackFanAnalyzer
-from .heat.heat_analyzer import HeatAnalyzer
-from .fan_analysis import FanAnalyzer
-
-__all__ = [
-    'SentimentAnalyzer',
-    'TopicAnalyzer',
-    'HeatAnalyzer',
-    'FanAnalyzer'
-] 
\ No newline at end of file
+import importlib
+
+_LAZY_IMPORTS = {
+    'SentimentAnalyzer': '.sentiment.sentiment_analyzer',
+    'PostSentimentAnalyzer': '.sentiment.sentiment_analyzer',
+    'BlackFanAnalyzer': '.sentiment.black_fan_analyzer',
+    'HeatAnalyzer': '.heat.heat_analyzer',
+    'FanAnalyzer': '.fan_analysis'
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,292 @@
+"""
+黑粉分析报告性能测试
+
+在合成的SQLite数据集（默认100万黑粉）上比较：
+- 旧流程：每行转成字典，各项统计分别遍历整个列表（趋势统计每天遍历一次，风险评分每行取两次当前时间）
+- pandas统计：BlackFanAnalyzer(aggregation='pandas')，分块读成列数据后向量化统计
+- SQL汇总：BlackFanAnalyzer(aggregation='sql')，在数据库中用GROUP BY和窗口函数汇总，只取回汇总结果
+
+情感趋势依赖评论表，旧流程把全部黑粉ID作为IN参数传入，百万级时无法执行，因此都不计入比较。
+同时检查各流程的统计结果一致，分别报告峰值内存，并比较黑粉排行深分页时OFFSET与键集分页的耗时。
+
+用法:
+    python -m api.analysis.black_fan_benchmark --fans 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import numpy as np
+from sqlalchemy import text
+
+from .sentiment.black_fan_analyzer import BlackFanAnalyzer
+
+CELEBRITY_ID = '1000'
+GENDERS = ['m', 'f', None]
+LOCATIONS = ['北京', '上海', '广东', '江苏', '浙江', '四川', '海外', None]
+
+
+def build_dataset(db_path: str, fans: int, seed: int = 42) -> None:
+    """生成合成数据集"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE weibo_users (
+            weibo_id VARCHAR(50) PRIMARY KEY, nickname VARCHAR(100), gender VARCHAR(10), location VARCHAR(100)
+        );
+        CREATE TABLE black_fans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id VARCHAR(50) NOT NULL,
+            celebrity_id VARCHAR(50) NOT NULL,
+            black_fan_score FLOAT NOT NULL,
+            comment_count INTEGER DEFAULT 0,
+            last_active TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP,
+            UNIQUE (user_id, celebrity_id)
+        );
+        CREATE TABLE comments (
+            comment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id VARCHAR(50), user_id VARCHAR(50), content TEXT, created_at TIMESTAMP, sentiment_score FLOAT
+        );
+        CREATE INDEX idx_black_fans_celebrity ON black_fans(celebrity_id);
+        CREATE INDEX idx_black_fans_celebrity_rank ON black_fans(celebrity_id, black_fan_score, comment_count, user_id);
+        CREATE INDEX idx_comments_user ON comments(user_id);
+    """)
+    conn.executemany(
+        "INSERT INTO weibo_users VALUES (?, ?, ?, ?)",
+        ((str(i), f'user{i}', rng.choice(GENDERS), rng.choice(LOCATIONS)) for i in range(fans))
+    )
+    conn.executemany(
+        "INSERT INTO black_fans (user_id, celebrity_id, black_fan_score, comment_count, last_active) VALUES (?, ?, ?, ?, ?)",
+        ((str(i), CELEBRITY_ID, round(rng.random(), 4), rng.randint(1, 150),
+          (now - timedelta(minutes=rng.randint(1, 60 * 24 * 14))).isoformat(sep=' ')) for i in range(fans))
+    )
+    conn.executemany(
+        "INSERT INTO comments (post_id, user_id, content, created_at, sentiment_score) VALUES (?, ?, ?, ?, ?)",
+        (('p1', str(rng.randrange(fans)), '评论', (now - timedelta(hours=rng.randint(1, 24 * 30))).isoformat(sep=' '),
+          rng.random()) for _ in range(fans // 20))
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_legacy(analyzer: BlackFanAnalyzer, celebrity_id: str) -> Dict[str, Any]:
+    """旧流程：逐行字典 + 多次遍历"""
+    with analyzer.engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT bf.*, wu.nickname, wu.gender, wu.location
+            FROM black_fans bf
+            JOIN weibo_users wu ON bf.user_id = wu.weibo_id
+            WHERE bf.celebrity_id = :celebrity_id
+            ORDER BY bf.black_fan_score DESC
+        """), {'celebrity_id': celebrity_id}).fetchall()
+    black_fans = [dict(row) for row in rows]
+    # SQLite返回的时间是字符串，旧代码按datetime使用
+    for bf in black_fans:
+        bf['last_active'] = datetime.fromisoformat(bf['last_active'])
+
+    scores = [bf['black_fan_score'] for bf in black_fans]
+    comment_counts = [bf['comment_count'] for bf in black_fans]
+    max_comments = max(comment_counts)
+    gender_counts: Dict[str, int] = {}
+    location_counts: Dict[str, int] = {}
+    for bf in black_fans:
+        gender_counts[bf['gender'] or 'unknown'] = gender_counts.get(bf['gender'] or 'unknown', 0) + 1
+        location_counts[bf['location'] or 'unknown'] = location_counts.get(bf['location'] or 'unknown', 0) + 1
+    hour_distribution = {i: 0 for i in range(24)}
+    weekday_distribution = {i: 0 for i in range(7)}
+    for bf in black_fans:
+        hour_distribution[bf['last_active'].hour] += 1
+        weekday_distribution[bf['last_active'].weekday()] += 1
+    trend = []
+    for days in range(analyzer.timewindow, 0, -1):
+        date = datetime.now() - timedelta(days=days)
+        trend.append({"date": date.strftime("%Y-%m-%d"),
+                      "count": len([bf for bf in black_fans if bf['last_active'].date() == date.date()])})
+    risk_scores: List[float] = []
+    for bf in black_fans:
+        risk_scores.append(
+            bf['black_fan_score'] * 0.4 + (bf['comment_count'] / 100) * 0.3 +
+            (1 / (datetime.now() - bf['last_active']).days if (datetime.now() - bf['last_active']).days > 0 else 1) * 0.3
+        )
+
+    return {
+        "total_count": len(black_fans),
+        "score_distribution": {
+            "mean": sum(scores) / len(scores),
+            "median": sorted(scores)[len(scores) // 2],
+            "max": max(scores),
+            "min": min(scores),
+            "distribution": {
+                "high": len([s for s in scores if s >= 0.8]),
+                "medium": len([s for s in scores if 0.5 <= s < 0.8]),
+                "low": len([s for s in scores if s < 0.5])
+            }
+        },
+        "activity_analysis": {
+            "levels": {
+                "very_active": len([c for c in comment_counts if c >= 50]),
+                "active": len([c for c in comment_counts if 20 <= c < 50]),
+                "inactive": len([c for c in comment_counts if c < 20])
+            },
+            "average_activity": float(np.mean([c / max_comments for c in comment_counts])),
+            "activity_metrics": {
+                "total_comments": sum(comment_counts),
+                "average_comments": float(np.mean(comment_counts)),
+                "median_comments": float(np.median(comment_counts)),
+                "max_comments": max_comments,
+                "min_comments": min(comment_counts)
+            },
+            "activity_distribution": {
+                "bins": [0, 10, 20, 50, 100, float('inf')],
+                "counts": np.histogram(comment_counts, bins=[0, 10, 20, 50, 100, float('inf')])[0].tolist()
+            }
+        },
+        "top_black_fans": sorted(black_fans, key=lambda x: (x['black_fan_score'], x['comment_count']), reverse=True)[:20],
+        "trend_analysis": trend,
+        "gender_distribution": gender_counts,
+        "location_distribution": location_counts,
+        "time_distribution": {
+            "hour_distribution": [{"hour": h, "count": c} for h, c in hour_distribution.items()],
+            "weekday_distribution": [{"weekday": w, "count": c} for w, c in weekday_distribution.items()]
+        },
+        "risk_level": {
+            "risk_levels": {
+                "high": len([s for s in risk_scores if s >= 0.8]),
+                "medium": len([s for s in risk_scores if 0.5 <= s < 0.8]),
+                "low": len([s for s in risk_scores if s < 0.5])
+            },
+            "average_risk": float(np.mean(risk_scores)),
+            "risk_distribution": {
+                "bins": [0, 0.2, 0.4, 0.6, 0.8, 1.0],
+                "counts": np.histogram(risk_scores, bins=5)[0].tolist()
+            }
+        }
+    }
+
+
+def run_new(analyzer: BlackFanAnalyzer, celebrity_id: str) -> Dict[str, Any]:
+    """新流程：与 analyze_black_fans 相同的统计，不含情感趋势和结果保存"""
+    now = datetime.now()
+    if analyzer.aggregation == 'sql':
+        stats = analyzer._aggregate_in_sql(celebrity_id, now)
+    else:
+        stats = analyzer._aggregate_in_pandas(celebrity_id, now)
+    return dict(stats, top_black_fans=analyzer.get_top_black_fans(celebrity_id)['items'])
+
+
+def run_deep_page(analyzer: BlackFanAnalyzer, depth: int, limit: int = 20) -> Dict[str, float]:
+    """取排行第depth名之后的一页：OFFSET需要先跳过depth行，键集分页从游标位置直接开始"""
+    with analyzer.engine.connect() as conn:
+        start = time.perf_counter()
+        offset_rows = conn.execute(text("""
+            SELECT bf.user_id FROM black_fans bf
+            JOIN weibo_users wu ON bf.user_id = wu.weibo_id
+            WHERE bf.celebrity_id = :celebrity_id
+            ORDER BY bf.black_fan_score DESC, COALESCE(bf.comment_count, 0) DESC, bf.user_id DESC
+            LIMIT :limit OFFSET :offset
+        """), {'celebrity_id': CELEBRITY_ID, 'limit': limit, 'offset': depth}).fetchall()
+        offset_seconds = time.perf_counter() - start
+        last = conn.execute(text("""
+            SELECT black_fan_score, COALESCE(comment_count, 0) AS comment_count, user_id FROM black_fans
+            WHERE celebrity_id = :celebrity_id
+            ORDER BY black_fan_score DESC, COALESCE(comment_count, 0) DESC, user_id DESC
+            LIMIT 1 OFFSET :offset
+        """), {'celebrity_id': CELEBRITY_ID, 'offset': depth - 1}).fetchone()
+    cursor = analyzer._encode_cursor(last.black_fan_score, last.comment_count, last.user_id)
+    start = time.perf_counter()
+    page = analyzer.get_top_black_fans(CELEBRITY_ID, limit, cursor)
+    keyset_seconds = time.perf_counter() - start
+    assert [row.user_id for row in offset_rows] == [bf['user_id'] for bf in page['items']]
+    return {'offset_ms': offset_seconds * 1000, 'keyset_ms': keyset_seconds * 1000}
+
+
+def peak_memory(run, analyzer: BlackFanAnalyzer) -> float:
+    """单独运行一次统计峰值内存（MB），tracemalloc会拖慢运行，不和计时放在一起"""
+    tracemalloc.start()
+    try:
+        run(analyzer, CELEBRITY_ID)
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def compare(legacy: Dict[str, Any], vectorized: Dict[str, Any]) -> List[str]:
+    """返回两种流程结果不一致的字段"""
+    mismatches = []
+    for key in legacy:
+        expected, actual = legacy[key], vectorized[key]
+        if key == 'top_black_fans':
+            # 分数和评论数相同的黑粉先后顺序不固定，只比较排序键
+            expected = [(bf['black_fan_score'], bf['comment_count']) for bf in expected]
+            actual = [(bf['black_fan_score'], bf['comment_count']) for bf in actual]
+        elif key == 'score_distribution':
+            expected = dict(expected, mean=round(expected['mean'], 9))
+            actual = dict(actual, mean=round(actual['mean'], 9))
+        elif key in ('activity_analysis', 'risk_level'):
+            field = 'average_activity' if key == 'activity_analysis' else 'average_risk'
+            expected = dict(expected, **{field: round(expected[field], 9)})
+            actual = dict(actual, **{field: round(actual[field], 9)})
+        if expected != actual:
+            mismatches.append(key)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='黑粉分析报告性能测试')
+    parser.add_argument('--fans', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--skip-legacy', action='store_true', help='不运行旧流程')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'black_fans.db')
+        start = time.perf_counter()
+        build_dataset(db_path, args.fans)
+        print(f"生成数据集: {args.fans} 个黑粉, 用时 {time.perf_counter() - start:.1f} 秒")
+
+        db_url = f'sqlite:///{db_path}'
+        cwd = os.getcwd()
+        os.chdir(tmp)  # 分析器会在当前目录下创建结果保存目录
+        try:
+            legacy = None
+            if not args.skip_legacy:
+                analyzer = BlackFanAnalyzer(db_url, aggregation='pandas')
+                start = time.perf_counter()
+                legacy = run_legacy(analyzer, CELEBRITY_ID)
+                legacy_elapsed = time.perf_counter() - start
+                print(f"旧流程: 用时 {legacy_elapsed:.2f} 秒, 峰值内存 {peak_memory(run_legacy, analyzer):.0f} MB")
+
+            for mode in ('pandas', 'sql'):
+                analyzer = BlackFanAnalyzer(db_url, chunk_size=args.chunk_size, aggregation=mode)
+                start = time.perf_counter()
+                stats = run_new(analyzer, CELEBRITY_ID)
+                elapsed = time.perf_counter() - start
+                line = f"{mode}: 用时 {elapsed:.2f} 秒, 峰值内存 {peak_memory(run_new, analyzer):.0f} MB"
+                if legacy is not None:
+                    mismatches = compare(legacy, stats)
+                    line += f", 加速约 {legacy_elapsed / elapsed:.1f} 倍, "
+                    line += "统计结果一致" if not mismatches else f"统计结果不一致: {', '.join(mismatches)}"
+                print(line)
+
+            start = time.perf_counter()
+            result = analyzer.analyze_black_fans(CELEBRITY_ID)
+            print(f"完整报告(SQL汇总, 含情感趋势和保存): {result['status']}, 用时 {time.perf_counter() - start:.2f} 秒")
+
+            depth = args.fans // 2
+            page = run_deep_page(analyzer, depth)
+            print(f"排行第{depth}名后的一页: OFFSET {page['offset_ms']:.1f} ms, 键集分页 {page['keyset_ms']:.1f} ms")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
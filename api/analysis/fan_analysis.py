@@ -1,36 +1,44 @@
 # 用户粉丝分析，主要过程如下：
-# 扫描用户表，选取近七天在指定明星的微博下有评论的用户
-# 检索每个该用户在该明星微博下的所有评论表数据，制作成list
-# list经过 sentiment_analyzer的analyze_black_fan，返回一个dict
-# dict与用户表、明星表等连接，成为黑粉表
+# 一条查询按用户顺序流式读出近七天在指定明星的微博下有评论的用户的全部评论
+# 按用户分组后每积累一批用户，统一做一次批量情感推理，再逐个计算黑粉评分
+# 每批的黑粉结果用一条多行upsert写入黑粉表
 # 所有用户遍历完成后使用black_fan_analyzer.py 对黑粉表中的用户结合用户表进行各项分析，得到分析结果
 
 import logging
-from typing import List, Dict, Any
+from itertools import groupby
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from collections import defaultdict
 from .sentiment.sentiment_analyzer import SentimentAnalyzer
 from .sentiment.black_fan_analyzer import BlackFanAnalyzer
+from ..database.db_utils import get_engine
 
 class FanAnalyzer:
     """粉丝分析器，用于分析明星的粉丝群体特征"""
     
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: str, chunk_size: int = 2000,
+                 sentiment_analyzer: Optional[SentimentAnalyzer] = None):
         """初始化粉丝分析器
         
         Args:
             db_url: 数据库连接URL
+            chunk_size: 每批处理的用户数（一次批量推理和一次upsert）
+            sentiment_analyzer: 共享的情感分析器，为空时新建
         """
         self.logger = logging.getLogger(__name__)
-        self.engine = create_engine(db_url)
-        self.sentiment_analyzer = SentimentAnalyzer(db_url)
+        self.db_url = db_url
+        # 共享引擎对SQLite开启了WAL：评论流式读取的游标未关闭时也能提交黑粉表的写入
+        self.engine = get_engine(db_url)
+        self.chunk_size = chunk_size
+        
+        self.sentiment_analyzer = sentiment_analyzer or SentimentAnalyzer(db_url)
         
         # 检查并创建黑粉表
         self._ensure_black_fans_table()
         
     def _ensure_black_fans_table(self) -> None:
-        """确保黑粉表存在，如果不存在则创建"""
+        """确保黑粉表存在，如果不存在则创建；旧表缺少的列和唯一索引会补齐"""
         try:
             # 检查表是否存在
             check_query = """
@@ -38,35 +46,43 @@ class FanAnalyzer:
                 WHERE type='table' AND name='black_fans';
             """
             
-            with self.engine.connect() as conn:
+            with self.engine.begin() as conn:
                 table_exists = conn.execute(text(check_query)).scalar()
                 
-            if not table_exists:
-                # 创建黑粉表
-                create_query = """
-                    CREATE TABLE black_fans (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        celebrity_id VARCHAR(50) NOT NULL,
-                        black_fan_score FLOAT NOT NULL,
-                        comment_count INTEGER DEFAULT 0,
-                        last_active TIMESTAMP,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (celebrity_id) REFERENCES celebrity(weibo_id)
-                    );
-                    
-                    -- 创建索引
-                    CREATE INDEX idx_black_fans_celebrity ON black_fans(celebrity_id);
-                    CREATE INDEX idx_black_fans_score ON black_fans(black_fan_score);
-                    CREATE INDEX idx_black_fans_last_active ON black_fans(last_active);
-                """
-                
-                with self.engine.connect() as conn:
-                    conn.execute(text(create_query))
-                    conn.commit()
-                    
-                self.logger.info("黑粉表创建成功")
-            else:
-                self.logger.info("黑粉表已存在")
+                if not table_exists:
+                    # 创建黑粉表
+                    conn.execute(text("""
+                        CREATE TABLE black_fans (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            user_id VARCHAR(50) NOT NULL,
+                            celebrity_id VARCHAR(50) NOT NULL,
+                            black_fan_score FLOAT NOT NULL,
+                            comment_count INTEGER DEFAULT 0,
+                            last_active TIMESTAMP,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            updated_at TIMESTAMP,
+                            FOREIGN KEY (celebrity_id) REFERENCES celebrity(weibo_id)
+                        )
+                    """))
+                    self.logger.info("黑粉表创建成功")
+                else:
+                    # 旧版黑粉表没有user_id/updated_at列，upsert无法执行
+                    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(black_fans)"))}
+                    for column, ddl in (('user_id', 'VARCHAR(50)'), ('updated_at', 'TIMESTAMP')):
+                        if column not in columns:
+                            conn.execute(text(f"ALTER TABLE black_fans ADD COLUMN {column} {ddl}"))
+                            self.logger.info(f"黑粉表已补充列 {column}")
+                            
+                # 创建索引
+                for index_query in (
+                    "CREATE UNIQUE INDEX IF NOT EXISTS uq_black_fans_user_celebrity ON black_fans(user_id, celebrity_id)",
+                    "CREATE INDEX IF NOT EXISTS idx_black_fans_celebrity ON black_fans(celebrity_id)",
+                    "CREATE INDEX IF NOT EXISTS idx_black_fans_score ON black_fans(black_fan_score)",
+                    # 黑粉排行的键集分页按此索引顺序读取
+                    "CREATE INDEX IF NOT EXISTS idx_black_fans_celebrity_rank ON black_fans(celebrity_id, black_fan_score, comment_count, user_id)",
+                    "CREATE INDEX IF NOT EXISTS idx_black_fans_last_active ON black_fans(last_active)"
+                ):
+                    conn.execute(text(index_query))
                 
         except Exception as e:
             self.logger.error(f"检查/创建黑粉表失败: {str(e)}")
@@ -83,43 +99,23 @@ class FanAnalyzer:
             Dict: 分析结果
         """
         try:
-            # 1. 获取最近活跃的粉丝
-            active_fans = self._get_active_fans(celebrity_id, days)
-            if not active_fans:
+            # 1. 流式读取评论、批量打分并写入黑粉表
+            detection = self.detect_black_fans(celebrity_id, days)
+            if not detection['total_fans']:
                 return {
                     "status": "error",
                     "message": "未找到活跃粉丝"
                 }
                 
-            # 2. 分析每个粉丝的评论并更新黑粉表
-            black_fan_count = 0
-            for fan in active_fans:
-                # 获取该粉丝的所有评论
-                comments = self._get_fan_comments(fan['weibo_id'], celebrity_id)
-                
-                # 分析是否为黑粉
-                black_fan_result = self.sentiment_analyzer.analyze_black_fan(comments)
-                
-                # 如果是黑粉，更新黑粉表
-                if black_fan_result['is_black_fan']:
-                    self._update_black_fan_table(
-                        user_id=fan['weibo_id'],
-                        celebrity_id=celebrity_id,
-                        black_fan_score=black_fan_result['score'],
-                        comment_count=len(comments),
-                        last_active=fan['last_active']
-                    )
-                    black_fan_count += 1
-                    
-            # 3. 对黑粉表进行分析
-            black_fan_analyzer = BlackFanAnalyzer(self.engine)
+            # 2. 对黑粉表进行分析
+            black_fan_analyzer = BlackFanAnalyzer(self.db_url)
             black_fan_analysis = black_fan_analyzer.analyze_black_fans(celebrity_id)
             
-            # 4. 生成分析报告
+            # 3. 生成分析报告
             report = {
-                'total_fans': len(active_fans),
-                'black_fan_count': black_fan_count,
-                'black_fan_ratio': black_fan_count / len(active_fans) if active_fans else 0,
+                'total_fans': detection['total_fans'],
+                'black_fan_count': detection['black_fan_count'],
+                'black_fan_ratio': detection['black_fan_count'] / detection['total_fans'],
                 'black_fan_analysis': black_fan_analysis
             }
             
@@ -135,105 +131,164 @@ class FanAnalyzer:
                 'message': str(e)
             }
             
-    def _get_active_fans(self, celebrity_id: int, days: int) -> List[Dict]:
-        """获取最近活跃的粉丝
+    def detect_black_fans(self, celebrity_id: int, days: int = 7) -> Dict[str, int]:
+        """批量检测明星的黑粉并写入黑粉表
         
         Args:
             celebrity_id: 明星ID
-            days: 时间范围（天）
+            days: 活跃粉丝的时间范围（天）
             
         Returns:
-            List[Dict]: 活跃粉丝列表
+            Dict: 活跃粉丝数、参与打分的评论数和黑粉数
         """
-        query = """
-            SELECT DISTINCT wu.*, MAX(c.created_at) as last_active
-            FROM weibo_users wu
-            JOIN comments c ON wu.weibo_id = c.user_id
-            JOIN posts p ON c.post_id = p.post_id
-            WHERE p.celebrity_id = :celebrity_id
-            AND c.created_at >= :start_date
-            GROUP BY wu.weibo_id
-            ORDER BY last_active DESC
-        """
-        
         start_date = datetime.now() - timedelta(days=days)
+        stats = {'total_fans': 0, 'scored_comments': 0, 'black_fan_count': 0}
         
-        with self.engine.connect() as conn:
-            result = conn.execute(
-                text(query),
-                {
-                    'celebrity_id': celebrity_id,
-                    'start_date': start_date
-                }
-            ).fetchall()
+        chunk = []
+        for fan in self._iter_fan_comments(celebrity_id, start_date):
+            chunk.append(fan)
+            if len(chunk) >= self.chunk_size:
+                self._process_chunk(celebrity_id, chunk, stats)
+                chunk = []
+        if chunk:
+            self._process_chunk(celebrity_id, chunk, stats)
             
-        return [dict(row) for row in result]
+        self.logger.info(
+            f"明星 {celebrity_id} 黑粉检测完成: 活跃粉丝 {stats['total_fans']}, "
+            f"打分评论 {stats['scored_comments']}, 黑粉 {stats['black_fan_count']}"
+        )
+        return stats
         
-    def _get_fan_comments(self, user_id: int, celebrity_id: int) -> List[Dict]:
-        """获取粉丝的所有评论
+    def _iter_fan_comments(self, celebrity_id: int, start_date: datetime) -> Iterator[Tuple[Any, List[Dict], datetime]]:
+        """一条查询按用户顺序流式读取活跃粉丝在该明星微博下的全部评论
         
         Args:
-            user_id: 用户ID
             celebrity_id: 明星ID
+            start_date: 活跃判定起始时间
             
-        Returns:
-            List[Dict]: 评论列表
+        Yields:
+            Tuple: (用户ID, 评论列表, 最后活跃时间)
         """
         query = """
-            SELECT c.*
+            SELECT c.user_id, c.content, c.created_at
             FROM comments c
             JOIN posts p ON c.post_id = p.post_id
-            WHERE c.user_id = :user_id
-            AND p.celebrity_id = :celebrity_id
-            ORDER BY c.created_at DESC
+            WHERE p.celebrity_id = :celebrity_id
+            AND c.user_id IN (
+                SELECT DISTINCT c2.user_id
+                FROM comments c2
+                JOIN posts p2 ON c2.post_id = p2.post_id
+                JOIN weibo_users wu ON wu.weibo_id = c2.user_id
+                WHERE p2.celebrity_id = :celebrity_id
+                AND c2.created_at >= :start_date
+            )
+            ORDER BY c.user_id, c.created_at
         """
         
         with self.engine.connect() as conn:
-            result = conn.execute(
+            rows = conn.execution_options(stream_results=True).execute(
                 text(query),
                 {
-                    'user_id': user_id,
-                    'celebrity_id': celebrity_id
+                    'celebrity_id': celebrity_id,
+                    'start_date': start_date
                 }
-            ).fetchall()
-            
-        return [dict(row) for row in result]
+            )
+            for user_id, group in groupby(rows, key=lambda row: row.user_id):
+                comments = [
+                    {'content': row.content, 'created_at': self._to_datetime(row.created_at)}
+                    for row in group
+                ]
+                last_active = max(comment['created_at'] for comment in comments)
+                yield user_id, comments, last_active
+                
+    @staticmethod
+    def _to_datetime(value: Any) -> datetime:
+        """SQLite原生查询返回的时间是字符串，统一转换为datetime"""
+        if isinstance(value, str):
+            return datetime.fromisoformat(value)
+        return value
         
-    def _update_black_fan_table(self, user_id: int, celebrity_id: int, 
-                              black_fan_score: float, comment_count: int,
-                              last_active: datetime) -> None:
-        """更新黑粉表
+    def _process_chunk(self, celebrity_id: int, chunk: List[Tuple[Any, List[Dict], datetime]],
+                       stats: Dict[str, int]) -> None:
+        """对一批用户统一打分，并把黑粉结果一次性写入黑粉表
         
         Args:
-            user_id: 用户ID
             celebrity_id: 明星ID
-            black_fan_score: 黑粉分数
-            comment_count: 评论数量
-            last_active: 最后活跃时间
-        """
-        query = """
-            INSERT INTO black_fans (user_id, celebrity_id, black_fan_score, 
-                                  comment_count, last_active, created_at)
-            VALUES (:user_id, :celebrity_id, :black_fan_score, 
-                    :comment_count, :last_active, :created_at)
-            ON CONFLICT (user_id, celebrity_id) 
-            DO UPDATE SET
-                black_fan_score = :black_fan_score,
-                comment_count = :comment_count,
-                last_active = :last_active,
-                updated_at = :created_at
+            chunk: (用户ID, 评论列表, 最后活跃时间) 列表
+            stats: 累计统计，原地更新
         """
+        analyzer = self.sentiment_analyzer
+        now = datetime.now()
         
-        with self.engine.connect() as conn:
-            conn.execute(
-                text(query),
-                {
+        # 评论数不足的用户不会被判定为黑粉，时间窗口外的评论不参与评分，都无需推理
+        contents = []
+        spans = []
+        for _, comments, _ in chunk:
+            if len(comments) < analyzer.min_comments:
+                spans.append(None)
+                continue
+            recent = [i for i, comment in enumerate(comments) if now - comment['created_at'] <= analyzer.time_window]
+            spans.append((len(contents), recent))
+            contents.extend(comments[i]['content'] for i in recent)
+            
+        sentiments = analyzer.analyze_sentiment_batch(contents) if contents else []
+        
+        rows = []
+        for (user_id, comments, last_active), span in zip(chunk, spans):
+            if span is None:
+                continue
+            offset, recent = span
+            results = [None] * len(comments)
+            for j, i in enumerate(recent):
+                results[i] = sentiments[offset + j]
+                
+            black_fan_result = analyzer.evaluate_black_fan(comments, results)
+            if black_fan_result['is_black_fan']:
+                rows.append({
                     'user_id': user_id,
                     'celebrity_id': celebrity_id,
-                    'black_fan_score': black_fan_score,
-                    'comment_count': comment_count,
-                    'last_active': last_active,
-                    'created_at': datetime.now()
-                }
-            )
-            conn.commit()
\ No newline at end of file
+                    'black_fan_score': black_fan_result['score'],
+                    'comment_count': len(comments),
+                    'last_active': last_active
+                })
+                
+        self._upsert_black_fans(rows)
+        
+        stats['total_fans'] += len(chunk)
+        stats['scored_comments'] += len(contents)
+        stats['black_fan_count'] += len(rows)
+        
+    def _upsert_black_fans(self, rows: List[Dict[str, Any]], rows_per_statement: int = 100) -> None:
+        """用多行upsert批量写入黑粉表，整批在同一个事务中提交
+        
+        Args:
+            rows: 黑粉记录列表
+            rows_per_statement: 每条语句包含的行数，避免超出SQLite参数个数上限
+        """
+        if not rows:
+            return
+            
+        columns = ['user_id', 'celebrity_id', 'black_fan_score', 'comment_count', 'last_active', 'created_at', 'updated_at']
+        now = datetime.now()
+        
+        with self.engine.begin() as conn:
+            for start in range(0, len(rows), rows_per_statement):
+                batch = rows[start:start + rows_per_statement]
+                values = []
+                params = {}
+                for i, row in enumerate(batch):
+                    values.append('(' + ', '.join(f':{column}_{i}' for column in columns) + ')')
+                    for column in columns:
+                        params[f'{column}_{i}'] = row.get(column, now)
+                        
+                query = f"""
+                    INSERT INTO black_fans ({', '.join(columns)})
+                    VALUES {', '.join(values)}
+                    ON CONFLICT (user_id, celebrity_id)
+                    DO UPDATE SET
+                        black_fan_score = excluded.black_fan_score,
+                        comment_count = excluded.comment_count,
+                        last_active = excluded.last_active,
+                        updated_at = excluded.updated_at
+                """
+                conn.execute(text(query), params)
@@ -0,0 +1,178 @@
+"""
+黑粉检测性能测试
+
+在合成的SQLite数据集（默认10万用户）上比较：
+- 旧流程：每个粉丝单独查询评论、单独连接提交upsert（N+1）
+- 新流程：FanAnalyzer.detect_black_fans，一条流式查询 + 按批推理 + 每批一次多行upsert
+
+旧流程只在前 --legacy-users 个粉丝上运行并按比例外推总耗时。
+默认使用关键词规则代替BERT打分，以便只比较数据库访问模式；加 --with-model 使用真实模型。
+
+用法:
+    python -m api.analysis.fan_benchmark --users 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import text
+
+from .fan_analysis import FanAnalyzer
+from .sentiment.sentiment_analyzer import SentimentAnalyzer
+
+NEGATIVE_COMMENTS = ["演技太差了", "又在炒作", "脱粉了", "难听死了", "别再营销了"]
+OTHER_COMMENTS = ["期待新剧", "今天几点播出", "永远支持你", "好看", "辛苦了"]
+CELEBRITY_ID = '1000'
+
+
+class KeywordSentimentAnalyzer(SentimentAnalyzer):
+    """按关键词给出情感结果，用于隔离数据库访问的开销"""
+
+    def analyze_sentiment_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        results = []
+        for content in texts:
+            negative = content in NEGATIVE_COMMENTS
+            results.append({
+                'sentiment': '负面' if negative else '正面',
+                'confidence': 0.9,
+                'strength': -0.8 if negative else 0.6
+            })
+        return results
+
+
+def build_dataset(db_path: str, users: int, comments_per_user: int, posts: int, seed: int = 42) -> None:
+    """生成合成数据集"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE weibo_users (weibo_id VARCHAR(50) PRIMARY KEY, nickname VARCHAR(100));
+        CREATE TABLE posts (post_id VARCHAR(50) PRIMARY KEY, celebrity_id VARCHAR(50), content TEXT, created_at TIMESTAMP);
+        CREATE TABLE comments (
+            comment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id VARCHAR(50), user_id VARCHAR(50), content TEXT, created_at TIMESTAMP
+        );
+        CREATE INDEX idx_posts_celebrity ON posts(celebrity_id);
+        CREATE INDEX idx_comments_post ON comments(post_id);
+        CREATE INDEX idx_comments_user ON comments(user_id);
+    """)
+    conn.executemany("INSERT INTO weibo_users VALUES (?, ?)", ((str(i), f'user{i}') for i in range(users)))
+    conn.executemany(
+        "INSERT INTO posts VALUES (?, ?, ?, ?)",
+        ((f'p{i}', CELEBRITY_ID, '微博内容', (now - timedelta(days=i % 10)).isoformat(sep=' ')) for i in range(posts))
+    )
+
+    def comments():
+        for user in range(users):
+            # 约10%的用户在短时间内集中发布负面评论
+            negative = user % 10 == 0
+            pool = NEGATIVE_COMMENTS if negative else OTHER_COMMENTS
+            for _ in range(comments_per_user):
+                if negative:
+                    created_at = now - timedelta(minutes=rng.randint(1, 60))
+                else:
+                    created_at = now - timedelta(hours=rng.randint(1, 24 * 6))
+                yield (f'p{rng.randrange(posts)}', str(user), rng.choice(pool), created_at.isoformat(sep=' '))
+
+    conn.executemany("INSERT INTO comments (post_id, user_id, content, created_at) VALUES (?, ?, ?, ?)", comments())
+    conn.commit()
+    conn.close()
+
+
+def run_legacy(analyzer: FanAnalyzer, limit: int, days: int = 7) -> Dict[str, float]:
+    """旧流程：逐个粉丝查询评论、逐个连接写入黑粉表"""
+    start_date = datetime.now() - timedelta(days=days)
+    start = time.perf_counter()
+    with analyzer.engine.connect() as conn:
+        fans = conn.execute(text("""
+            SELECT wu.weibo_id, MAX(c.created_at) as last_active
+            FROM weibo_users wu
+            JOIN comments c ON wu.weibo_id = c.user_id
+            JOIN posts p ON c.post_id = p.post_id
+            WHERE p.celebrity_id = :celebrity_id
+            AND c.created_at >= :start_date
+            GROUP BY wu.weibo_id
+            ORDER BY last_active DESC
+        """), {'celebrity_id': CELEBRITY_ID, 'start_date': start_date}).fetchall()
+
+    for fan in fans[:limit]:
+        with analyzer.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT c.*
+                FROM comments c
+                JOIN posts p ON c.post_id = p.post_id
+                WHERE c.user_id = :user_id
+                AND p.celebrity_id = :celebrity_id
+                ORDER BY c.created_at DESC
+            """), {'user_id': fan.weibo_id, 'celebrity_id': CELEBRITY_ID}).fetchall()
+        comments = [{'content': row.content, 'created_at': datetime.fromisoformat(row.created_at)} for row in rows]
+        sentiments = analyzer.sentiment_analyzer.analyze_sentiment_batch([c['content'] for c in comments])
+        result = analyzer.sentiment_analyzer.evaluate_black_fan(comments, sentiments)
+        if result['is_black_fan']:
+            with analyzer.engine.begin() as conn:
+                conn.execute(text("""
+                    INSERT INTO black_fans (user_id, celebrity_id, black_fan_score, comment_count, last_active, created_at)
+                    VALUES (:user_id, :celebrity_id, :score, :comment_count, :last_active, :now)
+                    ON CONFLICT (user_id, celebrity_id) DO UPDATE SET
+                        black_fan_score = :score, comment_count = :comment_count,
+                        last_active = :last_active, updated_at = :now
+                """), {
+                    'user_id': fan.weibo_id, 'celebrity_id': CELEBRITY_ID, 'score': result['score'],
+                    'comment_count': len(comments), 'last_active': fan.last_active, 'now': datetime.now()
+                })
+
+    processed = min(limit, len(fans))
+    elapsed = time.perf_counter() - start
+    return {
+        'processed': processed,
+        'seconds': elapsed,
+        'estimated_total_seconds': elapsed / processed * len(fans) if processed else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='黑粉检测性能测试')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--comments-per-user', type=int, default=5)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    parser.add_argument('--legacy-users', type=int, default=2000, help='旧流程实际运行的粉丝数')
+    parser.add_argument('--with-model', action='store_true', help='使用真实BERT模型打分')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'fans.db')
+        start = time.perf_counter()
+        build_dataset(db_path, args.users, args.comments_per_user, args.posts)
+        print(f"生成数据集: {args.users} 用户, {args.users * args.comments_per_user} 条评论, "
+              f"用时 {time.perf_counter() - start:.1f} 秒")
+
+        db_url = f'sqlite:///{db_path}'
+        analyzer_class = SentimentAnalyzer if args.with_model else KeywordSentimentAnalyzer
+        sentiment_analyzer = analyzer_class(db_url, cache_path=None)
+        analyzer = FanAnalyzer(db_url, chunk_size=args.chunk_size, sentiment_analyzer=sentiment_analyzer)
+
+        legacy = run_legacy(analyzer, args.legacy_users)
+        print(f"旧流程: {legacy['processed']} 个粉丝用时 {legacy['seconds']:.2f} 秒, "
+              f"外推全部粉丝约 {legacy['estimated_total_seconds']:.1f} 秒")
+
+        with analyzer.engine.begin() as conn:
+            conn.execute(text("DELETE FROM black_fans"))
+
+        start = time.perf_counter()
+        stats = analyzer.detect_black_fans(CELEBRITY_ID)
+        elapsed = time.perf_counter() - start
+        print(f"新流程: {stats['total_fans']} 个粉丝用时 {elapsed:.2f} 秒, 黑粉 {stats['black_fan_count']} 个")
+        with analyzer.engine.connect() as conn:
+            print(f"黑粉表记录数: {conn.execute(text('SELECT COUNT(*) FROM black_fans')).scalar()}")
+        if elapsed:
+            print(f"加速约 {legacy['estimated_total_seconds'] / elapsed:.1f} 倍")
+
+
+if __name__ == '__main__':
+    main()
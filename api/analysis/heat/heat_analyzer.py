@@ -1,11 +1,11 @@
 import logging
 from typing import Dict, List, Any, Optional, Tuple
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from collections import defaultdict
-from ..sentiment.sentiment_analyzer import SentimentAnalyzer
+from ...database.db_utils import get_engine
 
 class HeatAnalyzer:
     """热度分析器，用于分析明星微博热度数据"""
@@ -17,13 +17,24 @@ class HeatAnalyzer:
             db_url: 数据库连接URL
         """
         self.logger = logging.getLogger(__name__)
-        self.engine = create_engine(db_url)
-
+        self.engine = get_engine(db_url)
+        
+        # 指数平滑系数，新数据权重为0.4，历史数据权重为0.6
+        self.alpha = 0.4
+        # 每日基础热度权重：微博数1.0、评论数2.0、点赞数0.5、转发数1.5
+        self.heat_weights = {
+            'post_count': 1.0,
+            'comment_count': 2.0,
+            'like_count': 0.5,
+            'repost_count': 1.5
+        }
+        # 增量模式下距上次计算过久时，最多向前补算的天数
+        self.max_backfill_days = 90
         
     def _ensure_heat_table(self) -> bool:
         """确保热度表存在"""
         try:
-            with self.engine.connect() as conn:
+            with self.engine.begin() as conn:
                 # 检查表是否存在
                 result = conn.execute(
                     text("""
@@ -44,12 +55,26 @@ class HeatAnalyzer:
                             repost_count INTEGER DEFAULT 0,
                             total_heat FLOAT DEFAULT 0.0,
                             heat_change FLOAT DEFAULT 0.0,
+                            updated_at TIMESTAMP,
                             PRIMARY KEY (date, celebrity_id),
                             FOREIGN KEY (celebrity_id) REFERENCES celebrity(weibo_id)
                         )
                     """))
-                    conn.commit()
                     self.logger.info("热度表创建成功")
+                else:
+                    # 旧版热度表没有updated_at列，upsert会失败
+                    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(heat_data)"))}
+                    if 'updated_at' not in columns:
+                        conn.execute(text("ALTER TABLE heat_data ADD COLUMN updated_at TIMESTAMP"))
+                        
+                # 增量计算水位表：记录每个明星已经计算到的日期
+                conn.execute(text("""
+                    CREATE TABLE IF NOT EXISTS heat_watermark (
+                        celebrity_id VARCHAR(50) PRIMARY KEY,
+                        computed_through DATE,
+                        computed_at TIMESTAMP
+                    )
+                """))
                 return True
                 
         except Exception as e:
@@ -77,8 +102,8 @@ class HeatAnalyzer:
                         SELECT 
                             DATE(created_at) as date,
                             COUNT(*) as post_count,
-                            SUM(like_count) as like_count,
-                            SUM(repost_count) as repost_count
+                            SUM(likes) as like_count,
+                            SUM(reposts) as repost_count
                         FROM post
                         WHERE celebrity_id = :celebrity_id
                         AND created_at >= :window_start
@@ -189,12 +214,13 @@ class HeatAnalyzer:
             self.logger.error(f"计算热度数据失败: {str(e)}")
             return None
             
-    def update_heat_data(self, celebrity_id: str, days: int = 7) -> bool:
+    def update_heat_data(self, celebrity_id: str, days: int = 7, incremental: bool = True) -> bool:
         """更新热度数据
         
         Args:
             celebrity_id: 明星ID
             days: 更新最近几天的数据
+            incremental: 是否使用增量模式（一次分组查询 + 向量化平滑，只重算有变化的日期）
             
         Returns:
             bool: 是否更新成功
@@ -203,16 +229,20 @@ class HeatAnalyzer:
             if not self._ensure_heat_table():
                 return False
                 
+            if incremental:
+                return self._update_heat_data_incremental(celebrity_id, days)
+                
             # 获取需要更新的日期范围
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
             
-            with self.engine.connect() as conn:
-                for date in pd.date_range(start_date, end_date):
-                    # 计算当天的热度数据
-                    heat_data = self._calculate_daily_heat(celebrity_id, date)
-                    if heat_data:
-                        # 更新或插入热度数据
+            # 转为datetime，sqlite3驱动不接受pandas的Timestamp参数
+            for date in pd.date_range(start_date, end_date).to_pydatetime():
+                # 计算当天的热度数据（会读取前一天已提交的热度）
+                heat_data = self._calculate_daily_heat(celebrity_id, date)
+                if heat_data:
+                    # 逐日提交，下一天计算热度变化时才能读到当天的结果
+                    with self.engine.begin() as conn:
                         conn.execute(
                             text("""
                                 INSERT INTO heat_data (
@@ -233,13 +263,207 @@ class HeatAnalyzer:
                             """),
                             heat_data
                         )
-                conn.commit()
-                return True
+            return True
                 
         except Exception as e:
             self.logger.error(f"更新热度数据失败: {str(e)}")
             return False
             
+    def _fetch_daily_stats(self, conn, celebrity_id: str, start: date, end: date) -> pd.DataFrame:
+        """一次分组查询取出日期范围内每天的微博、评论、点赞、转发数
+        
+        Args:
+            conn: 数据库连接
+            celebrity_id: 明星ID
+            start: 起始日期（含）
+            end: 结束日期（含）
+            
+        Returns:
+            pd.DataFrame: 以日期为索引、逐日连续（无数据的日期补0）的统计表
+        """
+        rows = conn.execute(
+            text("""
+                SELECT day,
+                       SUM(post_count) AS post_count,
+                       SUM(comment_count) AS comment_count,
+                       SUM(like_count) AS like_count,
+                       SUM(repost_count) AS repost_count
+                FROM (
+                    SELECT DATE(created_at) AS day,
+                           COUNT(*) AS post_count,
+                           0 AS comment_count,
+                           SUM(likes) AS like_count,
+                           SUM(reposts) AS repost_count
+                    FROM post
+                    WHERE celebrity_id = :celebrity_id
+                    AND created_at >= :start
+                    AND created_at < :end
+                    GROUP BY DATE(created_at)
+                    UNION ALL
+                    SELECT DATE(c.created_at) AS day,
+                           0 AS post_count,
+                           COUNT(*) AS comment_count,
+                           0 AS like_count,
+                           0 AS repost_count
+                    FROM comment c
+                    JOIN post p ON c.post_id = p.post_id
+                    WHERE p.celebrity_id = :celebrity_id
+                    AND c.created_at >= :start
+                    AND c.created_at < :end
+                    GROUP BY DATE(c.created_at)
+                ) daily
+                GROUP BY day
+            """),
+            {
+                'celebrity_id': celebrity_id,
+                'start': start,
+                'end': end + timedelta(days=1)
+            }
+        ).fetchall()
+        
+        columns = list(self.heat_weights)
+        index = pd.date_range(start, end, freq='D').date
+        if not rows:
+            return pd.DataFrame(0, index=index, columns=columns)
+            
+        df = pd.DataFrame([tuple(row) for row in rows], columns=['date'] + columns)
+        df['date'] = pd.to_datetime(df['date']).dt.date
+        return df.set_index('date')[columns].reindex(index, fill_value=0).fillna(0).astype('int64')
+        
+    def _update_heat_data_incremental(self, celebrity_id: str, days: int) -> bool:
+        """增量更新热度数据
+        
+        热度为每日基础热度在整条时间序列上的指数平滑值。每次运行用一次分组查询
+        取出范围内的逐日统计，与heat_data中已保存的统计逐日比较，只从最早发生变化
+        的日期开始重新平滑（以前一天已保存的热度为初值），未变化的日期不再写入。
+        微博与评论表没有修改时间列，因此以已保存的逐日统计作为变化判断依据，
+        heat_watermark记录已计算到的日期，保证两次运行之间的日期不会遗漏。
+        
+        Args:
+            celebrity_id: 明星ID
+            days: 更新最近几天的数据
+            
+        Returns:
+            bool: 是否更新成功
+        """
+        end = datetime.now().date()
+        start = end - timedelta(days=days)
+        
+        with self.engine.begin() as conn:
+            computed_through = conn.execute(
+                text("SELECT computed_through FROM heat_watermark WHERE celebrity_id = :celebrity_id"),
+                {'celebrity_id': celebrity_id}
+            ).scalar()
+            if computed_through is not None:
+                computed_through = pd.to_datetime(computed_through).date()
+                # 上次计算之后的日期也要补上，序列才能连续
+                start = min(start, max(computed_through + timedelta(days=1), end - timedelta(days=self.max_backfill_days)))
+                
+            stats = self._fetch_daily_stats(conn, celebrity_id, start, end)
+            
+            stored_rows = conn.execute(
+                text("""
+                    SELECT date, post_count, comment_count, like_count, repost_count, total_heat
+                    FROM heat_data
+                    WHERE celebrity_id = :celebrity_id
+                    AND date >= :seed_date
+                    AND date <= :end
+                """),
+                {
+                    'celebrity_id': celebrity_id,
+                    'seed_date': start - timedelta(days=1),
+                    'end': end
+                }
+            ).fetchall()
+            stored = pd.DataFrame(
+                [tuple(row) for row in stored_rows],
+                columns=['date'] + list(self.heat_weights) + ['total_heat']
+            )
+            if not stored.empty:
+                stored['date'] = pd.to_datetime(stored['date']).dt.date
+            stored = stored.set_index('date')
+            
+            # 找出统计值与已保存记录不一致（或尚无记录）的最早日期
+            previous = stored.reindex(stats.index)[list(self.heat_weights)]
+            changed = (previous.isna() | (previous != stats)).any(axis=1)
+            if not changed.any():
+                self.logger.info(f"明星 {celebrity_id} 热度数据无变化，跳过计算")
+                self._save_watermark(conn, celebrity_id, end)
+                return True
+                
+            first_changed = changed.idxmax()
+            recompute = stats.loc[first_changed:]
+            
+            # 以变化日期前一天已保存的热度为初值，向量化计算指数平滑
+            seed_date = first_changed - timedelta(days=1)
+            seed = stored['total_heat'].get(seed_date)
+            daily_heat = sum(recompute[column] * weight for column, weight in self.heat_weights.items()).astype(float)
+            if seed is not None and not pd.isna(seed):
+                series = pd.concat([pd.Series([float(seed)]), daily_heat.reset_index(drop=True)])
+                smoothed = series.ewm(alpha=self.alpha, adjust=False).mean().to_numpy()
+                total_heat = smoothed[1:]
+                heat_change = np.diff(smoothed)
+            else:
+                total_heat = daily_heat.ewm(alpha=self.alpha, adjust=False).mean().to_numpy()
+                heat_change = np.diff(total_heat, prepend=0.0)
+                
+            now = datetime.now()
+            records = [
+                {
+                    'date': day,
+                    'celebrity_id': celebrity_id,
+                    'post_count': int(row.post_count),
+                    'comment_count': int(row.comment_count),
+                    'like_count': int(row.like_count),
+                    'repost_count': int(row.repost_count),
+                    'total_heat': float(heat),
+                    'heat_change': float(change),
+                    'updated_at': now
+                }
+                for (day, row), heat, change in zip(recompute.iterrows(), total_heat, heat_change)
+            ]
+            conn.execute(
+                text("""
+                    INSERT INTO heat_data (
+                        date, celebrity_id, post_count, comment_count,
+                        like_count, repost_count, total_heat, heat_change, updated_at
+                    ) VALUES (
+                        :date, :celebrity_id, :post_count, :comment_count,
+                        :like_count, :repost_count, :total_heat, :heat_change, :updated_at
+                    )
+                    ON CONFLICT (date, celebrity_id) DO UPDATE SET
+                        post_count = EXCLUDED.post_count,
+                        comment_count = EXCLUDED.comment_count,
+                        like_count = EXCLUDED.like_count,
+                        repost_count = EXCLUDED.repost_count,
+                        total_heat = EXCLUDED.total_heat,
+                        heat_change = EXCLUDED.heat_change,
+                        updated_at = EXCLUDED.updated_at
+                """),
+                records
+            )
+            self._save_watermark(conn, celebrity_id, end)
+            
+        self.logger.info(f"明星 {celebrity_id} 热度数据已增量更新，从 {first_changed} 起重算 {len(records)} 天")
+        return True
+        
+    def _save_watermark(self, conn, celebrity_id: str, computed_through: date) -> None:
+        """记录已计算到的日期"""
+        conn.execute(
+            text("""
+                INSERT INTO heat_watermark (celebrity_id, computed_through, computed_at)
+                VALUES (:celebrity_id, :computed_through, :computed_at)
+                ON CONFLICT (celebrity_id) DO UPDATE SET
+                    computed_through = EXCLUDED.computed_through,
+                    computed_at = EXCLUDED.computed_at
+            """),
+            {
+                'celebrity_id': celebrity_id,
+                'computed_through': computed_through,
+                'computed_at': datetime.now()
+            }
+        )
+        
     def get_heat_data(self, celebrity_id: str, days: int = 7) -> Dict[str, Any]:
         """获取热度数据
         
@@ -1,25 +1,56 @@
 import logging
-from typing import Dict, List, Any
+import base64
+from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+from pandas.api.types import union_categoricals
 import os
 import json
 import numpy as np
+from ...database.db_utils import get_engine
+
+BLACK_FAN_COLUMNS = ['black_fan_score', 'comment_count', 'last_active', 'gender', 'location']
+
+# 统计方式：sql在数据库中用GROUP BY和窗口函数汇总，只取回汇总结果；pandas把黑粉数据按列读入内存后向量化统计
+AGGREGATION_MODES = ('sql', 'pandas')
+
+# SQL汇总用到的时间表达式：小时、星期（周一为0，与datetime.weekday一致）、距:now的整天数
+SQL_TIME_EXPRESSIONS = {
+    'sqlite': {
+        'hour': "CAST(strftime('%H', {column}) AS INTEGER)",
+        'weekday': "(CAST(strftime('%w', {column}) AS INTEGER) + 6) % 7",
+        'days': "CAST(julianday(:now) - julianday({column}) AS INTEGER)"
+    },
+    'mysql': {
+        'hour': "HOUR({column})",
+        'weekday': "WEEKDAY({column})",
+        'days': "TIMESTAMPDIFF(DAY, {column}, :now)"
+    }
+}
 
 class BlackFanAnalyzer:
     """黑粉分析器，用于分析黑粉群体的特征"""
     
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: str, chunk_size: int = 100000, aggregation: Optional[str] = None):
         """初始化黑粉分析器
         
         Args:
             db_url: 数据库连接URL
+            chunk_size: pandas统计时读取黑粉表每块的行数
+            aggregation: 统计方式（sql/pandas），为None时读取环境变量BLACK_FAN_AGGREGATION；
+                都未指定时MySQL等服务端数据库用sql，SQLite在进程内运行、没有传输开销，用更快的pandas
         """
         self.logger = logging.getLogger(__name__)
-        self.engine = create_engine(db_url)
+        self.engine = get_engine(db_url)
+        self.chunk_size = chunk_size
+        self.aggregation = (aggregation or os.getenv('BLACK_FAN_AGGREGATION')
+                            or ('pandas' if self.engine.dialect.name == 'sqlite' else 'sql'))
+        if self.aggregation not in AGGREGATION_MODES:
+            raise ValueError(f"不支持的统计方式: {self.aggregation}，可选: {', '.join(AGGREGATION_MODES)}")
+        if self.aggregation == 'sql' and self.engine.dialect.name not in SQL_TIME_EXPRESSIONS:
+            self.logger.warning(f"{self.engine.dialect.name} 不支持SQL汇总，改用pandas统计")
+            self.aggregation = 'pandas'
         self.timewindow = 7
         # 创建保存目录
         self.save_dir = os.path.join('static', 'analysis', 'black_fans')
@@ -31,7 +62,7 @@ class BlackFanAnalyzer:
     def _ensure_analysis_table(self) -> None:
         """确保分析结果表存在"""
         try:
-            with self.engine.connect() as conn:
+            with self.engine.begin() as conn:
                 # 检查表是否存在
                 result = conn.execute(text("""
                     SELECT name FROM sqlite_master 
@@ -49,13 +80,12 @@ class BlackFanAnalyzer:
                             FOREIGN KEY (celebrity_id) REFERENCES celebrity(weibo_id)
                         )
                     """))
-                    conn.commit()
                     self.logger.info("创建black_fan_analysis表成功")
                     
         except Exception as e:
             # 如果表不存在，会抛出异常，此时创建表
             if "no such table" in str(e):
-                with self.engine.connect() as conn:
+                with self.engine.begin() as conn:
                     conn.execute(text("""
                         CREATE TABLE black_fan_analysis (
                             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -65,7 +95,6 @@ class BlackFanAnalyzer:
                             FOREIGN KEY (celebrity_id) REFERENCES celebrity(weibo_id)
                         )
                     """))
-                    conn.commit()
                     self.logger.info("创建black_fan_analysis表成功")
             else:
                 self.logger.error(f"创建black_fan_analysis表失败: {str(e)}")
@@ -80,26 +109,30 @@ class BlackFanAnalyzer:
             Dict: 分析结果
         """
         try:
-            # 1. 获取黑粉数据
-            black_fans = self._get_black_fans(celebrity_id)
-            if not black_fans:
+            # 1. 汇总黑粉特征，所有按时间的统计使用同一个当前时间
+            now = datetime.now()
+            if self.aggregation == 'sql':
+                stats = self._aggregate_in_sql(celebrity_id, now)
+            else:
+                stats = self._aggregate_in_pandas(celebrity_id, now)
+            if not stats:
                 return {
                     "status": "error",
                     "message": "未找到黑粉数据"
                 }
                 
-            # 2. 分析黑粉特征
+            # 2. 最活跃黑粉和情感趋势在两种统计方式下都直接查询
             analysis_results = {
-                "total_count": len(black_fans),
-                "score_distribution": self._analyze_score_distribution(black_fans),
-                "activity_analysis": self._analyze_activity(black_fans),
-                "top_black_fans": self._get_top_black_fans(black_fans),
-                "trend_analysis": self._analyze_trend(black_fans),
-                "gender_distribution": self._analyze_gender_distribution(black_fans),
-                "location_distribution": self._analyze_location_distribution(black_fans),
-                "time_distribution": self._analyze_time_distribution(black_fans),
-                "sentiment_trend": self._analyze_sentiment_trend(black_fans),
-                "risk_level": self._analyze_risk_level(black_fans)
+                "total_count": stats["total_count"],
+                "score_distribution": stats["score_distribution"],
+                "activity_analysis": stats["activity_analysis"],
+                "top_black_fans": self.get_top_black_fans(celebrity_id)["items"],
+                "trend_analysis": stats["trend_analysis"],
+                "gender_distribution": stats["gender_distribution"],
+                "location_distribution": stats["location_distribution"],
+                "time_distribution": stats["time_distribution"],
+                "sentiment_trend": self._analyze_sentiment_trend(celebrity_id),
+                "risk_level": stats["risk_level"]
             }
             
             # 3. 保存分析结果
@@ -117,259 +150,542 @@ class BlackFanAnalyzer:
                 "message": str(e)
             }
 
-    def _get_black_fans(self, celebrity_id: int) -> List[Dict]:
-        """获取黑粉数据
+    def _aggregate_in_pandas(self, celebrity_id: int, now: datetime) -> Optional[Dict[str, Any]]:
+        """把黑粉数据按列读入内存后向量化统计，没有黑粉时返回None"""
+        black_fans = self._load_black_fans(celebrity_id)
+        if black_fans.empty:
+            return None
+        return {
+            "total_count": len(black_fans),
+            "score_distribution": self._analyze_score_distribution(black_fans),
+            "activity_analysis": self._analyze_activity(black_fans),
+            "trend_analysis": self._analyze_trend(black_fans, now),
+            "gender_distribution": self._analyze_gender_distribution(black_fans),
+            "location_distribution": self._analyze_location_distribution(black_fans),
+            "time_distribution": self._analyze_time_distribution(black_fans),
+            "risk_level": self._analyze_risk_level(black_fans, now)
+        }
+        
+    def _aggregate_in_sql(self, celebrity_id: int, now: datetime) -> Optional[Dict[str, Any]]:
+        """在数据库中汇总黑粉特征，只取回汇总结果，没有黑粉时返回None
+        
+        黑粉表和用户表的关联只做一次，结果（连同风险分数）写入连接内的临时表，
+        之后的计数、直方图、分组统计和中位数（窗口函数）都只扫描这张窄表
         
         Args:
             celebrity_id: 明星ID
+            now: 当前时间
             
         Returns:
-            List[Dict]: 黑粉数据列表
+            Dict: 与pandas统计相同结构的汇总结果
         """
+        expressions = SQL_TIME_EXPRESSIONS[self.engine.dialect.name]
+        drop_query = ("DROP TEMPORARY TABLE IF EXISTS black_fan_report" if self.engine.dialect.name == 'mysql'
+                      else "DROP TABLE IF EXISTS temp.black_fan_report")
+        now_text = now.strftime('%Y-%m-%d %H:%M:%S.%f')
         
+        with self.engine.connect() as conn:
+            conn.execute(text(drop_query))
+            try:
+                conn.execute(text(f"""
+                    CREATE TEMPORARY TABLE black_fan_report AS
+                    SELECT score, comment_count, last_active, gender, location,
+                           score * 0.4 + comment_count / 100.0 * 0.3 +
+                           CASE WHEN last_active IS NULL THEN 0 WHEN days > 0 THEN 1.0 / days ELSE 1 END * 0.3 AS risk
+                    FROM (
+                        SELECT bf.black_fan_score AS score,
+                               COALESCE(bf.comment_count, 0) AS comment_count,
+                               bf.last_active,
+                               COALESCE(NULLIF(wu.gender, ''), 'unknown') AS gender,
+                               COALESCE(NULLIF(wu.location, ''), 'unknown') AS location,
+                               {expressions['days'].format(column='bf.last_active')} AS days
+                        FROM black_fans bf
+                        JOIN weibo_users wu ON bf.user_id = wu.weibo_id
+                        WHERE bf.celebrity_id = :celebrity_id
+                    ) fans
+                """), {'celebrity_id': celebrity_id, 'now': now_text})
+                
+                summary = conn.execute(text("""
+                    SELECT COUNT(*) AS total_count,
+                           AVG(score) AS score_mean, MIN(score) AS score_min, MAX(score) AS score_max,
+                           SUM(CASE WHEN score >= 0.8 THEN 1 ELSE 0 END) AS score_high,
+                           SUM(CASE WHEN score >= 0.5 AND score < 0.8 THEN 1 ELSE 0 END) AS score_medium,
+                           SUM(CASE WHEN score < 0.5 THEN 1 ELSE 0 END) AS score_low,
+                           SUM(comment_count) AS comment_total, AVG(comment_count) AS comment_mean,
+                           MIN(comment_count) AS comment_min, MAX(comment_count) AS comment_max,
+                           SUM(CASE WHEN comment_count >= 50 THEN 1 ELSE 0 END) AS very_active,
+                           SUM(CASE WHEN comment_count >= 20 AND comment_count < 50 THEN 1 ELSE 0 END) AS active,
+                           SUM(CASE WHEN comment_count < 20 THEN 1 ELSE 0 END) AS inactive,
+                           SUM(CASE WHEN comment_count >= 0 AND comment_count < 10 THEN 1 ELSE 0 END) AS comment_bin_0,
+                           SUM(CASE WHEN comment_count >= 10 AND comment_count < 20 THEN 1 ELSE 0 END) AS comment_bin_1,
+                           SUM(CASE WHEN comment_count >= 20 AND comment_count < 50 THEN 1 ELSE 0 END) AS comment_bin_2,
+                           SUM(CASE WHEN comment_count >= 50 AND comment_count < 100 THEN 1 ELSE 0 END) AS comment_bin_3,
+                           SUM(CASE WHEN comment_count >= 100 THEN 1 ELSE 0 END) AS comment_bin_4,
+                           AVG(risk) AS risk_mean, MIN(risk) AS risk_min, MAX(risk) AS risk_max,
+                           SUM(CASE WHEN risk >= 0.8 THEN 1 ELSE 0 END) AS risk_high,
+                           SUM(CASE WHEN risk >= 0.5 AND risk < 0.8 THEN 1 ELSE 0 END) AS risk_medium,
+                           SUM(CASE WHEN risk < 0.5 THEN 1 ELSE 0 END) AS risk_low
+                    FROM black_fan_report
+                """)).fetchone()
+                total = int(summary.total_count)
+                if not total:
+                    return None
+                    
+                # 中位数：分数取升序第 total//2 个（与原实现一致），评论数偶数个时取中间两个的平均
+                medians = conn.execute(text("""
+                    SELECT MAX(CASE WHEN score_rank = :score_rank THEN score END) AS score_median,
+                           AVG(CASE WHEN count_rank IN (:lower_rank, :upper_rank) THEN comment_count END) AS comment_median
+                    FROM (
+                        SELECT score, comment_count,
+                               ROW_NUMBER() OVER (ORDER BY score) AS score_rank,
+                               ROW_NUMBER() OVER (ORDER BY comment_count) AS count_rank
+                        FROM black_fan_report
+                    ) ranked
+                """), {
+                    'score_rank': total // 2 + 1,
+                    'lower_rank': (total - 1) // 2 + 1,
+                    'upper_rank': total // 2 + 1
+                }).fetchone()
+                
+                distributions = {}
+                for column in ('gender', 'location'):
+                    rows = conn.execute(text(f"""
+                        SELECT {column} AS value, COUNT(*) AS count
+                        FROM black_fan_report
+                        GROUP BY {column}
+                        ORDER BY count DESC
+                    """)).fetchall()
+                    distributions[column] = {str(row.value): int(row.count) for row in rows}
+                    
+                day_counts = {
+                    str(row.day)[:10]: int(row.count)
+                    for row in conn.execute(text("""
+                        SELECT DATE(last_active) AS day, COUNT(*) AS count
+                        FROM black_fan_report
+                        WHERE last_active >= :start_date AND last_active < :end_date
+                        GROUP BY DATE(last_active)
+                    """), {
+                        'start_date': (now - timedelta(days=self.timewindow)).strftime('%Y-%m-%d'),
+                        'end_date': now.strftime('%Y-%m-%d')
+                    })
+                }
+                
+                time_counts = {}
+                for unit, size in (('hour', 24), ('weekday', 7)):
+                    counts = [0] * size
+                    for row in conn.execute(text(f"""
+                        SELECT {expressions[unit].format(column='last_active')} AS unit, COUNT(*) AS count
+                        FROM black_fan_report
+                        WHERE last_active IS NOT NULL
+                        GROUP BY 1
+                    """)):
+                        if row.unit is not None:
+                            counts[int(row.unit)] = int(row.count)
+                    time_counts[unit] = counts
+                    
+                risk_counts = self._sql_risk_histogram(conn, float(summary.risk_min), float(summary.risk_max), total)
+            finally:
+                conn.execute(text(drop_query))
+                
+        activity_bins = [0, 10, 20, 50, 100, float('inf')]
+        comment_max = int(summary.comment_max)
+        return {
+            "total_count": total,
+            "score_distribution": {
+                "mean": float(summary.score_mean),
+                "median": float(medians.score_median),
+                "max": float(summary.score_max),
+                "min": float(summary.score_min),
+                "distribution": {
+                    "high": int(summary.score_high),
+                    "medium": int(summary.score_medium),
+                    "low": int(summary.score_low)
+                }
+            },
+            "activity_analysis": {
+                "levels": {
+                    "very_active": int(summary.very_active),
+                    "active": int(summary.active),
+                    "inactive": int(summary.inactive)
+                },
+                "average_activity": float(summary.comment_mean) / comment_max if comment_max > 0 else 0.0,
+                "activity_metrics": {
+                    "total_comments": int(summary.comment_total),
+                    "average_comments": float(summary.comment_mean),
+                    "median_comments": float(medians.comment_median),
+                    "max_comments": comment_max,
+                    "min_comments": int(summary.comment_min)
+                },
+                "activity_distribution": {
+                    "bins": activity_bins,
+                    "counts": [int(getattr(summary, f'comment_bin_{i}')) for i in range(5)]
+                }
+            },
+            "trend_analysis": [
+                {
+                    "date": (now - timedelta(days=days)).strftime("%Y-%m-%d"),
+                    "count": day_counts.get((now - timedelta(days=days)).strftime("%Y-%m-%d"), 0)
+                }
+                for days in range(self.timewindow, 0, -1)
+            ],
+            "gender_distribution": distributions['gender'],
+            "location_distribution": distributions['location'],
+            "time_distribution": {
+                "hour_distribution": [
+                    {"hour": hour, "count": count}
+                    for hour, count in enumerate(time_counts['hour'])
+                ],
+                "weekday_distribution": [
+                    {"weekday": weekday, "count": count}
+                    for weekday, count in enumerate(time_counts['weekday'])
+                ]
+            },
+            "risk_level": {
+                "risk_levels": {
+                    "high": int(summary.risk_high),
+                    "medium": int(summary.risk_medium),
+                    "low": int(summary.risk_low)
+                },
+                "average_risk": float(summary.risk_mean),
+                "risk_distribution": {
+                    "bins": [0, 0.2, 0.4, 0.6, 0.8, 1.0],
+                    "counts": risk_counts
+                }
+            }
+        }
+        
+    @staticmethod
+    def _sql_risk_histogram(conn, risk_min: float, risk_max: float, total: int) -> List[int]:
+        """风险分数的5等分直方图，分箱方式与 np.histogram(bins=5) 相同"""
+        if risk_min == risk_max:
+            # np.histogram在取值全部相同时以该值为中心分箱，所有值落在中间一箱
+            return [0, 0, total, 0, 0]
+        counts = [0] * 5
+        rows = conn.execute(text("""
+            SELECT CAST((risk - :risk_min) * :scale AS INTEGER) AS bucket, COUNT(*) AS count
+            FROM black_fan_report
+            GROUP BY 1
+        """), {'risk_min': risk_min, 'scale': 5 / (risk_max - risk_min)})
+        for row in rows:
+            # 最大值落在最后一箱的右边界上，与np.histogram一样计入最后一箱
+            counts[min(int(row.bucket), 4)] += int(row.count)
+        return counts
+        
+    def _load_black_fans(self, celebrity_id: int) -> pd.DataFrame:
+        """分块流式读取黑粉数据
+        
+        只读取统计需要的列：分数、评论数、最后活跃时间保存为数值列，性别、地域保存为分类列，
+        每块转换后原始行即可释放，内存占用与黑粉数成正比且每行只有几十字节
+        
+        Args:
+            celebrity_id: 明星ID
+            
+        Returns:
+            pd.DataFrame: 黑粉数据表
+        """
         query = """
-            SELECT bf.*, wu.nickname, wu.gender, wu.location
+            SELECT bf.black_fan_score, bf.comment_count, bf.last_active, wu.gender, wu.location
             FROM black_fans bf
             JOIN weibo_users wu ON bf.user_id = wu.weibo_id
             WHERE bf.celebrity_id = :celebrity_id
-            ORDER BY bf.black_fan_score DESC
         """
         
+        chunks = []
         with self.engine.connect() as conn:
-            result = conn.execute(
+            result = conn.execution_options(stream_results=True).execute(
                 text(query),
                 {'celebrity_id': celebrity_id}
-            ).fetchall()
+            )
+            while True:
+                rows = result.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                scores, comment_counts, last_active, genders, locations = zip(*rows)
+                chunks.append({
+                    'black_fan_score': np.array(scores, dtype='float64'),
+                    'comment_count': pd.Series(comment_counts, dtype='float64').fillna(0).to_numpy('int64'),
+                    'last_active': pd.to_datetime(pd.Series(last_active), errors='coerce').to_numpy(),
+                    'gender': pd.Categorical([gender or 'unknown' for gender in genders]),
+                    'location': pd.Categorical([location or 'unknown' for location in locations])
+                })
+                
+        if not chunks:
+            return pd.DataFrame(columns=BLACK_FAN_COLUMNS)
+        
+        # 各块的分类列类别不同，合并时统一类别，避免退化为object列
+        return pd.DataFrame({
+            column: (union_categoricals([chunk[column] for chunk in chunks])
+                     if column in ('gender', 'location')
+                     else np.concatenate([chunk[column] for chunk in chunks]))
+            for column in BLACK_FAN_COLUMNS
+        })
+        
+    def get_top_black_fans(self, celebrity_id: int, limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """按黑粉分数、评论数从高到低分页获取黑粉
+        
+        使用键集分页：游标记录上一页最后一名的(分数, 评论数, 用户ID)，下一页从它之后开始，
+        配合 (celebrity_id, black_fan_score, comment_count, user_id) 索引每页只读取limit行，翻到后面的页也不变慢。
+        游标条件以 black_fan_score <= :score 开头，索引可以直接定位到游标所在分数，不必从第一名开始扫描；
+        comment_count可以为NULL，排序和游标比较都按0处理，否则NULL行在翻页时会被跳过
+        
+        Args:
+            celebrity_id: 明星ID
+            limit: 每页数量
+            cursor: 上一页返回的next_cursor，为空时从第一名开始
             
-        return [dict(row) for row in result]
+        Returns:
+            Dict: {'items': 黑粉列表, 'next_cursor': 下一页游标，没有下一页时为None}
+        """
+        params = {'celebrity_id': celebrity_id, 'limit': limit + 1}
+        after = ""
+        if cursor:
+            params['score'], params['comment_count'], params['user_id'] = self._decode_cursor(cursor)
+            after = """
+                AND bf.black_fan_score <= :score
+                AND (bf.black_fan_score < :score
+                     OR (bf.black_fan_score = :score AND COALESCE(bf.comment_count, 0) < :comment_count)
+                     OR (bf.black_fan_score = :score AND COALESCE(bf.comment_count, 0) = :comment_count
+                         AND bf.user_id < :user_id))
+            """
+        query = f"""
+            SELECT bf.user_id, wu.nickname, wu.gender, wu.location,
+                   bf.black_fan_score, COALESCE(bf.comment_count, 0) AS comment_count, bf.last_active
+            FROM black_fans bf
+            JOIN weibo_users wu ON bf.user_id = wu.weibo_id
+            WHERE bf.celebrity_id = :celebrity_id {after}
+            ORDER BY bf.black_fan_score DESC, COALESCE(bf.comment_count, 0) DESC, bf.user_id DESC
+            LIMIT :limit
+        """
         
-    def _analyze_score_distribution(self, black_fans: List[Dict]) -> Dict[str, Any]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(query), params).fetchall()
+            
+        # 多取一行判断是否还有下一页；最后活跃时间转成字符串，结果可以直接保存为JSON
+        items = [
+            dict(row._mapping, last_active=str(row.last_active) if row.last_active is not None else None)
+            for row in rows[:limit]
+        ]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = self._encode_cursor(last['black_fan_score'], last['comment_count'], last['user_id'])
+        return {'items': items, 'next_cursor': next_cursor}
+        
+    @staticmethod
+    def _encode_cursor(score: float, comment_count: int, user_id: str) -> str:
+        raw = json.dumps([score, comment_count, user_id], ensure_ascii=False)
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+        
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple:
+        """解析分页游标，格式不正确时抛出ValueError"""
+        try:
+            score, comment_count, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return float(score), int(comment_count), str(user_id)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"无效的分页游标: {cursor}") from e
+        
+    def _analyze_score_distribution(self, black_fans: pd.DataFrame) -> Dict[str, Any]:
         """分析黑粉分数分布
         
         Args:
-            black_fans: 黑粉数据列表
+            black_fans: 黑粉数据表
             
         Returns:
             Dict: 分数分布分析结果
         """
-        scores = [bf['black_fan_score'] for bf in black_fans]
+        scores = black_fans['black_fan_score'].to_numpy()
+        middle = len(scores) // 2
         
         return {
-            "mean": sum(scores) / len(scores),
-            "median": sorted(scores)[len(scores) // 2],
-            "max": max(scores),
-            "min": min(scores),
+            "mean": float(scores.mean()),
+            "median": float(np.partition(scores, middle)[middle]),
+            "max": float(scores.max()),
+            "min": float(scores.min()),
             "distribution": {
-                "high": len([s for s in scores if s >= 0.8]),
-                "medium": len([s for s in scores if 0.5 <= s < 0.8]),
-                "low": len([s for s in scores if s < 0.5])
+                "high": int(np.count_nonzero(scores >= 0.8)),
+                "medium": int(np.count_nonzero((scores >= 0.5) & (scores < 0.8))),
+                "low": int(np.count_nonzero(scores < 0.5))
             }
         }
 
-    def _analyze_activity(self, black_fans: List[Dict]) -> Dict[str, Any]:
+    def _analyze_activity(self, black_fans: pd.DataFrame) -> Dict[str, Any]:
         """分析黑粉活跃度
         
         Args:
-            black_fans: 黑粉数据列表
+            black_fans: 黑粉数据表
             
         Returns:
             Dict: 活跃度分析结果
         """
-        comment_counts = [bf['comment_count'] for bf in black_fans]
+        comment_counts = black_fans['comment_count'].to_numpy()
         
         # 计算活跃度等级
         activity_levels = {
-            "very_active": len([c for c in comment_counts if c >= 50]),  # 评论数 >= 50
-            "active": len([c for c in comment_counts if 20 <= c < 50]),  # 评论数 20-49
-            "inactive": len([c for c in comment_counts if c < 20])       # 评论数 < 20
+            "very_active": int(np.count_nonzero(comment_counts >= 50)),  # 评论数 >= 50
+            "active": int(np.count_nonzero((comment_counts >= 20) & (comment_counts < 50))),  # 评论数 20-49
+            "inactive": int(np.count_nonzero(comment_counts < 20))       # 评论数 < 20
         }
         
         # 计算活跃度分数 (0-1)
-        max_comments = max(comment_counts) if comment_counts else 0
-        activity_scores = [count / max_comments if max_comments > 0 else 0 for count in comment_counts]
+        max_comments = int(comment_counts.max())
+        average_activity = float(comment_counts.mean() / max_comments) if max_comments > 0 else 0.0
+        bins = [0, 10, 20, 50, 100, float('inf')]
         
         return {
             "levels": activity_levels,
-            "average_activity": float(np.mean(activity_scores)),
+            "average_activity": average_activity,
             "activity_metrics": {
-                "total_comments": sum(comment_counts),
-                "average_comments": float(np.mean(comment_counts)),
+                "total_comments": int(comment_counts.sum()),
+                "average_comments": float(comment_counts.mean()),
                 "median_comments": float(np.median(comment_counts)),
-                "max_comments": max(comment_counts) if comment_counts else 0,
-                "min_comments": min(comment_counts) if comment_counts else 0
+                "max_comments": max_comments,
+                "min_comments": int(comment_counts.min())
             },
             "activity_distribution": {
-                "bins": [0, 10, 20, 50, 100, float('inf')],
-                "counts": np.histogram(comment_counts, bins=[0, 10, 20, 50, 100, float('inf')])[0].tolist()
+                "bins": bins,
+                "counts": np.histogram(comment_counts, bins=bins)[0].tolist()
             }
         }
-
-    def _get_top_black_fans(self, black_fans: List[Dict], limit: int = 20) -> List[Dict]:
-        """获取最活跃的黑粉
-        
-        Args:
-            black_fans: 黑粉数据列表
-            limit: 返回数量限制
-            
-        Returns:
-            List[Dict]: 最活跃的黑粉列表
-        """
-        return sorted(
-            black_fans,
-            key=lambda x: (x['black_fan_score'], x['comment_count']),
-            reverse=True
-        )[:limit]
         
-    def _analyze_trend(self, black_fans: List[Dict]) -> List[Dict]:
+    def _analyze_trend(self, black_fans: pd.DataFrame, now: datetime) -> List[Dict]:
         """分析黑粉趋势
         
         Args:
-            black_fans: 黑粉数据列表
+            black_fans: 黑粉数据表
+            now: 当前时间
             
         Returns:
             List[Dict]: 趋势数据
         """
-        # 按最后活跃时间分组统计
+        # 按最后活跃日期一次分桶，再取最近timewindow天
+        day_counts = black_fans['last_active'].dt.normalize().value_counts()
         trend_data = []
         for days in range(self.timewindow, 0, -1):
-            date = datetime.now() - timedelta(days=days)
-            count = len([
-                bf for bf in black_fans
-                if bf['last_active'].date() == date.date()
-            ])
+            date = now - timedelta(days=days)
             trend_data.append({
                 "date": date.strftime("%Y-%m-%d"),
-                "count": count
+                "count": int(day_counts.get(pd.Timestamp(date.date()), 0))
             })
             
         return trend_data
         
-    def _analyze_gender_distribution(self, black_fans: List[Dict]) -> Dict[str, int]:
+    def _analyze_gender_distribution(self, black_fans: pd.DataFrame) -> Dict[str, int]:
         """分析黑粉性别分布
         
         Args:
-            black_fans: 黑粉数据列表
+            black_fans: 黑粉数据表
             
         Returns:
             Dict[str, int]: 性别分布数据
         """
-        gender_counts = {}
-        for bf in black_fans:
-            gender = bf['gender'] or 'unknown'
-            gender_counts[gender] = gender_counts.get(gender, 0) + 1
-        return gender_counts
+        counts = black_fans['gender'].value_counts()
+        return {str(gender): int(count) for gender, count in counts.items() if count > 0}
         
-    def _analyze_location_distribution(self, black_fans: List[Dict]) -> Dict[str, int]:
+    def _analyze_location_distribution(self, black_fans: pd.DataFrame) -> Dict[str, int]:
         """分析黑粉地域分布
         
         Args:
-            black_fans: 黑粉数据列表
+            black_fans: 黑粉数据表
             
         Returns:
             Dict[str, int]: 地域分布数据
         """
-        location_counts = {}
-        for bf in black_fans:
-            location = bf['location'] or 'unknown'
-            location_counts[location] = location_counts.get(location, 0) + 1
-        return location_counts
+        counts = black_fans['location'].value_counts()
+        return {str(location): int(count) for location, count in counts.items() if count > 0}
         
-    def _analyze_time_distribution(self, black_fans: List[Dict]) -> Dict[str, Any]:
+    def _analyze_time_distribution(self, black_fans: pd.DataFrame) -> Dict[str, Any]:
         """分析黑粉活跃时间分布
         
         Args:
-            black_fans: 黑粉数据列表
+            black_fans: 黑粉数据表
             
         Returns:
             Dict: 时间分布分析结果
         """
-        hour_distribution = {i: 0 for i in range(24)}
-        weekday_distribution = {i: 0 for i in range(7)}
-        
-        for bf in black_fans:
-            hour = bf['last_active'].hour
-            weekday = bf['last_active'].weekday()
-            hour_distribution[hour] += 1
-            weekday_distribution[weekday] += 1
+        last_active = black_fans['last_active'].dropna()
+        hour_counts = np.bincount(last_active.dt.hour.to_numpy(), minlength=24)
+        weekday_counts = np.bincount(last_active.dt.weekday.to_numpy(), minlength=7)
             
         return {
             "hour_distribution": [
-                {"hour": hour, "count": count}
-                for hour, count in hour_distribution.items()
+                {"hour": hour, "count": int(count)}
+                for hour, count in enumerate(hour_counts)
             ],
             "weekday_distribution": [
-                {"weekday": weekday, "count": count}
-                for weekday, count in weekday_distribution.items()
+                {"weekday": weekday, "count": int(count)}
+                for weekday, count in enumerate(weekday_counts)
             ]
         }
         
     
-    def _analyze_sentiment_trend(self, black_fans: List[Dict]) -> List[Dict]:
+    def _analyze_sentiment_trend(self, celebrity_id: int) -> List[Dict]:
         """分析情感趋势
         
         Args:
-            black_fans: 黑粉数据列表
+            celebrity_id: 明星ID
             
         Returns:
             List[Dict]: 情感趋势数据
         """
-        # 这里需要从评论表中获取情感数据
+        # 这里需要从评论表中获取情感数据；黑粉名单在库内关联，不再把全部用户ID作为参数传入
         query = """
             SELECT DATE(c.created_at) as date,
                    AVG(c.sentiment_score) as avg_sentiment,
                    COUNT(*) as comment_count
             FROM comments c
-            WHERE c.user_id IN :user_ids
+            JOIN black_fans bf ON bf.user_id = c.user_id AND bf.celebrity_id = :celebrity_id
+            JOIN weibo_users wu ON bf.user_id = wu.weibo_id
             GROUP BY DATE(c.created_at)
             ORDER BY date DESC
             LIMIT 30
         """
         
-        user_ids = [bf['user_id'] for bf in black_fans]
-        
         with self.engine.connect() as conn:
             result = conn.execute(
                 text(query),
-                {'user_ids': tuple(user_ids)}
+                {'celebrity_id': celebrity_id}
             ).fetchall()
             
         return [
             {
-                "date": row['date'].strftime("%Y-%m-%d"),
-                "avg_sentiment": float(row['avg_sentiment']),
-                "comment_count": row['comment_count']
+                "date": str(row.date)[:10],
+                "avg_sentiment": float(row.avg_sentiment or 0),
+                "comment_count": row.comment_count
             }
             for row in result
         ]
         
-    def _analyze_risk_level(self, black_fans: List[Dict]) -> Dict[str, Any]:
+    def _analyze_risk_level(self, black_fans: pd.DataFrame, now: datetime) -> Dict[str, Any]:
         """分析风险等级
         
         Args:
-            black_fans: 黑粉数据列表
+            black_fans: 黑粉数据表
+            now: 当前时间
             
         Returns:
             Dict: 风险等级分析结果
         """
-        risk_scores = []
-        for bf in black_fans:
-            # 计算综合风险分数
-            score = (
-                bf['black_fan_score'] * 0.4 +  # 黑粉分数权重
-                (bf['comment_count'] / 100) * 0.3 +  # 评论频率权重
-                (1 / (datetime.now() - bf['last_active']).days if (datetime.now() - bf['last_active']).days > 0 else 1) * 0.3  # 活跃度权重
-            )
-            risk_scores.append(score)
+        # 活跃度：距最后活跃天数的倒数，当天活跃为1，没有活跃时间为0
+        days = (pd.Timestamp(now) - black_fans['last_active']).dt.days
+        recency = (1 / days.where(days > 0)).fillna(1.0).where(days.notna(), 0.0)
+        
+        # 计算综合风险分数
+        risk_scores = (
+            black_fans['black_fan_score'].to_numpy() * 0.4 +  # 黑粉分数权重
+            (black_fans['comment_count'].to_numpy() / 100) * 0.3 +  # 评论频率权重
+            recency.to_numpy() * 0.3  # 活跃度权重
+        )
             
         risk_levels = {
-            "high": len([s for s in risk_scores if s >= 0.8]),
-            "medium": len([s for s in risk_scores if 0.5 <= s < 0.8]),
-            "low": len([s for s in risk_scores if s < 0.5])
+            "high": int(np.count_nonzero(risk_scores >= 0.8)),
+            "medium": int(np.count_nonzero((risk_scores >= 0.5) & (risk_scores < 0.8))),
+            "low": int(np.count_nonzero(risk_scores < 0.5))
         }
         
         return {
             "risk_levels": risk_levels,
-            "average_risk": float(np.mean(risk_scores)),
+            "average_risk": float(risk_scores.mean()),
             "risk_distribution": {
                 "bins": [0, 0.2, 0.4, 0.6, 0.8, 1.0],
                 "counts": np.histogram(risk_scores, bins=5)[0].tolist()
@@ -397,7 +713,7 @@ class BlackFanAnalyzer:
                 json.dump(save_data, f, ensure_ascii=False, indent=2)
                 
             # 保存到数据库
-            with self.engine.connect() as conn:
+            with self.engine.begin() as conn:
                 conn.execute(
                     text("""
                         INSERT INTO black_fan_analysis 
@@ -411,7 +727,6 @@ class BlackFanAnalyzer:
                         'analysis_results': json.dumps(analysis_results)
                     }
                 )
-                conn.commit()
                 
         except Exception as e:
             self.logger.error(f"保存分析结果失败: {str(e)}")
@@ -7,31 +7,41 @@ import logging
 from datetime import datetime, timedelta
 from collections import defaultdict
 from ...models.model_manager import ModelManager
-import pandas as pd
-from sqlalchemy import create_engine, text
+from .sentiment_cache import get_sentiment_cache
+from sqlalchemy import text, bindparam
 from sqlalchemy.orm import sessionmaker
 from ...database.models import Comment, Post
+from ...database.db_utils import get_engine
+from ...database.rollup import collect_keys, refresh_daily_stats
 
 class SentimentAnalyzer:
     """情感分析器"""
     
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: str, max_batch_size: int = 32, max_length: int = 512,
+                 cache_path: Optional[str] = 'data/sentiment_cache.db', backend: Optional[str] = None):
         """初始化情感分析器
         
         Args:
             db_url: 数据库连接URL
+            max_batch_size: 单次前向计算的最大文本数
+            max_length: 分词截断长度
+            cache_path: 情感结果持久化缓存文件路径，为None时不使用缓存
+            backend: 推理后端（torch/quantized/onnx），为None时由ModelManager按环境变量决定
         """
         self.logger = logging.getLogger(__name__)
         self.db_url = db_url
-        # 使用模型管理器加载模型
-        try:
-            model_manager = ModelManager()
-            self.tokenizer, self.model = model_manager.get_bert_model()
-            self.device = self.model.device
-            self.logger.info(f"BERT模型加载成功，使用设备: {self.device}")
-        except Exception as e:
-            self.logger.error(f"BERT模型加载失败: {str(e)}")
-            # raise
+        self.max_batch_size = max_batch_size
+        self.max_length = max_length
+        # 模型由进程内注册表共享，首次推理时才加载
+        self.model_manager = ModelManager(backend=backend)
+        
+        # 情感结果缓存，按文本指纹+模型版本命中，所有分析器共用同一实例
+        self.cache = None
+        if cache_path:
+            try:
+                self.cache = get_sentiment_cache(cache_path, self.model_manager.get_model_version())
+            except Exception as e:
+                self.logger.warning(f"情感缓存初始化失败，将不使用缓存: {str(e)}")
         
         # 情感类别
         self.sentiment_labels = ['负面', '中性', '正面']
@@ -41,6 +51,18 @@ class SentimentAnalyzer:
         self.time_window = timedelta(days=7)  # 分析时间窗口
         self.min_comments = 3  # 最小评论数
         
+    @property
+    def tokenizer(self) -> BertTokenizer:
+        return self.model_manager.get_bert_model()[0]
+        
+    @property
+    def model(self) -> BertModel:
+        return self.model_manager.get_bert_model()[1]
+        
+    @property
+    def device(self) -> torch.device:
+        return self.model.device
+        
     def analyze_sentiment(self, text: str) -> Dict[str, Any]:
         """分析文本情感
         
@@ -50,48 +72,160 @@ class SentimentAnalyzer:
         Returns:
             情感分析结果
         """
+        return self.analyze_sentiment_batch([text])[0]
+        
+    def analyze_sentiment_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """批量分析文本情感
+        
+        先按文本指纹查缓存并对重复文本去重，只有未命中的文本才进入模型；
+        未命中文本按分词长度分桶后动态补齐，每个批次只补齐到批内最长序列，
+        概率与情感强度在全部批次完成后统一用NumPy向量化计算
+        
+        Args:
+            texts: 输入文本列表
+            
+        Returns:
+            与输入顺序一致的情感分析结果列表
+        """
+        if not texts:
+            return []
+            
+        texts = [text or '' for text in texts]
+        fingerprints = [self.cache.fingerprint(text) if self.cache else text for text in texts]
+        cached = self.cache.get_many(fingerprints) if self.cache else {}
+        
+        # 去重后的未命中文本
+        pending = {}
+        for key, text in zip(fingerprints, texts):
+            if key not in cached and key not in pending:
+                pending[key] = text
+                
+        computed = {}
+        if pending:
+            keys = list(pending.keys())
+            probabilities = self._softmax(self._infer_logits([pending[key] for key in keys]))
+            computed = {
+                key: row for key, row in zip(keys, probabilities)
+                if not np.isnan(row).any()
+            }
+            if self.cache:
+                self.cache.put_many(computed)
+                
+        probabilities = np.full((len(texts), len(self.sentiment_labels)), np.nan, dtype=np.float32)
+        for i, key in enumerate(fingerprints):
+            row = cached.get(key)
+            if row is None:
+                row = computed.get(key)
+            if row is not None:
+                probabilities[i] = row
+                
+        return self._build_results(probabilities)
+        
+    def _infer_logits(self, texts: List[str]) -> np.ndarray:
+        """按长度分桶批量推理
+        
+        Args:
+            texts: 输入文本列表
+            
+        Returns:
+            形状为 (N, 类别数) 的logits，推理失败的行为NaN
+        """
+        logits = np.full((len(texts), len(self.sentiment_labels)), np.nan, dtype=np.float32)
+        
         try:
-            # 准备输入
-            inputs = self.tokenizer(
-                text,
-                padding=True,
+            # 整个调用只从注册表取一次模型，加载失败时所有行都记为失败
+            tokenizer, model = self.model_manager.get_bert_model()
+            
+            # 一次性分词（不补齐），得到每条文本的真实长度
+            encodings = tokenizer(
+                texts,
                 truncation=True,
-                max_length=512,
-                return_tensors='pt'
-            ).to(self.device)
-            
-            # 预测
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                probabilities = torch.softmax(outputs, dim=1)
-                sentiment_scores = probabilities[0].cpu().numpy()
-                
-            # 获取情感类别和置信度
-            sentiment_idx = np.argmax(sentiment_scores)
-            sentiment = self.sentiment_labels[sentiment_idx]
-            confidence = float(sentiment_scores[sentiment_idx])
+                max_length=self.max_length
+            )
+            input_ids = encodings['input_ids']
             
-            # 计算情感强度（-1到1之间）
-            sentiment_strength = (sentiment_scores[2] - sentiment_scores[0]) / (sentiment_scores[2] + sentiment_scores[0] + 1e-6)
+            # 按长度排序后切分批次，使同一批次内的序列长度接近
+            order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+            for start in range(0, len(order), self.max_batch_size):
+                batch_indices = order[start:start + self.max_batch_size]
+                try:
+                    logits[batch_indices] = self._predict_batch(
+                        [{key: encodings[key][i] for key in encodings.keys()} for i in batch_indices],
+                        tokenizer,
+                        model
+                    )
+                except Exception as e:
+                    self.logger.error(f"批次情感分析失败: {str(e)}")
+                    
+        except Exception as e:
+            self.logger.error(f"情感分析失败: {str(e)}")
             
-            return {
-                'sentiment': sentiment,
-                'confidence': confidence,
-                'strength': float(sentiment_strength),
+        return logits
+        
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取情感缓存命中统计"""
+        if not self.cache:
+            return {'enabled': False}
+        return {'enabled': True, **self.cache.stats()}
+        
+    def _predict_batch(self, features: List[Dict[str, List[int]]], tokenizer: BertTokenizer, model: BertModel) -> np.ndarray:
+        """对一个长度相近的批次做前向计算，返回softmax前的logits"""
+        inputs = tokenizer.pad(features, padding=True, return_tensors='pt').to(model.device)
+        
+        with torch.no_grad():
+            outputs = model(**inputs)
+            logits = getattr(outputs, 'logits', outputs)
+            
+        return logits.float().cpu().numpy()
+        
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        """数值稳定的按行softmax，NaN行保持为NaN"""
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+        
+    def _build_results(self, probabilities: np.ndarray) -> List[Dict[str, Any]]:
+        """向量化计算类别、置信度与情感强度，并组装结果
+        
+        Args:
+            probabilities: 形状为 (N, 类别数) 的情感概率，失败的行为NaN
+            
+        Returns:
+            情感分析结果列表
+        """
+        failed = np.isnan(probabilities).any(axis=1)
+        scores = np.where(failed[:, None], 0.0, probabilities)
+        
+        sentiment_idx = scores.argmax(axis=1)
+        confidence = scores[np.arange(len(scores)), sentiment_idx]
+        
+        # 计算情感强度（-1到1之间）
+        strength = (scores[:, 2] - scores[:, 0]) / (scores[:, 2] + scores[:, 0] + 1e-6)
+        
+        results = []
+        for i in range(len(scores)):
+            if failed[i]:
+                results.append(self._unknown_result())
+                continue
+            results.append({
+                'sentiment': self.sentiment_labels[sentiment_idx[i]],
+                'confidence': float(confidence[i]),
+                'strength': float(strength[i]),
                 'scores': {
                     label: float(score)
-                    for label, score in zip(self.sentiment_labels, sentiment_scores)
+                    for label, score in zip(self.sentiment_labels, scores[i])
                 }
-            }
-            
-        except Exception as e:
-            self.logger.error(f"情感分析失败: {str(e)}")
-            return {
-                'sentiment': '未知',
-                'confidence': 0.0,
-                'strength': 0.0,
-                'scores': {label: 0.0 for label in self.sentiment_labels}
-            }
+            })
+        return results
+        
+    def _unknown_result(self) -> Dict[str, Any]:
+        """分析失败时返回的默认结果"""
+        return {
+            'sentiment': '未知',
+            'confidence': 0.0,
+            'strength': 0.0,
+            'scores': {label: 0.0 for label in self.sentiment_labels}
+        }
             
     def analyze_black_fan(self, celebrity_id: str) -> Dict[str, Any]:
         """分析黑粉
@@ -104,7 +238,7 @@ class SentimentAnalyzer:
         """
         try:
             # 从数据库获取评论数据
-            engine = create_engine(self.db_url)
+            engine = get_engine(self.db_url)
             Session = sessionmaker(bind=engine)
             session = Session()
             
@@ -128,70 +262,8 @@ class SentimentAnalyzer:
                     'content': comment.content,
                     'created_at': comment.created_at
                 })
-            
-            if len(user_comments) < self.min_comments:
-                return {
-                    'is_black_fan': False,
-                    'reason': f'评论数量不足{self.min_comments}条',
-                    'score': 0.0
-                }
                 
-            # 按时间排序
-            user_comments.sort(key=lambda x: x['created_at'])
-            
-            # 分析时间窗口内的评论
-            recent_comments = [
-                comment for comment in user_comments
-                if datetime.now() - comment['created_at'] <= self.time_window
-            ]
-            
-            if not recent_comments:
-                return {
-                    'is_black_fan': False,
-                    'reason': f'最近{self.time_window}天内无评论',
-                    'score': 0.0
-                }
-                
-            # 分析每条评论的情感
-            sentiment_results = []
-            for comment in recent_comments:
-                result = self.analyze_sentiment(comment['content'])
-                sentiment_results.append({
-                    'sentiment': result['sentiment'],
-                    'strength': result['strength'],
-                    'created_at': comment['created_at']
-                })
-                
-            # 计算黑粉评分
-            negative_ratio = sum(1 for r in sentiment_results if r['sentiment'] == '负面') / len(sentiment_results)
-            avg_strength = sum(r['strength'] for r in sentiment_results) / len(sentiment_results)
-            time_span = (sentiment_results[-1]['created_at'] - sentiment_results[0]['created_at']).total_seconds()
-            comment_frequency = len(sentiment_results) / (time_span / 3600)  # 每小时评论数
-            
-            # 首先计算负面评论的加权分数
-            negative_score = negative_ratio * (
-                0.4 + 
-                0.3 * (1 - (avg_strength + 1) / 2) +  # 情感强度对负面评论的影响
-                0.3 * min(comment_frequency / 10, 1)  # 评论频率对负面评论的影响
-            )
-
-            # 最终黑粉分数
-            black_fan_score = negative_score
-            
-            is_black_fan = black_fan_score >= self.black_fan_threshold
-            
-            result = {
-                'is_black_fan': is_black_fan,
-                'score': float(black_fan_score),
-                'metrics': {
-                    'negative_ratio': float(negative_ratio),
-                    'avg_strength': float(avg_strength),
-                    'comment_frequency': float(comment_frequency)
-                },
-                'reason': '黑粉特征明显' if is_black_fan else '未达到黑粉判定标准'
-            }
-            
-            return result
+            return self.evaluate_black_fan(user_comments)
             
         except Exception as e:
             self.logger.error(f"黑粉分析失败: {str(e)}")
@@ -203,6 +275,85 @@ class SentimentAnalyzer:
         finally:
             session.close()
             
+    def evaluate_black_fan(self, user_comments: List[Dict[str, Any]],
+                           sentiment_results: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """根据评论列表计算黑粉评分
+        
+        Args:
+            user_comments: 评论列表，每项包含content和created_at
+            sentiment_results: 与user_comments一一对应的情感分析结果，
+                为空时在此处批量计算（调用方可预先对多个用户的评论统一批量打分）
+            
+        Returns:
+            黑粉分析结果
+        """
+        if len(user_comments) < self.min_comments:
+            return {
+                'is_black_fan': False,
+                'reason': f'评论数量不足{self.min_comments}条',
+                'score': 0.0
+            }
+            
+        if sentiment_results is None:
+            sentiment_results = [None] * len(user_comments)
+            
+        # 按时间排序
+        pairs = sorted(zip(user_comments, sentiment_results), key=lambda x: x[0]['created_at'])
+        
+        # 分析时间窗口内的评论
+        now = datetime.now()
+        recent = [(comment, result) for comment, result in pairs if now - comment['created_at'] <= self.time_window]
+        
+        if not recent:
+            return {
+                'is_black_fan': False,
+                'reason': f'最近{self.time_window}天内无评论',
+                'score': 0.0
+            }
+            
+        # 未预先打分的评论统一走一次批量推理
+        pending = [i for i, (_, result) in enumerate(recent) if result is None]
+        if pending:
+            batch_results = self.analyze_sentiment_batch([recent[i][0]['content'] for i in pending])
+            for i, result in zip(pending, batch_results):
+                recent[i] = (recent[i][0], result)
+                
+        sentiment_results = [{
+            'sentiment': result['sentiment'],
+            'strength': result['strength'],
+            'created_at': comment['created_at']
+        } for comment, result in recent]
+            
+        # 计算黑粉评分
+        negative_ratio = sum(1 for r in sentiment_results if r['sentiment'] == '负面') / len(sentiment_results)
+        avg_strength = sum(r['strength'] for r in sentiment_results) / len(sentiment_results)
+        time_span = (sentiment_results[-1]['created_at'] - sentiment_results[0]['created_at']).total_seconds()
+        # 评论时间完全相同时按1秒计，避免除零
+        comment_frequency = len(sentiment_results) / (max(time_span, 1) / 3600)  # 每小时评论数
+        
+        # 首先计算负面评论的加权分数
+        negative_score = negative_ratio * (
+            0.4 + 
+            0.3 * (1 - (avg_strength + 1) / 2) +  # 情感强度对负面评论的影响
+            0.3 * min(comment_frequency / 10, 1)  # 评论频率对负面评论的影响
+        )
+
+        # 最终黑粉分数
+        black_fan_score = negative_score
+        
+        is_black_fan = black_fan_score >= self.black_fan_threshold
+        
+        return {
+            'is_black_fan': is_black_fan,
+            'score': float(black_fan_score),
+            'metrics': {
+                'negative_ratio': float(negative_ratio),
+                'avg_strength': float(avg_strength),
+                'comment_frequency': float(comment_frequency)
+            },
+            'reason': '黑粉特征明显' if is_black_fan else '未达到黑粉判定标准'
+        }
+            
 class PostSentimentAnalyzer:
     """微博情感分析器，用于分析微博及其评论的情感倾向"""
     
@@ -213,14 +364,21 @@ class PostSentimentAnalyzer:
             db_url: 数据库连接URL
         """
         self.logger = logging.getLogger(__name__)
-        self.engine = create_engine(db_url)
+        self.engine = get_engine(db_url)
         self.comment_analyzer = SentimentAnalyzer(db_url)  # 评论情感分析器
         
-    def analyze_post_sentiment(self, post_id: str) -> Dict[str, Any]:
+    def analyze_post_sentiment(self, post_id: str,
+                               post_sentiment: Optional[Dict[str, Any]] = None,
+                               affected_keys: Optional[set] = None) -> Dict[str, Any]:
         """分析单条微博的情感倾向
         
+        写入情感分数后会重算该微博所在(明星, 日期)的每日统计；
+        传入affected_keys时只记录受影响的(明星, 日期)，由调用方统一刷新
+        
         Args:
             post_id: 微博ID
+            post_sentiment: 预先批量计算好的微博内容情感结果，为空时单独计算
+            affected_keys: 收集受影响(明星, 日期)的集合
             
         Returns:
             Dict: 分析结果
@@ -261,7 +419,7 @@ class PostSentimentAnalyzer:
                 # 2. 获取微博的所有评论
                 comments = conn.execute(
                     text("""
-                        SELECT c.*, s.sentiment_score
+                        SELECT c.*, s.emotion_intensity AS sentiment_score
                         FROM comment c
                         LEFT JOIN sentiment_for_comment s ON c.comment_id = s.comment_id
                         WHERE c.post_id = :post_id
@@ -270,7 +428,8 @@ class PostSentimentAnalyzer:
                 ).fetchall()
                 
             # 3. 分析微博内容的情感
-            post_sentiment = self.comment_analyzer.analyze_sentiment(post['content'])
+            if post_sentiment is None:
+                post_sentiment = self.comment_analyzer.analyze_sentiment_batch([post['content']])[0]
             
             # 4. 计算评论的情感分数
             comment_scores = [c['sentiment_score'] for c in comments if c['sentiment_score'] is not None]
@@ -290,7 +449,7 @@ class PostSentimentAnalyzer:
                 final_score = post_sentiment['scores']['正面']
                 
             # 6. 更新微博的情感分数
-            with self.engine.connect() as conn:
+            with self.engine.begin() as conn:
                 conn.execute(
                     text("""
                         UPDATE post 
@@ -302,7 +461,13 @@ class PostSentimentAnalyzer:
                         'sentiment_score': final_score
                     }
                 )
-                conn.commit()
+                
+            # 7. 每日统计中的情感汇总随之更新
+            keys = collect_keys([dict(post._mapping)])
+            if affected_keys is None:
+                refresh_daily_stats(self.engine, keys)
+            else:
+                affected_keys |= keys
                 
             return {
                         "status": "success",
@@ -329,12 +494,22 @@ class PostSentimentAnalyzer:
         Returns:
             Dict: 分析结果
         """
+        # 先对所有未计算过情感分数的微博内容统一做一次批量推理
+        precomputed = self._score_post_contents(post_ids)
+        
         results = []
+        affected_keys = set()
         for post_id in post_ids:
-            result = self.analyze_post_sentiment(post_id)
+            result = self.analyze_post_sentiment(post_id, precomputed.get(post_id), affected_keys)
             if result["status"] == "success":
                 results.append(result["data"])
                 
+        # 所有微博写完后统一刷新一次每日统计
+        try:
+            refresh_daily_stats(self.engine, affected_keys)
+        except Exception as e:
+            self.logger.error(f"刷新每日统计失败: {str(e)}")
+            
         return {
             "status": "success",
             "data": {
@@ -345,6 +520,38 @@ class PostSentimentAnalyzer:
             }
         }
         
+    def _score_post_contents(self, post_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量计算尚无情感分数的微博内容情感
+        
+        Args:
+            post_ids: 微博ID列表
+            
+        Returns:
+            Dict: 微博ID到情感分析结果的映射
+        """
+        if not post_ids:
+            return {}
+            
+        query = text("""
+            SELECT post_id, content
+            FROM post
+            WHERE post_id IN :post_ids
+            AND (sentiment_score IS NULL OR sentiment_score = 0)
+        """).bindparams(bindparam('post_ids', expanding=True))
+        
+        try:
+            posts = []
+            with self.engine.connect() as conn:
+                # 分段查询，避免超出SQLite绑定参数数量上限
+                for i in range(0, len(post_ids), 500):
+                    posts.extend(conn.execute(query, {'post_ids': list(post_ids[i:i + 500])}).fetchall())
+        except Exception as e:
+            self.logger.error(f"获取微博内容失败: {str(e)}")
+            return {}
+            
+        sentiments = self.comment_analyzer.analyze_sentiment_batch([p['content'] for p in posts])
+        return {p['post_id']: sentiment for p, sentiment in zip(posts, sentiments)}
+        
     def analyze_celebrity_posts(self, celebrity_id: str, days: int = 7) -> Dict[str, Any]:
         """分析明星最近发布的微博情感
         
@@ -0,0 +1,179 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+
+class SentimentCache:
+    """情感分析结果缓存
+
+    以 (文本指纹, 模型版本) 为键，把每条文本的情感概率持久化到SQLite，
+    前面再加一层进程内LRU。文本内容不变时重复分析只需查缓存，
+    模型更新后版本号变化，旧结果自然失效。
+    """
+
+    def __init__(self, db_path: str, model_version: str, memory_size: int = 50000):
+        """初始化情感缓存
+
+        Args:
+            db_path: SQLite缓存文件路径
+            model_version: 模型版本标识
+            memory_size: 进程内LRU最多保留的条目数
+        """
+        self.logger = logging.getLogger(__name__)
+        self.db_path = db_path
+        self.model_version = model_version
+        self.memory_size = memory_size
+
+        self._memory: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 命中统计
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sentiment_cache (
+                fingerprint TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                scores TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (fingerprint, model_version)
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def fingerprint(text: Optional[str]) -> str:
+        """计算文本指纹"""
+        return hashlib.sha1((text or '').encode('utf-8')).hexdigest()
+
+    def get_many(self, fingerprints: Sequence[str]) -> Dict[str, Tuple[float, ...]]:
+        """批量查询缓存
+
+        Args:
+            fingerprints: 文本指纹列表
+
+        Returns:
+            Dict: 命中的指纹到情感概率的映射
+        """
+        unique = list(dict.fromkeys(fingerprints))
+        found = {}
+        pending = []
+        with self._lock:
+            for key in unique:
+                scores = self._memory.get(key)
+                if scores is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = scores
+                    self.memory_hits += 1
+                else:
+                    pending.append(key)
+
+            # 内存未命中的再查磁盘，分段查询避免超出参数上限
+            for i in range(0, len(pending), 500):
+                chunk = pending[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                try:
+                    rows = self._conn.execute(
+                        f"SELECT fingerprint, scores FROM sentiment_cache "
+                        f"WHERE model_version = ? AND fingerprint IN ({placeholders})",
+                        [self.model_version, *chunk]
+                    ).fetchall()
+                except sqlite3.Error as e:
+                    self.logger.error(f"读取情感缓存失败: {str(e)}")
+                    rows = []
+                for key, raw in rows:
+                    scores = tuple(float(v) for v in raw.split(','))
+                    found[key] = scores
+                    self._remember(key, scores)
+                    self.disk_hits += 1
+
+            self.misses += len(unique) - len(found)
+
+        return found
+
+    def put_many(self, items: Dict[str, Sequence[float]]) -> None:
+        """批量写入缓存
+
+        Args:
+            items: 指纹到情感概率的映射
+        """
+        if not items:
+            return
+
+        rows = []
+        with self._lock:
+            for key, scores in items.items():
+                scores = tuple(float(v) for v in scores)
+                self._remember(key, scores)
+                rows.append((key, self.model_version, ','.join(repr(v) for v in scores)))
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO sentiment_cache (fingerprint, model_version, scores) "
+                    "VALUES (?, ?, ?)",
+                    rows
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self.logger.error(f"写入情感缓存失败: {str(e)}")
+
+    def _remember(self, key: str, scores: Tuple[float, ...]) -> None:
+        """写入进程内LRU，超出容量时淘汰最久未使用的条目"""
+        self._memory[key] = scores
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """获取缓存命中统计"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'model_version': self.model_version,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory)
+            }
+
+    def close(self) -> None:
+        """关闭缓存文件"""
+        with self._lock:
+            self._conn.close()
+
+
+_caches: Dict[Tuple[str, str], SentimentCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_sentiment_cache(db_path: str, model_version: str) -> SentimentCache:
+    """获取进程内共享的情感缓存实例
+
+    同一缓存文件和模型版本在进程内只打开一次，供所有分析器共用
+
+    Args:
+        db_path: SQLite缓存文件路径
+        model_version: 模型版本标识
+
+    Returns:
+        SentimentCache: 缓存实例
+    """
+    key = (os.path.abspath(db_path), model_version)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = SentimentCache(db_path, model_version)
+            _caches[key] = cache
+        return cache
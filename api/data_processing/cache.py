@@ -0,0 +1,114 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+_MISSING = object()
+
+
+class BoundedCache:
+    """有界LRU缓存
+
+    同时按条目数和估算内存字节数限制容量，可选TTL过期。
+    get/put均为O(1)，超出容量时逐条淘汰最久未使用的条目，
+    而不是整体清空，长时间运行时命中率保持稳定。
+    线程安全，可在多个清洗流程之间共享同一实例。
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None, sizeof: Optional[Callable[[Any], int]] = None):
+        """初始化缓存
+
+        Args:
+            max_entries: 最大条目数
+            max_bytes: 最大占用字节数（按sizeof估算），为None时不限制
+            ttl: 条目存活秒数，为None时不过期
+            sizeof: 估算单个键/值大小的函数，默认使用sys.getsizeof
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof or sys.getsizeof
+
+        # key -> (value, expires_at, size)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {'entries': 0, 'bytes': 0, 'ttl': 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取缓存，命中时将条目移到最近使用端"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.evictions['ttl'] += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """写入缓存，必要时淘汰最久未使用的条目"""
+        size = self._sizeof(key) + self._sizeof(value)
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+
+            while len(self._data) > self.max_entries:
+                self._evict_oldest('entries')
+            while self.max_bytes is not None and self._bytes > self.max_bytes and self._data:
+                self._evict_oldest('bytes')
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        """清空缓存（统计信息保留）"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _evict_oldest(self, reason: str) -> None:
+        key = next(iter(self._data))
+        self._remove(key)
+        self.evictions[reason] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """获取命中与淘汰统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': dict(self.evictions)
+            }
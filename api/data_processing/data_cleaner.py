@@ -11,23 +11,40 @@ import hashlib
 import os
 from pathlib import Path
 import json
+import time
+from .cache import BoundedCache
+from .text_normalizer import CommentNormalizer
+from ..models.model_manager import ModelManager, get_model_registry
 
 class DataCleaner:
-    def __init__(self, batch_size: int = 32, cache_size: int = 10000, model_path: str = 'models/bert-base-chinese'):
+    def __init__(self, batch_size: int = 32, cache_size: int = 10000, model_path: Optional[str] = None,
+                 cache_max_bytes: Optional[int] = 64 * 1024 * 1024, cache_ttl: Optional[float] = None,
+                 semantic_cache: Optional[BoundedCache] = None, meaningful_cache: Optional[BoundedCache] = None,
+                 cascade: bool = True):
         self.logger = logging.getLogger(__name__)
         self.batch_size = batch_size
         self.cache_size = cache_size
         
-        # 初始化缓存
-        self.semantic_cache = {}
-        self.meaningful_cache = {}
+        # 级联模式：先用规则判定明显的情况，只有规则无法判定的文本才送入BERT
+        self.cascade = cascade
+        self.stage_counts = {'cache': 0, 'rule_meaningless': 0, 'rule_meaningful': 0, 'model': 0}
+        
+        # 初始化缓存（有界LRU，可由外部传入以便多个清洗器共享）
+        if semantic_cache is None:
+            semantic_cache = BoundedCache(cache_size, cache_max_bytes, cache_ttl)
+        if meaningful_cache is None:
+            meaningful_cache = BoundedCache(cache_size, cache_max_bytes, cache_ttl)
+        self.semantic_cache = semantic_cache
+        self.meaningful_cache = meaningful_cache
         
         # 加载停用词和自定义词典
         self.stopwords = self._load_stopwords()
         self.custom_dict = self._load_custom_dict()
         
-        # 初始化BERT模型
-        self.model, self.tokenizer, self.device = self._init_bert_model(model_path)
+        # BERT模型通过进程内注册表与分析器共享，首次需要语义判断时才加载；
+        # 未指定model_path时使用ModelManager管理的模型
+        self.model_path = model_path
+        self._model_manager = None
         
         # 初始化正则表达式和预定义模式
         self._init_patterns()
@@ -50,34 +67,62 @@ class DataCleaner:
             self.logger.warning("自定义词典文件未找到，将使用空集合")
             return set()
             
-    def _init_bert_model(self, model_path: str) -> tuple:
-        """初始化BERT模型"""
+    @property
+    def tokenizer(self) -> Optional[BertTokenizer]:
+        bert = self._get_bert()
+        return bert[0] if bert else None
+        
+    @property
+    def model(self) -> Optional[BertModel]:
+        bert = self._get_bert()
+        return bert[1] if bert else None
+        
+    @property
+    def device(self) -> Optional[torch.device]:
+        model = self.model
+        return model.device if model is not None else None
+        
+    def _get_bert(self) -> Optional[tuple]:
+        """从模型注册表获取 (tokenizer, model)，加载失败时返回None
+        
+        每次都向注册表取模型而不在清洗器上保存引用：注册表卸载模型后内存能真正释放，
+        加载失败后在注册表的重试间隔内直接返回None，间隔过后的调用会重新加载
+        """
         try:
-            device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-            
-            if os.path.exists(model_path):
-                self.logger.info(f"从本地路径加载模型: {model_path}")
-                tokenizer = BertTokenizer.from_pretrained(model_path)
-                model = BertModel.from_pretrained(model_path)
-            else:
-                self.logger.warning(f"本地模型路径 {model_path} 不存在，将使用在线模型")
-                tokenizer = BertTokenizer.from_pretrained('bert-base-chinese')
-                model = BertModel.from_pretrained('bert-base-chinese')
-                
-                os.makedirs(model_path, exist_ok=True)
-                tokenizer.save_pretrained(model_path)
-                model.save_pretrained(model_path)
-                self.logger.info(f"模型已保存到本地路径: {model_path}")
-            
-            model.to(device)
-            model.eval()
-            self.logger.info(f"BERT模型加载成功，使用设备: {device}")
-            return model, tokenizer, device
-            
+            if self.model_path is None:
+                # ModelManager会创建模型目录，推迟到第一次需要BERT时再构造
+                if self._model_manager is None:
+                    self._model_manager = ModelManager()
+                return self._model_manager.get_bert_model()
+            key = f"bert:{Path(self.model_path).resolve()}"
+            return get_model_registry().get(key, lambda: self._init_bert_model(self.model_path))
         except Exception as e:
             self.logger.error(f"BERT模型加载失败: {str(e)}")
-            return None, None, None
+            return None
+        
+    def _init_bert_model(self, model_path: str) -> tuple:
+        """从指定路径加载BERT模型"""
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        
+        if os.path.exists(model_path):
+            self.logger.info(f"从本地路径加载模型: {model_path}")
+            tokenizer = BertTokenizer.from_pretrained(model_path)
+            model = BertModel.from_pretrained(model_path)
+        else:
+            self.logger.warning(f"本地模型路径 {model_path} 不存在，将使用在线模型")
+            tokenizer = BertTokenizer.from_pretrained('bert-base-chinese')
+            model = BertModel.from_pretrained('bert-base-chinese')
             
+            os.makedirs(model_path, exist_ok=True)
+            tokenizer.save_pretrained(model_path)
+            model.save_pretrained(model_path)
+            self.logger.info(f"模型已保存到本地路径: {model_path}")
+        
+        model.to(device)
+        model.eval()
+        self.logger.info(f"BERT模型加载成功，使用设备: {device}")
+        return tokenizer, model
+        
     def _init_patterns(self):
         """初始化正则表达式和预定义模式"""
         # 地区信息正则表达式
@@ -146,6 +191,10 @@ class DataCleaner:
             'plxjj': '漂亮小姐姐'
         }
         
+        # 预编译的清洗与规则匹配器
+        self.normalizer = CommentNormalizer(self.meaningful_symbols, self.meaningful_numbers, self.meaningful_abbr)
+        self.meaningless_regex = re.compile('|'.join(f'(?:{p})' for p in self.meaningless_patterns))
+        
     def clean_user_data(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """清理用户数据"""
         cleaned_data = {
@@ -204,25 +253,11 @@ class DataCleaner:
         
     def clean_comment(self, comment: str) -> str:
         """清理评论内容"""
-        if not comment:
-            return ""
-            
-        # 移除URL
-        comment = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', comment)
-        
-        # 移除@用户
-        comment = re.sub(r'@[\w\u4e00-\u9fff]+', '', comment)
-        
-        # 移除表情符号
-        comment = re.sub(r'\[.*?\]', '', comment)
-        
-        # 移除HTML标签
-        comment = re.sub(r'<[^>]+>', '', comment)
-        
-        # 移除多余空白字符
-        comment = re.sub(r'\s+', ' ', comment).strip()
+        return self.normalizer.clean(comment)
         
-        return comment
+    def clean_comments_batch(self, comments: List[str]) -> List[str]:
+        """批量清理评论内容"""
+        return self.normalizer.clean_batch(comments)
         
     def _get_cache_key(self, text: str) -> str:
         """生成缓存键"""
@@ -230,66 +265,21 @@ class DataCleaner:
         
     def _is_meaningful_symbols(self, text: str) -> bool:
         """判断是否包含有意义的符号组合"""
-        # 检查连续重复的符号
-        for symbol in self.meaningful_symbols.keys():
-            pattern = f"{symbol}{{3,}}"
-            if re.search(pattern, text):
-                return True
-                
-        # 检查符号组合
-        symbol_patterns = [
-            r'[，。！？]{2,}',
-            r'\.{3,}',
-            r'!{2,}',
-            r'\?{2,}',
-            r'~{2,}',
-        ]
-        
-        for pattern in symbol_patterns:
-            if re.search(pattern, text):
-                return True
-                
-        return False
+        return self.normalizer.has_meaningful_symbols(text)
         
     def _is_meaningful_number(self, text: str) -> bool:
         """判断是否包含有意义的数字"""
-        if text in self.meaningful_numbers:
-            return True
-            
-        for number in self.meaningful_numbers.keys():
-            if number in text:
-                return True
-                
-        number_patterns = [
-            r'(\d)\1{2,}',
-            r'(\d{2,})\1{1,}',
-        ]
-        
-        for pattern in number_patterns:
-            if re.search(pattern, text):
-                return True
-                
-        return False
+        return self.normalizer.has_meaningful_number(text)
         
     def _is_meaningful_abbr(self, text: str) -> bool:
         """判断是否包含有意义的英文缩写"""
-        text_lower = text.lower()
-        
-        if text_lower in self.meaningful_abbr:
-            return True
-            
-        for abbr in self.meaningful_abbr.keys():
-            if abbr in text_lower:
-                return True
-                
-        return False
+        return self.normalizer.has_meaningful_abbr(text)
         
     def _is_meaningless_by_pattern(self, text: str) -> bool:
         """使用预定义模式判断无意义评论"""
-        for pattern in self.meaningless_patterns:
-            if re.match(pattern, text):
-                return True
-                
+        if self.meaningless_regex.match(text):
+            return True
+            
         if not text.strip():
             return True
             
@@ -313,49 +303,45 @@ class DataCleaner:
         
     def has_semantic_meaning_batch(self, texts: List[str]) -> List[bool]:
         """批量判断文本是否包含语义信息"""
-        if not texts or not self.model:
+        bert = self._get_bert() if texts else None
+        if bert is None:
             return [False] * len(texts)
+        tokenizer, model = bert
             
-        results = []
-        cache_hits = 0
-        
         # 检查缓存
-        for text in texts:
-            cache_key = self._get_cache_key(text)
-            if cache_key in self.semantic_cache:
-                results.append(self.semantic_cache[cache_key])
-                cache_hits += 1
-            else:
-                results.append(None)
+        keys = [self._get_cache_key(text) for text in texts]
+        results = [self.semantic_cache.get(key) for key in keys]
+        
+        # 未命中的文本去重后再送入模型
+        pending = {}
+        for i, key in enumerate(keys):
+            if results[i] is None:
+                pending.setdefault(key, []).append(i)
                 
-        if cache_hits == len(texts):
+        if not pending:
             return results
             
         try:
-            new_texts = [text for i, text in enumerate(texts) if results[i] is None]
+            pending_keys = list(pending.keys())
             
-            for i in range(0, len(new_texts), self.batch_size):
-                batch_texts = new_texts[i:i + self.batch_size]
+            for i in range(0, len(pending_keys), self.batch_size):
+                batch_keys = pending_keys[i:i + self.batch_size]
+                batch_texts = [texts[pending[key][0]] for key in batch_keys]
                 
-                inputs = self.tokenizer(batch_texts, return_tensors="pt", padding=True, truncation=True, max_length=512)
-                inputs = {k: v.to(self.device) for k, v in inputs.items()}
+                inputs = tokenizer(batch_texts, return_tensors="pt", padding=True, truncation=True, max_length=512)
+                inputs = {k: v.to(model.device) for k, v in inputs.items()}
                 
                 with torch.no_grad():
-                    outputs = self.model(**inputs)
+                    outputs = model(**inputs)
                     
                 text_embeddings = outputs.last_hidden_state[:, 0].cpu().numpy()
                 norms = np.linalg.norm(text_embeddings, axis=1)
                 
-                for j, norm in enumerate(norms):
-                    idx = i + j
-                    text = new_texts[idx]
-                    cache_key = self._get_cache_key(text)
-                    result = norm > 0.5
-                    self.semantic_cache[cache_key] = result
-                    results[texts.index(text)] = result
-                    
-                if len(self.semantic_cache) > self.cache_size:
-                    self.semantic_cache.clear()
+                for key, norm in zip(batch_keys, norms):
+                    result = bool(norm > 0.5)
+                    self.semantic_cache.put(key, result)
+                    for idx in pending[key]:
+                        results[idx] = result
                     
         except Exception as e:
             self.logger.error(f"批量语义判断失败: {str(e)}")
@@ -367,49 +353,89 @@ class DataCleaner:
         
     def is_meaningful_comment_batch(self, cleaned_comments: List[str]) -> List[bool]:
         """批量判断评论是否有意义"""
-        if not comments:
+        if not cleaned_comments:
             return []
             
-        results = []
-        cache_hits = 0
-        
         # 检查缓存
-        for comment in comments:
-            cache_key = self._get_cache_key(comment)
-            if cache_key in self.meaningful_cache:
-                results.append(self.meaningful_cache[cache_key])
-                cache_hits += 1
-            else:
-                results.append(None)
-                
-        if cache_hits == len(comments):
+        keys = [self._get_cache_key(comment) for comment in cleaned_comments]
+        results = [self.meaningful_cache.get(key) for key in keys]
+        
+        uncached = [i for i, result in enumerate(results) if result is None]
+        self.stage_counts['cache'] += len(cleaned_comments) - len(uncached)
+        if not uncached:
             return results
             
+        if self.cascade:
+            # 规则层先判定明显有意义/无意义的评论
+            ambiguous = []
+            for i in uncached:
+                result = self._rule_decision(cleaned_comments[i])
+                if result is None:
+                    ambiguous.append(i)
+                    continue
+                self.stage_counts['rule_meaningful' if result else 'rule_meaningless'] += 1
+                self.meaningful_cache.put(keys[i], result)
+                results[i] = result
+            uncached = ambiguous
+            if not uncached:
+                return results
+                
+        uncached_comments = [cleaned_comments[i] for i in uncached]
+        self.stage_counts['model'] += len(uncached_comments)
         
         # 使用BERT模型批量判断语义
-        semantic_results = self.has_semantic_meaning_batch(cleaned_comments)
+        semantic_results = self.has_semantic_meaning_batch(uncached_comments)
         
         # 使用传统方法判断无意义模式
-        pattern_results = [not self._is_meaningless_by_pattern(comment) for comment in cleaned_comments]
+        pattern_results = [not self._is_meaningless_by_pattern(comment) for comment in uncached_comments]
         
         # 综合两种方法的结果
-        for i, (comment, semantic_result, pattern_result) in enumerate(zip(comments, semantic_results, pattern_results)):
-            if results[i] is not None:
-                continue
-                
+        for i, semantic_result, pattern_result in zip(uncached, semantic_results, pattern_results):
             # 如果BERT模型判断有意义，或者传统方法判断有意义，则认为评论有意义
             result = semantic_result or pattern_result
             
             # 更新结果和缓存
-            cache_key = self._get_cache_key(comment)
-            self.meaningful_cache[cache_key] = result
+            self.meaningful_cache.put(keys[i], result)
             results[i] = result
-            
-            # 清理缓存
-            if len(self.meaningful_cache) > self.cache_size:
-                self.meaningful_cache.clear()
                 
         return results
+        
+    def _rule_decision(self, text: str) -> Optional[bool]:
+        """规则层判定评论是否有意义
+        
+        Args:
+            text: 清洗后的评论
+            
+        Returns:
+            Optional[bool]: 规则能确定时返回判定结果，需要模型判断时返回None
+        """
+        # 空文本、纯转发、//@转发链、纯链接直接判为无意义
+        if not text.strip() or self.meaningless_regex.match(text):
+            return False
+            
+        # 有意义的符号、数字、缩写，或规则不认为无意义的文本，
+        # 原流程中与模型结果取或后必然为True，无需再跑模型
+        if not self._is_meaningless_by_pattern(text):
+            return True
+            
+        return None
+        
+    def get_stage_stats(self) -> Dict[str, Any]:
+        """获取各判定阶段处理的评论数量及占比"""
+        total = sum(self.stage_counts.values())
+        return {
+            'cascade': self.cascade,
+            'total': total,
+            'counts': dict(self.stage_counts),
+            'fractions': {stage: count / total if total else 0.0 for stage, count in self.stage_counts.items()}
+        }
+        
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取语义缓存与有意义判断缓存的命中/淘汰统计"""
+        return {
+            'semantic_cache': self.semantic_cache.stats(),
+            'meaningful_cache': self.meaningful_cache.stats()
+        }
          
     def clean_user_data_batch(self, users_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """批量清理用户数据"""
@@ -418,11 +444,7 @@ class DataCleaner:
     def clean_post_data_batch(self, posts_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """批量清理帖子数据，过滤掉无意义的内容"""
         # 先清理所有内容
-        cleaned_contents = []
-        for post_data in posts_data:
-            content = post_data.get('content', '')
-            cleaned_content = self.clean_comment(content)
-            cleaned_contents.append(cleaned_content)
+        cleaned_contents = self.clean_comments_batch([post_data.get('content', '') for post_data in posts_data])
             
         # 批量判断内容是否有意义
         meaningful_results = self.is_meaningful_comment_batch(cleaned_contents)
@@ -449,11 +471,7 @@ class DataCleaner:
     def clean_comment_data_batch(self, comments_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """批量清理评论数据，过滤掉无意义的内容"""
         # 先清理所有内容
-        cleaned_contents = []
-        for comment_data in comments_data:
-            content = comment_data.get('content', '')
-            cleaned_content = self.clean_comment(content)
-            cleaned_contents.append(cleaned_content)
+        cleaned_contents = self.clean_comments_batch([comment_data.get('content', '') for comment_data in comments_data])
             
         # 批量判断内容是否有意义
         meaningful_results = self.is_meaningful_comment_batch(cleaned_contents)
@@ -488,6 +506,7 @@ if __name__ == "__main__":
         "转发微博",
         "//@用户A: 支持！",
         "https://example.com",
+        "[http://x.com]",
         "来自北京",
         "来自 上海",
         "来自广东 广州",
@@ -507,6 +526,67 @@ if __name__ == "__main__":
         "5201314" # 数字组合
     ] * 10  # 重复10次以测试批量处理
     
+    print("=== 清洗与规则匹配微基准 ===")
+    
+    def legacy_clean_comment(comment: str) -> str:
+        """旧版逐次re.sub清洗，仅用于对比"""
+        if not comment:
+            return ""
+        comment = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', comment)
+        comment = re.sub(r'@[\w\u4e00-\u9fff]+', '', comment)
+        comment = re.sub(r'\[.*?\]', '', comment)
+        comment = re.sub(r'<[^>]+>', '', comment)
+        return re.sub(r'\s+', ' ', comment).strip()
+        
+    def legacy_rule_match(text: str) -> bool:
+        """旧版逐词条扫描的符号/数字/缩写判断（与基线实现逐行一致），仅用于对比"""
+        for symbol in cleaner.meaningful_symbols.keys():
+            if re.search(f"{symbol}{{3,}}", text):
+                return True
+        for pattern in [r'[，。！？]{2,}', r'\.{3,}', r'!{2,}', r'\?{2,}', r'~{2,}']:
+            if re.search(pattern, text):
+                return True
+        if text in cleaner.meaningful_numbers:
+            return True
+        if any(number in text for number in cleaner.meaningful_numbers.keys()):
+            return True
+        for pattern in [r'(\d)\1{2,}', r'(\d{2,})\1{1,}']:
+            if re.search(pattern, text):
+                return True
+        text_lower = text.lower()
+        if text_lower in cleaner.meaningful_abbr:
+            return True
+        return any(abbr in text_lower for abbr in cleaner.meaningful_abbr.keys())
+        
+    def new_rule_match(text: str) -> bool:
+        return (cleaner._is_meaningful_symbols(text) or cleaner._is_meaningful_number(text)
+                or cleaner._is_meaningful_abbr(text))
+        
+    # 唯一有意的差异：旧实现把 "..." 当正则拼接，5个字符以上的文本都算含有意义符号
+    legacy_wildcard = re.compile(r'...{3,}')
+    for comment in test_comments:
+        if legacy_rule_match(comment) != new_rule_match(comment):
+            assert legacy_wildcard.search(comment) and not new_rule_match(comment), f"规则匹配差异无法解释: {comment}"
+    compared_comments = [c for c in test_comments if not legacy_wildcard.search(c)]
+        
+    rounds = 200
+    benchmarks = [
+        ('清洗', len(test_comments), lambda: [legacy_clean_comment(c) for c in test_comments],
+         lambda: cleaner.clean_comments_batch(test_comments)),
+        ('规则匹配', len(compared_comments), lambda: [legacy_rule_match(c) for c in compared_comments],
+         lambda: [new_rule_match(c) for c in compared_comments]),
+    ]
+    for name, count, legacy_fn, new_fn in benchmarks:
+        assert legacy_fn() == new_fn(), f"{name}结果与旧实现不一致"
+        timings = []
+        for fn in (legacy_fn, new_fn):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                fn()
+            timings.append((time.perf_counter() - start) / (rounds * count) * 1e6)
+        print(f"{name}: 旧实现 {timings[0]:.2f} 微秒/条, 新实现 {timings[1]:.2f} 微秒/条, "
+              f"加速 {timings[0] / timings[1]:.2f} 倍")
+        
     print("=== 测试批量评论清洗 ===")
     start_time = datetime.now()
     
@@ -535,4 +615,10 @@ if __name__ == "__main__":
     cache_time = (end_time - start_time).total_seconds()
     
     print(f"使用缓存处理 {len(test_comments)} 条评论用时: {cache_time:.2f} 秒")
-    print(f"缓存加速比: {processing_time/cache_time:.2f}倍")
\ No newline at end of file
+    print(f"缓存加速比: {processing_time/cache_time:.2f}倍")
+    
+    # 各判定阶段的分流情况
+    print("\n=== 判定阶段统计 ===")
+    stage_stats = cleaner.get_stage_stats()
+    for stage, count in stage_stats['counts'].items():
+        print(f"{stage}: {count} 条 ({stage_stats['fractions'][stage]:.1%})")
\ No newline at end of file
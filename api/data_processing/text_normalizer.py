@@ -0,0 +1,134 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+
+class AhoCorasick:
+    """Aho-Corasick多模式匹配器
+
+    一次扫描文本即可判断是否包含词典中的任意词条，
+    代替对每个词条逐个做子串查找。
+    """
+
+    def __init__(self, words: Iterable[str]):
+        """构建自动机
+
+        Args:
+            words: 词条列表
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Optional[str]] = [None]
+
+        for word in words:
+            if word:
+                self._add(word)
+        self._build()
+
+    def _add(self, word: str) -> None:
+        state = 0
+        for char in word:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+            state = nxt
+        self._output[state] = word
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                # 沿失败链继承输出，命中后缀词条时也能立即返回
+                if self._output[nxt] is None:
+                    self._output[nxt] = self._output[self._fail[nxt]]
+
+    def search(self, text: str) -> Optional[str]:
+        """查找文本中出现的第一个词条
+
+        Args:
+            text: 待匹配文本
+
+        Returns:
+            Optional[str]: 命中的词条，未命中返回None
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+
+class CommentNormalizer:
+    """预编译的评论规范化器
+
+    URL、@用户、表情、HTML标签四类删除使用预编译正则按原顺序逐个替换，
+    再折叠空白；有意义符号/数字/缩写的判断同样使用预编译正则和Aho-Corasick自动机。
+    """
+
+    # 必须按原顺序逐个替换：合并成一个交替正则后结果会变，
+    # 例如 "[http://x.com]" 原先先删掉URL剩下 "["，交替正则会把整个 "[...]" 当表情删掉
+    REMOVE_PATTERNS = (
+        re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'),
+        re.compile(r'@[\w\u4e00-\u9fff]+'),
+        re.compile(r'\[.*?\]'),
+        re.compile(r'<[^>]+>')
+    )
+    WHITESPACE_PATTERN = re.compile(r'\s+')
+    REPEATED_NUMBER_PATTERN = re.compile(r'(\d)\1{2,}|(\d{2,})\2+')
+
+    def __init__(self, meaningful_symbols: Dict[str, str], meaningful_numbers: Dict[str, str],
+                 meaningful_abbr: Dict[str, str]):
+        """初始化规范化器
+
+        Args:
+            meaningful_symbols: 有意义的符号词典
+            meaningful_numbers: 有意义的数字词典
+            meaningful_abbr: 有意义的英文缩写词典
+        """
+        # 符号先转义再重复：旧实现直接把符号拼进正则，"..." 成了通配符，
+        # 任何5个字符以上的文本都会被判为含有意义符号；这里只匹配真正重复的符号
+        repeated_symbols = '|'.join(f'(?:{re.escape(symbol)}){{3,}}' for symbol in meaningful_symbols)
+        symbol_combos = r'[，。！？]{2,}|\.{3,}|!{2,}|\?{2,}|~{2,}'
+        self.symbol_pattern = re.compile(
+            f'{repeated_symbols}|{symbol_combos}' if repeated_symbols else symbol_combos
+        )
+        self.number_matcher = AhoCorasick(meaningful_numbers)
+        self.abbr_matcher = AhoCorasick(abbr.lower() for abbr in meaningful_abbr)
+
+    def clean(self, comment: str) -> str:
+        """清理单条评论"""
+        if not comment:
+            return ""
+        for pattern in self.REMOVE_PATTERNS:
+            comment = pattern.sub('', comment)
+        return self.WHITESPACE_PATTERN.sub(' ', comment).strip()
+
+    def clean_batch(self, comments: List[str]) -> List[str]:
+        """批量清理评论"""
+        return [self.clean(comment) for comment in comments]
+
+    def has_meaningful_symbols(self, text: str) -> bool:
+        """判断是否包含有意义的符号组合"""
+        return self.symbol_pattern.search(text) is not None
+
+    def has_meaningful_number(self, text: str) -> bool:
+        """判断是否包含有意义的数字"""
+        return self.number_matcher.search(text) is not None or self.REPEATED_NUMBER_PATTERN.search(text) is not None
+
+    def has_meaningful_abbr(self, text: str) -> bool:
+        """判断是否包含有意义的英文缩写"""
+        return self.abbr_matcher.search(text.lower()) is not None
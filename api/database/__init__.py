@@ -11,7 +11,10 @@ from .models import (
     Comment,
     BlackFan,
     BlackFanAnalysis,
-    HeatData
+    HeatData,
+    DailyStats,
+    WeiboUser,
+    AnalysisJob
 )
 
 __all__ = [
@@ -23,6 +26,9 @@ __all__ = [
     'BlackFan',
     'BlackFanAnalysis',
     'HeatData',
+    'DailyStats',
+    'WeiboUser',
+    'AnalysisJob',
     'ReportTemplate',
     'AlertRule',
     'MonitoringTarget'
@@ -1,8 +1,24 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
-from contextlib import contextmanager
+"""
+数据库连接管理
+
+进程内按数据库URL共享引擎和连接池：分析器、报表收集器和Web服务使用同一个URL时拿到的是
+同一个引擎，不再各自建连接池。SQLite文件库统一开启WAL等适合多读一写的设置，
+每个连接池记录借出次数、等待连接耗时和占用时长，可通过 get_engine_registry().stats() 查看。
+
+连接池大小可以用环境变量 DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT 配置，
+也可以在第一次调用 get_engine() 时传入 create_engine 的参数。
+"""
 import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 
 # 加载环境变量配置
@@ -17,15 +33,232 @@ DB_NAME = os.getenv('DB_NAME', 'celebrity_sentiment')
 
 # 创建数据库连接URL
 DATABASE_URL = f"mysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(DATABASE_URL, pool_size=5, max_overflow=10)
 
-# 创建数据库会话工厂
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 连接池配置：常驻连接数、高峰时额外连接数、等待空闲连接的超时秒数、连接回收秒数
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '3600'))
+
+# SQLite连接设置：写锁等待毫秒数、每个连接的页缓存KB数、内存映射字节数
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))
+SQLITE_CACHE_KB = int(os.getenv('SQLITE_CACHE_KB', '16384'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+
+
+class PoolMetrics:
+    """单个连接池的借出、等待和占用统计"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.holds = 0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+        
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+                
+    def on_connect(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.connects += 1
+            
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        connection_record.info['checkout_at'] = time.perf_counter()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+            
+    def on_checkin(self, dbapi_connection, connection_record) -> None:
+        start = connection_record.info.pop('checkout_at', None)
+        if start is None:
+            return
+        held = time.perf_counter() - start
+        with self._lock:
+            self.checked_out -= 1
+            self.holds += 1
+            self.hold_total += held
+            self.hold_max = max(self.hold_max, held)
+            
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checked_out': self.checked_out,
+                'peak_checked_out': self.peak_checked_out,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.wait_total / self.waits * 1000, 3) if self.waits else 0.0,
+                'max_wait_ms': round(self.wait_max * 1000, 3),
+                'avg_hold_ms': round(self.hold_total / self.holds * 1000, 3) if self.holds else 0.0,
+                'max_hold_ms': round(self.hold_max * 1000, 3)
+            }
+
+
+class MeteredQueuePool(QueuePool):
+    """记录等待空闲连接耗时的QueuePool"""
+    
+    metrics: Optional[PoolMetrics] = None
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.metrics is not None:
+            self.metrics.record_wait(time.perf_counter() - start)
+        return connection
+        
+    def recreate(self):
+        # engine.dispose() 会新建连接池，统计需要延续到新池
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """SQLite连接设置：WAL下读不阻塞写、写不阻塞读；写锁冲突时等待而不是立即报错"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+class EngineRegistry:
+    """进程内引擎注册表
+    
+    每个数据库URL在进程内只创建一个引擎；第一次创建时传入的参数生效，之后同一URL的调用直接返回已有引擎
+    """
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._engines: Dict[str, Engine] = {}
+        self._metrics: Dict[str, PoolMetrics] = {}
+        self._lock = threading.Lock()
+        
+    @staticmethod
+    def _engine_options(url) -> Dict[str, Any]:
+        """按数据库类型返回默认的create_engine参数"""
+        pool_options = {
+            'poolclass': MeteredQueuePool,
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT
+        }
+        if url.get_backend_name() != 'sqlite':
+            return dict(pool_options, pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=True)
+        options = {'connect_args': {'check_same_thread': False}}
+        # 内存库每个连接是独立的数据库，保留SQLAlchemy默认的连接池
+        if url.database not in (None, '', ':memory:'):
+            options.update(pool_options)
+        return options
+        
+    def get(self, db_url: str, **kwargs) -> Engine:
+        """获取db_url对应的引擎，不存在时创建；kwargs覆盖默认的create_engine参数"""
+        url = make_url(db_url)
+        key = url.render_as_string(hide_password=False)
+        engine = self._engines.get(key)
+        if engine is not None:
+            return engine
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                options = self._engine_options(url)
+                options.update(kwargs)
+                engine = create_engine(url, **options)
+                metrics = PoolMetrics()
+                if url.get_backend_name() == 'sqlite':
+                    event.listen(engine, 'connect', _set_sqlite_pragmas)
+                event.listen(engine, 'connect', metrics.on_connect)
+                event.listen(engine, 'checkout', metrics.on_checkout)
+                event.listen(engine, 'checkin', metrics.on_checkin)
+                if isinstance(engine.pool, MeteredQueuePool):
+                    engine.pool.metrics = metrics
+                self._engines[key] = engine
+                self._metrics[key] = metrics
+                self.logger.info(f"创建数据库引擎: {url.render_as_string(hide_password=True)}")
+        return engine
+        
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各引擎连接池的当前状态和累计统计，URL中的密码已隐藏"""
+        with self._lock:
+            items = list(self._engines.items())
+        report = {}
+        for key, engine in items:
+            pool = engine.pool
+            stats = self._metrics[key].snapshot()
+            stats['pool'] = type(pool).__name__
+            if isinstance(pool, QueuePool):
+                stats.update(pool_size=pool.size(), idle=pool.checkedin(), overflow=pool.overflow())
+            report[make_url(key).render_as_string(hide_password=True)] = stats
+        return report
+        
+    def dispose(self, db_url: Optional[str] = None) -> None:
+        """关闭引擎的全部连接并从注册表移除，db_url为空时关闭全部（如fork子进程前）"""
+        with self._lock:
+            if db_url is None:
+                keys = list(self._engines)
+            else:
+                keys = [make_url(db_url).render_as_string(hide_password=False)]
+            for key in keys:
+                engine = self._engines.pop(key, None)
+                self._metrics.pop(key, None)
+                if engine is not None:
+                    engine.dispose()
+
+
+_registry: Optional[EngineRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_engine_registry() -> EngineRegistry:
+    """获取进程内唯一的引擎注册表"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = EngineRegistry()
+    return _registry
+
+
+def get_engine(db_url: Optional[str] = None, **kwargs) -> Engine:
+    """获取共享引擎，db_url为空时使用环境变量配置的默认数据库"""
+    return get_engine_registry().get(db_url or DATABASE_URL, **kwargs)
+
+
+def __getattr__(name):
+    # 默认引擎在第一次使用时才创建，导入本模块不再要求安装MySQL驱动
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# 创建数据库会话工厂，会话绑定默认引擎
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 # 数据库会话上下文管理器
 @contextmanager
 def get_db():
-    db = SessionLocal()
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
     finally:
@@ -34,12 +267,12 @@ def get_db():
 # 初始化数据库表结构
 def init_db():
     from .models import Base
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
 
 # 数据库操作管理类
 class DatabaseManager:
     def __init__(self):
-        self.db = SessionLocal()
+        self.db = SessionLocal(bind=get_engine())
     
     def __enter__(self):
         return self
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Enum, JSON, ForeignKey, Boolean, text, Date, ForeignKeyConstraint
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Enum, JSON, ForeignKey, Boolean, text, Date, ForeignKeyConstraint, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -73,6 +73,23 @@ class Celebrity(Base):
     black_fan_analysis = relationship("BlackFanAnalysis", back_populates="celebrity")
     heat_data = relationship("HeatData", back_populates="celebrity")
 
+class WeiboUser(Base):
+    """爬取到的微博用户"""
+    __tablename__ = 'weibo_users'
+    
+    weibo_id = Column(String(50), primary_key=True)
+    nickname = Column(String(100))
+    verified = Column(Boolean, default=False)
+    verified_type = Column(Integer)
+    followers_count = Column(Integer, default=0)
+    following_count = Column(Integer, default=0)
+    statuses_count = Column(Integer, default=0)
+    gender = Column(String(10))
+    location = Column(String(100))
+    description = Column(Text)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, onupdate=datetime.now)
+
 class Post(Base):
     __tablename__ = 'post'
     
@@ -134,12 +151,20 @@ class SentimentForPost(Base):
 class BlackFan(Base):
     __tablename__ = 'black_fans'
     
+    __table_args__ = (
+        UniqueConstraint('user_id', 'celebrity_id', name='uq_black_fans_user_celebrity'),
+        # 黑粉排行按(分数, 评论数, 用户ID)键集分页
+        Index('idx_black_fans_celebrity_rank', 'celebrity_id', 'black_fan_score', 'comment_count', 'user_id'),
+    )
+    
     id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String(50), nullable=False)     # 黑粉用户ID
     celebrity_id = Column(String(50), ForeignKey('celebrity.weibo_id'), nullable=False)
     black_fan_score = Column(Float, nullable=False)  # 黑粉分数
     comment_count = Column(Integer, default=0)      # 评论数量
     last_active = Column(DateTime)                  # 最后活跃时间
     created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, onupdate=datetime.now)
     
     # 关联关系
     celebrity = relationship("Celebrity", back_populates="black_fans")
@@ -169,6 +194,7 @@ class HeatData(Base):
     repost_count = Column(Integer, default=0)  # 转发数量
     total_heat = Column(Float, default=0.0)  # 总热度值
     heat_change = Column(Float, default=0.0)  # 热度变化值（相比前一天）
+    updated_at = Column(DateTime, onupdate=datetime.now)  # 最后计算时间
     
     # 关联关系
     celebrity = relationship("Celebrity", back_populates="heat_data")
@@ -177,5 +203,44 @@ class HeatData(Base):
         ForeignKeyConstraint(['celebrity_id'], ['celebrity.weibo_id']),
     )
 
+# 每日统计汇总表
+class DailyStats(Base):
+    """每日统计汇总表，导入微博时按(明星, 日期)增量刷新，供看板直接读取"""
+    __tablename__ = 'daily_stats'
+    
+    celebrity_id = Column(String(50), primary_key=True)  # 明星ID
+    date = Column(Date, primary_key=True)  # 微博发布日期
+    post_count = Column(Integer, default=0)  # 微博数量
+    comment_count = Column(Integer, default=0)  # 评论数量
+    like_count = Column(Integer, default=0)  # 点赞数量
+    repost_count = Column(Integer, default=0)  # 转发数量
+    sentiment_sum = Column(Float, default=0.0)  # 情感分数之和
+    sentiment_count = Column(Integer, default=0)  # 有情感分数的微博数量
+    positive_count = Column(Integer, default=0)  # 正面微博数量
+    neutral_count = Column(Integer, default=0)  # 中性微博数量
+    negative_count = Column(Integer, default=0)  # 负面微博数量
+    updated_at = Column(DateTime, default=datetime.now)  # 最后刷新时间
+
+# 后台任务表
+class AnalysisJob(Base):
+    """爬取和分析任务，由 api.jobs.JobQueue 写入，记录状态、进度和各阶段时间"""
+    __tablename__ = 'analysis_jobs'
+
+    __table_args__ = (
+        # 去重和看板都按(明星, 任务类型, 状态)查询进行中的任务
+        Index('idx_analysis_jobs_celebrity_type_status', 'celebrity_id', 'job_type', 'status'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    celebrity_id = Column(String(50), nullable=False)  # 明星ID
+    job_type = Column(String(20), nullable=False)  # 任务类型：crawl/analysis
+    status = Column(String(20), nullable=False, default='queued')  # queued/running/done/failed
+    stage = Column(String(50))  # 当前阶段
+    progress = Column(Float, default=0.0)  # 进度 0-1
+    message = Column(Text)  # 完成说明或失败原因
+    created_at = Column(DateTime, default=datetime.now)  # 入队时间
+    started_at = Column(DateTime)  # 开始执行时间
+    finished_at = Column(DateTime)  # 结束时间
+
 if __name__ == "__main__":
    pass
\ No newline at end of file
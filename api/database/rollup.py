@@ -0,0 +1,176 @@
+"""
+每日统计汇总
+
+按(明星, 日期)维护 daily_stats 表：导入微博后只重算受影响日期的汇总行，
+看板接口直接按日期读取汇总，不再每次对 post 表做 GROUP BY DATE(created_at)。
+
+重建全部汇总（首次上线或历史数据修复时使用）:
+    python -m api.database.rollup --db data/celebrity_sentiment.db
+"""
+import argparse
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+DELETE_SQL = text("""
+    DELETE FROM daily_stats
+    WHERE celebrity_id = :celebrity_id
+    AND date >= :start_date AND date < :end_date
+""")
+
+# 情感分类来自 sentiment_for_post，没有分类结果的微博只计入数量和分数
+INSERT_SQL = text("""
+    INSERT INTO daily_stats (
+        celebrity_id, date, post_count, comment_count, like_count, repost_count,
+        sentiment_sum, sentiment_count, positive_count, neutral_count, negative_count, updated_at
+    )
+    SELECT
+        p.celebrity_id,
+        DATE(p.created_at),
+        COUNT(*),
+        COALESCE(SUM(p.comments_count), 0),
+        COALESCE(SUM(p.likes), 0),
+        COALESCE(SUM(p.reposts), 0),
+        COALESCE(SUM(p.sentiment_score), 0),
+        COUNT(p.sentiment_score),
+        SUM(CASE WHEN s.sentiment_category = 'positive' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN s.sentiment_category = 'neutral' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN s.sentiment_category = 'negative' THEN 1 ELSE 0 END),
+        :now
+    FROM post p
+    LEFT JOIN sentiment_for_post s ON s.post_id = p.post_id
+    WHERE p.celebrity_id = :celebrity_id
+    AND p.created_at >= :start_time AND p.created_at < :end_time
+    AND p.is_deleted = 0
+    GROUP BY p.celebrity_id, DATE(p.created_at)
+""")
+
+
+def _to_date(value) -> Optional[date]:
+    """把datetime/date/字符串统一转换为日期"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.fromisoformat(str(value)[:10]).date()
+    except ValueError:
+        return None
+
+
+def _date_ranges(dates: Iterable[date]) -> List[Tuple[date, date]]:
+    """把日期集合合并为连续区间 [start, end)"""
+    ranges: List[Tuple[date, date]] = []
+    for day in sorted(set(dates)):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1] = (ranges[-1][0], day + timedelta(days=1))
+        else:
+            ranges.append((day, day + timedelta(days=1)))
+    return ranges
+
+
+def collect_keys(items: Iterable[dict], celebrity_field: str = 'celebrity_id',
+                 time_field: str = 'created_at') -> Set[Tuple[str, date]]:
+    """从导入的数据中提取受影响的(明星, 日期)
+
+    Args:
+        items: 导入的数据行
+        celebrity_field: 明星ID字段名
+        time_field: 发布时间字段名
+
+    Returns:
+        Set[Tuple[str, date]]: 受影响的(明星, 日期)集合
+    """
+    keys = set()
+    for item in items:
+        celebrity_id = item.get(celebrity_field)
+        day = _to_date(item.get(time_field))
+        if celebrity_id and day:
+            keys.add((str(celebrity_id), day))
+    return keys
+
+
+def refresh_daily_stats(engine: Engine, keys: Iterable[Tuple[str, date]]) -> int:
+    """重算受影响(明星, 日期)的汇总行
+
+    每个明星的连续日期合并为一个区间，在同一事务内先删除区间内的汇总行
+    再从 post 表重新聚合写入，重复调用结果不变。
+
+    Args:
+        engine: 数据库引擎
+        keys: 受影响的(明星ID, 日期)
+
+    Returns:
+        int: 刷新的日期区间数
+    """
+    dates_by_celebrity: Dict[str, Set[date]] = defaultdict(set)
+    for celebrity_id, day in keys:
+        day = _to_date(day)
+        if celebrity_id and day:
+            dates_by_celebrity[str(celebrity_id)].add(day)
+    if not dates_by_celebrity:
+        return 0
+
+    refreshed = 0
+    now = datetime.now()
+    with engine.begin() as conn:
+        for celebrity_id, dates in dates_by_celebrity.items():
+            for start, end in _date_ranges(dates):
+                conn.execute(DELETE_SQL, {
+                    'celebrity_id': celebrity_id, 'start_date': start, 'end_date': end
+                })
+                conn.execute(INSERT_SQL, {
+                    'celebrity_id': celebrity_id,
+                    'start_time': datetime.combine(start, datetime.min.time()),
+                    'end_time': datetime.combine(end, datetime.min.time()),
+                    'now': now
+                })
+                refreshed += 1
+    logger.info(f"刷新每日统计: {len(dates_by_celebrity)} 个明星, {refreshed} 个日期区间")
+    return refreshed
+
+
+def rebuild_daily_stats(engine: Engine) -> int:
+    """按 post 表中的全部数据重建汇总表
+
+    Args:
+        engine: 数据库引擎
+
+    Returns:
+        int: 刷新的日期区间数
+    """
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT DISTINCT celebrity_id, DATE(created_at) AS day
+            FROM post
+            WHERE celebrity_id IS NOT NULL AND created_at IS NOT NULL
+        """)).fetchall()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM daily_stats"))
+    return refresh_daily_stats(engine, ((row.celebrity_id, row.day) for row in rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重建每日统计汇总表')
+    parser.add_argument('--db', default='data/celebrity_sentiment.db', help='SQLite数据库路径')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from .models import DailyStats
+    from .db_utils import get_engine
+    engine = get_engine(f'sqlite:///{args.db}')
+    DailyStats.__table__.create(engine, checkfirst=True)
+    refreshed = rebuild_daily_stats(engine)
+    print(f"重建完成，共刷新 {refreshed} 个日期区间")
+
+
+if __name__ == '__main__':
+    main()
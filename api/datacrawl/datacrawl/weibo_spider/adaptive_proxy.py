@@ -0,0 +1,291 @@
+# encoding: utf-8
+"""
+自适应代理与接口限速
+
+api/datacrawl 的爬虫通过 middlewares 使用，myweibo_analysis_V2 的爬虫通过
+weibospider/adaptive_proxy.py 转出同一份实现。
+本模块只依赖scrapy和twisted，不导入所在项目的其它模块。
+"""
+import logging
+import random
+import time
+from collections import deque
+
+from scrapy import signals
+from twisted.internet import defer
+
+logger = logging.getLogger(__name__)
+
+# 按URL把请求归入微博接口，每类接口单独限并发
+ENDPOINTS = (
+    ('statuses', 'weibo.com/ajax/statuses/'),
+    ('friendships', 'weibo.com/ajax/friendships/'),
+    ('comments', 'weibo.com/ajax/comments/'),
+    ('profile', 'weibo.com/ajax/profile/'),
+    ('search', 's.weibo.com'),
+)
+THROTTLE_CODES = (418, 429)
+
+
+def endpoint_of(url):
+    for name, pattern in ENDPOINTS:
+        if pattern in url:
+            return name
+    return 'other'
+
+
+class ProxyPool(object):
+    """
+    代理健康度评分
+
+    每个代理维护成功率和延迟的指数移动平均，按 成功率/延迟 加权随机选择；
+    连续失败的代理进入冷却，冷却时间随冷却次数翻倍，到期后以较低分数重新加入。
+    """
+
+    def __init__(self, proxies, cooldown=60, max_cooldown=1800, max_failures=3, alpha=0.3):
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_failures = max_failures
+        self.alpha = alpha
+        self.proxies = {proxy: self._new_state() for proxy in proxies}
+
+    @staticmethod
+    def _new_state():
+        return {'success': 1.0, 'latency': 1.0, 'failures': 0, 'cooldowns': 0, 'until': 0.0,
+                'requests': 0, 'errors': 0}
+
+    def available(self, now=None):
+        now = time.monotonic() if now is None else now
+        ready = []
+        for proxy, state in self.proxies.items():
+            if state['until'] and state['until'] <= now:
+                # 冷却结束，以一半的成功率重新参与选择
+                state['until'] = 0.0
+                state['success'] = 0.5
+                state['failures'] = 0
+            if not state['until']:
+                ready.append(proxy)
+        return ready
+
+    def choose(self):
+        """返回一个代理，没有可用代理时返回None（直连）"""
+        ready = self.available()
+        if not ready:
+            return None
+        weights = [max(self.proxies[p]['success'], 0.01) / max(self.proxies[p]['latency'], 0.05) for p in ready]
+        return random.choices(ready, weights=weights)[0]
+
+    def success(self, proxy, latency):
+        state = self.proxies.get(proxy)
+        if state is None:
+            return
+        state['requests'] += 1
+        state['success'] += self.alpha * (1 - state['success'])
+        state['latency'] += self.alpha * (latency - state['latency'])
+        state['failures'] = 0
+        # 恢复稳定后，下次冷却重新从基础时长开始
+        if state['success'] > 0.9:
+            state['cooldowns'] = 0
+
+    def failure(self, proxy):
+        """记录一次失败，返回是否进入冷却"""
+        state = self.proxies.get(proxy)
+        if state is None:
+            return False
+        state['requests'] += 1
+        state['errors'] += 1
+        state['success'] -= self.alpha * state['success']
+        state['failures'] += 1
+        if state['failures'] < self.max_failures:
+            return False
+        state['until'] = time.monotonic() + min(self.max_cooldown, self.cooldown * 2 ** state['cooldowns'])
+        state['cooldowns'] += 1
+        state['failures'] = 0
+        return True
+
+
+class EndpointLimiter(object):
+    """
+    按接口自适应并发（AIMD）
+
+    每个接口的并发上限在请求成功时缓慢增加（每个窗口+1），遇到418/429时减半，
+    并在退避时间内暂停该接口的新请求，退避时间随连续限流翻倍。
+    """
+
+    def __init__(self, start=4, minimum=1, maximum=16, backoff=5, max_backoff=120):
+        self.start = start
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.endpoints = {}
+
+    def get(self, endpoint):
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = {
+                'limit': float(self.start), 'active': 0, 'waiters': deque(), 'paused_until': 0.0,
+                'backoff': self.backoff, 'last_decrease': 0.0, 'throttled': 0, 'requests': 0,
+            }
+        return self.endpoints[endpoint]
+
+    def acquire(self, endpoint):
+        """有空位时返回None，否则返回在获得空位时触发的Deferred"""
+        state = self.get(endpoint)
+        if not state['waiters'] and self._has_room(state):
+            state['active'] += 1
+            return None
+        d = defer.Deferred()
+        state['waiters'].append(d)
+        self._schedule(endpoint, state)
+        return d
+
+    def release(self, endpoint, throttled=False, started=None):
+        """请求结束时调用，started为请求开始时间"""
+        state = self.get(endpoint)
+        state['active'] = max(0, state['active'] - 1)
+        state['requests'] += 1
+        now = time.monotonic()
+        if throttled:
+            state['throttled'] += 1
+            # 上次减半之前发出的请求被限流时不再重复减半
+            if started is None or started >= state['last_decrease']:
+                state['limit'] = max(self.minimum, state['limit'] / 2)
+                state['paused_until'] = now + state['backoff']
+                state['backoff'] = min(self.max_backoff, state['backoff'] * 2)
+                state['last_decrease'] = now
+        else:
+            state['limit'] = min(self.maximum, state['limit'] + 1 / state['limit'])
+            state['backoff'] = self.backoff
+        self._wake(endpoint, state)
+
+    def _has_room(self, state):
+        return time.monotonic() >= state['paused_until'] and state['active'] < int(state['limit'])
+
+    def _wake(self, endpoint, state):
+        while state['waiters'] and self._has_room(state):
+            state['active'] += 1
+            state['waiters'].popleft().callback(None)
+        self._schedule(endpoint, state)
+
+    def _schedule(self, endpoint, state):
+        # 暂停期间没有请求结束来唤醒等待的请求，暂停到期时主动唤醒
+        delay = state['paused_until'] - time.monotonic()
+        if state['waiters'] and delay > 0 and not state.get('timer'):
+            from twisted.internet import reactor
+
+            def fire():
+                state['timer'] = None
+                self._wake(endpoint, state)
+
+            state['timer'] = reactor.callLater(delay, fire)
+
+
+class AdaptiveProxyMiddleware(object):
+    """
+    自适应代理与接口限速中间件
+
+    - 从 PROXY_LIST 中按健康度选择代理，失败的代理冷却后重新加入
+    - 按接口（statuses / friendships / comments / profile / search）自适应并发，
+      418/429 时降并发并退避，然后换代理重试（最多 ADAPTIVE_RETRY_TIMES 次）
+    需要排在 RetryMiddleware（550）之后、HttpProxyMiddleware（750）之前，
+    这样响应和异常先经过本中间件。
+    process_* 不使用已弃用的spider参数，统计和日志从from_crawler保存的crawler获取。
+    """
+
+    def __init__(self, proxies, limiter, retry_times=3, crawler=None):
+        self.pool = ProxyPool(proxies)
+        self.limiter = limiter
+        self.retry_times = retry_times
+        self.crawler = crawler
+        self.stats = crawler.stats if crawler is not None else None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        limiter = EndpointLimiter(
+            start=settings.getint('ADAPTIVE_START_CONCURRENCY', 4),
+            minimum=settings.getint('ADAPTIVE_MIN_CONCURRENCY', 1),
+            maximum=settings.getint('ADAPTIVE_MAX_CONCURRENCY', 16),
+            backoff=settings.getfloat('ADAPTIVE_BACKOFF', 5),
+            max_backoff=settings.getfloat('ADAPTIVE_MAX_BACKOFF', 120),
+        )
+        middleware = cls(settings.getlist('PROXY_LIST'), limiter,
+                         settings.getint('ADAPTIVE_RETRY_TIMES', 3), crawler)
+        middleware.pool.cooldown = settings.getfloat('PROXY_COOLDOWN', 60)
+        middleware.pool.max_cooldown = settings.getfloat('PROXY_MAX_COOLDOWN', 1800)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    @property
+    def logger(self):
+        spider = getattr(self.crawler, 'spider', None)
+        return spider.logger if spider is not None else logger
+
+    def process_request(self, request, spider=None):
+        if request.meta.get('adaptive_endpoint'):
+            return None
+        endpoint = endpoint_of(request.url)
+        d = self.limiter.acquire(endpoint)
+        if d is None:
+            self._start(request, endpoint)
+            return None
+        return d.addCallback(lambda _: self._start(request, endpoint))
+
+    def _start(self, request, endpoint):
+        request.meta['adaptive_endpoint'] = endpoint
+        request.meta['adaptive_start'] = time.monotonic()
+        proxy = self.pool.choose()
+        if proxy:
+            request.meta['proxy'] = proxy
+        elif request.meta.get('adaptive_proxy'):
+            # 上次使用的代理都在冷却，改为直连
+            request.meta.pop('proxy', None)
+        request.meta['adaptive_proxy'] = proxy
+        return None
+
+    def _finish(self, request, throttled=False, failed=False):
+        endpoint = request.meta.pop('adaptive_endpoint', None)
+        if endpoint is None:
+            return
+        self.limiter.release(endpoint, throttled, request.meta.get('adaptive_start'))
+        proxy = request.meta.get('adaptive_proxy')
+        if proxy:
+            if failed or throttled:
+                if self.pool.failure(proxy):
+                    self._inc('adaptive/proxy_cooldowns')
+            else:
+                self.pool.success(proxy, time.monotonic() - request.meta['adaptive_start'])
+
+    def process_response(self, request, response, spider=None):
+        throttled = response.status in THROTTLE_CODES
+        self._finish(request, throttled=throttled, failed=response.status >= 500)
+        if not throttled:
+            return response
+        self._inc(f'adaptive/throttled/{response.status}')
+        retries = request.meta.get('adaptive_retry_times', 0) + 1
+        if retries > self.retry_times:
+            self.logger.warning(f'{response.status} 限流重试次数用完: {request.url}')
+            return response
+        retry_request = request.copy()
+        retry_request.meta['adaptive_retry_times'] = retries
+        retry_request.dont_filter = True
+        return retry_request
+
+    def process_exception(self, request, exception, spider=None):
+        # 只记录失败，重试交给之后的RetryMiddleware，重试请求会重新选择代理
+        self._finish(request, failed=True)
+        return None
+
+    def _inc(self, key):
+        if self.stats is not None:
+            self.stats.inc_value(key)
+
+    def spider_closed(self, spider):
+        for endpoint, state in self.limiter.endpoints.items():
+            spider.logger.info(f"接口 {endpoint}: 请求{state['requests']}次，限流{state['throttled']}次，"
+                               f"最终并发上限{int(state['limit'])}")
+            if state.get('timer') and state['timer'].active():
+                state['timer'].cancel()
+        for proxy, state in self.pool.proxies.items():
+            spider.logger.info(f"代理 {proxy}: 请求{state['requests']}次，失败{state['errors']}次，"
+                               f"成功率{state['success']:.2f}，平均延迟{state['latency']:.2f}秒")
@@ -11,6 +11,11 @@ class UserItem(scrapy.Item):
     gender = scrapy.Field()
     location = scrapy.Field()
     created_at = scrapy.Field()
+    # 以下为user爬虫实际填写的字段
+    user_id = scrapy.Field()
+    friends_count = scrapy.Field()
+    verified_reason = scrapy.Field()
+    description = scrapy.Field()
 
 class TweetItem(scrapy.Item):
     post_id = scrapy.Field()
@@ -22,6 +27,15 @@ class TweetItem(scrapy.Item):
     likes = scrapy.Field()
     is_deleted = scrapy.Field()
     sentiment_score = scrapy.Field()
+    # 以下为tweet爬虫实际填写的字段
+    tweet_id = scrapy.Field()
+    user_id = scrapy.Field()
+    celebrity_name = scrapy.Field()
+    attitudes_count = scrapy.Field()
+    source = scrapy.Field()
+    is_retweet = scrapy.Field()
+    pics = scrapy.Field()
+    crawl_time = scrapy.Field()
 
 class CommentItem(scrapy.Item):
     comment_id = scrapy.Field()
@@ -30,4 +44,9 @@ class CommentItem(scrapy.Item):
     created_at = scrapy.Field()
     parent_id = scrapy.Field()
     user_id = scrapy.Field()
-    like_count = scrapy.Field() 
\ No newline at end of file
+    like_count = scrapy.Field()
+    # 以下为comment爬虫实际填写的字段
+    tweet_id = scrapy.Field()
+    nickname = scrapy.Field()
+    likes_count = scrapy.Field()
+    source = scrapy.Field() 
\ No newline at end of file
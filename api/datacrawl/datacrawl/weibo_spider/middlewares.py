@@ -2,6 +2,10 @@ import random
 from scrapy import signals
 from scrapy.downloadermiddlewares.useragent import UserAgentMiddleware
 
+# 代理池和接口限速与myweibo_analysis_V2的爬虫共用，settings中仍按 middlewares.AdaptiveProxyMiddleware 引用
+from .adaptive_proxy import (ENDPOINTS, THROTTLE_CODES, AdaptiveProxyMiddleware, EndpointLimiter,  # noqa: F401
+                             ProxyPool, endpoint_of)
+
 class IPProxyMiddleware:
     def __init__(self):
         self.proxy_list = [
@@ -56,29 +60,3 @@ class UserAgentMiddleware:
         if 'ajax' in request.url:
             request.headers['Origin'] = 'https://weibo.com'
             request.headers['X-Requested-With'] = 'XMLHttpRequest'
-
-class ProxyMiddleware:
-    def __init__(self, proxy_list):
-        self.proxy_list = proxy_list
-
-    @classmethod
-    def from_crawler(cls, crawler):
-        return cls(crawler.settings.getlist('PROXY_LIST'))
-
-    def process_request(self, request, spider):
-        if self.proxy_list:
-            proxy = random.choice(self.proxy_list)
-            request.meta['proxy'] = proxy
-            spider.logger.debug(f'Using proxy: {proxy}')
-
-    def process_exception(self, request, exception, spider):
-        # 如果代理请求失败，尝试使用其他代理
-        if 'proxy' in request.meta:
-            proxy = request.meta['proxy']
-            if proxy in self.proxy_list:
-                self.proxy_list.remove(proxy)
-            if self.proxy_list:
-                new_proxy = random.choice(self.proxy_list)
-                request.meta['proxy'] = new_proxy
-                spider.logger.debug(f'Switching to new proxy: {new_proxy}')
-                return request 
\ No newline at end of file
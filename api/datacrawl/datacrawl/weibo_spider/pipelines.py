@@ -1,192 +1,278 @@
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from datetime import datetime
-from api.database.models import WeiboUser, Post, Comment, Celebrity
-import json
+from collections import deque
+from api.database.models import WeiboUser, Post, Comment, DailyStats
+from api.database.rollup import collect_keys, refresh_daily_stats
 from api.data_processing.data_cleaner import DataCleaner
+from twisted.internet import defer, threads
+import threading
+import logging
+import json
 import time
 import os
 
+logger = logging.getLogger(__name__)
+
+_DIALECT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'mysql': mysql.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def bulk_upsert(conn, table, rows, update_columns=None):
+    """按数据库方言批量插入或更新，rows为普通字典列表
+
+    update_columns为冲突时更新的列，默认更新除主键外的全部列。
+    """
+    if not rows:
+        return 0
+    insert = _DIALECT_INSERTS.get(conn.dialect.name)
+    if insert is None:
+        raise ValueError(f"不支持的数据库类型: {conn.dialect.name}")
+    primary_keys = [column.name for column in table.primary_key.columns]
+    if update_columns is None:
+        update_columns = [key for key in rows[0] if key not in primary_keys]
+    stmt = insert(table)
+    if conn.dialect.name == 'mysql':
+        stmt = stmt.on_duplicate_key_update({col: stmt.inserted[col] for col in update_columns})
+    elif update_columns:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=primary_keys,
+            set_={col: stmt.excluded[col] for col in update_columns}
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=primary_keys)
+    conn.execute(stmt, rows)
+    return len(rows)
+
+
+def _to_id(value):
+    return None if value is None else str(value)
+
+
+def _to_datetime(value):
+    """统一转换为不带时区的本地时间，无法解析时返回None"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _first(item, *fields, default=None):
+    """按顺序取第一个存在的字段，兼容不同爬虫的字段命名"""
+    for field in fields:
+        value = item.get(field)
+        if value is not None:
+            return value
+    return default
+
+
 class WeiboPipeline:
-    def __init__(self, db_config):
+    """
+    清洗并写入数据库的pipeline
+
+    item按类型攒批，每批的清洗（BERT判断）和写库放到Twisted线程池执行，爬虫线程不再阻塞；
+    写库使用数据库原生的批量upsert，不再构造ORM对象。
+    进行中的批次达到max_pending时，process_item返回未完成的Deferred，
+    Scrapy会暂停处理后续item，直到有批次写完。
+    """
+
+    def __init__(self, db_config, batch_size=100, max_pending=4, max_retries=3):
         self.db_config = db_config
         self.cleaner = DataCleaner(batch_size=32)
-        self.user_items = []
-        self.tweet_items = []
-        self.comment_items = []
-        self.batch_size = 100
-        self.max_retries = 3
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.batches = {'user': [], 'tweet': [], 'comment': []}
+        self.pending = 0
+        self.in_flight = set()
+        self.waiters = deque()
+        # 清洗模型和SQLite写入都不适合并发，批次在工作线程里逐个执行
+        self.flush_lock = threading.Lock()
+        self.stats = {'user': 0, 'tweet': 0, 'comment': 0, 'failed_batches': 0}
         
     @classmethod
     def from_crawler(cls, crawler):
-        return cls(crawler.settings.get('DATABASE'))
+        settings = crawler.settings
+        return cls(
+            settings.get('DATABASE'),
+            batch_size=settings.getint('PIPELINE_BATCH_SIZE', 100),
+            max_pending=settings.getint('PIPELINE_MAX_PENDING', 4),
+            max_retries=settings.getint('PIPELINE_MAX_RETRIES', 3),
+        )
         
     def open_spider(self, spider):
         db_url = f"sqlite:///{self.db_config['database']}"
         self.engine = create_engine(db_url, connect_args={'check_same_thread': False})
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        WeiboUser.__table__.create(self.engine, checkfirst=True)
+        DailyStats.__table__.create(self.engine, checkfirst=True)
         
     def close_spider(self, spider):
-        try:
-            # 处理剩余的items
-            self._process_user_items()
-            self._process_tweet_items()
-            self._process_comment_items()
-        except Exception as e:
-            spider.logger.error(f'关闭爬虫时处理数据失败: {str(e)}')
-            raise
-        finally:
-            self.session.close()
+        # 提交剩余的items，等待所有批次写完后再释放连接
+        for kind, batch in self.batches.items():
+            if batch:
+                self._dispatch(kind, spider)
+        d = defer.DeferredList(list(self.in_flight))
+        
+        def finish(_):
+            self.engine.dispose()
+            spider.logger.info(
+                f"WeiboPipeline 写入用户{self.stats['user']}条，微博{self.stats['tweet']}条，"
+                f"评论{self.stats['comment']}条，失败批次{self.stats['failed_batches']}个"
+            )
+        
+        return d.addBoth(finish)
         
     def process_item(self, item, spider):
-        try:
-            if spider.name == 'user':
-                self.user_items.append(item)
-                if len(self.user_items) >= self.batch_size:
-                    self._process_user_items()
-                    
-            elif spider.name == 'tweet':
-                self.tweet_items.append(item)
-                if len(self.tweet_items) >= self.batch_size:
-                    self._process_tweet_items()
-                    
-            elif spider.name == 'comment':
-                self.comment_items.append(item)
-                if len(self.comment_items) >= self.batch_size:
-                    self._process_comment_items()
-                    
-        except Exception as e:
-            spider.logger.error(f'处理数据失败: {str(e)}')
-            raise
-            
+        kind = spider.name
+        if kind not in self.batches:
+            return item
+        
+        self.batches[kind].append(item)
+        if len(self.batches[kind]) >= self.batch_size:
+            self._dispatch(kind, spider)
+        
+        # 背压：写库跟不上时让Scrapy等待
+        if self.pending >= self.max_pending:
+            waiter = defer.Deferred()
+            self.waiters.append(waiter)
+            return waiter.addCallback(lambda _: item)
         return item
         
-    def _process_user_items(self):
-        if not self.user_items:
-            return
-            
-        for retry in range(self.max_retries):
-            try:
-                # 批量清洗用户数据
-                cleaned_items = self.cleaner.clean_user_data_batch(self.user_items)
-                
-                # 批量创建微博用户对象
-                weibo_users = [
-                    WeiboUser(
-                        weibo_id=item['weibo_id'],
-                        nickname=item['nickname'],
-                        verified=item['verified'],
-                        verified_type=item.get('verified_type'),
-                        followers_count=item['followers_count'],
-                        following_count=item['following_count'],
-                        statuses_count=item['statuses_count'],
-                        gender=item.get('gender'),
-                        location=item.get('location'),
-                        created_at=item['created_at']
-                    )
-                    for item in cleaned_items
-                ]
-                
-                # 使用事务
-                with self.session.begin():
-                    self.session.bulk_merge_mappings(WeiboUser, [user.__dict__ for user in weibo_users])
-                
-                self.user_items = []
-                break
-                
-            except Exception as e:
-                if retry == self.max_retries - 1:
-                    raise
-                self.session.rollback()
-                time.sleep(1)  # 等待1秒后重试
-            
-    def _process_tweet_items(self):
-        if not self.tweet_items:
-            return
-            
-        for retry in range(self.max_retries):
-            try:
-                # 批量清洗微博数据
-                cleaned_items = self.cleaner.clean_post_data_batch(self.tweet_items)
-                
-                # 批量创建微博对象
-                posts = []
-                for item in cleaned_items:
-                    posts.append(Post(
-                        post_id=item['post_id'],
-                        celebrity_id=item['celebrity_id'],
-                        content=item['content'],
-                        created_at=item['created_at'],
-                        reposts_count=item['reposts_count'],
-                        comments_count=item['comments_count'],
-                        likes=item['likes'],
-                        is_deleted=item.get('is_deleted', 0),
-                        sentiment_score=item.get('sentiment_score', 0.0)
-                    ))
-                
-                # 使用事务
-                with self.session.begin():
-                    self.session.bulk_merge_mappings(Post, [post.__dict__ for post in posts])
-                
-                self.tweet_items = []
-                break
-                
-            except Exception as e:
-                if retry == self.max_retries - 1:
-                    raise
-                self.session.rollback()
-                time.sleep(1)  # 等待1秒后重试
+    def _dispatch(self, kind, spider):
+        batch = self.batches[kind]
+        self.batches[kind] = []
+        self.pending += 1
+        d = threads.deferToThread(self._flush, kind, batch)
+        self.in_flight.add(d)
+        
+        def done(result):
+            if isinstance(result, int):
+                self.stats[kind] += result
+            return None
+        
+        def failed(failure):
+            self.stats['failed_batches'] += 1
+            spider.logger.error(f'写入{kind}数据失败，丢弃{len(batch)}条: {failure.getErrorMessage()}')
+        
+        def release(_):
+            self.pending -= 1
+            self.in_flight.discard(d)
+            while self.waiters and self.pending < self.max_pending:
+                self.waiters.popleft().callback(None)
+        
+        d.addCallbacks(done, failed)
+        d.addBoth(release)
+        return d
+        
+    def _flush(self, kind, items):
+        """在工作线程中清洗并写入一批数据，返回写入条数"""
+        with self.flush_lock:
+            for retry in range(self.max_retries):
+                try:
+                    if kind == 'user':
+                        return self._write_users(items)
+                    if kind == 'tweet':
+                        return self._write_posts(items)
+                    return self._write_comments(items)
+                except Exception as e:
+                    if retry == self.max_retries - 1:
+                        raise
+                    logger.warning(f'写入{kind}数据失败，第{retry + 1}次重试: {str(e)}')
+                    time.sleep(2 ** retry)  # 工作线程内退避，不阻塞爬虫
             
-    def _process_comment_items(self):
-        if not self.comment_items:
-            return
+    def _clean_contents(self, items):
+        """批量清洗内容，返回(item, 清洗后内容)，过滤掉无意义的内容"""
+        cleaned_contents = self.cleaner.clean_comments_batch([item.get('content') or '' for item in items])
+        meaningful_results = self.cleaner.is_meaningful_comment_batch(cleaned_contents)
+        return [
+            (item, content)
+            for item, content, is_meaningful in zip(items, cleaned_contents, meaningful_results)
+            if is_meaningful
+        ]
+        
+    def _write_users(self, items):
+        rows = [{
+            'weibo_id': _to_id(_first(item, 'weibo_id', 'user_id')),
+            'nickname': item.get('nickname'),
+            'verified': bool(item.get('verified', False)),
+            'verified_type': item.get('verified_type'),
+            'followers_count': item.get('followers_count', 0),
+            'following_count': _first(item, 'following_count', 'friends_count', default=0),
+            'statuses_count': item.get('statuses_count', 0),
+            'gender': item.get('gender'),
+            'location': item.get('location'),
+            'description': item.get('description'),
+            'created_at': _to_datetime(item.get('created_at')),
+            'updated_at': datetime.now(),
+        } for item in items]
+        rows = [row for row in rows if row['weibo_id']]
+        with self.engine.begin() as conn:
+            return bulk_upsert(conn, WeiboUser.__table__, rows)
             
-        for retry in range(self.max_retries):
-            try:
-                # 批量清洗评论数据
-                cleaned_items = self.cleaner.clean_comment_data_batch(self.comment_items)
-                
-                # 批量创建评论对象
-                comments = [
-                    Comment(
-                        comment_id=item['comment_id'],
-                        post_id=item['post_id'],
-                        content=item['content'],
-                        created_at=item['created_at'],
-                        parent_id=item.get('parent_id')
-                    )
-                    for item in cleaned_items
-                ]
-                
-                # 使用事务
-                with self.session.begin():
-                    self.session.bulk_merge_mappings(Comment, [comment.__dict__ for comment in comments])
-                
-                self.comment_items = []
-                break
-                
-            except Exception as e:
-                if retry == self.max_retries - 1:
-                    raise
-                self.session.rollback()
-                time.sleep(1)  # 等待1秒后重试 
+    def _write_posts(self, items):
+        rows = [{
+            'post_id': _to_id(_first(item, 'post_id', 'tweet_id')),
+            'celebrity_id': _to_id(_first(item, 'celebrity_id', 'user_id')),
+            'content': content,
+            'created_at': _to_datetime(item.get('created_at')),
+            'reposts': _first(item, 'reposts', 'reposts_count', default=0),
+            'comments_count': item.get('comments_count', 0),
+            'likes': _first(item, 'likes', 'attitudes_count', default=0),
+            'is_deleted': item.get('is_deleted', 0),
+            'sentiment_score': item.get('sentiment_score', 0.0),
+        } for item, content in self._clean_contents(items)]
+        rows = [row for row in rows if row['post_id']]
+        # 已有的情感分数由分析模块写入，重复爬取时不覆盖
+        update_columns = [key for key in rows[0] if key not in ('post_id', 'sentiment_score')] if rows else None
+        with self.engine.begin() as conn:
+            count = bulk_upsert(conn, Post.__table__, rows, update_columns)
+        
+        # 只重算本批微博涉及的(明星, 日期)汇总
+        refresh_daily_stats(self.engine, collect_keys(rows))
+        return count
+        
+    def _write_comments(self, items):
+        rows = [{
+            'comment_id': _to_id(item.get('comment_id')),
+            'post_id': _to_id(_first(item, 'post_id', 'tweet_id')),
+            'content': content,
+            'created_at': _to_datetime(item.get('created_at')),
+            'parent_id': _to_id(item.get('parent_id')),
+        } for item, content in self._clean_contents(items)]
+        rows = [row for row in rows if row['comment_id']]
+        with self.engine.begin() as conn:
+            return bulk_upsert(conn, Comment.__table__, rows)
 
 class JsonWriterPipeline:
-    def __init__(self):
+    def __init__(self, buffer_size=1024 * 1024):
         self.output_dir = 'output'
+        self.buffer_size = buffer_size
+        self.file = None
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
             
-    def process_item(self, item, spider):
-        # 生成文件名
+    def open_spider(self, spider):
+        # 每次运行只打开一个文件，写入经过缓冲，不再每条数据重新打开文件
         timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        filename = f"{spider.name}_{timestamp}.jsonl"
-        filepath = os.path.join(self.output_dir, filename)
+        filepath = os.path.join(self.output_dir, f"{spider.name}_{timestamp}.jsonl")
+        self.file = open(filepath, 'a', encoding='utf-8', buffering=self.buffer_size)
         
-        # 写入数据
-        with open(filepath, 'a', encoding='utf-8') as f:
-            line = json.dumps(dict(item), ensure_ascii=False) + '\n'
-            f.write(line)
+    def close_spider(self, spider):
+        if self.file:
+            self.file.close()
+            self.file = None
             
+    def process_item(self, item, spider):
+        if self.file is None:
+            self.open_spider(spider)
+        self.file.write(json.dumps(dict(item), ensure_ascii=False) + '\n')
         return item 
\ No newline at end of file
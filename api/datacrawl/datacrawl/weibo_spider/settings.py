@@ -6,15 +6,16 @@ NEWSPIDER_MODULE = 'datacrawl.weibo_spider.spiders'
 # 爬虫设置
 ROBOTSTXT_OBEY = False
 CONCURRENT_REQUESTS = 8  # 降低并发数
-DOWNLOAD_DELAY = 5  # 增加延迟到5秒
+DOWNLOAD_DELAY = 0.5  # 并发由AdaptiveProxyMiddleware按接口自适应调整
 RANDOMIZE_DOWNLOAD_DELAY = True
 DOWNLOAD_TIMEOUT = 30  # 增加超时时间
 
 # 启用中间件
 DOWNLOADER_MIDDLEWARES = {
     'datacrawl.weibo_spider.middlewares.UserAgentMiddleware': 543,
-    'datacrawl.weibo_spider.middlewares.ProxyMiddleware': 544,
     'scrapy.downloadermiddlewares.retry.RetryMiddleware': 550,
+    # 需要在RetryMiddleware之前处理响应和异常，才能记录代理失败并换代理
+    'datacrawl.weibo_spider.middlewares.AdaptiveProxyMiddleware': 560,
 }
 
 # 代理设置
@@ -24,6 +25,16 @@ PROXY_LIST = [
     # 'http://ip:port',
     # 'socks5://ip:port',
 ]
+PROXY_COOLDOWN = 60  # 代理连续失败后的冷却秒数，每次再进入冷却时翻倍
+PROXY_MAX_COOLDOWN = 1800
+
+# 按接口自适应并发：成功时逐步加并发，418/429时减半并退避
+ADAPTIVE_START_CONCURRENCY = 2
+ADAPTIVE_MIN_CONCURRENCY = 1
+ADAPTIVE_MAX_CONCURRENCY = 8
+ADAPTIVE_BACKOFF = 10  # 首次限流的暂停秒数，连续限流时翻倍
+ADAPTIVE_MAX_BACKOFF = 300
+ADAPTIVE_RETRY_TIMES = 3  # 418/429 换代理重试次数
 
 # 数据库设置
 DATABASE = {
@@ -39,6 +50,11 @@ ITEM_PIPELINES = {
     'datacrawl.weibo_spider.pipelines.WeiboPipeline': 300,
 }
 
+# 数据库管道：每批条数、最多同时进行的写库批次（超过后暂停处理新item）、失败重试次数
+PIPELINE_BATCH_SIZE = 100
+PIPELINE_MAX_PENDING = 4
+PIPELINE_MAX_RETRIES = 3
+
 # 日志设置
 LOG_LEVEL = 'DEBUG'
 LOG_FORMAT = '%(asctime)s [%(name)s] %(levelname)s: %(message)s'
@@ -57,8 +73,8 @@ COOKIES_DEBUG = True
 CONCURRENT_REQUESTS_PER_DOMAIN = 4
 CONCURRENT_REQUESTS_PER_IP = 4
 
-# 自动限速
-AUTOTHROTTLE_ENABLED = True
+# 自动限速（按下载延迟调节，与接口自适应并发重复，已关闭）
+AUTOTHROTTLE_ENABLED = False
 AUTOTHROTTLE_START_DELAY = 5
 AUTOTHROTTLE_MAX_DELAY = 60
 AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
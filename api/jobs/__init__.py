@@ -0,0 +1,12 @@
+"""
+任务模块
+爬取和分析任务的有界线程池队列，任务状态持久化到数据库
+"""
+
+from .job_queue import JobQueue, JobContext, JOB_STATUSES
+
+__all__ = [
+    'JobQueue',
+    'JobContext',
+    'JOB_STATUSES'
+]
@@ -0,0 +1,250 @@
+"""
+后台任务队列
+
+爬取和分析任务按类型放入各自固定大小的线程池执行，任务状态写入 analysis_jobs 表：
+queued（已入队）→ running（执行中）→ done（完成）/ failed（失败），同时记录入队、开始和结束时间。
+同一明星同类型的任务在排队时不会重复入队，提交时直接返回排队中的任务；
+任务已在执行时记下重跑标记，当前任务结束后再提交一次，保证执行期间新到的数据也会被处理。
+状态和进度的每次变化都通过 notify(event, data) 推送，服务端传入 socketio.emit。
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import sessionmaker
+
+from ..database.db_utils import get_engine
+from ..database.models import AnalysisJob
+
+# 任务状态
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class JobContext:
+    """传给任务函数的上下文，任务通过它汇报当前阶段和进度"""
+
+    def __init__(self, queue: 'JobQueue', job_id: int, job_type: str, celebrity_id: str):
+        self._queue = queue
+        self.job_id = job_id
+        self.job_type = job_type
+        self.celebrity_id = celebrity_id
+
+    def progress(self, stage: str, progress: float, message: Optional[str] = None) -> None:
+        """更新任务阶段和进度（0-1），写入任务表并推送给前端"""
+        fields = {'stage': stage, 'progress': max(0.0, min(progress, 1.0))}
+        if message is not None:
+            fields['message'] = message
+        self._queue._update(self.job_id, **fields)
+
+
+class JobQueue:
+    """有界线程池任务队列，任务状态持久化到 analysis_jobs 表"""
+
+    def __init__(self, db_url: str, workers: Dict[str, int],
+                 notify: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+                 event: str = 'job_update'):
+        """初始化任务队列
+
+        Args:
+            db_url: 数据库连接URL
+            workers: 任务类型到线程数的映射，例如 {'crawl': 1, 'analysis': 2}
+            notify: 状态变化回调，参数为 (事件名, 任务信息)
+            event: 推送的事件名
+        """
+        self.logger = logging.getLogger(__name__)
+        self.engine = get_engine(db_url)
+        AnalysisJob.__table__.create(self.engine, checkfirst=True)
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.notify = notify
+        self.event = event
+
+        self.executors = {
+            job_type: ThreadPoolExecutor(max_workers=max(1, count), thread_name_prefix=f'{job_type}-job')
+            for job_type, count in workers.items()
+        }
+        # (任务类型, 明星ID) -> 排队或执行中的任务ID，用于去重
+        self._active: Dict[Tuple[str, str], int] = {}
+        # 已开始执行的任务，以及执行期间再次提交、需要在结束后重跑的任务函数
+        self._running: Set[Tuple[str, str]] = set()
+        self._rerun: Dict[Tuple[str, str], Callable[[JobContext], Any]] = {}
+        self._lock = threading.Lock()
+
+        self._fail_interrupted_jobs()
+
+    def submit(self, job_type: str, celebrity_id: Any, func: Callable[[JobContext], Any]) -> Tuple[Dict[str, Any], bool]:
+        """提交任务
+
+        Args:
+            job_type: 任务类型，必须是构造时配置过的类型
+            celebrity_id: 明星ID
+            func: 任务函数，参数为 JobContext，返回字符串时作为完成说明，抛出异常时任务失败
+
+        Returns:
+            Tuple: (任务信息, 是否新建)；同一明星同类型的任务在排队时返回该任务和False；
+                任务正在执行时返回该任务（rerun_pending为True）和False，它结束后会用func再执行一次
+        """
+        executor = self.executors.get(job_type)
+        if executor is None:
+            raise ValueError(f"不支持的任务类型: {job_type}，可选: {', '.join(self.executors)}")
+
+        key = (job_type, str(celebrity_id))
+        with self._lock:
+            active_id = self._active.get(key)
+            if active_id is not None and key not in self._running:
+                return self.get_job(active_id), False
+            if active_id is not None:
+                # 执行中的任务可能已经读过数据，结束后用最近一次提交的函数再执行一次
+                self._rerun[key] = func
+                return dict(self.get_job(active_id), rerun_pending=True), False
+
+            session = self.Session()
+            try:
+                job = AnalysisJob(
+                    celebrity_id=str(celebrity_id),
+                    job_type=job_type,
+                    status='queued',
+                    progress=0.0,
+                    created_at=datetime.now()
+                )
+                session.add(job)
+                session.commit()
+                job_info = self._to_dict(job)
+            finally:
+                session.close()
+            self._active[key] = job_info['id']
+
+        self._notify(job_info)
+        try:
+            executor.submit(self._run, job_info['id'], key, func)
+        except RuntimeError as e:
+            # 线程池已关闭
+            self._finish(job_info['id'], key, 'failed', f"任务无法执行: {str(e)}")
+            raise
+        return job_info, True
+
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """获取单个任务信息"""
+        session = self.Session()
+        try:
+            job = session.get(AnalysisJob, job_id)
+            return self._to_dict(job) if job else None
+        finally:
+            session.close()
+
+    def list_jobs(self, celebrity_id: Any = None, status: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """按入队时间倒序列出任务"""
+        session = self.Session()
+        try:
+            query = session.query(AnalysisJob)
+            if celebrity_id is not None:
+                query = query.filter(AnalysisJob.celebrity_id == str(celebrity_id))
+            if status:
+                query = query.filter(AnalysisJob.status == status)
+            jobs = query.order_by(AnalysisJob.id.desc()).limit(limit).all()
+            return [self._to_dict(job) for job in jobs]
+        finally:
+            session.close()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭所有线程池"""
+        for executor in self.executors.values():
+            executor.shutdown(wait=wait)
+
+    def _run(self, job_id: int, key: Tuple[str, str], func: Callable[[JobContext], Any]) -> None:
+        """在线程池中执行任务并记录状态"""
+        job_type, celebrity_id = key
+        with self._lock:
+            self._running.add(key)
+        self._update(job_id, status='running', started_at=datetime.now())
+        try:
+            result = func(JobContext(self, job_id, job_type, celebrity_id))
+        except Exception as e:
+            self.logger.error(f"任务 {job_id}（{job_type}, 明星 {celebrity_id}）失败: {str(e)}")
+            self._finish(job_id, key, 'failed', str(e))
+        else:
+            self._finish(job_id, key, 'done', result if isinstance(result, str) else None)
+
+    def _finish(self, job_id: int, key: Tuple[str, str], status: str, message: Optional[str]) -> None:
+        """记录任务结束，并允许同一明星同类型的任务再次入队；执行期间有新的提交时再提交一次"""
+        fields = {'status': status, 'finished_at': datetime.now(), 'message': message}
+        if status == 'done':
+            fields['progress'] = 1.0
+        with self._lock:
+            self._active.pop(key, None)
+            self._running.discard(key)
+            rerun = self._rerun.pop(key, None)
+        self._update(job_id, **fields)
+        if rerun is not None:
+            try:
+                self.submit(key[0], key[1], rerun)
+            except RuntimeError as e:
+                self.logger.warning(f"任务 {job_id} 的重跑任务无法提交: {str(e)}")
+
+    def _update(self, job_id: int, **fields: Any) -> None:
+        """更新任务记录并推送最新状态"""
+        session = self.Session()
+        try:
+            job = session.get(AnalysisJob, job_id)
+            if job is None:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+            session.commit()
+            job_info = self._to_dict(job)
+        except Exception as e:
+            session.rollback()
+            self.logger.error(f"更新任务 {job_id} 状态失败: {str(e)}")
+            return
+        finally:
+            session.close()
+        self._notify(job_info)
+
+    def _notify(self, job_info: Dict[str, Any]) -> None:
+        """推送任务状态，推送失败不影响任务执行"""
+        if self.notify is None:
+            return
+        try:
+            self.notify(self.event, job_info)
+        except Exception as e:
+            self.logger.warning(f"推送任务 {job_info['id']} 状态失败: {str(e)}")
+
+    def _fail_interrupted_jobs(self) -> None:
+        """服务重启前未完成的任务不会再执行，标记为失败"""
+        session = self.Session()
+        try:
+            count = session.query(AnalysisJob).filter(
+                AnalysisJob.status.in_(ACTIVE_STATUSES)
+            ).update({
+                AnalysisJob.status: 'failed',
+                AnalysisJob.message: '服务重启，任务中断',
+                AnalysisJob.finished_at: datetime.now()
+            }, synchronize_session=False)
+            session.commit()
+            if count:
+                self.logger.warning(f"{count} 个未完成的任务因服务重启标记为失败")
+        finally:
+            session.close()
+
+    @staticmethod
+    def _to_dict(job: AnalysisJob) -> Dict[str, Any]:
+        """任务记录转为可JSON序列化的字典，附带排队和执行耗时"""
+        def seconds(start: Optional[datetime], end: Optional[datetime]) -> Optional[float]:
+            return round((end - start).total_seconds(), 3) if start and end else None
+
+        return {
+            'id': job.id,
+            'celebrity_id': job.celebrity_id,
+            'job_type': job.job_type,
+            'status': job.status,
+            'stage': job.stage,
+            'progress': job.progress or 0.0,
+            'message': job.message,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+            'wait_seconds': seconds(job.created_at, job.started_at),
+            'run_seconds': seconds(job.started_at, job.finished_at)
+        }
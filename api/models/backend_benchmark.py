@@ -0,0 +1,216 @@
+"""
+推理后端对比测试
+
+在固定的带标注评论样本上依次运行各推理后端（torch / quantized / onnx），
+比较吞吐量与输出精度，并在精度容差内给出最快的后端。
+
+精度指标：
+- 与fp32 torch输出的最大绝对误差、平均余弦相似度
+- 与fp32预测一致率和样本标注准确率。模型带分类头（输出logits）时直接取argmax；
+  默认的bert-base-chinese没有分类头，此时在fp32句向量上按留一法求各类中心，
+  用最近中心作为线性探针，对各后端的句向量做同样的分类
+
+用法:
+    python -m api.models.backend_benchmark --rounds 5 --tolerance 0.01
+"""
+import argparse
+import logging
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import torch
+
+from .model_manager import INFERENCE_BACKENDS, ModelManager
+
+# 固定的标注样本，标签与SentimentAnalyzer一致：0负面 1中性 2正面
+LABELED_SAMPLE: List[Tuple[str, int]] = [
+    ("这个演技太差了，完全看不下去", 0),
+    ("又在炒作，真的很烦", 0),
+    ("脱粉了，太让人失望", 0),
+    ("这种人怎么还能上节目", 0),
+    ("唱得什么东西，难听死了", 0),
+    ("别再营销了，路人都看累了", 0),
+    ("态度太差，以后不会再支持", 0),
+    ("剧情拖沓，浪费时间", 0),
+    ("今天晚上八点播出", 1),
+    ("请问这是在哪里拍的", 1),
+    ("新剧下个月上线", 1),
+    ("转发给朋友看看", 1),
+    ("有人知道这首歌叫什么吗", 1),
+    ("明天有活动吗", 1),
+    ("这是第几期节目", 1),
+    ("同款衣服在哪买的", 1),
+    ("太好看了，期待下一部作品", 2),
+    ("永远支持你，加油", 2),
+    ("这个造型绝了，好喜欢", 2),
+    ("演技越来越好了，真棒", 2),
+    ("声音好温柔，听一遍就爱上了", 2),
+    ("哥哥辛苦了，注意身体", 2),
+    ("这部剧是今年最好看的", 2),
+    ("笑死我了，太可爱了", 2),
+]
+
+
+def _raw_output(outputs: Any) -> np.ndarray:
+    """取模型的比较输出：有分类头时取logits，否则取pooler输出（没有时取CLS向量）"""
+    logits = getattr(outputs, 'logits', None)
+    if logits is not None:
+        return logits.float().cpu().numpy()
+    pooled = getattr(outputs, 'pooler_output', None)
+    if pooled is None:
+        pooled = outputs.last_hidden_state[:, 0]
+    return pooled.float().cpu().numpy()
+
+
+def run_backend(backend: str, model_dir: str, texts: List[str], batch_size: int, rounds: int) -> Dict[str, Any]:
+    """在样本上运行单个后端
+
+    Args:
+        backend: 推理后端
+        model_dir: 模型目录
+        texts: 样本文本
+        batch_size: 批大小
+        rounds: 计时轮数
+
+    Returns:
+        Dict: 输出矩阵、加载耗时与吞吐量
+    """
+    manager = ModelManager(model_dir, backend=backend)
+    start = time.perf_counter()
+    tokenizer, model = manager.get_bert_model()
+    load_seconds = time.perf_counter() - start
+
+    batches = [
+        tokenizer(texts[i:i + batch_size], padding=True, truncation=True, max_length=128, return_tensors='pt')
+        for i in range(0, len(texts), batch_size)
+    ]
+    device = getattr(model, 'device', torch.device('cpu'))
+
+    def infer() -> np.ndarray:
+        with torch.no_grad():
+            return np.concatenate([_raw_output(model(**batch.to(device))) for batch in batches])
+
+    outputs = infer()  # 预热，同时作为精度比较的输出
+    start = time.perf_counter()
+    for _ in range(rounds):
+        infer()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'outputs': outputs,
+        'load_seconds': load_seconds,
+        'throughput': len(texts) * rounds / elapsed if elapsed else float('inf')
+    }
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+def probe_predictions(reference: np.ndarray, outputs: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """用fp32句向量上的最近类中心探针对输出分类
+
+    第i条样本的类中心由除它之外的fp32向量求得（留一法），
+    避免探针在自己的训练样本上打分
+
+    Args:
+        reference: fp32后端的句向量
+        outputs: 待分类的句向量（同一批样本）
+        labels: 样本标注
+
+    Returns:
+        np.ndarray: 每条样本的预测类别
+    """
+    reference = _normalize(reference)
+    outputs = _normalize(outputs)
+    classes = np.unique(labels)
+    one_hot = (labels[:, None] == classes[None, :]).astype(reference.dtype)
+    sums = one_hot.T @ reference
+    counts = one_hot.sum(axis=0)
+
+    predictions = np.empty(len(outputs), dtype=labels.dtype)
+    for i in range(len(outputs)):
+        loo_counts = counts - one_hot[i]
+        loo_sums = sums - one_hot[i][:, None] * reference[i]
+        centroids = _normalize(loo_sums / np.maximum(loo_counts, 1)[:, None])
+        scores = centroids @ outputs[i]
+        scores[loo_counts == 0] = -np.inf
+        predictions[i] = classes[scores.argmax()]
+    return predictions
+
+
+def compare(reference: np.ndarray, outputs: np.ndarray, labels: np.ndarray) -> Dict[str, Any]:
+    """计算与fp32参考输出的误差、预测一致率及标注准确率"""
+    cosine = np.sum(reference * outputs, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(outputs, axis=1) + 1e-12
+    )
+    # 输出维度与类别数一致时视为分类头logits，否则视为句向量，用探针分类
+    if outputs.shape[1] == 3:
+        method = 'head'
+        predictions = outputs.argmax(axis=1)
+        reference_predictions = reference.argmax(axis=1)
+    else:
+        method = 'probe'
+        predictions = probe_predictions(reference, outputs, labels)
+        reference_predictions = probe_predictions(reference, reference, labels)
+    return {
+        'max_abs_diff': float(np.max(np.abs(reference - outputs))),
+        'mean_cosine': float(np.mean(cosine)),
+        'method': method,
+        'agreement': float(np.mean(predictions == reference_predictions)),
+        'accuracy': float(np.mean(predictions == labels))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='推理后端精度与吞吐量对比')
+    parser.add_argument('--model-dir', default='models/weights', help='模型目录')
+    parser.add_argument('--backends', nargs='+', default=list(INFERENCE_BACKENDS), choices=INFERENCE_BACKENDS)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=5, help='计时轮数')
+    parser.add_argument('--tolerance', type=float, default=0.01, help='允许的精度损失')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    texts = [text for text, _ in LABELED_SAMPLE]
+    labels = np.array([label for _, label in LABELED_SAMPLE])
+
+    results = {}
+    for backend in ['torch'] + [b for b in args.backends if b != 'torch']:
+        try:
+            results[backend] = run_backend(backend, args.model_dir, texts, args.batch_size, args.rounds)
+        except Exception as e:
+            print(f"{backend}: 运行失败 - {str(e)}")
+
+    if 'torch' not in results:
+        print("fp32基准后端运行失败，无法比较")
+        return
+
+    reference = results['torch']['outputs']
+    baseline = compare(reference, reference, labels)
+    print(f"样本数: {len(texts)}, 批大小: {args.batch_size}, 计时轮数: {args.rounds}")
+    if baseline['method'] == 'probe':
+        print("模型没有分类头：一致率/准确率来自fp32句向量上的留一法最近类中心探针，"
+              "反映的是句向量的可分性，不是情感分类器本身的准确率")
+    print()
+    print(f"{'后端':<10}{'加载(秒)':>10}{'条/秒':>10}{'最大误差':>12}{'余弦':>10}{'一致率':>10}{'准确率':>10}")
+
+    candidates = []
+    for backend, result in results.items():
+        metrics = compare(reference, result['outputs'], labels)
+        print(f"{backend:<10}{result['load_seconds']:>10.2f}{result['throughput']:>10.1f}"
+              f"{metrics['max_abs_diff']:>12.4f}{metrics['mean_cosine']:>10.4f}"
+              f"{metrics['agreement']:>10.3f}{metrics['accuracy']:>10.3f}")
+
+        within = (metrics['agreement'] >= 1 - args.tolerance
+                  and baseline['accuracy'] - metrics['accuracy'] <= args.tolerance)
+        if within:
+            candidates.append((result['throughput'], backend))
+
+    best = max(candidates)[1]
+    print(f"\n精度容差 {args.tolerance} 内最快的后端: {best}（设置 SENTIMENT_BACKEND={best}）")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,237 @@
 import os
+import hashlib
 import logging
+import threading
+import time
 import torch
 from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
 from transformers import BertTokenizer, BertModel
+from transformers.modeling_outputs import BaseModelOutputWithPooling, SequenceClassifierOutput
 from huggingface_hub import snapshot_download
 import shutil
 
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+# 可选的推理后端：torch为原始fp32模型，quantized为CPU动态int8量化，onnx为ONNX Runtime
+INFERENCE_BACKENDS = ('torch', 'quantized', 'onnx')
+
+
+def _current_rss() -> Optional[int]:
+    """获取当前进程常驻内存字节数，无法获取时返回None"""
+    if psutil is not None:
+        return psutil.Process(os.getpid()).memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ModelRegistry:
+    """进程内模型注册表
+    
+    每个模型（按名称区分）在进程内只加载一次，所有分析器和清洗器共享同一份
+    权重与分词器；加载推迟到第一次使用时进行，并记录每个模型的加载耗时和内存占用。
+    加载失败的模型会记住失败原因和时间，retry_after 秒内的访问直接报错，不会反复重试下载，
+    超过这段时间后的访问重新执行加载函数；unload 会立即清除失败记录
+    """
+    
+    def __init__(self, retry_after: float = 300):
+        self.logger = logging.getLogger(__name__)
+        self.retry_after = retry_after
+        self._models: Dict[str, Any] = {}
+        self._info: Dict[str, Dict[str, Any]] = {}
+        self._failures: Dict[str, Tuple[Exception, float]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        
+    def get(self, name: str, loader: Callable[[], Any]) -> Any:
+        """获取模型，首次调用时执行加载函数
+        
+        Args:
+            name: 模型名称
+            loader: 加载函数，返回需要共享的对象（如 (tokenizer, model)）
+            
+        Returns:
+            加载函数的返回值，同名模型在进程内复用
+            
+        Raises:
+            Exception: 加载函数抛出的异常
+            RuntimeError: 同名模型在 retry_after 秒内加载失败过，异常链指向上次失败的原因
+        """
+        if name in self._models:
+            return self._models[name]
+        self._check_failure(name)
+            
+        # 每个模型单独加锁，并发首次访问时只加载一次
+        with self._lock_for(name):
+            if name in self._models:
+                return self._models[name]
+            self._check_failure(name)
+                
+            rss_before = _current_rss()
+            start = time.perf_counter()
+            try:
+                obj = loader()
+            except Exception as e:
+                self._failures[name] = (e, time.monotonic())
+                self.logger.error(f"模型 {name} 加载失败，{self.retry_after} 秒内不再重试: {str(e)}")
+                raise
+            self._failures.pop(name, None)
+            load_seconds = time.perf_counter() - start
+            rss_after = _current_rss()
+            
+            self._models[name] = obj
+            self._info[name] = {
+                'load_seconds': round(load_seconds, 3),
+                'rss_delta': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+                'parameter_bytes': self._parameter_bytes(obj),
+                'loaded_at': time.time()
+            }
+            self.logger.info(f"模型 {name} 已加载，用时 {load_seconds:.2f} 秒")
+            return obj
+            
+    def _check_failure(self, name: str) -> None:
+        """模型在重试间隔内加载失败过时抛出新异常，超过间隔则允许重新加载"""
+        failure = self._failures.get(name)
+        if failure is None:
+            return
+        error, failed_at = failure
+        if time.monotonic() - failed_at >= self.retry_after:
+            return
+        # 每次抛出新的异常对象，避免同一个异常的traceback在多次抛出中不断累积
+        raise RuntimeError(f"模型 {name} 加载失败，{self.retry_after} 秒后重试: {error}") from error
+            
+    def _lock_for(self, name: str) -> threading.Lock:
+        """获取模型对应的锁"""
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+            
+    def is_loaded(self, name: str) -> bool:
+        """判断模型是否已加载"""
+        return name in self._models
+        
+    def unload(self, name: str) -> None:
+        """卸载模型，释放引用，同时清除加载失败记录以便重新加载"""
+        # 与加载使用同一把锁，避免卸载与正在进行的加载交错
+        with self._lock_for(name):
+            with self._lock:
+                self._models.pop(name, None)
+                self._info.pop(name, None)
+                self._failures.pop(name, None)
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+            
+    @staticmethod
+    def _parameter_bytes(obj: Any) -> int:
+        """统计对象中所有torch模块的参数与缓冲区字节数"""
+        items = obj if isinstance(obj, (tuple, list)) else (obj,)
+        total = 0
+        for item in items:
+            if isinstance(item, torch.nn.Module):
+                for tensor in list(item.parameters()) + list(item.buffers()):
+                    total += tensor.numel() * tensor.element_size()
+        return total
+        
+    def memory_report(self) -> Dict[str, Any]:
+        """获取各模型的内存占用报告
+        
+        Returns:
+            Dict: 每个模型的参数字节数、加载前后RSS差值和加载耗时，以及当前进程RSS
+        """
+        with self._lock:
+            models = {name: dict(info) for name, info in self._info.items()}
+        return {
+            'process_rss': _current_rss(),
+            'models': models
+        }
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """获取进程内唯一的模型注册表"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+class OnnxBertModel:
+    """ONNX Runtime推理封装
+    
+    调用方式与输出结构与transformers模型保持一致（model(**inputs)），
+    分析器和清洗器无需区分后端
+    """
+    
+    def __init__(self, onnx_path: str, num_threads: Optional[int] = None):
+        """加载ONNX模型
+        
+        Args:
+            onnx_path: ONNX模型文件路径
+            num_threads: 算子内并行线程数，为None时由ONNX Runtime决定
+        """
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = [item.name for item in self.session.get_inputs()]
+        self.output_names = [item.name for item in self.session.get_outputs()]
+        self.device = torch.device('cpu')
+        
+    def __call__(self, **inputs):
+        feeds = {
+            name: inputs[name].cpu().numpy().astype('int64')
+            for name in self.input_names if name in inputs
+        }
+        outputs = dict(zip(self.output_names, self.session.run(self.output_names, feeds)))
+        if 'logits' in outputs:
+            return SequenceClassifierOutput(logits=torch.from_numpy(outputs['logits']))
+        return BaseModelOutputWithPooling(
+            last_hidden_state=torch.from_numpy(outputs['last_hidden_state']),
+            pooler_output=torch.from_numpy(outputs['pooler_output']) if 'pooler_output' in outputs else None
+        )
+        
+    def to(self, device):
+        return self
+        
+    def eval(self):
+        return self
+
 
 class ModelManager:
     """模型管理器，用于处理模型的本地化下载和管理"""
     
-    def __init__(self, model_dir: str = "models/weights"):
+    def __init__(self, model_dir: str = "models/weights", backend: Optional[str] = None):
+        """初始化模型管理器
+        
+        Args:
+            model_dir: 模型存放目录
+            backend: 推理后端（torch/quantized/onnx），为None时读取环境变量SENTIMENT_BACKEND，默认torch
+        """
         self.logger = logging.getLogger(__name__)
         self.model_dir = Path(model_dir)
         self.bert_model_name = "bert-base-chinese"
         self.bert_dir = self.model_dir / self.bert_model_name.replace('\\', '/')
         
+        self.backend = (backend or os.getenv('SENTIMENT_BACKEND', 'torch')).lower()
+        if self.backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"不支持的推理后端: {self.backend}，可选: {', '.join(INFERENCE_BACKENDS)}")
+        
         # 确保模型目录存在
         self.model_dir.mkdir(parents=True, exist_ok=True)
         
@@ -23,11 +239,16 @@ class ModelManager:
         """检查模型是否已下载"""
         required_files = [
             "config.json",
-            "pytorch_model.bin",
             "vocab.txt"
         ]
+        # 新版transformers默认保存为safetensors格式
+        weight_files = [
+            "pytorch_model.bin",
+            "model.safetensors"
+        ]
         
-        return all((self.bert_dir / file).exists() for file in required_files)
+        return (all((self.bert_dir / file).exists() for file in required_files)
+                and any((self.bert_dir / file).exists() for file in weight_files))
         
     def _download_model(self) -> bool:
         """下载模型到本地"""
@@ -57,12 +278,100 @@ class ModelManager:
         except Exception as e:
             self.logger.warning(f"清理临时文件失败: {str(e)}")
             
+    @property
+    def registry_key(self) -> str:
+        """模型在注册表中的名称"""
+        return f"bert:{self.bert_dir.resolve()}:{self.backend}"
+        
     def get_bert_model(self) -> tuple[BertTokenizer, BertModel]:
         """获取BERT模型和分词器
         
+        模型通过进程内注册表共享，同一路径、同一后端的模型只会加载一次
+        
         Returns:
             tuple: (tokenizer, model)
         """
+        return get_model_registry().get(self.registry_key, self._load_backend)
+        
+    def _load_backend(self) -> tuple:
+        """按配置的后端加载模型"""
+        if self.backend == 'torch':
+            return self._load_bert_model()
+        if self.backend == 'quantized':
+            return self._load_quantized_model()
+        return self._load_onnx_model()
+        
+    def _load_quantized_model(self) -> tuple:
+        """加载动态int8量化模型（仅CPU）
+        
+        Linear层权重量化为int8，激活值在推理时动态量化，
+        无需校准数据，模型体积和CPU推理耗时都明显下降
+        """
+        tokenizer, model = self._load_bert_model()
+        if model.device.type != 'cpu':
+            self.logger.warning("动态量化仅支持CPU，模型将移回CPU")
+            model.to('cpu')
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.eval()
+        self.logger.info("BERT模型已完成动态int8量化")
+        return tokenizer, model
+        
+    def _load_onnx_model(self) -> tuple:
+        """加载ONNX Runtime模型，本地没有导出文件时先导出"""
+        if onnxruntime is None:
+            raise RuntimeError("未安装onnxruntime，无法使用onnx后端")
+            
+        onnx_path = self.bert_dir / "onnx" / "model.onnx"
+        if not onnx_path.exists():
+            tokenizer, model = self._load_bert_model()
+            self.export_onnx(tokenizer, model, onnx_path)
+        else:
+            tokenizer = BertTokenizer.from_pretrained(str(self.bert_dir), local_files_only=True)
+            
+        model = OnnxBertModel(str(onnx_path))
+        self.logger.info(f"ONNX模型加载成功: {onnx_path}")
+        return tokenizer, model
+        
+    def export_onnx(self, tokenizer: BertTokenizer, model: BertModel, onnx_path: Path) -> Path:
+        """把PyTorch模型导出为ONNX，批大小和序列长度均为动态维度
+        
+        Args:
+            tokenizer: 分词器
+            model: PyTorch模型
+            onnx_path: 导出文件路径
+            
+        Returns:
+            Path: 导出文件路径
+        """
+        onnx_path.parent.mkdir(parents=True, exist_ok=True)
+        model = model.to('cpu').eval()
+        sample = tokenizer(["导出示例文本", "样例"], padding=True, return_tensors="pt")
+        input_names = ['input_ids', 'attention_mask', 'token_type_ids']
+        
+        with torch.no_grad():
+            outputs = model(**{name: sample[name] for name in input_names})
+        output_names = ['logits'] if getattr(outputs, 'logits', None) is not None else ['last_hidden_state', 'pooler_output']
+        
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+        dynamic_axes.update({name: {0: 'batch'} for name in output_names})
+        export_kwargs = dict(
+            input_names=input_names,
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+        args = tuple(sample[name] for name in input_names)
+        self.logger.info(f"开始导出ONNX模型: {onnx_path}")
+        try:
+            torch.onnx.export(model, args, str(onnx_path), dynamo=False, **export_kwargs)
+        except TypeError:
+            # 旧版本torch没有dynamo参数
+            torch.onnx.export(model, args, str(onnx_path), **export_kwargs)
+        self.logger.info("ONNX模型导出完成")
+        return onnx_path
+        
+    def _load_bert_model(self) -> tuple[BertTokenizer, BertModel]:
+        """从本地加载BERT模型和分词器，不存在时先下载"""
         # 检查模型是否存在
         if not self._check_model_exists():
             # 下载模型
@@ -98,13 +407,36 @@ class ModelManager:
             self.logger.error(f"模型加载失败: {str(e)}")
             raise
             
+    def get_model_version(self) -> str:
+        """获取模型版本标识
+        
+        由模型名称和权重/配置文件的大小、修改时间组成，
+        本地模型文件被替换后版本随之变化，供结果缓存判断是否失效
+        
+        Returns:
+            str: 模型版本标识
+        """
+        parts = [self.bert_model_name]
+        for file in ("config.json", "pytorch_model.bin", "model.safetensors"):
+            path = self.bert_dir / file
+            if path.exists():
+                stat = path.stat()
+                parts.append(f"{file}:{stat.st_size}:{int(stat.st_mtime)}")
+        # 非默认后端的输出与fp32略有差异，缓存按后端区分
+        if self.backend != 'torch':
+            parts.append(f"backend:{self.backend}")
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+        
     def get_model_info(self) -> dict:
         """获取模型信息"""
         info = {
             "model_name": self.bert_model_name,
             "model_dir": str(self.bert_dir),
             "is_downloaded": self._check_model_exists(),
-            "device": "cuda" if torch.cuda.is_available() else "cpu"
+            "model_version": self.get_model_version(),
+            "backend": self.backend,
+            "device": "cuda" if torch.cuda.is_available() else "cpu",
+            "is_loaded": get_model_registry().is_loaded(self.registry_key)
         }
         
         if self._check_model_exists():
@@ -146,6 +478,14 @@ if __name__ == "__main__":
             outputs = model(**inputs)
         print("模型推理成功")
         
+        # 再次获取应直接复用已加载的模型
+        tokenizer2, model2 = ModelManager().get_bert_model()
+        print(f"重复获取复用同一模型: {model2 is model}")
+        
+        print("\n=== 模型内存占用 ===")
+        for name, stats in get_model_registry().memory_report()['models'].items():
+            print(f"{name}: {stats}")
+        
     except Exception as e:
         print(f"模型加载失败: {str(e)}") 
  
@@ -1,9 +1,10 @@
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from typing import Dict, List, Any, Optional
 import logging
+from ..database.db_utils import get_engine
 
 class ReportDataCollector:
     def __init__(self, db_url: str):
@@ -13,7 +14,7 @@ class ReportDataCollector:
         Args:
             db_url: 数据库连接URL
         """
-        self.engine = create_engine(db_url)
+        self.engine = get_engine(db_url)
         self.logger = logging.getLogger(__name__)
         
     def collect_heat_data(self, start_time: datetime, end_time: datetime) -> Dict[str, Any]:
@@ -2,14 +2,13 @@ from flask import Flask, send_from_directory, render_template, jsonify, request,
 import os
 import json
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, text
+from sqlalchemy import text, func
 from sqlalchemy.orm import sessionmaker, scoped_session
 import sys
 import os
 import asyncio
 import traceback
 import threading
-from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from dotenv import load_dotenv
 from flask_socketio import SocketIO, emit
@@ -19,13 +18,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
 
 from api.database.models import *
+from api.database.db_utils import get_engine, get_engine_registry
+from api.jobs import JobQueue
 from werkzeug.security import generate_password_hash
-from api.datacrawl.datacrawl.spider_runner import WeiboSpiderRunner
-from api.analysis.sentiment.sentiment_analyzer import SentimentAnalyzer
-from api.analysis.sentiment.sentiment_analyzer import PostSentimentAnalyzer
-from api.analysis.sentiment.black_fan_analyzer import BlackFanAnalyzer
-from api.analysis.heat.heat_analyzer import HeatAnalyzer
-from api.analysis.fan_analysis import FanAnalyzer
+# 分析器和爬虫依赖torch、transformers、scrapy等较重的库，按需导入
+import api.analysis
 
 app = Flask(__name__, 
     static_folder='.',
@@ -52,11 +49,8 @@ DATABASE_URL = f"sqlite:///{DB_PATH}"
 # 数据库配置
 def init_db():
     try:
-        # 创建数据库引擎
-        engine = create_engine(
-            DATABASE_URL,
-            connect_args={'check_same_thread': False}  # 允许多线程访问
-        )
+        # 使用进程内共享的引擎，与分析器共用同一个连接池
+        engine = get_engine(DATABASE_URL)
         
         # 创建所有表
         Base.metadata.create_all(engine)
@@ -95,34 +89,54 @@ def teardown_request(exception):
 stars_data = []
 next_id = 1
 
-# 全局变量
-analyzers = {}
-
-# 创建线程池
-thread_pool = ThreadPoolExecutor(max_workers=4)
+# 爬取和数据分析任务在有界线程池中执行，状态写入analysis_jobs表并通过job_update事件推送；
+# 同一明星的同类任务在排队或执行中时不会重复提交
+job_queue = JobQueue(
+    DATABASE_URL,
+    workers={
+        'crawl': int(os.getenv('CRAWL_WORKERS', '1')),
+        'analysis': int(os.getenv('ANALYSIS_WORKERS', '2'))
+    },
+    notify=socketio.emit
+)
 
-# 初始化分析器实例
-def init_analyzers():
+# 分析器按需创建：第一次使用时才导入对应模块并实例化，
+# 登录等不涉及分析的接口不再等待模型加载
+ANALYZER_CLASSES = {
+    'sentiment': 'SentimentAnalyzer',
+    'post_sentiment': 'PostSentimentAnalyzer',
+    'black_fan': 'BlackFanAnalyzer',
+    'heat': 'HeatAnalyzer',
+    'fan': 'FanAnalyzer'
+}
+analyzers = {}
+analyzers_lock = threading.Lock()
+
+def get_analyzer(name):
+    """获取分析器实例，首次调用时创建"""
+    analyzer = analyzers.get(name)
+    if analyzer is None:
+        with analyzers_lock:
+            analyzer = analyzers.get(name)
+            if analyzer is None:
+                analyzer_class = getattr(api.analysis, ANALYZER_CLASSES[name])
+                analyzer = analyzer_class(DATABASE_URL)
+                analyzers[name] = analyzer
+    return analyzer
+
+def warm_up_analyzers():
+    """后台预热：提前创建所有分析器并加载BERT模型"""
     try:
-        sentiment_analyzer = SentimentAnalyzer(DATABASE_URL)
-        post_sentiment_analyzer = PostSentimentAnalyzer(DATABASE_URL)
-        black_fan_analyzer = BlackFanAnalyzer(DATABASE_URL)
-        heat_analyzer = HeatAnalyzer(DATABASE_URL)
-        fan_analyzer = FanAnalyzer(DATABASE_URL)
-        
-        print("分析器初始化成功")
-        return {
-            'sentiment': sentiment_analyzer,
-            'post_sentiment': post_sentiment_analyzer,
-            'black_fan': black_fan_analyzer,
-            'heat': heat_analyzer,
-            'fan': fan_analyzer
-        }
+        for name in ANALYZER_CLASSES:
+            get_analyzer(name)
+        get_analyzer('sentiment').model
+        print("分析器预热完成")
     except Exception as e:
-        print(f"分析器初始化失败: {str(e)}")
-        raise
+        print(f"分析器预热失败: {str(e)}")
 
-analyzers = init_analyzers()
+# 设置 ANALYZER_WARMUP=1 时在后台线程中预热，不阻塞服务启动
+if os.getenv('ANALYZER_WARMUP', '0') == '1':
+    threading.Thread(target=warm_up_analyzers, daemon=True).start()
 
 @app.route('/')
 def index():
@@ -280,36 +294,40 @@ def get_all_stars():
         print(f"获取明星列表失败: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-def on_spider_complete(celebrity_info):
-    """爬虫完成回调"""
+def run_analysis(celebrity_id, job):
+    """数据分析任务：依次运行情感、粉丝、黑粉和热度分析，在分析任务线程池中执行"""
     try:
         # 1. 运行情感分析
-        sentiment_analyzer = SentimentAnalyzer(DB_PATH)
-        sentiment_result = sentiment_analyzer.analyze_black_fan(celebrity_info['weibo_id'])
+        job.progress('情感分析', 0.0)
+        sentiment_analyzer = get_analyzer('sentiment')
+        sentiment_result = sentiment_analyzer.analyze_black_fan(celebrity_id)
         if not sentiment_result:
             raise Exception("情感分析失败")
             
         # 2. 运行粉丝分析
-        fan_analyzer = FanAnalyzer(DB_PATH)
-        fan_result = fan_analyzer.analyze_fans(celebrity_info['weibo_id'])
+        job.progress('粉丝分析', 0.25)
+        fan_analyzer = get_analyzer('fan')
+        fan_result = fan_analyzer.analyze_fans(celebrity_id)
         if not fan_result:
             raise Exception("粉丝分析失败")
             
         # 3. 运行黑粉分析
-        black_fan_analyzer = BlackFanAnalyzer(DB_PATH)
-        black_fan_result = black_fan_analyzer.analyze_black_fans(celebrity_info['weibo_id'])
+        job.progress('黑粉分析', 0.5)
+        black_fan_analyzer = get_analyzer('black_fan')
+        black_fan_result = black_fan_analyzer.analyze_black_fans(celebrity_id)
         if not black_fan_result:
             raise Exception("黑粉分析失败")
             
         # 4. 运行热度分析
-        heat_analyzer = HeatAnalyzer(DB_PATH)
-        heat_result = heat_analyzer.update_heat_data(celebrity_info['weibo_id'])
+        job.progress('热度分析', 0.75)
+        heat_analyzer = get_analyzer('heat')
+        heat_result = heat_analyzer.update_heat_data(celebrity_id)
         if not heat_result:
             raise Exception("热度分析失败")
             
         # 5. 通知前端更新
         socketio.emit('analysis_complete', {
-            'celebrity_id': celebrity_info['weibo_id'],
+            'celebrity_id': celebrity_id,
             'status': 'success',
             'message': '数据分析完成',
             'data': {
@@ -319,14 +337,24 @@ def on_spider_complete(celebrity_info):
                 'heat': heat_result
             }
         })
+        return '数据分析完成'
         
     except Exception as e:
         print(f"数据分析失败: {str(e)}")
         socketio.emit('analysis_complete', {
-            'celebrity_id': celebrity_info['weibo_id'],
+            'celebrity_id': celebrity_id,
             'status': 'error',
             'message': str(e)
         })
+        raise
+
+def submit_analysis(celebrity_id):
+    """提交数据分析任务，同一明星已有排队的分析时返回该任务，分析正在执行时在它结束后再分析一次"""
+    return job_queue.submit('analysis', celebrity_id, partial(run_analysis, celebrity_id))
+
+def on_spider_complete(celebrity_info):
+    """爬虫完成回调：数据分析交给分析任务线程池，爬虫线程立即返回"""
+    submit_analysis(celebrity_info['weibo_id'])
 
 @app.route('/api/stars', methods=['POST'])
 def add_star():
@@ -395,6 +423,7 @@ def add_star():
             g.db.commit()
             
             # 初始化爬虫
+            from api.datacrawl.datacrawl.spider_runner import WeiboSpiderRunner
             spider_runner = WeiboSpiderRunner({
                 'database': DB_PATH
             })
@@ -425,47 +454,42 @@ def add_star():
                 'sentiment_score': 0
             })
             
-            # 立即返回响应
-            response = jsonify({
-                'status': 'success',
-                'message': '明星添加成功，开始爬取数据',
-                'star_id': celebrity.weibo_id
-            })
-            
-            # 在返回响应后启动爬虫
-            def start_spider():
+            # 爬虫任务：在爬取线程池中执行，完成后由回调提交数据分析任务
+            def start_spider(job):
+                job.progress('爬取数据', 0.0)
                 try:
                     result = spider_runner.run_spider(
                         celebrity_info={
                             'name': star_name,
                             'url': star_url,
-                            'weibo_id': celebrity.weibo_id
+                            'weibo_id': weibo_id
                         },
                         start_date=start_date.strftime('%Y-%m-%d'),
                         end_date=end_date.strftime('%Y-%m-%d')
                     )
-                    
-                    if result and result.get('status') == 'error':
-                        print(f"爬虫运行失败: {result.get('message')}")
-                        socketio.emit('analysis_complete', {
-                            'celebrity_id': celebrity.weibo_id,
-                            'status': 'error',
-                            'message': result.get('message')
-                        })
                 except Exception as e:
                     print(f"爬虫运行异常: {str(e)}")
+                    result = {'status': 'error', 'message': str(e)}
+                    
+                if result and result.get('status') == 'error':
+                    print(f"爬虫运行失败: {result.get('message')}")
                     socketio.emit('analysis_complete', {
-                        'celebrity_id': celebrity.weibo_id,
+                        'celebrity_id': weibo_id,
                         'status': 'error',
-                        'message': str(e)
+                        'message': result.get('message')
                     })
+                    raise Exception(result.get('message'))
+                return '爬虫运行完成'
             
-            # 使用线程启动爬虫
-            thread = threading.Thread(target=start_spider)
-            thread.daemon = True
-            thread.start()
+            job, _ = job_queue.submit('crawl', weibo_id, start_spider)
             
-            return response
+            # 立即返回响应
+            return jsonify({
+                'status': 'success',
+                'message': '明星添加成功，开始爬取数据',
+                'star_id': weibo_id,
+                'job_id': job['id']
+            })
             
         except Exception as e:
             g.db.rollback()
@@ -509,8 +533,9 @@ def delete_star(star_id):
             # 2.6 删除微博数据
             g.db.query(Post).filter(Post.post_id.in_(post_ids)).delete(synchronize_session=False)
         
-        # 2.7 删除热度数据
+        # 2.7 删除热度数据和每日统计数据
         g.db.query(HeatData).filter(HeatData.celebrity_id == star.weibo_id).delete(synchronize_session=False)
+        g.db.query(DailyStats).filter(DailyStats.celebrity_id == star.weibo_id).delete(synchronize_session=False)
         
         # 2.8 删除黑粉分析数据
         g.db.query(BlackFanAnalysis).filter(BlackFanAnalysis.celebrity_id == star.weibo_id).delete(synchronize_session=False)
@@ -602,34 +627,26 @@ def get_star_basic(star_id):
 @app.route('/api/stars/<star_id>/sentiment')
 def get_star_sentiment(star_id):
     try:
-        # 获取最近30天的情感分析数据
-        sentiment_data = Session.query(SentimentForPost).join(Post).filter(
-            Post.celebrity_id == star_id,
-            Post.created_at >= datetime.now() - timedelta(days=30),
-            Post.is_deleted == 0
-        ).all()
+        # 从每日统计汇总表读取最近30天的情感分布和趋势
+        daily_stats = Session.query(DailyStats).filter(
+            DailyStats.celebrity_id == star_id,
+            DailyStats.date >= datetime.now().date() - timedelta(days=30)
+        ).order_by(DailyStats.date).all()
         
         # 统计情感分布
-        positive_count = sum(1 for s in sentiment_data if s.sentiment_category == 'positive')
-        neutral_count = sum(1 for s in sentiment_data if s.sentiment_category == 'neutral')
-        negative_count = sum(1 for s in sentiment_data if s.sentiment_category == 'negative')
+        positive_count = sum(d.positive_count or 0 for d in daily_stats)
+        neutral_count = sum(d.neutral_count or 0 for d in daily_stats)
+        negative_count = sum(d.negative_count or 0 for d in daily_stats)
         
         # 获取情感趋势
-        trend_data = Session.query(
-            func.date(Post.created_at).label('date'),
-            func.avg(Post.sentiment_score).label('score')
-        ).filter(
-            Post.celebrity_id == star_id,
-            Post.created_at >= datetime.now() - timedelta(days=30),
-            Post.is_deleted == 0
-        ).group_by(func.date(Post.created_at)).all()
+        trend_data = [d for d in daily_stats if d.sentiment_count]
         
         return jsonify({
             'positive_count': positive_count,
             'neutral_count': neutral_count,
             'negative_count': negative_count,
             'trend_dates': [str(d.date) for d in trend_data],
-            'trend_scores': [float(d.score) for d in trend_data]
+            'trend_scores': [float(d.sentiment_sum) / d.sentiment_count for d in trend_data]
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -670,6 +687,20 @@ def get_star_hater(star_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# 分页获取明星黑粉排行，cursor为上一页返回的next_cursor
+@app.route('/api/stars/<star_id>/black_fans')
+def get_star_black_fans(star_id):
+    try:
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        page = get_analyzer('black_fan').get_top_black_fans(
+            star_id, limit=limit, cursor=request.args.get('cursor')
+        )
+        return jsonify(page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # 获取明星热度分析数据
 @app.route('/api/stars/<star_id>/heat')
 def get_star_heat(star_id):
@@ -680,15 +711,14 @@ def get_star_heat(star_id):
             HeatData.date >= datetime.now().date() - timedelta(days=30)
         ).order_by(HeatData.date).all()
         
-        # 获取互动数据
+        # 从每日统计汇总表获取互动数据
         interaction_data = Session.query(
-            func.sum(Post.comments_count).label('comment_count'),
-            func.sum(Post.likes).label('like_count'),
-            func.sum(Post.reposts).label('repost_count')
+            func.sum(DailyStats.comment_count).label('comment_count'),
+            func.sum(DailyStats.like_count).label('like_count'),
+            func.sum(DailyStats.repost_count).label('repost_count')
         ).filter(
-            Post.celebrity_id == star_id,
-            Post.created_at >= datetime.now() - timedelta(days=30),
-            Post.is_deleted == 0
+            DailyStats.celebrity_id == star_id,
+            DailyStats.date >= datetime.now().date() - timedelta(days=30)
         ).first()
         
         return jsonify({
@@ -701,5 +731,65 @@ def get_star_heat(star_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/system/models')
+def get_model_memory():
+    """已加载模型的内存占用"""
+    try:
+        from api.models.model_manager import get_model_registry
+        return jsonify(get_model_registry().memory_report())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/system/db_pools')
+def get_db_pools():
+    """各数据库连接池的借出、等待和占用统计"""
+    try:
+        return jsonify(get_engine_registry().stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs')
+def get_jobs():
+    """按入队时间倒序列出爬取和分析任务，可按明星和状态过滤"""
+    try:
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        return jsonify(job_queue.list_jobs(
+            celebrity_id=request.args.get('celebrity_id'),
+            status=request.args.get('status'),
+            limit=limit
+        ))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<int:job_id>')
+def get_job(job_id):
+    """获取单个任务的状态、进度和耗时"""
+    try:
+        job = job_queue.get_job(job_id)
+        if not job:
+            return jsonify({'error': '任务不存在'}), 404
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stars/<star_id>/analyze', methods=['POST'])
+def analyze_star(star_id):
+    """重新分析已爬取的数据；同一明星已有排队的分析时返回该任务，正在执行时结束后再分析一次"""
+    try:
+        job, created = submit_analysis(star_id)
+        if created:
+            message = '已提交数据分析任务'
+        elif job.get('rerun_pending'):
+            message = '该明星的数据分析任务正在执行，完成后将重新分析'
+        else:
+            message = '该明星的数据分析任务已在排队'
+        return jsonify({
+            'status': 'success',
+            'message': message,
+            'job': job
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000) 
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""
+服务冷启动测试
+
+分别在新的子进程中测量：
+1. 导入 server 模块的耗时，以及导入后已加载的重量级依赖
+2. 从启动进程到 /api/login 返回第一个响应的耗时
+
+用法:
+    python frontend/startup_benchmark.py --runs 3
+    python frontend/startup_benchmark.py --warmup   # 同时开启后台预热
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+FRONTEND_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ['torch', 'transformers', 'pandas', 'matplotlib', 'seaborn', 'scrapy', 'jieba']
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import server
+elapsed = time.perf_counter() - start
+print(json.dumps({'import_seconds': elapsed, 'heavy_modules': [m for m in %r if m in sys.modules]}))
+"""
+
+SERVE_PROBE = """
+import server
+server.app.run(host='127.0.0.1', port=%d, debug=False, use_reloader=False)
+"""
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _env(warmup: bool) -> dict:
+    env = dict(os.environ)
+    env['ANALYZER_WARMUP'] = '1' if warmup else '0'
+    return env
+
+
+def measure_import(warmup: bool) -> dict:
+    """测量导入server模块的耗时"""
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_PROBE % (HEAVY_MODULES,)],
+        cwd=FRONTEND_DIR, env=_env(warmup), capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_first_response(warmup: bool, timeout: float = 120.0) -> float:
+    """测量从启动进程到/api/login返回第一个响应的耗时"""
+    port = _free_port()
+    url = f'http://127.0.0.1:{port}/api/login'
+    body = json.dumps({}).encode('utf-8')
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVE_PROBE % port],
+        cwd=FRONTEND_DIR, env=_env(warmup), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"服务进程异常退出，返回码 {process.returncode}")
+            request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+            try:
+                urllib.request.urlopen(request, timeout=1)
+                return time.perf_counter() - start
+            except urllib.error.HTTPError:
+                # 参数错误等HTTP错误同样说明服务已经可以响应
+                return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                time.sleep(0.05)
+        raise TimeoutError(f"{timeout:.0f} 秒内服务未响应")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='服务冷启动测试')
+    parser.add_argument('--runs', type=int, default=3, help='重复次数')
+    parser.add_argument('--warmup', action='store_true', help='开启后台预热（ANALYZER_WARMUP=1）')
+    args = parser.parse_args()
+
+    import_times, response_times = [], []
+    for i in range(args.runs):
+        probe = measure_import(args.warmup)
+        first_response = measure_first_response(args.warmup)
+        import_times.append(probe['import_seconds'])
+        response_times.append(first_response)
+        print(f"第 {i + 1} 次: 导入 {probe['import_seconds']:.3f} 秒, 首个响应 {first_response:.3f} 秒, "
+              f"已加载重量级依赖: {', '.join(probe['heavy_modules']) or '无'}")
+
+    print(f"\n导入耗时中位数: {statistics.median(import_times):.3f} 秒")
+    print(f"首个响应耗时中位数: {statistics.median(response_times):.3f} 秒")
+
+
+if __name__ == '__main__':
+    main()
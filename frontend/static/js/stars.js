@@ -14,6 +14,16 @@ socket.on('analysis_complete', function(data) {
     }
 });
 
+// 监听爬取和分析任务进度，排队和执行中时在状态列显示当前阶段
+socket.on('job_update', function(job) {
+    const starRow = document.querySelector(`tr[data-star-id="${job.celebrity_id}"]`);
+    if (!starRow || (job.status !== 'queued' && job.status !== 'running')) {
+        return;
+    }
+    const stage = job.status === 'queued' ? '排队中' : (job.stage || '执行中');
+    starRow.querySelector('td:nth-child(3)').textContent = `${stage} ${Math.round(job.progress * 100)}%`;
+});
+
 // 更新明星数据
 async function updateStarData(celebrityId) {
     try {
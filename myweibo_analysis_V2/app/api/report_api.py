@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from sqlalchemy import text, bindparam
 from models import db, Report
+from queries import HOT_WEIBO_SQL, HOT_COMMENTS_SQL, BAD_CONTENT_SQL
 import logging
 
 report_bp = Blueprint('report', __name__, url_prefix='/api')
@@ -61,39 +62,17 @@ def create_report():
         star = result.fetchone()
         if not star:
             return jsonify({'status': 'error', 'message': '明星不存在'}), 404
-        hot_weibo_query = text("""
-            SELECT content, mblogid, attitudes_count
-            FROM user_post 
-            WHERE user_id = :star_id 
-            ORDER BY attitudes_count DESC 
-            LIMIT 1
-        """).bindparams(bindparam('star_id', star_id))
-        hot_weibo_result = db.session.execute(hot_weibo_query)
+        hot_weibo_result = db.session.execute(HOT_WEIBO_SQL, {'star_id': star_id})
         hot_weibo = hot_weibo_result.fetchone()
         comments = []
         if hot_weibo:
-            comments_query = text("""
-                SELECT user_id, content, likes
-                FROM weibo_comments 
-                WHERE mblog_id = :mblog_id 
-                ORDER BY likes DESC 
-                LIMIT 5
-            """).bindparams(bindparam('mblog_id', hot_weibo.mblogid))
-            comments_result = db.session.execute(comments_query)
+            comments_result = db.session.execute(HOT_COMMENTS_SQL, {'mblog_id': hot_weibo.mblogid})
             comments = [{
                 'user_id': row.user_id,
                 'content': row.content,
                 'likes': row.likes
             } for row in comments_result]
-        bad_content_query = text("""
-            SELECT content, sentiment_score * 100 as sentiment_score, keyword_id
-            FROM keyword_post 
-            WHERE keyword_id = :star_id 
-            AND sentiment_score > 0
-            ORDER BY sentiment_score ASC 
-            LIMIT 5
-        """).bindparams(bindparam('star_id', star_id))
-        bad_content_result = db.session.execute(bad_content_query)
+        bad_content_result = db.session.execute(BAD_CONTENT_SQL, {'star_id': star_id})
         bad_content = [{
             'content': row.content,
             'sentiment_score': round(row.sentiment_score, 2),
@@ -161,39 +140,17 @@ def get_report_detail(star_id):
         report_row = result.fetchone()
         if not report_row:
             return jsonify({'status': 'error', 'message': '报告不存在'}), 404
-        hot_weibo_query = text("""
-            SELECT content, mblogid, attitudes_count
-            FROM user_post 
-            WHERE user_id = :star_id 
-            ORDER BY attitudes_count DESC 
-            LIMIT 1
-        """).bindparams(bindparam('star_id', star_id))
-        hot_weibo_result = db.session.execute(hot_weibo_query)
+        hot_weibo_result = db.session.execute(HOT_WEIBO_SQL, {'star_id': star_id})
         hot_weibo = hot_weibo_result.fetchone()
         comments = []
         if hot_weibo:
-            comments_query = text("""
-                SELECT user_id, content, likes
-                FROM weibo_comments 
-                WHERE mblog_id = :mblog_id 
-                ORDER BY likes DESC 
-                LIMIT 5
-            """).bindparams(bindparam('mblog_id', hot_weibo.mblogid))
-            comments_result = db.session.execute(comments_query)
+            comments_result = db.session.execute(HOT_COMMENTS_SQL, {'mblog_id': hot_weibo.mblogid})
             comments = [{
                 'user_id': row.user_id,
                 'content': row.content,
                 'likes': row.likes
             } for row in comments_result]
-        bad_content_query = text("""
-            SELECT content, sentiment_score * 100 as sentiment_score, keyword_id
-            FROM keyword_post 
-            WHERE keyword_id = :star_id 
-            AND sentiment_score > 0
-            ORDER BY sentiment_score ASC 
-            LIMIT 5
-        """).bindparams(bindparam('star_id', star_id))
-        bad_content_result = db.session.execute(bad_content_query)
+        bad_content_result = db.session.execute(BAD_CONTENT_SQL, {'star_id': star_id})
         bad_content = [{
             'content': row.content,
             'sentiment_score': round(row.sentiment_score, 2),
@@ -1,8 +1,9 @@
 from flask import Blueprint, request, jsonify, send_from_directory
 from flask_login import login_required, current_user
-from sqlalchemy import text, bindparam, func
-from models import db, UserStar, WeiboUser, UserPost, WeiboFans, WeiboComments, KeywordPost, Report
-from datetime import datetime
+from models import db, UserStar, WeiboUser
+from queries import (RECENT_DAILY_STATS_SQL, STAR_GENDER_SQL, STAR_REGION_SQL, NEGATIVE_EVENTS_SQL, POPULAR_EVENTS_SQL,
+                     ALERT_COUNT_SQL, TOTAL_ALERT_COUNT_SQL, FAN_GENDER_SQL, FAN_REGION_SQL, LOW_SENTIMENT_STARS_SQL)
+from datetime import datetime, timedelta
 import logging
 
 star_bp = Blueprint('star', __name__, url_prefix='/api')
@@ -122,26 +123,19 @@ def get_star_data(star_id):
         logger.error(f"获取明星详情失败: {str(e)}")
         return jsonify({'error': f'获取数据失败：{str(e)}'}), 500
 
+def recent_daily_stats(star_id, days=10):
+    """读取明星最近若干天有微博的每日汇总行"""
+    since = (datetime.now() - timedelta(days=days)).date()
+    return db.session.execute(RECENT_DAILY_STATS_SQL, {'star_id': str(star_id), 'since': since}).fetchall()
+
 @star_bp.route('/stars/<star_id>/heat', methods=['GET'])
 def get_star_heat(star_id):
     try:
-        query = text("""
-            SELECT DATE(created_at) as date, 
-                   SUM(reposts_count) as reposts, 
-                   SUM(comments_count) as comments, 
-                   SUM(attitudes_count) as likes
-            FROM user_post 
-            WHERE user_id = :star_id 
-            AND created_at >= DATE_SUB(NOW(), INTERVAL 10 DAY)
-            GROUP BY DATE(created_at)
-            ORDER BY date
-        """).bindparams(bindparam('star_id', star_id))
-        result = db.session.execute(query)
         heat_data = []
-        for row in result:
-            heat_score = row.reposts + row.comments + row.likes
+        for row in recent_daily_stats(star_id):
+            heat_score = row.reposts_count + row.comments_count + row.attitudes_count
             heat_data.append({
-                'date': row.date.strftime('%Y-%m-%d'),
+                'date': row.stat_date.strftime('%Y-%m-%d'),
                 'heat_score': heat_score
             })
         return jsonify({
@@ -155,32 +149,12 @@ def get_star_heat(star_id):
 @star_bp.route('/stars/<star_id>/activity', methods=['GET'])
 def get_star_activity(star_id):
     try:
-        query = text("""
-            SELECT 
-                DATE(p.created_at) AS date,
-                COUNT(c.mblog_id) AS comment_count,
-                SUM(
-                    CASE
-                        WHEN c.fan_badge LIKE '铁粉%' THEN 1
-                        WHEN c.fan_badge LIKE '金粉%' THEN 2
-                        WHEN c.fan_badge LIKE '钻粉%' THEN 3
-                        ELSE 0
-                    END
-                ) AS activity_score
-            FROM user_post p
-            LEFT JOIN weibo_comments c ON c.mblog_id = p.mblogid
-            WHERE p.user_id = :star_id
-              AND p.created_at >= DATE_SUB(NOW(), INTERVAL 10 DAY)
-            GROUP BY DATE(p.created_at)
-            ORDER BY date
-        """)
-        result = db.session.execute(query, {"star_id": str(star_id)})
         activity_data = []
-        for row in result:
+        for row in recent_daily_stats(star_id):
             activity_data.append({
-                'date': row.date.strftime('%Y-%m-%d'),
-                'comment_count': row.comment_count,
-                'activity_score': row.activity_score or 0
+                'date': row.stat_date.strftime('%Y-%m-%d'),
+                'comment_count': row.fan_comment_count,
+                'activity_score': row.fan_activity_score or 0
             })
         return jsonify({
             'status': 'success',
@@ -193,10 +167,7 @@ def get_star_activity(star_id):
 @star_bp.route('/stars/<star_id>/gender', methods=['GET'])
 def get_star_gender(star_id):
     try:
-        gender_data = (db.session.query(WeiboFans.gender, func.count().label('count'))
-            .filter(WeiboFans.follower_id == star_id, WeiboFans.gender.in_(['男', '女']))
-            .group_by(WeiboFans.gender)
-            .all())
+        gender_data = db.session.execute(STAR_GENDER_SQL, {'star_id': star_id}).fetchall()
         gender_data = [{'name': row.gender, 'value': row.count} for row in gender_data]
         return jsonify({'status': 'success', 'gender_data': gender_data})
     except Exception as e:
@@ -206,10 +177,7 @@ def get_star_gender(star_id):
 @star_bp.route('/stars/<star_id>/region', methods=['GET'])
 def get_star_region(star_id):
     try:
-        region_data = (db.session.query(WeiboFans.region, func.count().label('count'))
-            .filter(WeiboFans.follower_id == star_id, WeiboFans.region.notin_(['其他', '海外']))
-            .group_by(WeiboFans.region)
-            .all())
+        region_data = db.session.execute(STAR_REGION_SQL, {'star_id': star_id}).fetchall()
         region_data = [{'name': row.region, 'value': row.count} for row in region_data if row.region is not None]
         return jsonify({'status': 'success', 'region_data': region_data})
     except Exception as e:
@@ -235,11 +203,7 @@ def get_stars_count():
 @star_bp.route('/stars/<star_id>/negative_events', methods=['GET'])
 def get_negative_events(star_id):
     try:
-        result = (KeywordPost.query
-            .filter(KeywordPost.keyword_id == star_id, KeywordPost.sentiment_score != 0)
-            .order_by(KeywordPost.sentiment_score.asc())
-            .limit(10)
-            .all())
+        result = db.session.execute(NEGATIVE_EVENTS_SQL, {'star_id': star_id}).fetchall()
         events = [{
                 'content': row.content,
                 'sentiment_score': row.sentiment_score,
@@ -253,11 +217,7 @@ def get_negative_events(star_id):
 @star_bp.route('/stars/<star_id>/popular_events', methods=['GET'])
 def get_popular_events(star_id):
     try:
-        result = (KeywordPost.query
-            .filter(KeywordPost.keyword_id == star_id)
-            .order_by(KeywordPost.attitudes_count.desc())
-            .limit(5)
-            .all())
+        result = db.session.execute(POPULAR_EVENTS_SQL, {'star_id': star_id}).fetchall()
         events = [{
                 'content': row.content,
                 'attitudes_count': row.attitudes_count,
@@ -271,27 +231,7 @@ def get_popular_events(star_id):
 @star_bp.route('/stars/<star_id>/alert_count', methods=['GET'])
 def get_alert_count(star_id):
     try:
-        query = text("""
-            WITH alert_count AS (
-                SELECT COUNT(*) as alert_count
-                FROM keyword_post 
-                WHERE keyword_id = :star_id
-                AND sentiment_score < 0.05
-                AND sentiment_score != 0
-            ),
-            avg_sentiment AS (
-                SELECT AVG(sentiment_score) as avg_sentiment
-                FROM keyword_post 
-                WHERE keyword_id = :star_id
-                AND sentiment_score != 0
-            )
-            SELECT 
-                ac.alert_count,
-                COALESCE(avs.avg_sentiment, 0) as avg_sentiment
-            FROM alert_count ac
-            CROSS JOIN avg_sentiment avs
-        """).bindparams(bindparam('star_id', star_id))
-        result = db.session.execute(query)
+        result = db.session.execute(ALERT_COUNT_SQL, {'star_id': star_id})
         row = result.fetchone()
         avg_sentiment = row.avg_sentiment if row.avg_sentiment is not None else 0
         avg_sentiment_100 = avg_sentiment * 100
@@ -309,15 +249,7 @@ def get_alert_count(star_id):
 def get_total_alerts():
     try:
         logger.info(f"开始获取用户 {current_user.id} 的预警总数")
-        query = text("""
-            SELECT COUNT(*) as alert_count
-            FROM keyword_post kp
-            INNER JOIN user_stars us ON kp.keyword_id = us.star_id
-            WHERE us.user_id = :user_id
-            AND kp.sentiment_score < 0.05
-            AND kp.sentiment_score != 0
-        """).bindparams(bindparam('user_id', current_user.id))
-        result = db.session.execute(query)
+        result = db.session.execute(TOTAL_ALERT_COUNT_SQL, {'user_id': current_user.id})
         row = result.fetchone()
         alert_count = row.alert_count if row else 0
         logger.info(f"用户 {current_user.id} 的预警总数: {alert_count}")
@@ -337,44 +269,8 @@ def get_total_alerts():
 def get_fan_demographics(star_id):
     try:
         logger.info(f"开始获取明星 {star_id} 的粉丝画像数据")
-        gender_query = text("""
-            SELECT 
-                CASE 
-                    WHEN gender = '男' THEN '男'
-                    WHEN gender = '女' THEN '女'
-                    ELSE '未知'
-                END as gender,
-                COUNT(*) as count
-            FROM weibo_fans
-            WHERE follower_id = :star_id
-            GROUP BY gender
-        """).bindparams(bindparam('star_id', star_id))
-        region_query = text("""
-            SELECT 
-                CASE 
-                    WHEN region LIKE '%北京%' THEN '北京'
-                    WHEN region LIKE '%江苏%' THEN '江苏'
-                    WHEN region LIKE '%广东%' THEN '广东'
-                    WHEN region = '其他' OR region = '海外' THEN NULL
-                    ELSE region
-                END as region,
-                COUNT(*) as count
-            FROM weibo_fans
-            WHERE follower_id = :star_id
-            AND region NOT IN ('其他', '海外')
-            GROUP BY 
-                CASE 
-                    WHEN region LIKE '%北京%' THEN '北京'
-                    WHEN region LIKE '%江苏%' THEN '江苏'
-                    WHEN region LIKE '%广东%' THEN '广东'
-                    WHEN region = '其他' OR region = '海外' THEN NULL
-                    ELSE region
-                END
-            ORDER BY count DESC
-            LIMIT 10
-        """).bindparams(bindparam('star_id', star_id))
-        gender_result = db.session.execute(gender_query)
-        region_result = db.session.execute(region_query)
+        gender_result = db.session.execute(FAN_GENDER_SQL, {'star_id': star_id})
+        region_result = db.session.execute(FAN_REGION_SQL, {'star_id': star_id})
         gender_data = [{'name': row.gender, 'value': row.count} for row in gender_result]
         region_data = [{'name': row.region, 'value': row.count} for row in region_result if row.region is not None]
         logger.info(f"获取到性别数据: {gender_data}")
@@ -395,20 +291,7 @@ def get_fan_demographics(star_id):
 @login_required
 def get_low_sentiment_stars():
     try:
-        query = text("""
-            SELECT DISTINCT w.id, w.nick_name, 
-                   AVG(kp.sentiment_score) * 100 as avg_sentiment
-            FROM weibo_user w
-            INNER JOIN user_stars us ON w.id = us.star_id
-            INNER JOIN keyword_post kp ON w.id = kp.keyword_id
-            WHERE us.user_id = :user_id 
-            AND kp.sentiment_score > 0
-            GROUP BY w.id, w.nick_name
-            HAVING AVG(kp.sentiment_score) * 100 < 65
-            ORDER BY avg_sentiment ASC
-            LIMIT 10
-        """).bindparams(bindparam('user_id', current_user.id))
-        result = db.session.execute(query)
+        result = db.session.execute(LOW_SENTIMENT_STARS_SQL, {'user_id': current_user.id})
         low_sentiment_stars = []
         for row in result:
             low_sentiment_stars.append({
@@ -95,6 +95,12 @@ class UserPost(db.Model):
     user_id = db.Column(db.String(255))
     keyword_id = db.Column(db.String(255))
 
+    # 明星微博按时间汇总、按点赞数取热门微博
+    __table_args__ = (
+        db.Index('ix_user_post_user_created', 'user_id', 'created_at'),
+        db.Index('ix_user_post_user_attitudes', 'user_id', 'attitudes_count'),
+    )
+
 class WeiboFans(db.Model):
     __tablename__ = 'weibo_fans'
     fan_id = db.Column(db.String(255), primary_key=True)
@@ -105,6 +111,12 @@ class WeiboFans(db.Model):
     region = db.Column(db.String(100))
     follower_id = db.Column(db.String(255), nullable=False, index=True)
 
+    # 粉丝画像按明星分组统计性别、地域，组合索引可直接覆盖
+    __table_args__ = (
+        db.Index('ix_weibo_fans_follower_gender', 'follower_id', 'gender'),
+        db.Index('ix_weibo_fans_follower_region', 'follower_id', 'region'),
+    )
+
 class WeiboComments(db.Model):
     __tablename__ = 'weibo_comments'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -119,6 +131,12 @@ class WeiboComments(db.Model):
     celebrity_id = db.Column(db.BigInteger, nullable=False)
     mblog_id = db.Column(db.String(255), nullable=False)
 
+    # 按微博取热门评论、按明星和时间统计评论
+    __table_args__ = (
+        db.Index('ix_weibo_comments_mblog_likes', 'mblog_id', 'likes'),
+        db.Index('ix_weibo_comments_celebrity_time', 'celebrity_id', 'comment_time'),
+    )
+
 class KeywordPost(db.Model):
     __tablename__ = 'keyword_post'
     id = db.Column(db.String(255), primary_key=True)
@@ -132,4 +150,26 @@ class KeywordPost(db.Model):
     user_id = db.Column(db.String(255))
     keyword = db.Column(db.String(255))
     keyword_id = db.Column(db.String(255))
-    sentiment_score = db.Column(db.Float) 
\ No newline at end of file
+    sentiment_score = db.Column(db.Float)
+
+    # 负面事件/预警按情感分数过滤排序，热门事件按点赞数排序，汇总按时间
+    __table_args__ = (
+        db.Index('ix_keyword_post_keyword_sentiment', 'keyword_id', 'sentiment_score'),
+        db.Index('ix_keyword_post_keyword_created', 'keyword_id', 'created_at'),
+        db.Index('ix_keyword_post_keyword_attitudes', 'keyword_id', 'attitudes_count'),
+    )
+
+class StarDailyStats(db.Model):
+    __tablename__ = 'star_daily_stats'
+    star_id = db.Column(db.String(255), primary_key=True, comment='明星ID')
+    stat_date = db.Column(db.Date, primary_key=True, comment='微博发布日期')
+    post_count = db.Column(db.Integer, default=0, comment='微博数量')
+    reposts_count = db.Column(db.Integer, default=0, comment='转发数')
+    comments_count = db.Column(db.Integer, default=0, comment='评论数')
+    attitudes_count = db.Column(db.Integer, default=0, comment='点赞数')
+    fan_comment_count = db.Column(db.Integer, default=0, comment='已抓取评论数')
+    fan_activity_score = db.Column(db.Integer, default=0, comment='粉丝牌活跃度')
+    keyword_post_count = db.Column(db.Integer, default=0, comment='关键词微博数量')
+    sentiment_sum = db.Column(db.Float, default=0, comment='关键词微博情感分数之和')
+    sentiment_count = db.Column(db.Integer, default=0, comment='有情感分数的关键词微博数量')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, comment='最后刷新时间') 
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+看板和报告接口的热点查询
+
+star_api.py、report_api.py 执行这里的SQL，check_query_plans.py 对同一份SQL检查执行计划，
+修改查询后执行计划检查自动覆盖新的写法。本模块只依赖SQLAlchemy，不导入Flask。
+"""
+from sqlalchemy import text
+
+# 明星最近若干天有微博的每日汇总行
+RECENT_DAILY_STATS_SQL = text("""
+    SELECT * FROM star_daily_stats
+    WHERE star_id = :star_id AND stat_date >= :since AND post_count > 0
+    ORDER BY stat_date
+""")
+
+STAR_GENDER_SQL = text("""
+    SELECT gender, COUNT(*) AS count
+    FROM weibo_fans
+    WHERE follower_id = :star_id AND gender IN ('男', '女')
+    GROUP BY gender
+""")
+
+STAR_REGION_SQL = text("""
+    SELECT region, COUNT(*) AS count
+    FROM weibo_fans
+    WHERE follower_id = :star_id AND region NOT IN ('其他', '海外')
+    GROUP BY region
+""")
+
+NEGATIVE_EVENTS_SQL = text("""
+    SELECT * FROM keyword_post
+    WHERE keyword_id = :star_id AND sentiment_score != 0
+    ORDER BY sentiment_score ASC
+    LIMIT 10
+""")
+
+POPULAR_EVENTS_SQL = text("""
+    SELECT * FROM keyword_post
+    WHERE keyword_id = :star_id
+    ORDER BY attitudes_count DESC
+    LIMIT 5
+""")
+
+ALERT_COUNT_SQL = text("""
+    WITH alert_count AS (
+        SELECT COUNT(*) as alert_count
+        FROM keyword_post
+        WHERE keyword_id = :star_id
+        AND sentiment_score < 0.05
+        AND sentiment_score != 0
+    ),
+    avg_sentiment AS (
+        SELECT AVG(sentiment_score) as avg_sentiment
+        FROM keyword_post
+        WHERE keyword_id = :star_id
+        AND sentiment_score != 0
+    )
+    SELECT
+        ac.alert_count,
+        COALESCE(avs.avg_sentiment, 0) as avg_sentiment
+    FROM alert_count ac
+    CROSS JOIN avg_sentiment avs
+""")
+
+TOTAL_ALERT_COUNT_SQL = text("""
+    SELECT COUNT(*) as alert_count
+    FROM keyword_post kp
+    INNER JOIN user_stars us ON kp.keyword_id = us.star_id
+    WHERE us.user_id = :user_id
+    AND kp.sentiment_score < 0.05
+    AND kp.sentiment_score != 0
+""")
+
+FAN_GENDER_SQL = text("""
+    SELECT
+        CASE
+            WHEN gender = '男' THEN '男'
+            WHEN gender = '女' THEN '女'
+            ELSE '未知'
+        END as gender,
+        COUNT(*) as count
+    FROM weibo_fans
+    WHERE follower_id = :star_id
+    GROUP BY gender
+""")
+
+FAN_REGION_SQL = text("""
+    SELECT
+        CASE
+            WHEN region LIKE '%北京%' THEN '北京'
+            WHEN region LIKE '%江苏%' THEN '江苏'
+            WHEN region LIKE '%广东%' THEN '广东'
+            WHEN region = '其他' OR region = '海外' THEN NULL
+            ELSE region
+        END as region,
+        COUNT(*) as count
+    FROM weibo_fans
+    WHERE follower_id = :star_id
+    AND region NOT IN ('其他', '海外')
+    GROUP BY
+        CASE
+            WHEN region LIKE '%北京%' THEN '北京'
+            WHEN region LIKE '%江苏%' THEN '江苏'
+            WHEN region LIKE '%广东%' THEN '广东'
+            WHEN region = '其他' OR region = '海外' THEN NULL
+            ELSE region
+        END
+    ORDER BY count DESC
+    LIMIT 10
+""")
+
+LOW_SENTIMENT_STARS_SQL = text("""
+    SELECT DISTINCT w.id, w.nick_name,
+           AVG(kp.sentiment_score) * 100 as avg_sentiment
+    FROM weibo_user w
+    INNER JOIN user_stars us ON w.id = us.star_id
+    INNER JOIN keyword_post kp ON w.id = kp.keyword_id
+    WHERE us.user_id = :user_id
+    AND kp.sentiment_score > 0
+    GROUP BY w.id, w.nick_name
+    HAVING AVG(kp.sentiment_score) * 100 < 65
+    ORDER BY avg_sentiment ASC
+    LIMIT 10
+""")
+
+HOT_WEIBO_SQL = text("""
+    SELECT content, mblogid, attitudes_count
+    FROM user_post
+    WHERE user_id = :star_id
+    ORDER BY attitudes_count DESC
+    LIMIT 1
+""")
+
+HOT_COMMENTS_SQL = text("""
+    SELECT user_id, content, likes
+    FROM weibo_comments
+    WHERE mblog_id = :mblog_id
+    ORDER BY likes DESC
+    LIMIT 5
+""")
+
+BAD_CONTENT_SQL = text("""
+    SELECT content, sentiment_score * 100 as sentiment_score, keyword_id
+    FROM keyword_post
+    WHERE keyword_id = :star_id
+    AND sentiment_score > 0
+    ORDER BY sentiment_score ASC
+    LIMIT 5
+""")
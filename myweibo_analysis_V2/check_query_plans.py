@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+看板热点查询的执行计划检查
+
+按 app/models.py 在内存 SQLite 中建表（包括模型中声明的索引），写入一批合成数据并 ANALYZE，
+然后对 app/queries.py（star_api.py、report_api.py 执行的SQL）和 rollup.py 中的热点查询执行 EXPLAIN QUERY PLAN。
+任何一个查询对大表退化为全表扫描时以非零状态退出，可以在修改模型或查询后运行。
+
+用法:
+    python check_query_plans.py              # 检查当前模型
+    python check_query_plans.py --verbose    # 打印每个查询的完整执行计划
+    python check_query_plans.py --drop-indexes   # 去掉二级索引运行，确认检查能发现全表扫描
+"""
+import re
+import sys
+import random
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+
+from app import queries
+from weibospider import rollup
+
+# 数据量随明星数增长的表，对它们的全表扫描视为退化
+LARGE_TABLES = {'user_post', 'weibo_comments', 'weibo_fans', 'keyword_post', 'star_daily_stats'}
+
+SQL_KEYWORDS = {'WHERE', 'ON', 'INNER', 'LEFT', 'RIGHT', 'JOIN', 'GROUP', 'ORDER', 'LIMIT', 'USING'}
+
+STAR_ID = '1000'
+START_TIME = datetime(2025, 5, 1)
+ROLLUP_PARAMS = {'star_id': STAR_ID, 'start_time': '2025-06-01', 'end_time': '2025-06-08', 'now': START_TIME}
+
+# (名称, SQL, 参数)，SQL直接取自接口和汇总模块，修改查询后检查自动覆盖新的写法
+HOT_QUERIES = [
+    ('star_api.recent_daily_stats', queries.RECENT_DAILY_STATS_SQL, {'star_id': STAR_ID, 'since': '2025-06-01'}),
+    ('star_api.get_star_gender', queries.STAR_GENDER_SQL, {'star_id': STAR_ID}),
+    ('star_api.get_star_region', queries.STAR_REGION_SQL, {'star_id': STAR_ID}),
+    ('star_api.get_negative_events', queries.NEGATIVE_EVENTS_SQL, {'star_id': STAR_ID}),
+    ('star_api.get_popular_events', queries.POPULAR_EVENTS_SQL, {'star_id': STAR_ID}),
+    ('star_api.get_alert_count', queries.ALERT_COUNT_SQL, {'star_id': STAR_ID}),
+    ('star_api.get_total_alerts', queries.TOTAL_ALERT_COUNT_SQL, {'user_id': 1}),
+    ('star_api.get_fan_demographics.gender', queries.FAN_GENDER_SQL, {'star_id': STAR_ID}),
+    ('star_api.get_fan_demographics.region', queries.FAN_REGION_SQL, {'star_id': STAR_ID}),
+    ('star_api.get_low_sentiment_stars', queries.LOW_SENTIMENT_STARS_SQL, {'user_id': 1}),
+    ('report_api.hot_weibo', queries.HOT_WEIBO_SQL, {'star_id': STAR_ID}),
+    ('report_api.hot_comments', queries.HOT_COMMENTS_SQL, {'mblog_id': 'M1000_0'}),
+    ('report_api.bad_content', queries.BAD_CONTENT_SQL, {'star_id': STAR_ID}),
+    ('rollup.post_stats', rollup.POST_SQL, ROLLUP_PARAMS),
+    ('rollup.comment_stats', rollup.COMMENT_SQL, ROLLUP_PARAMS),
+    ('rollup.keyword_stats', rollup.KEYWORD_SQL, ROLLUP_PARAMS),
+]
+
+
+def select_part(sql):
+    """汇总语句是 INSERT ... SELECT ... ON DUPLICATE KEY UPDATE，SQLite只能对其中的SELECT取执行计划"""
+    sql = str(sql)
+    if sql.lstrip().upper().startswith('INSERT'):
+        sql = sql[sql.index('SELECT'):]
+    return sql.split('ON DUPLICATE KEY')[0]
+
+
+def load_synthetic_data(conn, stars=20, posts=300, comments=8, fans=1000, keyword_posts=300, seed=42):
+    """写入合成数据，数据分布足以让查询优化器在有索引时选择索引"""
+    rng = random.Random(seed)
+    star_ids = [str(1000 + i) for i in range(stars)]
+    genders = ['男', '女', '未知']
+    regions = ['北京', '江苏', '广东', '上海', '其他', '海外']
+    badges = ['钻粉', '铁粉', '', '']
+
+    conn.execute(text("INSERT INTO users (id, username, email) VALUES (1, 'demo', 'demo@example.com')"))
+    conn.execute(text("INSERT INTO weibo_user (id, nick_name) VALUES (:id, :name)"),
+                 [{'id': star_id, 'name': f'明星{star_id}'} for star_id in star_ids])
+    conn.execute(text("INSERT INTO user_stars (user_id, star_id) VALUES (1, :star_id)"),
+                 [{'star_id': star_id} for star_id in star_ids[:5]])
+
+    for star_id in star_ids:
+        post_rows, comment_rows, fan_rows, keyword_rows, stats_rows = [], [], [], [], []
+        for i in range(posts):
+            created_at = START_TIME + timedelta(hours=rng.randint(0, 24 * 60))
+            mblogid = f'M{star_id}_{i}'
+            post_rows.append({'id': f'P{star_id}_{i}', 'mblogid': mblogid, 'created_at': created_at,
+                              'reposts_count': rng.randint(0, 500), 'comments_count': rng.randint(0, 500),
+                              'attitudes_count': rng.randint(0, 5000), 'content': '微博内容', 'user_id': star_id})
+            for j in range(comments):
+                comment_rows.append({'user_id': rng.randint(1, 10 ** 9), 'comment_time': created_at,
+                                     'content': '评论', 'likes': rng.randint(0, 100), 'fan_badge': rng.choice(badges),
+                                     'celebrity_id': int(star_id), 'mblog_id': mblogid})
+        for i in range(fans):
+            fan_rows.append({'fan_id': f'F{star_id}_{i}', 'name': '粉丝', 'gender': rng.choice(genders),
+                             'region': rng.choice(regions), 'follower_id': star_id})
+        for i in range(keyword_posts):
+            keyword_rows.append({'id': f'K{star_id}_{i}', 'mblogid': f'KM{star_id}_{i}',
+                                 'created_at': START_TIME + timedelta(hours=rng.randint(0, 24 * 60)),
+                                 'attitudes_count': rng.randint(0, 5000), 'content': '关键词微博',
+                                 'keyword_id': star_id, 'sentiment_score': round(rng.random(), 3)})
+        for day in range(60):
+            stats_rows.append({'star_id': star_id, 'stat_date': (START_TIME + timedelta(days=day)).date(),
+                               'post_count': rng.randint(0, 10)})
+
+        conn.execute(text("""
+            INSERT INTO user_post (id, mblogid, created_at, reposts_count, comments_count, attitudes_count, content, user_id)
+            VALUES (:id, :mblogid, :created_at, :reposts_count, :comments_count, :attitudes_count, :content, :user_id)
+        """), post_rows)
+        conn.execute(text("""
+            INSERT INTO weibo_comments (user_id, comment_time, content, likes, fan_badge, celebrity_id, mblog_id)
+            VALUES (:user_id, :comment_time, :content, :likes, :fan_badge, :celebrity_id, :mblog_id)
+        """), comment_rows)
+        conn.execute(text("""
+            INSERT INTO weibo_fans (fan_id, name, gender, region, follower_id)
+            VALUES (:fan_id, :name, :gender, :region, :follower_id)
+        """), fan_rows)
+        conn.execute(text("""
+            INSERT INTO keyword_post (id, mblogid, created_at, attitudes_count, content, keyword_id, sentiment_score)
+            VALUES (:id, :mblogid, :created_at, :attitudes_count, :content, :keyword_id, :sentiment_score)
+        """), keyword_rows)
+        conn.execute(text("INSERT INTO star_daily_stats (star_id, stat_date, post_count) VALUES (:star_id, :stat_date, :post_count)"),
+                     stats_rows)
+    conn.execute(text("ANALYZE"))
+
+
+def table_aliases(sql):
+    """返回SQL中 表名/别名 -> 表名 的映射，执行计划中的表用别名表示"""
+    aliases = {}
+    for table, alias in re.findall(r'(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.I):
+        aliases[table] = table
+        if alias and alias.upper() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def full_scans(plan, sql):
+    """从执行计划中找出对大表的全表扫描（包括全索引扫描和SQLite临时建的自动索引）"""
+    aliases = table_aliases(sql)
+    scans = []
+    for row in plan:
+        detail = row[3]
+        match = re.match(r'(?:SCAN|SEARCH) (?:TABLE )?(\w+)', detail)
+        if not match or aliases.get(match.group(1), match.group(1)) not in LARGE_TABLES:
+            continue
+        if detail.startswith('SCAN') or 'AUTOMATIC' in detail:
+            scans.append(detail)
+    return scans
+
+
+def check(engine, verbose=False):
+    """检查全部热点查询，返回退化为全表扫描的查询数"""
+    failures = 0
+    with engine.connect() as conn:
+        for name, statement, params in HOT_QUERIES:
+            sql = select_part(statement)
+            plan = conn.execute(text('EXPLAIN QUERY PLAN ' + sql), params).fetchall()
+            scans = full_scans(plan, sql)
+            status = '❌ 全表扫描' if scans else '✅'
+            print(f"{status} {name}")
+            if scans or verbose:
+                for row in plan:
+                    print(f"      {row[3]}")
+            failures += bool(scans)
+    return failures
+
+
+def build_engine(drop_indexes=False):
+    """按 app/models.py 在内存SQLite中建表并写入合成数据"""
+    from app.models import db
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+    if drop_indexes:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(engine)
+    with engine.begin() as conn:
+        load_synthetic_data(conn)
+    return engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='检查看板热点查询的执行计划')
+    parser.add_argument('--verbose', action='store_true', help='打印每个查询的完整执行计划')
+    parser.add_argument('--drop-indexes', action='store_true', help='去掉模型中声明的二级索引后检查')
+    args = parser.parse_args(argv)
+
+    engine = build_engine(args.drop_indexes)
+    failures = check(engine, args.verbose)
+    print(f"\n共检查{len(HOT_QUERIES)}个查询，{failures}个退化为全表扫描")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
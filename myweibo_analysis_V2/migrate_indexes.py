@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+索引迁移脚本
+
+对比 app/models.py 中声明的索引和数据库中已有的索引，只创建缺少的索引，可以重复执行。
+db.create_all() 不会给已存在的表补建索引，已上线的数据库需要运行本脚本。
+
+用法:
+    python migrate_indexes.py              # 使用 app/config.py 中的数据库
+    python migrate_indexes.py --dry-run    # 只列出将要创建的索引
+    python migrate_indexes.py --db sqlite:///test.db
+"""
+import sys
+import time
+import argparse
+from sqlalchemy import create_engine, inspect
+
+
+def missing_indexes(engine, metadata):
+    """返回数据库中已有表缺少的索引"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        # 同名或同列的索引都视为已存在
+        existing_columns = {tuple(index['column_names']) for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            columns = tuple(column.name for column in index.columns)
+            if index.name not in existing and columns not in existing_columns:
+                missing.append(index)
+    return missing
+
+
+def migrate(engine, metadata, dry_run=False):
+    """创建缺少的索引，返回创建的索引名列表"""
+    created = []
+    for index in missing_indexes(engine, metadata):
+        columns = ', '.join(column.name for column in index.columns)
+        if dry_run:
+            print(f"将创建索引 {index.name} ON {index.table.name}({columns})")
+            continue
+        start = time.perf_counter()
+        index.create(engine)
+        created.append(index.name)
+        print(f"已创建索引 {index.name} ON {index.table.name}({columns})，耗时{time.perf_counter() - start:.1f}秒")
+    return created
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='为已有数据库补建模型中声明的索引')
+    parser.add_argument('--db', help='数据库连接，默认使用 app/config.py 中的 SQLALCHEMY_DATABASE_URI')
+    parser.add_argument('--dry-run', action='store_true', help='只列出缺少的索引')
+    args = parser.parse_args(argv)
+
+    from app.models import db
+    if args.db:
+        db_url = args.db
+    else:
+        from app.config import Config
+        db_url = Config.SQLALCHEMY_DATABASE_URI
+
+    engine = create_engine(db_url)
+    try:
+        created = migrate(engine, db.metadata, args.dry_run)
+    except Exception as e:
+        print(f"❌ 创建索引失败: {e}")
+        return 1
+    finally:
+        engine.dispose()
+    if not args.dry_run:
+        print(f"✅ 索引迁移完成，新建{len(created)}个索引")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,15 @@
+import os
+import sys
+
+V2_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SPIDER_DIR = os.path.join(V2_ROOT, 'weibospider')
+
+# weibospider 中的模块互相按顶层模块名导入（from config import Config 等）
+for path in (V2_ROOT, SPIDER_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from config import Config
+
+# 测试不连接MySQL：模块级创建的引擎改用内存SQLite
+Config.SQLALCHEMY_DATABASE_URI = 'sqlite://'
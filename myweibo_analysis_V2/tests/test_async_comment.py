@@ -0,0 +1,112 @@
+import asyncio
+import csv
+import time
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from async_comment import CommentCrawler, TokenBucket
+from comment import url_to_mid
+
+URL = 'https://weibo.com/6290114447/PwlQ17pIq'
+MID = str(url_to_mid('PwlQ17pIq'))
+
+
+def comment(idstr, total_number=0, rootidstr=''):
+    return {
+        'idstr': idstr,
+        'rootidstr': rootidstr,
+        'created_at': 'Tue Jan 02 10:00:00 +0800 2024',
+        'text_raw': f'评论{idstr}',
+        'total_number': total_number,
+        'user': {'id': 1, 'screen_name': f'用户{idstr}', 'gender': 'f'},
+    }
+
+
+# 录制的接口返回：(微博或根评论ID, fetch_level, max_id) -> 响应
+PAGES = {
+    (MID, '0', None): {'data': [comment('c1', total_number=1), comment('c2')], 'max_id': 111},
+    (MID, '0', '111'): {'data': [comment('c3')], 'max_id': 0},
+    ('c1', '1', '0'): {'data': [comment('r1', rootidstr='c1')], 'max_id': 0},
+}
+
+
+async def run_against_stub(crawler, fail_first=()):
+    """启动本地回放服务并运行爬虫；fail_first中的页面第一次请求返回500"""
+    seen = []
+    failed = set()
+
+    async def build_comments(request):
+        key = (request.query['id'], request.query['fetch_level'], request.query.get('max_id'))
+        seen.append(key)
+        if key in fail_first and key not in failed:
+            failed.add(key)
+            return web.Response(status=500)
+        return web.json_response(PAGES[key])
+
+    async def profile(request):
+        return web.json_response({'data': {'user': {'screen_name': '博主'}}})
+
+    app = web.Application()
+    app.router.add_get('/ajax/statuses/buildComments', build_comments)
+    app.router.add_get('/ajax/profile/info', profile)
+    async with TestServer(app) as server:
+        crawler.base_url = str(server.make_url('')).rstrip('/')
+        results = await crawler.crawl([URL])
+    return results, seen
+
+
+def read_rows(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return list(csv.reader(f))[1:]
+
+
+def test_follows_pages_and_replies_through_the_queue(tmp_path):
+    crawler = CommentCrawler(workers=2, rate=1000, save_dir=str(tmp_path))
+
+    results, seen = asyncio.run(run_against_stub(crawler))
+
+    assert results[0]['count'] == 4
+    assert results[0]['path'].endswith('博主_PwlQ17pIq_评论(Min版).csv')
+    rows = read_rows(results[0]['path'])
+    assert sorted(row[1] for row in rows) == ['c1', 'c2', 'c3', 'r1']
+    # 二级评论记录上级评论ID，一级评论留空
+    assert {row[1]: row[2] for row in rows}['r1'] == 'c1'
+    assert {row[1]: row[2] for row in rows}['c2'] == ''
+    assert sorted(seen, key=str) == sorted(PAGES, key=str)
+    assert crawler.requests == 4 and crawler.failures == 0
+
+
+def test_max_comments_stops_crawl(tmp_path):
+    crawler = CommentCrawler(workers=1, rate=1000, save_dir=str(tmp_path), max_comments=2)
+
+    results, seen = asyncio.run(run_against_stub(crawler))
+
+    assert results[0]['count'] == 2
+    assert (MID, '0', '111') not in seen
+
+
+def test_failed_request_is_retried(tmp_path):
+    crawler = CommentCrawler(workers=2, rate=1000, save_dir=str(tmp_path), retries=1)
+
+    results, seen = asyncio.run(run_against_stub(crawler, fail_first={(MID, '0', '111')}))
+
+    assert results[0]['count'] == 4
+    assert seen.count((MID, '0', '111')) == 2
+    assert crawler.failures == 0
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    async def acquire_all():
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # 容量为1：首个令牌立即可用，其后每个令牌需要等待 1/20 秒
+    assert asyncio.run(acquire_all()) >= 4 / 20 * 0.9
@@ -0,0 +1,155 @@
+import json
+import sys
+import types
+
+import pytest
+from twisted.internet import defer
+from twisted.python.failure import Failure
+
+import auto_spider
+import middlewares
+
+
+class FakeStats(object):
+    def __init__(self):
+        self.values = {}
+
+    def get_stats(self):
+        return self.values
+
+    def inc_value(self, key, count=1):
+        self.values[key] = self.values.get(key, 0) + count
+
+
+class FakeProcess(object):
+    """代替CrawlerProcess：crawl返回未触发的Deferred，start按顺序结束爬虫"""
+
+    def __init__(self, settings, failing=()):
+        self.failing = failing
+        self.pending = []
+        self.crawled = []
+        self.running = 0
+        self.peak = 0
+
+    def create_crawler(self, spidercls):
+        return types.SimpleNamespace(spidercls=spidercls, stats=FakeStats())
+
+    def crawl(self, crawler, **kwargs):
+        self.crawled.append((crawler.spidercls, kwargs))
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        d = defer.Deferred()
+        self.pending.append((crawler, d))
+        return d
+
+    def start(self):
+        # 结束一个爬虫时信号量会立即启动下一个，pending在循环中继续增长
+        while self.pending:
+            crawler, d = self.pending.pop(0)
+            self.running -= 1
+            crawler.stats.values.update({'item_scraped_count': 3, 'downloader/request_count': 5})
+            if crawler.spidercls in self.failing:
+                d.errback(Failure(RuntimeError('boom')))
+            else:
+                crawler.stats.values['finish_reason'] = 'finished'
+                d.callback(None)
+
+
+@pytest.fixture
+def fake_process(monkeypatch):
+    import scrapy.crawler
+    import scrapy.utils.project
+    from scrapy.settings import Settings
+
+    holder = {}
+
+    def factory(settings):
+        holder['process'] = FakeProcess(settings, failing=('fan',))
+        return holder['process']
+
+    monkeypatch.setenv('SCRAPY_SETTINGS_MODULE', 'settings')
+    # settings.py按当前目录读取cookie.txt，这里不需要真实配置
+    monkeypatch.setattr(scrapy.utils.project, 'get_project_settings', Settings)
+    monkeypatch.setattr(scrapy.crawler, 'CrawlerProcess', factory)
+    # 爬虫类用名字代替，避免导入依赖pymysql的爬虫模块
+    names = ['tweet_by_user_id', 'user', 'fan', 'tweet_by_keyword']
+    monkeypatch.setitem(sys.modules, 'run_spider', types.SimpleNamespace(MODE_TO_SPIDER={n: n for n in names}))
+    return holder
+
+
+def test_build_jobs_passes_targets_as_spider_arguments():
+    jobs = auto_spider.build_jobs(['1', '2'], ['张三', '李四'], {'张三': '1', '李四': '2'},
+                                  ['tweet_by_user_id', 'tweet_by_keyword'], full=True)
+
+    assert jobs[0] == ('tweet_by_user_id', {'user_ids': '1,2', 'full': '1'})
+    name, kwargs = jobs[1]
+    assert name == 'tweet_by_keyword'
+    assert kwargs['keywords'] == '张三,李四'
+    assert json.loads(kwargs['name_id_map']) == {'张三': '1', '李四': '2'}
+    assert auto_spider.build_jobs(['1'], [], {}, ['user'])[0] == ('user', {'user_ids': '1'})
+
+
+def test_run_spiders_bounds_parallelism_and_records_each_spider(fake_process):
+    jobs = auto_spider.build_jobs(['1'], ['张三'], {'张三': '1'}, auto_spider.DEFAULT_SPIDERS)
+
+    summary = auto_spider.run_spiders(jobs, max_parallel=2)
+
+    process = fake_process['process']
+    assert process.peak == 2
+    assert [spider for spider, _ in process.crawled] == auto_spider.DEFAULT_SPIDERS
+    assert [record['spider'] for record in summary] == auto_spider.DEFAULT_SPIDERS
+    status = {record['spider']: record['status'] for record in summary}
+    assert status == {'tweet_by_user_id': 'finished', 'user': 'finished', 'fan': 'failed',
+                      'tweet_by_keyword': 'finished'}
+    for record in summary:
+        assert record['items'] == 3 and record['requests'] == 5
+        assert 'started' not in record and record['elapsed'] >= 0
+
+
+def test_main_saves_summary_and_fails_when_any_spider_fails(monkeypatch, tmp_path, fake_process):
+    # main会切换到weibospider目录，先记录当前目录以便测试结束后恢复
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, 'path', list(sys.path))
+    saved = {}
+    real_print_summary = auto_spider.print_summary
+
+    def print_summary(summary):
+        saved['dir'] = tmp_path / 'output'
+        real_print_summary(summary, str(saved['dir']))
+
+    monkeypatch.setattr(auto_spider, 'print_summary', print_summary)
+
+    assert auto_spider.main(['--spiders', 'user,fan', '--max-parallel', '1']) == 1
+    assert fake_process['process'].peak == 1
+    files = list(saved['dir'].glob('spider_summary_*.json'))
+    assert len(files) == 1
+    records = json.loads(files[0].read_text(encoding='utf-8'))
+    assert [(r['spider'], r['status']) for r in records] == [('user', 'finished'), ('fan', 'failed')]
+
+    assert auto_spider.main(['--spiders', 'user']) == 0
+
+
+def test_global_rate_limiter_is_shared_across_crawlers(monkeypatch):
+    from scrapy.settings import Settings
+
+    now = [100.0]
+    monkeypatch.setattr(middlewares.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(middlewares.GlobalRateLimitMiddleware, 'limiters', {})
+    settings = Settings({'GLOBAL_RATE_LIMIT': 2, 'GLOBAL_RATE_BURST': 2})
+    first = middlewares.GlobalRateLimitMiddleware.from_crawler(types.SimpleNamespace(settings=settings))
+    second = middlewares.GlobalRateLimitMiddleware.from_crawler(types.SimpleNamespace(settings=settings))
+
+    assert first.limiter is second.limiter
+    # 每秒2个、突发2个：前两个立即放行，之后两个爬虫合计按0.5秒一个排队
+    delays = [mw.limiter.reserve() for mw in (first, second, first, second)]
+    assert delays == [0.0, 0.0, 0.5, 1.0]
+    now[0] += 10
+    assert first.limiter.reserve() == 0.0
+
+
+def test_global_rate_limit_disabled_without_setting():
+    from scrapy.exceptions import NotConfigured
+    from scrapy.settings import Settings
+
+    with pytest.raises(NotConfigured):
+        middlewares.GlobalRateLimitMiddleware.from_crawler(types.SimpleNamespace(settings=Settings()))
@@ -0,0 +1,76 @@
+import logging
+import os
+
+import pytest
+
+import crawl_state
+from crawl_state import CrawlState, IncrementalMixin
+
+
+class FakeSettings(dict):
+    def getbool(self, name, default=False):
+        return bool(self.get(name, default))
+
+
+class FakeSpider(IncrementalMixin):
+    name = 'tweet_spider_by_user_id'
+    logger = logging.getLogger('test_spider')
+
+    def __init__(self, **settings):
+        self.settings = FakeSettings(settings)
+
+
+@pytest.fixture
+def base_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(crawl_state, 'BASE_DIR', str(tmp_path / 'weibospider'))
+    os.makedirs(crawl_state.BASE_DIR)
+    return crawl_state.BASE_DIR
+
+
+def test_relative_path_does_not_depend_on_cwd(base_dir, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    spider = FakeSpider(CRAWL_STATE_PATH='state/crawl.db')
+    os.makedirs(os.path.join(base_dir, 'state'))
+
+    spider.state.save_cursor(spider.name, 'u1', 3)
+    spider.closed('shutdown')
+
+    assert os.path.exists(os.path.join(base_dir, 'state', 'crawl.db'))
+    assert not os.path.exists(tmp_path / 'state')
+
+
+def test_default_and_absolute_paths(tmp_path):
+    assert crawl_state.resolve_path(None) == crawl_state.DEFAULT_PATH
+    assert os.path.isabs(crawl_state.DEFAULT_PATH)
+    assert crawl_state.resolve_path(str(tmp_path / 'x.db')) == str(tmp_path / 'x.db')
+
+
+def test_newest_is_saved_only_when_run_finishes(base_dir):
+    path = os.path.join(base_dir, 'crawl_state.db')
+
+    interrupted = FakeSpider(CRAWL_STATE_PATH=path)
+    assert interrupted.last_state('u1') is None
+    interrupted.save_cursor('u1', 2)
+    interrupted.track('u1', 'm1', '2024-01-02 10:00:00')
+    interrupted.closed('shutdown')
+
+    state = CrawlState(path).get(FakeSpider.name, 'u1')
+    assert state['cursor'] == '2' and state['newest_id'] is None and not state['finished']
+
+    finished = FakeSpider(CRAWL_STATE_PATH=path)
+    assert finished.last_state('u1')['cursor'] == '2'
+    finished.track('u1', 'm1', '2024-01-02 10:00:00')
+    finished.track('u1', 'm2', '2024-01-03 10:00:00')
+    finished.closed('finished')
+
+    state = CrawlState(path).get(FakeSpider.name, 'u1')
+    assert (state['newest_id'], state['cursor'], state['finished']) == ('m2', None, 1)
+    # 全量模式仍登记key，但不返回上次状态
+    assert FakeSpider(CRAWL_STATE_PATH=path, CRAWL_INCREMENTAL=False).last_state('u1') is None
+
+
+def test_filter_unseen_keeps_order(tmp_path):
+    store = CrawlState(str(tmp_path / 'state.db'))
+    store.mark_seen('s', 'k', ['b'])
+    assert store.filter_unseen('s', 'k', ['c', 'b', 'a']) == ['c', 'a']
+    store.close()
@@ -0,0 +1,42 @@
+import datetime
+
+import pytest
+
+import import_output_to_db as importer
+
+DAY = datetime.date(2024, 1, 2)
+
+
+@pytest.fixture
+def fake_import(monkeypatch):
+    """按文件名返回受影响的(明星, 日期)，名字含bad的文件导入时抛错"""
+    imported = []
+
+    def import_file(filepath, force=False, sentiment_workers=None, skip_sentiment=False):
+        imported.append(filepath)
+        if 'bad' in filepath:
+            raise ValueError('损坏的文件')
+        return {(filepath, DAY)}
+
+    monkeypatch.setattr(importer, 'import_file', import_file)
+    return imported
+
+
+def test_sequential_failure_does_not_abort_remaining_files(fake_import, capsys):
+    keys = importer.run_files(['a.jsonl', 'bad.jsonl', 'c.jsonl'], workers=1)
+
+    assert fake_import == ['a.jsonl', 'bad.jsonl', 'c.jsonl']
+    assert keys == {('a.jsonl', DAY), ('c.jsonl', DAY)}
+    assert '导入 bad.jsonl 失败' in capsys.readouterr().out
+
+
+def test_main_refreshes_rollup_after_a_failed_file(fake_import, tmp_path, monkeypatch):
+    for name in ('user_1.jsonl', 'user_bad.jsonl'):
+        (tmp_path / name).write_text('')
+    refreshed = []
+    monkeypatch.setattr(importer, 'ensure_manifest_table', lambda: None)
+    monkeypatch.setattr(importer, 'refresh_star_daily_stats', lambda engine, keys: refreshed.append(keys))
+
+    importer.main(['--output-dir', str(tmp_path)])
+
+    assert refreshed == [{(str(tmp_path / 'user_1.jsonl'), DAY)}]
@@ -0,0 +1,138 @@
+import gzip
+import json
+
+import pytest
+
+import import_output_to_db as importer
+
+
+def write_jsonl(path, records, tail=b''):
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'wb') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        f.write(tail)
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """记录每个事务写入的块和清单位置；插入语句是MySQL方言，这里只记录不执行"""
+    calls = []
+    monkeypatch.setattr(importer, 'insert_many', lambda table, rows, conn=None: calls.append(('insert', list(rows))))
+    monkeypatch.setattr(importer, 'save_entry',
+                        lambda conn, entry, status: calls.append(('save', entry['byte_offset'], status)))
+    return calls
+
+
+class FakeTable:
+    name = 'user_post'
+
+
+def test_reader_stops_before_partial_line_and_resumes(tmp_path):
+    path = tmp_path / 'tweet_spider_by_user_id_1.jsonl'
+    write_jsonl(path, [{'id': 1}, {'id': 2}], tail=b'{"id": 3')
+
+    reader = importer.OffsetReader(str(path))
+    assert [row['id'] for row in importer.iter_jsonl(reader)] == [1, 2]
+    assert not reader.complete
+
+    # 爬虫补写完最后一行后，从上次位置继续读取
+    with open(path, 'ab') as f:
+        f.write(b'}\n')
+    resumed = importer.OffsetReader(str(path), reader.offset)
+    assert [row['id'] for row in importer.iter_jsonl(resumed)] == [3]
+    assert resumed.complete and resumed.offset == path.stat().st_size
+
+
+def test_malformed_lines_are_skipped(tmp_path):
+    path = tmp_path / 'user_1.jsonl'
+    path.write_bytes(b'{"id": 1}\nnot json\n\n{"id": 2}\n')
+
+    assert [row['id'] for row in importer.iter_jsonl(importer.OffsetReader(str(path)))] == [1, 2]
+
+
+def test_rows_are_written_in_bounded_chunks_while_streaming(tmp_path, recorded, monkeypatch):
+    path = tmp_path / 'tweet_spider_by_user_id_1.jsonl.gz'
+    write_jsonl(path, [{'id': i, 'user_id': 'u1', 'created_at': '2024-01-02 10:00:00'} for i in range(10)])
+    entry = importer.new_entry(str(path))
+    reader = importer.OffsetReader(str(path))
+    produced = []
+
+    def rows():
+        for row in importer.iter_jsonl(reader):
+            produced.append(row['id'])
+            yield row
+
+    def insert(table, chunk, conn=None):
+        # 写入第一块时只解析了这一块，整个文件没有被读进内存
+        recorded.append(('insert', [row['id'] for row in chunk], len(produced)))
+
+    monkeypatch.setattr(importer, 'insert_many', insert)
+    keys = importer.import_rows(FakeTable(), rows(), reader, entry, star_field='user_id', chunk_size=4)
+
+    inserts = [call for call in recorded if call[0] == 'insert']
+    assert [call[1] for call in inserts] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert [call[2] for call in inserts] == [4, 8, 10]
+    saves = [call for call in recorded if call[0] == 'save']
+    assert [status for *_, status in saves] == ['partial', 'partial', 'partial', 'done']
+    assert entry['rows_imported'] == 10
+    assert saves[-1][1] == reader.offset
+    assert {celebrity_id for celebrity_id, _ in keys} == {'u1'}
+
+
+@pytest.fixture
+def manifest():
+    """在测试用的SQLite引擎上建清单表，record写入一条上次导入留下的记录"""
+    importer.ensure_manifest_table()
+
+    def record(entry, status='partial'):
+        with importer.engine.begin() as conn:
+            conn.execute(importer.text("""
+                INSERT OR REPLACE INTO import_manifest
+                    (path, size, mtime, head_sha1, head_bytes, byte_offset, rows_imported, status)
+                VALUES (:path, :size, :mtime, :head_sha1, :head_bytes, :byte_offset, :rows_imported, :status)
+            """), dict(entry, status=status))
+
+    yield record
+    with importer.engine.begin() as conn:
+        conn.execute(importer.text("DROP TABLE import_manifest"))
+
+
+def write_comments(path, rows):
+    path.write_text('\n'.join(['序号,id,bid,user_id'] + rows) + '\n', encoding='utf-8-sig')
+
+
+def test_appended_file_resumes_from_manifest_offset(tmp_path, manifest):
+    path = tmp_path / 'user_1.jsonl'
+    write_jsonl(path, [{'id': 1}, {'id': 2}])
+    entry = importer.new_entry(str(path))
+    entry.update(byte_offset=path.stat().st_size, rows_imported=2)
+    manifest(entry, 'done')
+
+    with open(path, 'ab') as f:
+        f.write(b'{"id": 3}\n')
+    resumed = importer.load_entry(str(path))
+    assert (resumed['byte_offset'], resumed['rows_imported']) == (entry['byte_offset'], 2)
+
+
+def test_rewritten_comment_csv_is_imported_from_start(tmp_path, manifest):
+    path = tmp_path / '明星_PwsW62Q5H_评论(Min版).csv'
+    write_comments(path, ['1,a,PwsW62Q5H,100', '2,b,PwsW62Q5H,101'])
+    entry = importer.new_entry(str(path))
+    entry.update(byte_offset=path.stat().st_size, rows_imported=2)
+    manifest(entry, 'done')
+
+    # 重新抓取后原地重写：文件更大，开头是新的评论，旧位置落在一行中间
+    write_comments(path, ['1,c,PwsW62Q5H,200', '2,d,PwsW62Q5H,201', '3,a,PwsW62Q5H,100', '4,b,PwsW62Q5H,101'])
+    assert path.stat().st_size > entry['byte_offset']
+    assert importer.load_entry(str(path))['byte_offset'] == 0
+
+
+def test_offset_inside_a_line_is_not_resumed(tmp_path, manifest):
+    path = tmp_path / 'user_1.jsonl'
+    write_jsonl(path, [{'id': 1}, {'id': 2}])
+    entry = importer.new_entry(str(path))
+    entry.update(byte_offset=path.stat().st_size - 3, rows_imported=1)
+    manifest(entry)
+
+    assert importer.load_entry(str(path))['byte_offset'] == 0
@@ -0,0 +1,88 @@
+import gzip
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import pipelines
+from import_output_to_db import OffsetReader, iter_jsonl
+from pipelines import JsonWriterPipeline
+
+SPIDER = SimpleNamespace(name='tweet_spider_by_keyword', logger=SimpleNamespace(info=lambda message: None))
+
+
+def run_items(pipeline, count):
+    pipeline.open_spider(SPIDER)
+    for i in range(count):
+        pipeline.process_item({'id': i, 'content': '内容' * 20}, SPIDER)
+
+
+def read_all(output_dir):
+    items = []
+    for name in sorted(os.listdir(output_dir), key=lambda name: (len(name), name)):
+        items.extend(row['id'] for row in iter_jsonl(OffsetReader(os.path.join(output_dir, name))))
+    return items
+
+
+def test_buffer_is_written_only_when_full(tmp_path):
+    pipeline = JsonWriterPipeline(str(tmp_path), buffer_size=1024, flush_interval=3600)
+    pipeline.flushed_at = float('inf')  # 不按时间写盘
+    run_items(pipeline, 3)
+    assert pipeline.file is None and pipeline.items == 3
+
+    run_items(pipeline, 20)
+    assert pipeline.file is not None
+    assert pipeline.buffer_bytes < 1024
+
+    pipeline.close_spider(SPIDER)
+    assert read_all(tmp_path) == list(range(3)) + list(range(20))
+
+
+def test_rotates_by_size_without_splitting_lines(tmp_path):
+    pipeline = JsonWriterPipeline(str(tmp_path), buffer_size=1, max_bytes=1000)
+    run_items(pipeline, 30)
+    pipeline.close_spider(SPIDER)
+
+    files = os.listdir(tmp_path)
+    assert len(files) > 1
+    assert all(os.path.getsize(tmp_path / name) <= 1000 for name in files)
+    assert read_all(tmp_path) == list(range(30))
+
+
+def test_rotates_by_time(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pipelines.time, 'monotonic', lambda: now[0])
+    pipeline = JsonWriterPipeline(str(tmp_path), buffer_size=1, rotate_seconds=60)
+
+    run_items(pipeline, 2)
+    now[0] += 61
+    pipeline.process_item({'id': 2}, SPIDER)
+    pipeline.close_spider(SPIDER)
+
+    assert len(os.listdir(tmp_path)) == 2
+    assert read_all(tmp_path) == [0, 1, 2]
+
+
+@pytest.mark.parametrize('compression, suffix', [('gzip', '.gz'), ('zstd', '.zst')])
+def test_compressed_file_is_published_on_close(tmp_path, compression, suffix):
+    if compression == 'zstd' and pipelines.zstandard is None:
+        pytest.skip('未安装zstandard')
+    pipeline = JsonWriterPipeline(str(tmp_path), buffer_size=1, compression=compression)
+    run_items(pipeline, 5)
+
+    # 写入期间只有 .part 文件，导入脚本看不到未写完的压缩流
+    assert [name.endswith(suffix + '.part') for name in os.listdir(tmp_path)] == [True]
+
+    pipeline.close_spider(SPIDER)
+    names = os.listdir(tmp_path)
+    assert len(names) == 1 and names[0].endswith('.jsonl' + suffix)
+    assert read_all(tmp_path) == list(range(5))
+    if compression == 'gzip':
+        with gzip.open(tmp_path / names[0], 'rt', encoding='utf-8') as f:
+            assert 'crawl_time' in json.loads(f.readline())
+
+
+def test_rejects_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        JsonWriterPipeline(str(tmp_path), compression='bz2')
@@ -0,0 +1,60 @@
+import pytest
+
+# 表结构和索引在 app/models.py 中用Flask-SQLAlchemy声明
+pytest.importorskip('flask_sqlalchemy')
+pytest.importorskip('flask_login')
+
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+
+import check_query_plans
+from app import queries
+from weibospider import rollup
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return check_query_plans.build_engine()
+
+
+def test_every_shared_query_is_checked():
+    checked = {id(statement) for _, statement, _ in check_query_plans.HOT_QUERIES}
+    shared = [value for name, value in vars(queries).items() if name.endswith('_SQL') and isinstance(value, TextClause)]
+
+    assert shared
+    assert {id(statement) for statement in shared} <= checked
+    assert {id(rollup.POST_SQL), id(rollup.COMMENT_SQL), id(rollup.KEYWORD_SQL)} <= checked
+
+
+def test_hot_queries_use_indexes(engine, capsys):
+    assert check_query_plans.check(engine) == 0
+    assert '全表扫描' not in capsys.readouterr().out
+
+
+def test_check_reports_full_scans_without_indexes(capsys):
+    engine = check_query_plans.build_engine(drop_indexes=True)
+
+    assert check_query_plans.check(engine) > 0
+    out = capsys.readouterr().out
+    assert '❌ 全表扫描 report_api.hot_weibo' in out
+    assert '❌ 全表扫描 star_api.get_negative_events' in out
+
+
+def test_hot_queries_run_on_synthetic_data(engine):
+    with engine.connect() as conn:
+        for name, statement, params in check_query_plans.HOT_QUERIES:
+            conn.execute(text(check_query_plans.select_part(statement)), params).fetchall()
+        hot_weibo = conn.execute(queries.HOT_WEIBO_SQL, {'star_id': check_query_plans.STAR_ID}).fetchall()
+        comments = conn.execute(queries.HOT_COMMENTS_SQL, {'mblog_id': hot_weibo[0].mblogid}).fetchall()
+
+    assert len(hot_weibo) == 1
+    assert len(comments) == 5
+    assert [row.likes for row in comments] == sorted((row.likes for row in comments), reverse=True)
+
+
+def test_select_part_strips_insert_and_upsert():
+    sql = check_query_plans.select_part(rollup.KEYWORD_SQL)
+
+    assert sql.lstrip().startswith('SELECT keyword_id')
+    assert 'INSERT' not in sql and 'DUPLICATE' not in sql
+    assert check_query_plans.select_part(queries.HOT_WEIBO_SQL) == str(queries.HOT_WEIBO_SQL)
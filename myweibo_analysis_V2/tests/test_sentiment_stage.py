@@ -0,0 +1,40 @@
+import sentiment_stage
+from sentiment_stage import SentimentScorer
+
+
+def make_scorer(monkeypatch, cache_size):
+    scored = []
+
+    def fake_score(texts):
+        scored.append(list(texts))
+        return [0.5 for _ in texts]
+
+    monkeypatch.setattr(sentiment_stage, 'score_texts', fake_score)
+    return SentimentScorer(workers=1, cache_size=cache_size), scored
+
+
+def test_cache_hits_survive_eviction_within_a_batch(monkeypatch):
+    scorer, scored = make_scorer(monkeypatch, cache_size=4)
+
+    scorer.score(['a', 'b', 'c', 'd'])
+    assert scorer.score(['a', 'x', 'y']) == [0.5, 0.5, 0.5]
+    assert scored[-1] == ['x', 'y']
+    # a 命中后变为最近使用，被淘汰的是最久未用的 b、c
+    assert list(scorer.cache) == ['d', 'a', 'x', 'y']
+
+
+def test_batch_larger_than_cache_returns_every_score(monkeypatch):
+    scorer, _ = make_scorer(monkeypatch, cache_size=2)
+
+    assert scorer.score(['a', 'b', 'c', None, 'a']) == [0.5] * 5
+    assert len(scorer.cache) == 2
+
+
+def test_apply_keeps_rows_whose_text_was_cached(monkeypatch):
+    scorer, _ = make_scorer(monkeypatch, cache_size=4)
+    scorer.score(['a', 'b', 'c', 'd'])
+
+    rows = scorer.apply([{'content': 'a'}, {'content': 'x'}, {'content': 'y'}])
+
+    assert [row['sentiment_score'] for row in rows] == [0.5, 0.5, 0.5]
+    assert scorer.deduplicated == 1
@@ -0,0 +1,25 @@
+import pytest
+
+pytest.importorskip('scrapy')
+
+from scrapy.core.downloader.middleware import DownloaderMiddlewareManager
+from scrapy.utils.test import get_crawler
+
+import adaptive_proxy
+import middlewares
+from api.datacrawl.datacrawl.weibo_spider import adaptive_proxy as shared
+
+
+def test_spider_uses_the_shared_implementation():
+    # 代理池和限速的行为测试在仓库根目录的 tests/test_adaptive_proxy.py
+    assert adaptive_proxy.AdaptiveProxyMiddleware is shared.AdaptiveProxyMiddleware
+    assert middlewares.AdaptiveProxyMiddleware is shared.AdaptiveProxyMiddleware
+    assert middlewares.ProxyPool is shared.ProxyPool
+
+
+def test_settings_path_loads_the_middleware():
+    crawler = get_crawler(settings_dict={
+        'DOWNLOADER_MIDDLEWARES': {'middlewares.AdaptiveProxyMiddleware': 560},
+    })
+    manager = DownloaderMiddlewareManager.from_crawler(crawler)
+    assert any(isinstance(mw, shared.AdaptiveProxyMiddleware) for mw in manager.middlewares)
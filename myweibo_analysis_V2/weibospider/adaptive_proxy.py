@@ -0,0 +1,17 @@
+# encoding: utf-8
+"""
+自适应代理与接口限速
+
+实现在 api/datacrawl/datacrawl/weibo_spider/adaptive_proxy.py，两个爬虫项目共用；
+这里把仓库根目录加入sys.path后按包名导入并转出，settings中仍可按 adaptive_proxy.AdaptiveProxyMiddleware 引用。
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 追加到末尾，weibospider中的config、models等模块仍优先于仓库根目录下的同名模块
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from api.datacrawl.datacrawl.weibo_spider.adaptive_proxy import (  # noqa: E402,F401
+    ENDPOINTS, THROTTLE_CODES, AdaptiveProxyMiddleware, EndpointLimiter, ProxyPool, endpoint_of)
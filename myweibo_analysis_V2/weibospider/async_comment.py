@@ -0,0 +1,231 @@
+"""
+异步评论爬虫
+
+与 comment.py 输出相同格式的 `{博主名}_{微博ID}_评论(Min版).csv`，区别在于：
+- 一级评论翻页、二级评论都放进同一个任务队列，由固定数量的协程消费，不再递归
+- 所有请求复用同一个 aiohttp 会话和连接池，cookie 只在启动时读取一次
+- 用令牌桶控制全局请求速率，代替每100条固定休眠5秒
+- 一次运行可以爬取多条微博
+
+用法:
+    python async_comment.py https://weibo.com/6290114447/PwlQ17pIq https://weibo.com/xxx/yyy
+    python async_comment.py --url-file urls.txt --workers 8 --rate 5
+    python async_comment.py --base-url http://127.0.0.1:8080 ...   # 指向本地回放服务调试
+"""
+import os
+import csv
+import time
+import asyncio
+import argparse
+import aiohttp
+from comment import get_data, get_keyword
+
+CSV_HEADER = ['序号', '评论标识号', '上级评论', '用户标识符', '时间', '用户名', '性别', '评论内容', '评论点赞数',
+              '评论回复数', '粉丝牌', '评论IP', '用户简介', '是否认证', '会员等级', '用户粉丝数', '用户关注数', '用户转赞评数']
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+
+class TokenBucket:
+    """令牌桶限速：平均每秒rate个请求，允许capacity个请求的突发"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = None
+
+    async def acquire(self):
+        # 锁在事件循环内创建，避免绑定到其他循环
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class PostJob:
+    """一条微博的爬取状态和输出文件"""
+
+    def __init__(self, url, uid, mid, max_comments):
+        self.url = url
+        self.uid = uid
+        self.mid = mid
+        self.bid = url.rstrip('/').split('/')[-1]
+        self.max_comments = max_comments
+        self.count = 0
+        self.file = None
+        self.writer = None
+
+    @property
+    def full(self):
+        return self.count >= self.max_comments
+
+    def open(self, save_dir, name):
+        self.path = os.path.join(save_dir, f'{name}_{self.bid}_评论(Min版).csv')
+        self.file = open(self.path, mode='w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(CSV_HEADER)
+
+    def write(self, data, fetch_level):
+        self.count += 1
+        idstr, rootidstr, created_at, user_id, screen_name, text_raw, like, total_number, com_source, fansIcon, followers_count, friends_count, total_cnt, description, verified, gender, svip = get_data(data)
+        if fetch_level == 0:
+            rootidstr = ''
+        self.writer.writerow([self.count, idstr, rootidstr, user_id, created_at, screen_name, gender, text_raw, like, total_number, fansIcon, com_source, description, verified, svip, followers_count, friends_count, total_cnt])
+        return idstr, total_number
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class CommentCrawler:
+    """基于任务队列的异步评论爬虫"""
+
+    def __init__(self, cookie='', base_url='https://weibo.com', workers=8, rate=5.0,
+                 max_comments=300, save_dir='../output/', retries=2):
+        self.headers = {"User-Agent": USER_AGENT, "Cookie": cookie}
+        self.base_url = base_url.rstrip('/')
+        self.workers = workers
+        self.bucket = TokenBucket(rate)
+        self.max_comments = max_comments
+        self.save_dir = save_dir
+        self.retries = retries
+        self.requests = 0
+        self.failures = 0
+
+    async def fetch_json(self, session, path, params):
+        """限速后请求接口，失败时按指数退避重试，最终失败返回None"""
+        for attempt in range(self.retries + 1):
+            await self.bucket.acquire()
+            self.requests += 1
+            try:
+                async with session.get(f'{self.base_url}{path}', params=params) as resp:
+                    resp.raise_for_status()
+                    return await resp.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                if attempt == self.retries:
+                    self.failures += 1
+                    print(f"请求失败: {path} {params.get('id')} {e}")
+                    return None
+                await asyncio.sleep(2 ** attempt)
+
+    async def get_name(self, session, uid):
+        """根据UID返回博主的用户名"""
+        data = await self.fetch_json(session, '/ajax/profile/info', {'custom': uid})
+        try:
+            return data['data']['user']['screen_name']
+        except (TypeError, KeyError):
+            return "未知用户"
+
+    async def worker(self, session, queue):
+        while True:
+            job, mid, max_id, fetch_level = await queue.get()
+            try:
+                if not job.full:
+                    await self.crawl_page(session, queue, job, mid, max_id, fetch_level)
+            except Exception as e:
+                print(f"处理 {job.url} 出错: {e}")
+            finally:
+                queue.task_done()
+
+    async def crawl_page(self, session, queue, job, mid, max_id, fetch_level):
+        """抓取一页评论，二级评论和下一页作为新任务放回队列"""
+        params = {
+            'flow': 1, 'is_reload': 1, 'id': mid, 'is_show_bulletin': 2, 'is_mix': 0,
+            'count': 20, 'uid': job.uid, 'fetch_level': fetch_level, 'locale': 'zh-CN'
+        }
+        if max_id is not None:
+            params['max_id'] = max_id
+        resp_data = await self.fetch_json(session, '/ajax/statuses/buildComments', params)
+        if not resp_data:
+            return
+
+        for data in resp_data.get('data', []):
+            if job.full:
+                return
+            idstr, total_number = job.write(data, fetch_level)
+            # 存在二级评论时加入队列
+            if total_number > 0 and fetch_level == 0:
+                queue.put_nowait((job, idstr, 0, 1))
+
+        # 下一页
+        next_max_id = resp_data.get('max_id', 0)
+        if next_max_id != 0 and not job.full:
+            queue.put_nowait((job, mid, next_max_id, fetch_level))
+
+    async def crawl(self, urls):
+        """爬取多条微博的评论，返回每条微博的输出文件和评论数"""
+        os.makedirs(self.save_dir, exist_ok=True)
+        queue = asyncio.Queue()
+        jobs = []
+        connector = aiohttp.TCPConnector(limit=self.workers)
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(headers=self.headers, connector=connector, timeout=timeout) as session:
+            for url in urls:
+                uid, mid = get_keyword(url)
+                job = PostJob(url, uid, mid, self.max_comments)
+                job.open(self.save_dir, await self.get_name(session, uid))
+                jobs.append(job)
+                queue.put_nowait((job, mid, None, 0))
+
+            tasks = [asyncio.create_task(self.worker(session, queue)) for _ in range(self.workers)]
+            try:
+                await queue.join()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                for job in jobs:
+                    job.close()
+        return [{'url': job.url, 'path': job.path, 'count': job.count} for job in jobs]
+
+
+def read_cookie(path='cookie.txt'):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except Exception as e:
+        print(f"获取Cookie失败: {e}")
+        return ''
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='异步爬取微博评论')
+    parser.add_argument('urls', nargs='*', help='微博链接，如 https://weibo.com/6290114447/PwlQ17pIq')
+    parser.add_argument('--url-file', help='每行一个微博链接的文本文件')
+    parser.add_argument('--workers', type=int, default=8, help='并发协程数')
+    parser.add_argument('--rate', type=float, default=5.0, help='每秒最多请求数')
+    parser.add_argument('--max-comments', type=int, default=300, help='每条微博最多爬取的评论数')
+    parser.add_argument('--cookie-file', default='cookie.txt')
+    parser.add_argument('--base-url', default='https://weibo.com', help='接口地址，调试时可指向本地回放服务')
+    parser.add_argument('--output-dir', default='../output/')
+    args = parser.parse_args(argv)
+
+    urls = list(args.urls)
+    if args.url_file:
+        with open(args.url_file, 'r', encoding='utf-8') as f:
+            urls.extend(line.strip() for line in f if line.strip())
+    if not urls:
+        parser.error('请提供至少一个微博链接')
+
+    start = time.time()
+    crawler = CommentCrawler(read_cookie(args.cookie_file), args.base_url, args.workers, args.rate,
+                             args.max_comments, args.output_dir)
+    results = asyncio.run(crawler.crawl(urls))
+    for result in results:
+        print(f"{result['path']}: {result['count']}条")
+    total = sum(result['count'] for result in results)
+    print(f"评论爬取完成，共计{total}条，请求{crawler.requests}次，失败{crawler.failures}次，"
+          f"耗时{(time.time() - start) / 60:.2f}分")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,15 +2,22 @@
 # -*- coding: utf-8 -*-
 """
 自动化爬虫脚本
-读取weibo_user.txt文件中的用户ID，自动运行相关爬虫
+读取weibo_user.txt文件中的用户ID，在同一个进程中并行运行相关爬虫
+
+用法:
+    python auto_spider.py --max-parallel 2
+    python auto_spider.py --spiders tweet_by_user_id,fan --full
 """
 
 import os
 import sys
-import subprocess
 import time
-from datetime import datetime
 import json
+import argparse
+from datetime import datetime
+
+# 默认运行的爬虫，按weibo_user.txt中的用户和关键词传入目标
+DEFAULT_SPIDERS = ['tweet_by_user_id', 'user', 'fan', 'tweet_by_keyword']
 
 def read_user_ids(file_path='weibo_user.txt'):
     """读取用户ID文件，格式：姓名 ID"""
@@ -43,65 +50,6 @@ def read_user_ids(file_path='weibo_user.txt'):
         print(f"Error: 读取文件时出错: {e}")
         return []
 
-def update_spider_file(spider_file, user_ids):
-    """更新爬虫文件中的user_ids"""
-    try:
-        with open(spider_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 查找并替换user_ids
-        if 'user_ids = [' in content:
-            # 构建新的user_ids字符串
-            new_user_ids = "['" + "','".join(user_ids) + "']"
-            
-            # 替换user_ids行
-            import re
-            pattern = r"user_ids = \[.*?\]"
-            new_content = re.sub(pattern, f"user_ids = {new_user_ids}", content)
-            
-            # 写回文件
-            with open(spider_file, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            
-            print(f"已更新 {spider_file} 中的用户ID")
-            return True
-        else:
-            print(f"Warning: 在 {spider_file} 中未找到 user_ids 配置")
-            return False
-            
-    except Exception as e:
-        print(f"Error: 更新 {spider_file} 时出错: {e}")
-        return False
-
-def run_spider(spider_name, output_dir='output'):
-    """运行指定的爬虫"""
-    import platform
-    import os
-    import subprocess
-    try:
-        print(f"开始运行爬虫: {spider_name}")
-        # 确保输出目录存在
-        os.makedirs(output_dir, exist_ok=True)
-        # 运行爬虫命令，强制cwd为weibospider目录
-        weibospider_dir = os.path.dirname(os.path.abspath(__file__))
-        cmd = ['python', 'run_spider.py', spider_name]
-        if platform.system() == 'Windows':
-            result = subprocess.run(cmd, cwd=weibospider_dir, capture_output=True, text=True, encoding='cp936', errors='ignore')
-        else:
-            result = subprocess.run(cmd, cwd=weibospider_dir, capture_output=True, text=True, encoding='utf-8', errors='ignore')
-        if result.returncode == 0:
-            print(f"Success: {spider_name} 运行成功")
-            if result.stdout:
-                print(f"输出: {result.stdout}")
-        else:
-            print(f"Error: {spider_name} 运行失败")
-            if result.stderr:
-                print(f"错误: {result.stderr}")
-        return result.returncode == 0
-    except Exception as e:
-        print(f"Error: 运行 {spider_name} 时出错: {e}")
-        return False
-
 def read_names(file_path='weibo_user.txt'):
     """读取姓名列表"""
     names = []
@@ -133,104 +81,112 @@ def read_name_id_map(file_path='weibo_user.txt'):
         print(f"Error: 读取姓名ID映射时出错: {e}")
     return name_id_map
 
-def update_keyword_spider_file(spider_file, keywords, name_id_map):
-    """更新爬虫文件中的keywords和name_id_map"""
-    try:
-        with open(spider_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        if 'keywords = [' in content:
-            new_keywords = "['" + "','".join(keywords) + "']"
-            import re
-            pattern = r"keywords = \[.*?\]"
-            new_content = re.sub(pattern, f"keywords = {new_keywords}", content)
-            # 写入 name_id_map
-            if 'name_id_map =' in new_content:
-                pattern2 = r"name_id_map = \{.*?\}\n"
-                new_content = re.sub(pattern2, f"name_id_map = {json.dumps(name_id_map, ensure_ascii=False)}\n", new_content)
-            else:
-                new_content = "name_id_map = " + json.dumps(name_id_map, ensure_ascii=False) + "\n" + new_content
-            with open(spider_file, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            print(f"已更新 {spider_file} 中的 keywords 和 name_id_map")
-            return True
-        else:
-            print(f"Warning: 在 {spider_file} 中未找到 keywords 配置")
-            return False
-    except Exception as e:
-        print(f"Error: 更新 {spider_file} 时出错: {e}")
-        return False
+def build_jobs(user_ids, names, name_id_map, spiders, full=False):
+    """根据用户列表生成爬虫任务，目标通过爬虫参数传入，不再改写爬虫源码"""
+    user_arg = ','.join(user_ids)
+    jobs = []
+    for spider in spiders:
+        kwargs = {'keywords': ','.join(names), 'name_id_map': json.dumps(name_id_map, ensure_ascii=False)} \
+            if spider == 'tweet_by_keyword' else {'user_ids': user_arg}
+        if full:
+            kwargs['full'] = '1'
+        jobs.append((spider, kwargs))
+    return jobs
+
+def run_spiders(jobs, max_parallel=2):
+    """
+    在同一个CrawlerProcess中并行运行爬虫，同时运行的爬虫数不超过max_parallel
 
-def main():
+    所有爬虫共享 settings 中的 GLOBAL_RATE_LIMIT 全局限速，返回每个爬虫的运行统计。
+    """
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from twisted.internet import defer
+    from run_spider import MODE_TO_SPIDER
+
+    os.environ['SCRAPY_SETTINGS_MODULE'] = 'settings'
+    process = CrawlerProcess(get_project_settings())
+    semaphore = defer.DeferredSemaphore(max_parallel)
+    summary = []
+
+    def crawl(name, kwargs):
+        crawler = process.create_crawler(MODE_TO_SPIDER[name])
+        record = {'spider': name, 'started': time.time()}
+        summary.append(record)
+        print(f"开始运行爬虫: {name}")
+
+        def finished(result):
+            if result is not None:
+                print(f"Error: 运行 {name} 时出错: {result.getErrorMessage()}")
+            stats = crawler.stats.get_stats()
+            record['elapsed'] = time.time() - record.pop('started')
+            record['items'] = stats.get('item_scraped_count', 0)
+            record['requests'] = stats.get('downloader/request_count', 0)
+            record['errors'] = stats.get('log_count/ERROR', 0)
+            record['rate_limit_wait'] = round(stats.get('global_rate_limit/wait_seconds', 0), 1)
+            record['status'] = stats.get('finish_reason', 'failed') if result is None else 'failed'
+            print(f"爬虫 {name} 结束: {record['status']}，{record['items']}条，耗时{record['elapsed']:.1f}秒")
+
+        d = process.crawl(crawler, **kwargs)
+        d.addBoth(finished)
+        return d
+
+    # 排队中的爬虫在前面的爬虫结束时才调用crawl，join会一直等到没有运行中的爬虫
+    for name, kwargs in jobs:
+        semaphore.run(crawl, name, kwargs)
+    process.start()
+    return summary
+
+def print_summary(summary, output_dir='output'):
+    """输出每个爬虫的耗时和数据量，并保存为json"""
+    print(f"\n{'爬虫':<20}{'状态':<10}{'数据条数':>8}{'请求数':>8}{'错误':>6}{'限速等待(秒)':>12}{'耗时(秒)':>10}")
+    for record in summary:
+        print(f"{record['spider']:<20}{record['status']:<10}{record['items']:>8}{record['requests']:>8}"
+              f"{record['errors']:>6}{record['rate_limit_wait']:>12}{record['elapsed']:>10.1f}")
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"spider_summary_{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"运行统计已保存到: {path}")
+
+def main(argv=None):
     """主函数"""
+    parser = argparse.ArgumentParser(description='读取weibo_user.txt并行运行爬虫')
+    parser.add_argument('--spiders', default=','.join(DEFAULT_SPIDERS), help='要运行的爬虫，逗号分隔')
+    parser.add_argument('--max-parallel', type=int, default=2, help='同时运行的爬虫数')
+    parser.add_argument('--full', action='store_true', help='忽略增量状态，全量爬取')
+    args = parser.parse_args(argv)
+
+    # 爬虫配置和cookie都按weibospider目录的相对路径读取
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.getcwd())
+
     print("开始自动化爬虫任务")
     print(f"开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("-" * 60)
     
-    # 1. 读取用户ID
+    # 1. 读取用户ID和关键词
     user_ids = read_user_ids()
     if not user_ids:
         print("Error: 没有读取到用户ID，程序退出")
-        return
-    
-    # 2. 定义需要更新的爬虫文件
-    spider_files = [
-        'spiders/user.py',
-        'spiders/fan.py', 
-        'spiders/tweet_by_user_id.py'
-    ]
-    
-    # 3. 更新爬虫文件中的用户ID
-    print("\n更新爬虫文件中的用户ID...")
-    for spider_file in spider_files:
-        if os.path.exists(spider_file):
-            update_spider_file(spider_file, user_ids)
-        else:
-            print(f"Warning: 文件不存在: {spider_file}")
-    
-    # 4. 先运行 tweet_by_user_id 爬虫
-    print("\n========== 调试 tweet_by_user_id 爬虫 ==========")
-    print("准备运行 tweet_by_user_id 爬虫...")
-    tweet_debug_success = run_spider('tweet_by_user_id')
-    print(f"tweet_by_user_id 爬虫运行结果: {tweet_debug_success}")
-    print("========== tweet_by_user_id 调试结束 ==========")
-    
-    # 5. 运行其他爬虫
-    print("\n开始运行其他爬虫...")
-    spiders_to_run = ['user', 'fan']
-    
-    success_count = 0
-    for spider in spiders_to_run:
-        print(f"\n{'='*50}")
-        print(f"运行爬虫: {spider}")
-        print(f"{'='*50}")
-        
-        if run_spider(spider):
-            success_count += 1
-        
-        # 爬虫之间稍作休息
-        if spider != spiders_to_run[-1]:  # 不是最后一个爬虫
-            print("等待5秒后运行下一个爬虫...")
-            time.sleep(5)
-    
-    # 6. 处理关键词爬虫
-    print("\n处理关键词爬虫...")
+        return 1
     names = read_names()
     name_id_map = read_name_id_map()
-    keyword_spider_file = 'spiders/tweet_by_keyword.py'
-    if os.path.exists(keyword_spider_file):
-        update_keyword_spider_file(keyword_spider_file, names, name_id_map)
-        print("运行 tweet_by_keyword 爬虫...")
-        run_spider('tweet_by_keyword')
-    else:
-        print(f"Warning: 文件不存在: {keyword_spider_file}")
     
-    # 7. 输出结果
+    # 2. 并行运行爬虫
+    jobs = build_jobs(user_ids, names, name_id_map, [s for s in args.spiders.split(',') if s], args.full)
+    summary = run_spiders(jobs, args.max_parallel)
+    
+    # 3. 输出结果
+    print_summary(summary)
+    success_count = sum(1 for record in summary if record['status'] == 'finished')
     print(f"\n{'='*60}")
     print(f"爬虫任务完成!")
     print(f"结束时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"成功运行: {success_count}/2 个爬虫 + tweet_by_user_id + 关键词爬虫")
+    print(f"成功运行: {success_count}/{len(summary)} 个爬虫")
     print(f"输出目录: {os.path.abspath('output')}")
     print(f"{'='*60}")
+    return 0 if success_count == len(summary) else 1
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+爬取状态存储
+
+每天重复爬取同一批明星时，大部分页面都是上次已经爬过的内容。这里用一个本地 SQLite 文件
+按(爬虫, 用户/关键词/微博)记录：
+- newest_id / newest_time: 上次完整运行看到的最新一条（微博mblogid、粉丝ID、评论ID）及其时间
+- cursor: 本次运行翻到的页码或max_id，运行中断后下次从这里继续
+- seen: 已经请求过详情的微博ID，用于跨运行去重
+
+增量运行时，爬虫翻页遇到已经见过的内容就停止。newest_* 只在爬虫正常结束时写入，
+中断的运行不会让下次跳过没爬完的部分。
+
+查看状态:
+    python crawl_state.py
+清除某个爬虫的状态（下次全量爬取）:
+    python crawl_state.py --reset tweet_spider_by_user_id
+"""
+import os
+import sqlite3
+import argparse
+import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = os.path.join(BASE_DIR, 'crawl_state.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_state (
+    spider TEXT NOT NULL,
+    key TEXT NOT NULL,
+    newest_id TEXT,
+    newest_time TEXT,
+    cursor TEXT,
+    finished INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT,
+    PRIMARY KEY (spider, key)
+);
+CREATE TABLE IF NOT EXISTS crawl_seen (
+    spider TEXT NOT NULL,
+    key TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    PRIMARY KEY (spider, key, item_id)
+);
+"""
+
+
+class CrawlState(object):
+    """爬取状态的读写"""
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_PATH
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def get(self, spider, key):
+        """返回状态字典，没有记录时返回None"""
+        row = self.conn.execute(
+            'SELECT * FROM crawl_state WHERE spider = ? AND key = ?', (spider, str(key))
+        ).fetchone()
+        return dict(row) if row else None
+
+    def save_cursor(self, spider, key, cursor):
+        """记录翻页进度，同时标记本轮尚未完成"""
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO crawl_state (spider, key, cursor, finished, updated_at) VALUES (?, ?, ?, 0, ?)
+                ON CONFLICT (spider, key) DO UPDATE SET
+                    cursor = excluded.cursor, finished = 0, updated_at = excluded.updated_at
+            """, (spider, str(key), str(cursor), _now()))
+
+    def finish(self, spider, key, newest_id=None, newest_time=None):
+        """本轮爬取完成：清除进度，更新最新一条；newest为空时保留原值"""
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO crawl_state (spider, key, newest_id, newest_time, cursor, finished, updated_at)
+                VALUES (?, ?, ?, ?, NULL, 1, ?)
+                ON CONFLICT (spider, key) DO UPDATE SET
+                    newest_id = COALESCE(excluded.newest_id, newest_id),
+                    newest_time = COALESCE(excluded.newest_time, newest_time),
+                    cursor = NULL, finished = 1, updated_at = excluded.updated_at
+            """, (spider, str(key), newest_id, newest_time, _now()))
+
+    def filter_unseen(self, spider, key, item_ids):
+        """返回item_ids中尚未见过的ID，保持原顺序"""
+        item_ids = [str(item_id) for item_id in item_ids]
+        if not item_ids:
+            return []
+        placeholders = ','.join('?' * len(item_ids))
+        seen = {row[0] for row in self.conn.execute(
+            f'SELECT item_id FROM crawl_seen WHERE spider = ? AND key = ? AND item_id IN ({placeholders})',
+            [spider, str(key)] + item_ids
+        )}
+        return [item_id for item_id in item_ids if item_id not in seen]
+
+    def mark_seen(self, spider, key, item_ids):
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO crawl_seen (spider, key, item_id) VALUES (?, ?, ?)',
+                [(spider, str(key), str(item_id)) for item_id in item_ids]
+            )
+
+    def reset(self, spider=None):
+        """清除状态，spider为空时清除全部"""
+        with self.conn:
+            for table in ('crawl_state', 'crawl_seen'):
+                if spider:
+                    self.conn.execute(f'DELETE FROM {table} WHERE spider = ?', (spider,))
+                else:
+                    self.conn.execute(f'DELETE FROM {table}')
+
+    def rows(self):
+        return [dict(row) for row in self.conn.execute('SELECT * FROM crawl_state ORDER BY spider, key')]
+
+    def close(self):
+        self.conn.close()
+
+
+def _now():
+    return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def resolve_path(path):
+    """CRAWL_STATE_PATH 为空时使用默认位置，相对路径按weibospider目录解析，与启动时的工作目录无关"""
+    if not path:
+        return DEFAULT_PATH
+    return path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+
+
+class IncrementalMixin(object):
+    """
+    爬虫增量爬取的公共逻辑
+
+    通过 -a full=1 或设置 CRAWL_INCREMENTAL = False 关闭增量（仍会记录状态）。
+    爬虫在解析时调用 track() 记录本轮看到的最新一条，正常结束时统一写入状态库。
+    """
+
+    _state = None
+
+    @property
+    def state(self):
+        if self._state is None:
+            self._state = CrawlState(resolve_path(self.settings.get('CRAWL_STATE_PATH')))
+            self.newest = {}
+            self.keys = []
+            self.skipped_pages = 0
+        return self._state
+
+    @property
+    def incremental(self):
+        if str(getattr(self, 'full', '')).lower() in ('1', 'true', 'yes'):
+            return False
+        return self.settings.getbool('CRAWL_INCREMENTAL', True)
+
+    def last_state(self, key):
+        """登记本轮要爬取的key；增量模式下返回上次的状态，全量模式返回None"""
+        state = self.state.get(self.name, key)
+        if key not in self.keys:
+            self.keys.append(key)
+        return state if self.incremental else None
+
+    def save_cursor(self, key, cursor):
+        self.state.save_cursor(self.name, key, cursor)
+
+    def track(self, key, item_id, created_at=None):
+        """记录key本轮看到的最新一条：有时间时按时间比较，否则保留第一次记录的"""
+        self.state  # 确保已初始化
+        current = self.newest.get(key)
+        if current is None or (created_at and (current[1] or '') < created_at):
+            self.newest[key] = (str(item_id), created_at)
+
+    def closed(self, reason):
+        if self._state is None:
+            return
+        if reason == 'finished':
+            for key in self.keys:
+                newest_id, newest_time = self.newest.get(key, (None, None))
+                self.state.finish(self.name, key, newest_id, newest_time)
+        self.logger.info(f"增量爬取状态已保存({reason})，因遇到已爬内容少请求{self.skipped_pages}页")
+        self._state.close()
+        self._state = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='查看或清除爬取状态')
+    parser.add_argument('--path', default=DEFAULT_PATH)
+    parser.add_argument('--reset', nargs='?', const='', default=None, help='清除指定爬虫的状态，不指定爬虫时清除全部')
+    args = parser.parse_args()
+
+    store = CrawlState(args.path)
+    if args.reset is not None:
+        store.reset(args.reset or None)
+        print(f"已清除 {args.reset or '全部'} 爬取状态")
+    else:
+        for row in store.rows():
+            print(f"{row['spider']:<28}{row['key']:<14}最新:{row['newest_id'] or '-':<20}"
+                  f"{row['newest_time'] or '-':<21}进度:{row['cursor'] or '-':<8}{'完成' if row['finished'] else '未完成'}")
+    store.close()
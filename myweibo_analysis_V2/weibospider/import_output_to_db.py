@@ -1,11 +1,24 @@
 import os
+import io
+import gzip
+import hashlib
 import json
-from snownlp import SnowNLP
-from sqlalchemy import create_engine, Table, MetaData
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from sqlalchemy import create_engine, Table, MetaData, text, inspect
 from sqlalchemy.orm import sessionmaker
 from config import Config
 import csv
 from sqlalchemy.dialects.mysql import insert as mysql_insert
+from rollup import collect_keys, post_keys_for_mblogs, refresh_star_daily_stats
+from sentiment_stage import SentimentScorer
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 # 数据库连接配置
 DB_URI = Config.SQLALCHEMY_DATABASE_URI
@@ -14,26 +27,248 @@ Session = sessionmaker(bind=engine)
 session = Session()
 metadata = MetaData()
 
+# 每个事务写入的行数，内存占用只与块大小有关，与文件大小无关
+CHUNK_SIZE = 2000
+# JsonWriterPipeline 压缩输出的后缀
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+# 清单记录文件开头这么多字节的指纹，用来识别被原地重写的文件
+HEAD_BYTES = 4096
+
 def get_table(table_name):
     return Table(table_name, metadata, autoload_with=engine)
 
-def insert_many(table, data_list):
+def insert_many(table, data_list, conn=None):
     if not data_list:
         return
+    if conn is None:
+        with engine.begin() as conn:
+            return insert_many(table, data_list, conn)
+    if table.name == 'weibo_fans':
+        # 粉丝信息以后抓取的为准，重复主键时覆盖旧数据
+        stmt = mysql_insert(table)
+        stmt = stmt.on_duplicate_key_update(
+            {c.name: stmt.inserted[c.name] for c in table.columns if not c.primary_key}
+        )
+        conn.execute(stmt, data_list)
+    elif table.name in ('keyword_post', 'user_post', 'weibo_user'):
+        # 用 MySQL 的 INSERT IGNORE 跳过重复主键或唯一索引
+        stmt = mysql_insert(table).prefix_with('IGNORE')
+        conn.execute(stmt, data_list)
+    else:
+        conn.execute(table.insert(), data_list)
+
+def ensure_manifest_table():
+    """创建导入清单表：记录每个文件已提交到的字节位置，用于跳过和断点续传"""
     with engine.begin() as conn:
-        if table.name in ('weibo_fans', 'keyword_post', 'user_post', 'weibo_user'):
-            # 用 MySQL 的 INSERT IGNORE 跳过重复主键或唯一索引
-            stmt = mysql_insert(table).prefix_with('IGNORE')
-            conn.execute(stmt, data_list)
-        else:
-            conn.execute(table.insert(), data_list)
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS import_manifest (
+                path VARCHAR(512) NOT NULL PRIMARY KEY,
+                size BIGINT NOT NULL,
+                mtime DOUBLE NOT NULL,
+                head_sha1 CHAR(40),
+                head_bytes INT NOT NULL DEFAULT 0,
+                byte_offset BIGINT NOT NULL DEFAULT 0,
+                rows_imported BIGINT NOT NULL DEFAULT 0,
+                status VARCHAR(20) NOT NULL,
+                updated_at DATETIME
+            )
+        """))
+        # 旧版清单表没有文件头指纹列；这些记录没有指纹，续传前会从头导入一次
+        columns = {column['name'] for column in inspect(conn).get_columns('import_manifest')}
+        for column, ddl in (('head_sha1', 'CHAR(40)'), ('head_bytes', 'INT NOT NULL DEFAULT 0')):
+            if column not in columns:
+                conn.execute(text(f"ALTER TABLE import_manifest ADD COLUMN {column} {ddl}"))
+
+def read_head(filepath):
+    """读取文件开头最多HEAD_BYTES字节（压缩文件为压缩后的原始字节）"""
+    with open(filepath, 'rb') as f:
+        return f.read(HEAD_BYTES)
+
+def new_entry(filepath):
+    """从头导入时的清单记录"""
+    stat = os.stat(filepath)
+    head = read_head(filepath)
+    return {
+        'path': os.path.abspath(filepath),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'head_sha1': hashlib.sha1(head).hexdigest(),
+        'head_bytes': len(head),
+        'byte_offset': 0,
+        'rows_imported': 0,
+    }
+
+def ends_at_line_boundary(filepath, offset):
+    """offset是否正好在一个换行符之后（或在文件开头）"""
+    if offset == 0:
+        return True
+    with open(filepath, 'rb') as f:
+        f.seek(offset - 1)
+        return f.read(1) == b'\n'
+
+def can_resume(filepath, entry, row):
+    """判断上次记录的位置是否仍然适用于当前文件
+
+    评论csv每次重新抓取都会原地重写，重写后的文件通常更大，只比较大小会从旧位置续传，
+    跳过新文件开头的数据，甚至从一行的中间开始读。因此还要求文件开头与上次导入时一致，
+    并且续传位置正好落在行尾。
+    """
+    if not row.head_sha1 or row.head_bytes > entry['head_bytes']:
+        return False
+    # 文件开头较短时只比较上次看到的部分，爬虫在末尾追加数据不影响指纹
+    head = read_head(filepath)[:row.head_bytes]
+    if hashlib.sha1(head).hexdigest() != row.head_sha1:
+        return False
+    # 压缩文件记录的是解压后的位置，不能与文件大小比较；压缩文件关闭后不再变化
+    if is_compressed(filepath):
+        return True
+    return row.byte_offset <= entry['size'] and ends_at_line_boundary(filepath, row.byte_offset)
+
+def load_entry(filepath):
+    """根据清单判断文件的导入起点
+
+    返回None表示文件未变化且已全部导入，可以跳过；
+    否则返回清单记录，byte_offset为续传起点（文件被截断或重写时从头导入）。
+    """
+    entry = new_entry(filepath)
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT size, mtime, head_sha1, head_bytes, byte_offset, rows_imported, status
+            FROM import_manifest WHERE path = :path
+        """), {'path': entry['path']}).fetchone()
+    if row is None:
+        return entry
+    if (row.status == 'done' and row.size == entry['size'] and row.mtime == entry['mtime']
+            and row.head_sha1 == entry['head_sha1']):
+        return None
+    if can_resume(filepath, entry, row):
+        # 未导入完，或爬虫在文件末尾追加了新数据
+        entry['byte_offset'] = row.byte_offset
+        entry['rows_imported'] = row.rows_imported
+    return entry
+
+def save_entry(conn, entry, status):
+    """在导入数据的同一事务内更新清单，保证位置与已提交的数据一致"""
+    conn.execute(text("""
+        INSERT INTO import_manifest
+            (path, size, mtime, head_sha1, head_bytes, byte_offset, rows_imported, status, updated_at)
+        VALUES (:path, :size, :mtime, :head_sha1, :head_bytes, :byte_offset, :rows_imported, :status, :updated_at)
+        ON DUPLICATE KEY UPDATE
+            size = VALUES(size), mtime = VALUES(mtime), head_sha1 = VALUES(head_sha1), head_bytes = VALUES(head_bytes),
+            byte_offset = VALUES(byte_offset),
+            rows_imported = VALUES(rows_imported), status = VALUES(status), updated_at = VALUES(updated_at)
+    """), dict(entry, status=status, updated_at=datetime.now()))
+
+def is_compressed(filepath):
+    return filepath.endswith(COMPRESSED_SUFFIXES)
+
+def strip_compression(filename):
+    """去掉压缩后缀，fan_x.jsonl.gz -> fan_x.jsonl"""
+    for suffix in COMPRESSED_SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+def open_binary(filepath):
+    """以二进制方式打开输出文件，.gz/.zst 文件透明解压"""
+    if filepath.endswith('.gz'):
+        return gzip.open(filepath, 'rb')
+    if filepath.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("读取.zst文件需要安装zstandard")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(filepath, 'rb'), closefd=True))
+    return open(filepath, 'rb')
+
+class OffsetReader:
+    """从指定字节位置逐行读取文件，offset始终指向已读取的最后一个完整行之后
+
+    末尾没有换行符的行（爬虫正在写入或被中断）不会被读取，下次导入时从该行重新开始。
+    压缩文件的offset是解压后的位置。complete表示已读到文件末尾且没有残留的半行。
+    """
+
+    def __init__(self, filepath, offset=0):
+        self.filepath = filepath
+        self.start = offset
+        self.offset = offset
+        self.complete = False
+
+    def __iter__(self):
+        with open_binary(self.filepath) as f:
+            if is_compressed(self.filepath):
+                # 解压流只能顺序跳过
+                remaining = self.offset
+                while remaining > 0:
+                    skipped = len(f.read(min(remaining, 1024 * 1024)))
+                    if not skipped:
+                        break
+                    remaining -= skipped
+            else:
+                f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    return
+                self.offset += len(line)
+                yield line
+        self.complete = True
 
-def process_fan_file(filepath):
+def iter_jsonl(reader):
+    """逐行解析jsonl，跳过空行和损坏的行"""
+    for line in reader:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"跳过 {reader.filepath} 位置{reader.offset}的行: {e}")
+
+def iter_chunks(rows, chunk_size=CHUNK_SIZE):
+    """把行迭代器切成不超过chunk_size的列表"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def import_rows(table, rows, reader, entry, star_field=None, chunk_size=CHUNK_SIZE, transform=None):
+    """分块写入数据，每块一个事务，同一事务内记录文件已提交的位置
+
+    transform不为空时在写入前对每块数据做批量处理（如情感打分）。
+    返回受影响的(明星ID, 日期)集合（star_field为空时集合为空）
+    """
+    start = time.perf_counter()
+    total = 0
+    keys = set()
+    for chunk in iter_chunks(rows, chunk_size):
+        if transform is not None:
+            chunk = transform(chunk)
+        total += len(chunk)
+        entry['byte_offset'] = reader.offset
+        entry['rows_imported'] += len(chunk)
+        with engine.begin() as conn:
+            insert_many(table, chunk, conn)
+            save_entry(conn, entry, 'partial')
+        if star_field:
+            keys |= collect_keys(chunk, star_field)
+    # 过滤掉的行和末尾的空行同样算作已处理
+    entry['byte_offset'] = reader.offset
+    with engine.begin() as conn:
+        save_entry(conn, entry, 'done' if reader.complete else 'partial')
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0
+    resumed = f"（从位置{reader.start}续传）" if reader.start else ""
+    print(f"导入 {reader.filepath} 到 {table.name} 完成{resumed}，共{total}条，用时{elapsed:.1f}秒，{rate:.0f}条/秒")
+    return keys
+
+def process_fan_file(filepath, entry=None):
     table = get_table('weibo_fans')
-    data_dict = {}
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            data = json.loads(line)
+    entry = entry or new_entry(filepath)
+    reader = OffsetReader(filepath, entry['byte_offset'])
+    def rows():
+        for data in iter_jsonl(reader):
             fan_info = data.get('fan_info', {})
             row = {
                 'fan_id': data.get('_id'),
@@ -45,34 +280,39 @@ def process_fan_file(filepath):
                 'follower_id': data.get('follower_id'),
             }
             if row['fan_id']:
-                data_dict[row['fan_id']] = row  # 后出现的覆盖前面的
-    data_list = list(data_dict.values())
-    insert_many(table, data_list)
-    print(f"导入 {filepath} 到 weibo_fans 完成，共{len(data_list)}条")
+                yield row
+    return import_rows(table, rows(), reader, entry)
 
-def process_keyword_post_file(filepath):
+def process_keyword_post_file(filepath, entry=None, sentiment_workers=None, skip_sentiment=False):
+    """导入关键词微博
+
+    情感分数按块去重后用进程池打分；skip_sentiment为True时分数留空，
+    之后用 sentiment_stage.py 补算。
+    """
     table = get_table('keyword_post')
-    data_list = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            data = json.loads(line)
-            content = data.get('content', '')
-            # 情感分析
-            try:
-                s = SnowNLP(content)
-                data['sentiment_score'] = float(s.sentiments)
-            except Exception:
-                data['sentiment_score'] = None
+    entry = entry or new_entry(filepath)
+    reader = OffsetReader(filepath, entry['byte_offset'])
+    def rows():
+        for data in iter_jsonl(reader):
+            data['sentiment_score'] = None
             # 保证 id 字段存在
             if 'id' not in data or not data['id']:
                 data['id'] = data.get('mblogid')
-            data_list.append(data)
-    insert_many(table, data_list)
-    print(f"导入 {filepath} 到 keyword_post 完成，共{len(data_list)}条")
+            yield data
+    if skip_sentiment:
+        return import_rows(table, rows(), reader, entry, star_field='keyword_id')
+    scorer = SentimentScorer(sentiment_workers)
+    try:
+        keys = import_rows(table, rows(), reader, entry, star_field='keyword_id', transform=scorer.apply)
+    finally:
+        scorer.close()
+    print(f"情感打分{scorer.scored}条，重复文本跳过{scorer.deduplicated}条")
+    return keys
 
-def process_user_file(filepath):
+def process_user_file(filepath, entry=None):
     table = get_table('weibo_user')
-    data_list = []
+    entry = entry or new_entry(filepath)
+    reader = OffsetReader(filepath, entry['byte_offset'])
     def map_gender(g):
         if g in ('f', 'female', '女'):
             return '女'
@@ -80,9 +320,8 @@ def process_user_file(filepath):
             return '男'
         else:
             return '未知'
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            data = json.loads(line)
+    def rows():
+        for data in iter_jsonl(reader):
             # _id 字段映射为 id
             if 'id' not in data and '_id' in data:
                 data['id'] = data['_id']
@@ -94,22 +333,20 @@ def process_user_file(filepath):
             # 必须有 id 字段
             if not data.get('id'):
                 continue
-            data_list.append(data)
-    insert_many(table, data_list)
-    print(f"导入 {filepath} 到 weibo_user 完成，共{len(data_list)}条")
+            yield data
+    return import_rows(table, rows(), reader, entry)
 
-def process_user_post_file(filepath):
+def process_user_post_file(filepath, entry=None):
     table = get_table('user_post')
-    data_list = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            data = json.loads(line)
+    entry = entry or new_entry(filepath)
+    reader = OffsetReader(filepath, entry['byte_offset'])
+    def rows():
+        for data in iter_jsonl(reader):
             # 保证 id 字段存在
             if 'id' not in data or not data['id']:
                 data['id'] = data.get('mblogid')
-            data_list.append(data)
-    insert_many(table, data_list)
-    print(f"导入 {filepath} 到 user_post 完成，共{len(data_list)}条")
+            yield data
+    return import_rows(table, rows(), reader, entry, star_field='user_id')
 
 def load_celebrity_map(txt_path='weibo_user.txt'):
     """读取 weibo_user.txt，返回 明星名->id 映射字典"""
@@ -122,7 +359,7 @@ def load_celebrity_map(txt_path='weibo_user.txt'):
                     celeb_map[parts[0]] = parts[1]
     return celeb_map
 
-def process_comment_csv_file(filepath):
+def process_comment_csv_file(filepath, entry=None):
     """
     导入评论csv到 weibo_comments 表。
     自动从文件名提取 mblog_id（如: 时代少年团队长-马嘉祺_PwsW62Q5H_评论(Min版).csv，mblog_id=PwsW62Q5H）。
@@ -136,7 +373,7 @@ def process_comment_csv_file(filepath):
     m = re.search(r'_([\w\d]+)_评论', filename)
     if not m:
         print(f"文件名不符合规则，跳过: {filename}")
-        return
+        return set()
     mblog_id = m.group(1)
     # 明星名为第一个下划线前的部分
     celebrity_name = filename.split('_')[0] if '_' in filename else ''
@@ -149,14 +386,17 @@ def process_comment_csv_file(filepath):
             break
     if not celebrity_id:
         print(f"未找到明星id，跳过: {filename} (明星名: {celebrity_name})")
-        return
-    data_list = []
-    with open(filepath, 'r', encoding='utf-8-sig') as f:
-        reader = csv.reader(f)
-        header = next(reader, None)  # 跳过标题行
-        for row in reader:
+        return set()
+    entry = entry or new_entry(filepath)
+    reader = OffsetReader(filepath, entry['byte_offset'])
+    def rows():
+        # csv.reader按需逐行读取，产出一条记录时reader.offset正好在该记录之后
+        csv_reader = csv.reader(line.decode('utf-8-sig') for line in reader)
+        if reader.start == 0:
+            header = next(csv_reader, None)  # 跳过标题行
+        for row in csv_reader:
             try:
-                data = {
+                yield {
                     'user_id': int(row[3]) if row[3] else None,
                     'comment_time': row[4],
                     'gender': row[6],
@@ -168,27 +408,92 @@ def process_comment_csv_file(filepath):
                     'celebrity_id': celebrity_id,  # 自动补全
                     'mblog_id': mblog_id
                 }
-                data_list.append(data)
             except Exception as e:
                 print(f"跳过行: {row}, 错误: {e}")
-    insert_many(table, data_list)
-    print(f"导入 {filepath} 到 weibo_comments 完成，共{len(data_list)}条")
-
-def main():
-    output_dir = 'output'
-    for filename in os.listdir(output_dir):
-        filepath = os.path.join(output_dir, filename)
-        if filename.startswith('fan_') and filename.endswith('.jsonl'):
-            process_fan_file(filepath)
-        elif filename.startswith('tweet_spider_by_keyword') and filename.endswith('.jsonl'):
-            process_keyword_post_file(filepath)
-        elif filename.startswith('user_') and filename.endswith('.jsonl'):
-            process_user_file(filepath)
-        elif filename.startswith('tweet_spider_by_user_id') and filename.endswith('.jsonl'):
-            process_user_post_file(filepath)
-        elif filename.endswith('评论(Min版).csv'):
-            process_comment_csv_file(filepath)
-        # 可按需添加更多类型
+    import_rows(table, rows(), reader, entry)
+    # 评论按所属微博的发布日期汇总；微博尚未导入时，导入微博时会一并重算
+    return post_keys_for_mblogs(engine, [mblog_id])
+
+def get_processor(filename):
+    """按文件名选择导入函数，压缩的jsonl文件按解压后的文件名判断"""
+    filename = strip_compression(filename)
+    if filename.startswith('fan_') and filename.endswith('.jsonl'):
+        return process_fan_file
+    elif filename.startswith('tweet_spider_by_keyword') and filename.endswith('.jsonl'):
+        return process_keyword_post_file
+    elif filename.startswith('user_') and filename.endswith('.jsonl'):
+        return process_user_file
+    elif filename.startswith('tweet_spider_by_user_id') and filename.endswith('.jsonl'):
+        return process_user_post_file
+    elif filename.endswith('评论(Min版).csv'):
+        return process_comment_csv_file
+    # 可按需添加更多类型
+    return None
+
+def import_file(filepath, force=False, sentiment_workers=None, skip_sentiment=False):
+    """导入单个文件，返回受影响的(明星ID, 日期)集合
+
+    force为True时忽略清单，从头重新导入。
+    """
+    processor = get_processor(os.path.basename(filepath))
+    entry = new_entry(filepath) if force else load_entry(filepath)
+    if entry is None:
+        print(f"已导入且未变化，跳过: {filepath}")
+        return set()
+    if processor is process_keyword_post_file:
+        return processor(filepath, entry, sentiment_workers, skip_sentiment)
+    return processor(filepath, entry)
+
+def run_files(filepaths, workers=1, force=False, sentiment_workers=None, skip_sentiment=False):
+    """导入一组相互独立的文件，workers大于1时使用进程池并发导入"""
+    keys = set()
+    if workers <= 1 or len(filepaths) <= 1:
+        # 单个文件失败不影响其余文件，已导入文件的汇总仍会刷新
+        for filepath in filepaths:
+            try:
+                keys |= import_file(filepath, force, sentiment_workers, skip_sentiment)
+            except Exception as e:
+                print(f"导入 {filepath} 失败: {e}")
+        return keys
+    # 子进程不能复用父进程连接池中的连接
+    engine.dispose()
+    # 文件已经并发导入，每个文件内的情感打分不再另开进程池，避免进程数相乘
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(import_file, filepath, force, 1, skip_sentiment): filepath
+            for filepath in filepaths
+        }
+        for future in as_completed(futures):
+            try:
+                keys |= future.result()
+            except Exception as e:
+                print(f"导入 {futures[future]} 失败: {e}")
+    return keys
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='把爬虫输出目录导入数据库')
+    parser.add_argument('--output-dir', default='output', help='爬虫输出目录')
+    parser.add_argument('--workers', type=int, default=1, help='并发导入的进程数')
+    parser.add_argument('--force', action='store_true', help='忽略导入清单，全部重新导入')
+    parser.add_argument('--sentiment-workers', type=int, default=None, help='情感打分进程数，默认CPU核数')
+    parser.add_argument('--skip-sentiment', action='store_true',
+                        help='跳过关键词微博情感打分，之后用 sentiment_stage.py 补算')
+    args = parser.parse_args(argv)
+
+    ensure_manifest_table()
+    filepaths = sorted(
+        os.path.join(args.output_dir, filename)
+        for filename in os.listdir(args.output_dir)
+        if get_processor(filename)
+    )
+    # 评论的汇总依赖所属微博，先导入jsonl文件，再导入评论csv
+    csv_files = [f for f in filepaths if get_processor(os.path.basename(f)) is process_comment_csv_file]
+    jsonl_files = [f for f in filepaths if f not in csv_files]
+    keys = set()
+    for files in (jsonl_files, csv_files):
+        keys |= run_files(files, args.workers, args.force, args.sentiment_workers, args.skip_sentiment)
+    # 汇总统一在父进程中刷新，避免并发进程同时重算同一明星
+    refresh_star_daily_stats(engine, keys)
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
@@ -7,7 +7,7 @@
 
 from flask import Flask
 from sqlalchemy import inspect
-from weibospider.models import db, User, Report, UserStar, WeiboUser, UserPost, WeiboFans, WeiboComments, KeywordPost
+from weibospider.models import db, User, Report, UserStar, WeiboUser, UserPost, WeiboFans, WeiboComments, KeywordPost, StarDailyStats
 from weibospider.config import Config
 
 def create_tables():
@@ -1,4 +1,11 @@
 # encoding: utf-8
+import threading
+import time
+
+from twisted.internet.task import deferLater
+
+# 代理池和接口限速与api/datacrawl的爬虫共用，settings中仍按 middlewares.AdaptiveProxyMiddleware 引用
+from adaptive_proxy import AdaptiveProxyMiddleware, EndpointLimiter, ProxyPool, endpoint_of  # noqa: F401
 
 
 class IPProxyMiddleware(object):
@@ -24,3 +31,63 @@ class IPProxyMiddleware(object):
             current_proxy = f'http://{proxy_data}'
             spider.logger.debug(f"current proxy:{current_proxy}")
             request.meta['proxy'] = current_proxy
+
+
+class GlobalRateLimiter(object):
+    """
+    进程内共享的限速器：平均每秒rate个请求，允许burst个请求的突发
+    """
+
+    def __init__(self, rate, burst=1):
+        self.interval = 1.0 / rate
+        self.burst = burst
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        预约一个请求名额，返回需要等待的秒数
+        """
+        with self.lock:
+            now = time.monotonic()
+            # 空闲时最多积攒burst个名额
+            self.next_time = max(self.next_time, now - (self.burst - 1) * self.interval)
+            delay = max(0.0, self.next_time - now)
+            self.next_time += self.interval
+            return delay
+
+
+class GlobalRateLimitMiddleware(object):
+    """
+    全局限速中间件
+
+    同一个CrawlerProcess中同时运行多个爬虫时，DOWNLOAD_DELAY只对单个爬虫生效，
+    这里让所有爬虫共享一个限速器，总请求速率不超过 GLOBAL_RATE_LIMIT 个/秒。
+    """
+    limiters = {}
+
+    def __init__(self, rate, burst):
+        key = (rate, burst)
+        if key not in self.limiters:
+            self.limiters[key] = GlobalRateLimiter(rate, burst)
+        self.limiter = self.limiters[key]
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        from scrapy.exceptions import NotConfigured
+        rate = crawler.settings.getfloat('GLOBAL_RATE_LIMIT', 0)
+        if rate <= 0:
+            raise NotConfigured
+        return cls(rate, crawler.settings.getint('GLOBAL_RATE_BURST', 1))
+
+    def process_request(self, request, spider):
+        """
+        没有名额时延迟请求，返回的Deferred触发后请求继续下载
+        """
+        delay = self.limiter.reserve()
+        if delay > 0:
+            from twisted.internet import reactor
+            spider.crawler.stats.inc_value('global_rate_limit/delayed')
+            spider.crawler.stats.inc_value('global_rate_limit/wait_seconds', delay)
+            return deferLater(reactor, delay, lambda: None)
+        return None
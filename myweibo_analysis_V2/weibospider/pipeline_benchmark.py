@@ -0,0 +1,115 @@
+"""
+JsonWriterPipeline 写入性能测试
+
+在临时目录中用同一批合成微博数据比较：
+- legacy: 原 weibospider 版本，每条打印并 flush
+- legacy-api: 原 api/datacrawl 版本，每条重新以追加方式打开文件
+- buffered / gzip / zstd: 当前 JsonWriterPipeline 的各种压缩设置
+
+用法:
+    python pipeline_benchmark.py --items 100000
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import datetime
+import tempfile
+import contextlib
+from types import SimpleNamespace
+from pipelines import JsonWriterPipeline, zstandard
+
+
+class LegacyJsonWriterPipeline(object):
+    """原 weibospider 版本"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.file = None
+
+    def process_item(self, item, spider):
+        print("写入item到文件：", str(item)[:200])
+        if not self.file:
+            now = datetime.datetime.now()
+            file_name = spider.name + "_" + now.strftime("%Y%m%d%H%M%S") + '.jsonl'
+            self.file = open(os.path.join(self.output_dir, file_name), 'wt', encoding='utf-8')
+        item['crawl_time'] = int(time.time())
+        line = json.dumps(dict(item), ensure_ascii=False) + "\n"
+        self.file.write(line)
+        self.file.flush()
+        return item
+
+    def close_spider(self, spider):
+        self.file.close()
+
+
+class LegacyApiJsonWriterPipeline(object):
+    """原 api/datacrawl 版本"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+
+    def process_item(self, item, spider):
+        timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+        filepath = os.path.join(self.output_dir, f"{spider.name}_{timestamp}.jsonl")
+        with open(filepath, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(dict(item), ensure_ascii=False) + '\n')
+        return item
+
+    def close_spider(self, spider):
+        pass
+
+
+def make_items(count):
+    return [{
+        'mblogid': f'P{i:08d}',
+        'user_id': str(1000 + i % 50),
+        'created_at': '2025-06-16 17:31:13',
+        'reposts_count': i % 100,
+        'comments_count': i % 300,
+        'attitudes_count': i % 1000,
+        'content': f'第{i}条微博，今天的演出太精彩了，期待下一次见面！#话题# 转发抽奖送签名照',
+        'keyword_id': '6290114447',
+    } for i in range(count)]
+
+
+def run(name, pipeline, items, spider, output_dir):
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if hasattr(pipeline, 'open_spider'):
+            pipeline.open_spider(spider)
+        for item in items:
+            pipeline.process_item(dict(item), spider)
+        pipeline.close_spider(spider)
+    elapsed = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(output_dir, f)) for f in os.listdir(output_dir))
+    print(f"{name:<12}{len(items) / elapsed:>12.0f}{size / 1024 / 1024:>12.1f}{len(os.listdir(output_dir)):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JsonWriterPipeline 写入性能测试')
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--max-bytes', type=int, default=64 * 1024 * 1024, help='新版管道的文件轮转大小')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    items = make_items(args.items)
+    spider = SimpleNamespace(name='tweet_spider_by_user_id', logger=logging.getLogger('benchmark'))
+    cases = [
+        ('legacy', lambda d: LegacyJsonWriterPipeline(d)),
+        ('legacy-api', lambda d: LegacyApiJsonWriterPipeline(d)),
+        ('buffered', lambda d: JsonWriterPipeline(d, max_bytes=args.max_bytes)),
+        ('gzip', lambda d: JsonWriterPipeline(d, max_bytes=args.max_bytes, compression='gzip')),
+    ]
+    if zstandard is not None:
+        cases.append(('zstd', lambda d: JsonWriterPipeline(d, max_bytes=args.max_bytes, compression='zstd')))
+
+    print(f"{'管道':<12}{'条/秒':>12}{'大小(MB)':>12}{'文件数':>8}")
+    for name, factory in cases:
+        with tempfile.TemporaryDirectory() as output_dir:
+            run(name, factory(output_dir), items, spider, output_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,31 +1,137 @@
 # -*- coding: utf-8 -*-
 import datetime
+import gzip
 import json
+import os
 import os.path
 import time
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
 
 class JsonWriterPipeline(object):
     """
     写入json文件的pipline
+
+    数据先写入内存缓冲，缓冲达到 JSON_WRITER_BUFFER_SIZE 字节或距上次写盘超过
+    JSON_WRITER_FLUSH_INTERVAL 秒时一次写盘；单个文件超过 JSON_WRITER_MAX_BYTES 字节
+    或写入超过 JSON_WRITER_ROTATE_SECONDS 秒时切换新文件。
+    JSON_WRITER_COMPRESSION 可设为 'gzip' 或 'zstd'，压缩文件写入时带 .part 后缀，
+    关闭后才改为正式文件名，导入脚本不会读到未写完的压缩流。
     """
 
-    def __init__(self):
+    def __init__(self, output_dir='output', buffer_size=1024 * 1024, flush_interval=5,
+                 max_bytes=256 * 1024 * 1024, rotate_seconds=0, compression=None):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"不支持的压缩格式: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError("使用zstd压缩需要安装zstandard")
+        self.output_dir = output_dir
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compression = compression
+
         self.file = None
-        if not os.path.exists('output'):
-            os.mkdir('output')
+        self.raw_file = None
+        self.path = None
+        self.file_index = 0
+        self.file_bytes = 0
+        self.opened_at = 0
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.flushed_at = 0
+        self.items = 0
+        if not os.path.exists(self.output_dir):
+            os.mkdir(self.output_dir)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            output_dir=settings.get('JSON_WRITER_OUTPUT_DIR', 'output'),
+            buffer_size=settings.getint('JSON_WRITER_BUFFER_SIZE', 1024 * 1024),
+            flush_interval=settings.getfloat('JSON_WRITER_FLUSH_INTERVAL', 5),
+            max_bytes=settings.getint('JSON_WRITER_MAX_BYTES', 256 * 1024 * 1024),
+            rotate_seconds=settings.getfloat('JSON_WRITER_ROTATE_SECONDS', 0),
+            compression=settings.get('JSON_WRITER_COMPRESSION') or None,
+        )
+
+    def open_spider(self, spider):
+        self.spider_name = spider.name
+        self.started = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+
+    def close_spider(self, spider):
+        self._close_file()
+        spider.logger.info(f"JsonWriterPipeline 共写入 {self.items} 条")
 
     def process_item(self, item, spider):
         """
         处理item
         """
-        print("写入item到文件：", str(item)[:200])
-        if not self.file:
-            now = datetime.datetime.now()
-            file_name = spider.name + "_" + now.strftime("%Y%m%d%H%M%S") + '.jsonl'
-            self.file = open(f'output/{file_name}', 'wt', encoding='utf-8')
         item['crawl_time'] = int(time.time())
-        line = json.dumps(dict(item), ensure_ascii=False) + "\n"
-        self.file.write(line)
-        self.file.flush()
+        line = (json.dumps(dict(item), ensure_ascii=False) + "\n").encode('utf-8')
+        self.buffer.append(line)
+        self.buffer_bytes += len(line)
+        self.items += 1
+        now = time.monotonic()
+        if self.buffer_bytes >= self.buffer_size or now - self.flushed_at >= self.flush_interval:
+            self._flush(now)
         return item
+
+    def _flush(self, now=None):
+        """把缓冲写入当前文件，需要时先切换新文件"""
+        now = time.monotonic() if now is None else now
+        self.flushed_at = now
+        if not self.buffer:
+            return
+        if self.file is not None and self._should_rotate(now):
+            self._close_file(flush=False)
+        if self.file is None:
+            self._open_file(now)
+        self.file.write(b''.join(self.buffer))
+        self.file.flush()
+        self.file_bytes += self.buffer_bytes
+        self.buffer = []
+        self.buffer_bytes = 0
+
+    def _should_rotate(self, now):
+        if self.max_bytes and self.file_bytes + self.buffer_bytes > self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and now - self.opened_at >= self.rotate_seconds
+
+    def _open_file(self, now):
+        # 第一个文件沿用原来的命名，后续轮转的文件加序号
+        suffix = f"_{self.file_index}" if self.file_index else ""
+        file_name = f"{self.spider_name}_{self.started}{suffix}.jsonl{COMPRESSION_SUFFIXES[self.compression]}"
+        self.path = os.path.join(self.output_dir, file_name)
+        if self.compression is None:
+            self.file = open(self.path, 'wb')
+        else:
+            self.raw_file = open(self.path + '.part', 'wb')
+            if self.compression == 'gzip':
+                self.file = gzip.GzipFile(fileobj=self.raw_file, mode='wb', compresslevel=6)
+            else:
+                self.file = zstandard.ZstdCompressor(level=3).stream_writer(self.raw_file)
+        self.file_index += 1
+        self.file_bytes = 0
+        self.opened_at = now
+
+    def _close_file(self, flush=True):
+        if flush:
+            self._flush()
+        if self.file is None:
+            return
+        self.file.close()
+        if self.raw_file is not None:
+            if not self.raw_file.closed:
+                self.raw_file.close()
+            os.replace(self.path + '.part', self.path)
+            self.raw_file = None
+        self.file = None
@@ -0,0 +1,186 @@
+"""
+明星每日统计汇总
+
+按(明星, 日期)维护 star_daily_stats 表，导入数据后只重算受影响日期：
+- user_post: 微博数、转发、评论、点赞
+- weibo_comments: 按所属微博的发布日期统计已抓取评论数和粉丝牌活跃度
+- keyword_post: 关键词微博数和情感分数之和
+
+看板接口按日期直接读取汇总行，不再每次对原始表做 GROUP BY DATE(created_at)。
+
+重建全部汇总（首次上线或历史数据修复时使用）:
+    python rollup.py
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import text, bindparam
+
+DELETE_SQL = text("""
+    DELETE FROM star_daily_stats
+    WHERE star_id = :star_id
+    AND stat_date >= :start_date AND stat_date < :end_date
+""")
+
+POST_SQL = text("""
+    INSERT INTO star_daily_stats (
+        star_id, stat_date, post_count, reposts_count, comments_count, attitudes_count,
+        fan_comment_count, fan_activity_score, keyword_post_count, sentiment_sum, sentiment_count, updated_at
+    )
+    SELECT user_id, DATE(created_at), COUNT(*),
+           COALESCE(SUM(reposts_count), 0), COALESCE(SUM(comments_count), 0), COALESCE(SUM(attitudes_count), 0),
+           0, 0, 0, 0, 0, :now
+    FROM user_post
+    WHERE user_id = :star_id
+    AND created_at >= :start_time AND created_at < :end_time
+    GROUP BY user_id, DATE(created_at)
+""")
+
+# 评论按所属微博的发布日期归档，与原先看板的统计口径一致
+COMMENT_SQL = text("""
+    INSERT INTO star_daily_stats (
+        star_id, stat_date, post_count, reposts_count, comments_count, attitudes_count,
+        fan_comment_count, fan_activity_score, keyword_post_count, sentiment_sum, sentiment_count, updated_at
+    )
+    SELECT p.user_id, DATE(p.created_at), 0, 0, 0, 0,
+           COUNT(c.mblog_id),
+           SUM(
+               CASE
+                   WHEN c.fan_badge LIKE '铁粉%' THEN 1
+                   WHEN c.fan_badge LIKE '金粉%' THEN 2
+                   WHEN c.fan_badge LIKE '钻粉%' THEN 3
+                   ELSE 0
+               END
+           ),
+           0, 0, 0, :now
+    FROM user_post p
+    JOIN weibo_comments c ON c.mblog_id = p.mblogid
+    WHERE p.user_id = :star_id
+    AND p.created_at >= :start_time AND p.created_at < :end_time
+    GROUP BY p.user_id, DATE(p.created_at)
+    ON DUPLICATE KEY UPDATE
+        fan_comment_count = VALUES(fan_comment_count),
+        fan_activity_score = VALUES(fan_activity_score)
+""")
+
+KEYWORD_SQL = text("""
+    INSERT INTO star_daily_stats (
+        star_id, stat_date, post_count, reposts_count, comments_count, attitudes_count,
+        fan_comment_count, fan_activity_score, keyword_post_count, sentiment_sum, sentiment_count, updated_at
+    )
+    SELECT keyword_id, DATE(created_at), 0, 0, 0, 0, 0, 0,
+           COUNT(*), COALESCE(SUM(sentiment_score), 0), COUNT(sentiment_score), :now
+    FROM keyword_post
+    WHERE keyword_id = :star_id
+    AND created_at >= :start_time AND created_at < :end_time
+    GROUP BY keyword_id, DATE(created_at)
+    ON DUPLICATE KEY UPDATE
+        keyword_post_count = VALUES(keyword_post_count),
+        sentiment_sum = VALUES(sentiment_sum),
+        sentiment_count = VALUES(sentiment_count)
+""")
+
+
+def to_date(value):
+    """把datetime/date/字符串统一转换为日期，无法解析时返回None"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def date_ranges(dates):
+    """把日期集合合并为连续区间 [start, end)"""
+    ranges = []
+    for day in sorted(set(dates)):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1] = (ranges[-1][0], day + timedelta(days=1))
+        else:
+            ranges.append((day, day + timedelta(days=1)))
+    return ranges
+
+
+def collect_keys(rows, star_field, time_field='created_at'):
+    """从导入的数据行中提取受影响的(明星ID, 日期)"""
+    keys = set()
+    for row in rows:
+        star_id = row.get(star_field)
+        day = to_date(row.get(time_field))
+        if star_id and day:
+            keys.add((str(star_id), day))
+    return keys
+
+
+def post_keys_for_mblogs(engine, mblog_ids):
+    """查询评论所属微博的(明星ID, 发布日期)，微博尚未导入时返回空集合"""
+    mblog_ids = list(set(mblog_ids))
+    if not mblog_ids:
+        return set()
+    query = text("""
+        SELECT user_id, created_at FROM user_post WHERE mblogid IN :mblog_ids
+    """).bindparams(bindparam('mblog_ids', expanding=True))
+    with engine.connect() as conn:
+        rows = conn.execute(query, {'mblog_ids': mblog_ids}).fetchall()
+    return {(str(row.user_id), row.created_at.date()) for row in rows if row.user_id and row.created_at}
+
+
+def refresh_star_daily_stats(engine, keys):
+    """重算受影响(明星, 日期)的汇总行
+
+    每个明星的连续日期合并为一个区间，在同一事务内删除区间内的汇总行后
+    从三张原始表重新聚合写入，重复调用结果不变。
+    返回刷新的日期区间数。
+    """
+    dates_by_star = defaultdict(set)
+    for star_id, day in keys:
+        day = to_date(day)
+        if star_id and day:
+            dates_by_star[str(star_id)].add(day)
+    if not dates_by_star:
+        return 0
+
+    refreshed = 0
+    now = datetime.now()
+    with engine.begin() as conn:
+        for star_id, dates in dates_by_star.items():
+            for start, end in date_ranges(dates):
+                conn.execute(DELETE_SQL, {'star_id': star_id, 'start_date': start, 'end_date': end})
+                params = {
+                    'star_id': star_id,
+                    'start_time': datetime.combine(start, datetime.min.time()),
+                    'end_time': datetime.combine(end, datetime.min.time()),
+                    'now': now
+                }
+                conn.execute(POST_SQL, params)
+                conn.execute(COMMENT_SQL, params)
+                conn.execute(KEYWORD_SQL, params)
+                refreshed += 1
+    return refreshed
+
+
+def rebuild_star_daily_stats(engine):
+    """按原始表中的全部数据重建汇总表，返回刷新的日期区间数"""
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT DISTINCT user_id AS star_id, DATE(created_at) AS day
+            FROM user_post WHERE user_id IS NOT NULL AND created_at IS NOT NULL
+            UNION
+            SELECT DISTINCT keyword_id AS star_id, DATE(created_at) AS day
+            FROM keyword_post WHERE keyword_id IS NOT NULL AND created_at IS NOT NULL
+        """)).fetchall()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM star_daily_stats"))
+    return refresh_star_daily_stats(engine, ((row.star_id, row.day) for row in rows))
+
+
+if __name__ == '__main__':
+    from sqlalchemy import create_engine
+    from config import Config
+    engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+    refreshed = rebuild_star_daily_stats(engine)
+    print(f"重建 star_daily_stats 完成，共刷新{refreshed}个日期区间")
@@ -18,27 +18,31 @@ from spiders.user import UserSpider
 from spiders.fan import FanSpider
 from spiders.repost import RepostSpider
 
+MODE_TO_SPIDER = {
+    'comment': CommentSpider,
+    'fan': FanSpider,
+    'follow': FollowerSpider,
+    'user': UserSpider,
+    'repost': RepostSpider,
+    'tweet_by_tweet_id': TweetSpiderByTweetID,
+    'tweet_by_user_id': TweetSpiderByUserID,
+    'tweet_by_keyword': TweetSpiderByKeyword,
+}
+
 if __name__ == '__main__':
     mode = sys.argv[1]
     os.environ['SCRAPY_SETTINGS_MODULE'] = 'settings'
     settings = get_project_settings()
     process = CrawlerProcess(settings)
-    mode_to_spider = {
-        'comment': CommentSpider,
-        'fan': FanSpider,
-        'follow': FollowerSpider,
-        'user': UserSpider,
-        'repost': RepostSpider,
-        'tweet_by_tweet_id': TweetSpiderByTweetID,
-        'tweet_by_user_id': TweetSpiderByUserID,
-        'tweet_by_keyword': TweetSpiderByKeyword,
-    }
     
     # 获取爬虫参数
     spider_kwargs = {}
-    if mode == 'comment' and len(sys.argv) > 2:
+    if mode == 'comment' and len(sys.argv) > 2 and sys.argv[2] != '--full':
         spider_kwargs['tweet_id'] = sys.argv[2]
+    # --full 忽略增量爬取状态，重新全量爬取
+    if '--full' in sys.argv[2:]:
+        spider_kwargs['full'] = '1'
     
-    process.crawl(mode_to_spider[mode], **spider_kwargs)
+    process.crawl(MODE_TO_SPIDER[mode], **spider_kwargs)
     # the script will block here until the crawling is finished
     process.start()
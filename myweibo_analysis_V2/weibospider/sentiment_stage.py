@@ -0,0 +1,139 @@
+"""
+关键词微博情感打分
+
+SnowNLP 打分是导入关键词微博时最慢的环节，这里把它拆成独立阶段：
+- 每批内容先去重，相同文本只打一次分，并在批次之间缓存最近的结果
+- 去重后的文本切片后交给进程池并行打分
+- 导入时可以跳过打分（sentiment_score 留空），之后用本脚本补算
+
+补算尚未打分的关键词微博:
+    python sentiment_stage.py --workers 4
+"""
+import os
+import time
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import text
+
+# 每个子任务的文本数，过小时进程间通信开销占比高
+SLICE_SIZE = 200
+
+
+def score_texts(texts):
+    """在当前进程内为一组文本打分，失败的文本返回None"""
+    from snownlp import SnowNLP
+    scores = []
+    for content in texts:
+        try:
+            scores.append(float(SnowNLP(content).sentiments))
+        except Exception:
+            scores.append(None)
+    return scores
+
+
+class SentimentScorer:
+    """按批打分：批内去重、跨批缓存、进程池并行"""
+
+    def __init__(self, workers=None, cache_size=100000):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.executor = None
+        self.scored = 0
+        self.deduplicated = 0
+
+    def score(self, contents):
+        """返回与contents一一对应的情感分数"""
+        texts = [c or '' for c in contents]
+        unique = []
+        for content in dict.fromkeys(texts):
+            if content in self.cache:
+                # 命中的文本标记为最近使用，避免被本批新结果挤出
+                self.cache.move_to_end(content)
+            else:
+                unique.append(content)
+        self.deduplicated += len(contents) - len(unique)
+        if unique:
+            for content, score in zip(unique, self._score_unique(unique)):
+                self.cache[content] = score
+            self.scored += len(unique)
+        # 先取出本批结果再淘汰，缓存小于批内去重文本数时结果也完整
+        scores = [self.cache[content] for content in texts]
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return scores
+
+    def _score_unique(self, texts):
+        if self.workers <= 1 or len(texts) <= SLICE_SIZE:
+            return score_texts(texts)
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        slices = [texts[i:i + SLICE_SIZE] for i in range(0, len(texts), SLICE_SIZE)]
+        scores = []
+        for part in self.executor.map(score_texts, slices):
+            scores.extend(part)
+        return scores
+
+    def apply(self, rows, field='content'):
+        """为一批数据行写入sentiment_score字段"""
+        for row, score in zip(rows, self.score([row.get(field) for row in rows])):
+            row['sentiment_score'] = score
+        return rows
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def backfill(engine, workers=None, batch_size=2000):
+    """为 sentiment_score 为空的关键词微博补算情感分数
+
+    按主键分页扫描，每批一个事务更新；打分失败的行保持为空，下次运行时再试。
+    返回更新的行数和受影响的(明星ID, 日期)集合。
+    """
+    from rollup import collect_keys
+    scorer = SentimentScorer(workers)
+    select = text("""
+        SELECT id, content, keyword_id, created_at FROM keyword_post
+        WHERE sentiment_score IS NULL AND id > :last_id
+        ORDER BY id LIMIT :limit
+    """)
+    update = text("UPDATE keyword_post SET sentiment_score = :sentiment_score WHERE id = :id")
+    last_id = ''
+    updated = 0
+    keys = set()
+    start = time.perf_counter()
+    try:
+        while True:
+            with engine.connect() as conn:
+                rows = [dict(row._mapping) for row in conn.execute(select, {'last_id': last_id, 'limit': batch_size})]
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+            scored = [row for row in scorer.apply(rows) if row['sentiment_score'] is not None]
+            if scored:
+                with engine.begin() as conn:
+                    conn.execute(update, [{'id': row['id'], 'sentiment_score': row['sentiment_score']} for row in scored])
+                updated += len(scored)
+                keys |= collect_keys(scored, 'keyword_id')
+            print(f"已补算{updated}条，去重跳过{scorer.deduplicated}条，{updated / (time.perf_counter() - start):.0f}条/秒")
+    finally:
+        scorer.close()
+    return updated, keys
+
+
+if __name__ == '__main__':
+    from sqlalchemy import create_engine
+    from config import Config
+    from rollup import refresh_star_daily_stats
+    parser = argparse.ArgumentParser(description='补算关键词微博的情感分数')
+    parser.add_argument('--workers', type=int, default=None, help='打分进程数，默认CPU核数')
+    parser.add_argument('--batch-size', type=int, default=2000, help='每批读取和更新的行数')
+    args = parser.parse_args()
+
+    engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+    updated, keys = backfill(engine, args.workers, args.batch_size)
+    refresh_star_daily_stats(engine, keys)
+    print(f"补算完成，共更新{updated}条")
@@ -16,15 +16,48 @@ DEFAULT_REQUEST_HEADERS = {
 
 CONCURRENT_REQUESTS = 16
 
-DOWNLOAD_DELAY = 1
+# 同一进程内所有爬虫共享的请求速率上限（个/秒），0表示不限制；auto_spider 并行运行多个爬虫时生效
+GLOBAL_RATE_LIMIT = 2
+GLOBAL_RATE_BURST = 2
 
+# 请求节奏由 AdaptiveProxyMiddleware 的接口并发和 GLOBAL_RATE_LIMIT 控制，不再固定延迟
+DOWNLOAD_DELAY = 0
+
+# 自适应中间件需要在RetryMiddleware(550)之前处理响应，在HttpProxyMiddleware(750)之前设置代理；
+# 全局限速放在它之后，请求拿到接口并发名额后才消耗全局速率
 DOWNLOADER_MIDDLEWARES = {
     'scrapy.downloadermiddlewares.cookies.CookiesMiddleware': None,
     'scrapy.downloadermiddlewares.redirect.RedirectMiddleware': None,
     'middlewares.IPProxyMiddleware': 100,
-    'scrapy.downloadermiddlewares.httpproxy.HttpProxyMiddleware': 101,
+    'middlewares.AdaptiveProxyMiddleware': 560,
+    'middlewares.GlobalRateLimitMiddleware': 570,
+    'scrapy.downloadermiddlewares.httpproxy.HttpProxyMiddleware': 750,
 }
 
+# 代理列表，格式 'http://ip:port' 或 'http://username:password@ip:port'，为空时直连
+PROXY_LIST = []
+PROXY_COOLDOWN = 60  # 代理连续失败后的冷却秒数，每次再进入冷却时翻倍
+PROXY_MAX_COOLDOWN = 1800
+
+# 按接口自适应并发：成功时逐步加并发，418/429时减半并退避
+ADAPTIVE_START_CONCURRENCY = 4
+ADAPTIVE_MIN_CONCURRENCY = 1
+ADAPTIVE_MAX_CONCURRENCY = 16
+ADAPTIVE_BACKOFF = 5  # 首次限流的暂停秒数，连续限流时翻倍
+ADAPTIVE_MAX_BACKOFF = 120
+ADAPTIVE_RETRY_TIMES = 3  # 418/429 换代理重试次数
+
 ITEM_PIPELINES = {
     'weibospider.pipelines.JsonWriterPipeline': 300,
 }
+
+# JsonWriterPipeline 输出设置
+JSON_WRITER_BUFFER_SIZE = 1024 * 1024  # 缓冲达到该字节数时写盘
+JSON_WRITER_FLUSH_INTERVAL = 5  # 距上次写盘超过该秒数时写盘
+JSON_WRITER_MAX_BYTES = 256 * 1024 * 1024  # 单个文件（未压缩）超过该字节数时切换新文件，0表示不限制
+JSON_WRITER_ROTATE_SECONDS = 0  # 单个文件写入超过该秒数时切换新文件，0表示不限制
+JSON_WRITER_COMPRESSION = None  # None、'gzip' 或 'zstd'（需要安装zstandard）
+
+# 增量爬取：按用户/关键词/微博记录上次爬到的最新内容，翻页遇到已爬内容即停止
+CRAWL_INCREMENTAL = True  # 设为False或运行时加 -a full=1 / --full 进行全量爬取
+CRAWL_STATE_PATH = None  # 爬取状态库路径，None时为weibospider/crawl_state.db；相对路径按weibospider目录解析
@@ -5,11 +5,15 @@ import json
 from scrapy import Spider
 from scrapy.http import Request
 from spiders.common import parse_user_info, parse_time, url_to_mid
+from crawl_state import IncrementalMixin
 
 
-class CommentSpider(Spider):
+class CommentSpider(IncrementalMixin, Spider):
     """
     微博评论数据采集
+
+    增量模式下按时间倒序（flow=1）请求一级评论，翻页遇到不晚于上次最新评论的ID时停止；
+    上次运行中断时，另外从中断的max_id继续往后爬
     """
     name = "comment"
 
@@ -23,22 +27,45 @@ class CommentSpider(Spider):
             mid = url_to_mid(tweet_id)
             url = f"https://weibo.com/ajax/statuses/buildComments?" \
                   f"is_reload=1&id={mid}&is_show_bulletin=2&is_mix=0&count=20"
-            yield Request(url, callback=self.parse, meta={'source_url': url})
+            state = self.last_state(tweet_id) or {}
+            if self.incremental:
+                url += '&flow=1'
+            meta = {'source_url': url, 'tweet_id': tweet_id, 'stop_id': state.get('newest_id')}
+            resuming = not state.get('finished') and bool(state.get('cursor'))
+            if resuming:
+                yield Request(url + '&max_id=' + state['cursor'], callback=self.parse, meta=dict(meta, stop_id=None))
+            # 续爬且没有上次记录时，第一页只用来记录最新评论
+            meta['only_first_page'] = resuming and not meta['stop_id']
+            yield Request(url, callback=self.parse, meta=meta)
 
     def parse(self, response, **kwargs):
         """
         网页解析
         """
         data = json.loads(response.text)
+        tweet_id, stop_id = response.meta.get('tweet_id'), response.meta.get('stop_id')
+        # 二级评论的meta不含tweet_id，不参与增量判断
+        is_root = tweet_id is not None and 'fetch_level=1' not in response.url
+        reached_seen = False
         for comment_info in data['data']:
+            if is_root and stop_id and int(comment_info['id']) <= int(stop_id):
+                reached_seen = True
+                break
             item = self.parse_comment(comment_info)
+            if is_root:
+                self.track(tweet_id, item['_id'], item['created_at'])
             yield item
             # 解析二级评论
             if 'more_info' in comment_info:
                 url = f"https://weibo.com/ajax/statuses/buildComments?is_reload=1&id={comment_info['id']}" \
                       f"&is_show_bulletin=2&is_mix=1&fetch_level=1&max_id=0&count=100"
                 yield Request(url, callback=self.parse, priority=20)
-        if data.get('max_id', 0) != 0 and 'fetch_level=1' not in response.url:
+        if reached_seen:
+            self.skipped_pages += 1
+        elif data.get('max_id', 0) != 0 and 'fetch_level=1' not in response.url \
+                and not response.meta.get('only_first_page'):
+            if is_root and not stop_id:
+                self.save_cursor(tweet_id, data['max_id'])
             url = response.meta['source_url'] + '&max_id=' + str(data['max_id'])
             yield Request(url, callback=self.parse, meta=response.meta)
 
@@ -47,6 +47,17 @@ def url_to_mid(url: str):
     return int(result)
 
 
+def parse_list_arg(value, default):
+    """
+    解析通过 -a 传入的逗号分隔参数，未传入时返回默认值
+    """
+    if value is None:
+        return default
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    return [v.strip() for v in str(value).split(',') if v.strip()]
+
+
 def parse_time(s):
     """
     Wed Oct 19 23:44:36 +0800 2022 => 2022-10-19 23:44:36
@@ -5,11 +5,16 @@ import json
 from scrapy import Spider
 from scrapy.http import Request
 from spiders.comment import parse_user_info
+from spiders.common import parse_list_arg
+from crawl_state import IncrementalMixin
 
 
-class FanSpider(Spider):
+class FanSpider(IncrementalMixin, Spider):
     """
     微博粉丝数据采集
+
+    粉丝列表按关注时间倒序，增量模式下翻页遇到上次第一页的第一个粉丝时停止；
+    上次运行中断时，另外从中断的页码继续往后爬
     """
     name = "fan"
     base_url = 'https://weibo.com/ajax/friendships/friends'
@@ -18,24 +23,44 @@ class FanSpider(Spider):
         """
         爬虫入口
         """
-        # 这里user_ids可替换成实际待采集的数据
-        user_ids = ['6290114447']
+        # 这里user_ids可替换成实际待采集的数据，也可以通过 -a user_ids=ID1,ID2 传入
+        user_ids = parse_list_arg(getattr(self, 'user_ids', None), ['6290114447'])
         for user_id in user_ids:
+            state = self.last_state(user_id) or {}
+            stop_id = state.get('newest_id')
+            if not state.get('finished') and state.get('cursor'):
+                page_num = int(state['cursor'])
+                url = self.base_url + f"?relate=fans&page={page_num}&uid={user_id}&type=fans"
+                yield Request(url, callback=self.parse, meta={'user': user_id, 'page_num': page_num, 'stop_id': None})
+            # 续爬时第一页只用来记录最新粉丝（没有上次记录时）或补爬新增粉丝
+            only_first_page = bool(state.get('cursor')) and not state.get('finished') and not stop_id
             url = self.base_url + f"?relate=fans&page=1&uid={user_id}&type=fans"
-            yield Request(url, callback=self.parse, meta={'user': user_id, 'page_num': 1})
+            yield Request(url, callback=self.parse,
+                          meta={'user': user_id, 'page_num': 1, 'stop_id': stop_id, 'only_first_page': only_first_page})
 
     def parse(self, response, **kwargs):
         """
         网页解析
         """
         data = json.loads(response.text)
+        user_id, page_num = response.meta['user'], response.meta['page_num']
+        reached_seen = False
         for user in data['users']:
             item = dict()
-            item['follower_id'] = response.meta['user']
+            item['follower_id'] = user_id
             item['fan_info'] = parse_user_info(user)
-            item['_id'] = response.meta['user'] + '_' + item['fan_info']['_id']
+            item['_id'] = user_id + '_' + item['fan_info']['_id']
+            if response.meta.get('stop_id') and item['fan_info']['_id'] == response.meta['stop_id']:
+                reached_seen = True
+                break
+            if page_num == 1:
+                self.track(user_id, item['fan_info']['_id'])
             yield item
-        if data['users']:
+        if reached_seen:
+            self.skipped_pages += 1
+        elif data['users'] and not response.meta.get('only_first_page'):
+            if not response.meta.get('stop_id'):
+                self.save_cursor(user_id, page_num)
             response.meta['page_num'] += 1
             url = self.base_url + f"?relate=fans&page={response.meta['page_num']}&uid={response.meta['user']}&type=fans"
             yield Request(url, callback=self.parse, meta=response.meta)
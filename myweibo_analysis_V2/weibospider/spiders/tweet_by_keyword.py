@@ -5,16 +5,19 @@ import datetime
 import json
 import re
 from scrapy import Spider, Request
-from spiders.common import parse_tweet_info, parse_long_tweet
+from spiders.common import parse_tweet_info, parse_long_tweet, parse_list_arg
+from crawl_state import IncrementalMixin
 
 try:
     name_id_map
 except NameError:
     name_id_map = {"单依纯": "6290114447"}
 
-class TweetSpiderByKeyword(Spider):
+class TweetSpiderByKeyword(IncrementalMixin, Spider):
     """
     关键词搜索采集
+
+    增量模式下跳过上次最新微博所在小时之前的时间段，已请求过详情的微博不再请求
     """
     name = "tweet_spider_by_keyword"
     base_url = "https://s.weibo.com/"
@@ -30,24 +33,33 @@ class TweetSpiderByKeyword(Spider):
         """
         爬虫入口
         """
-        # 这里keywords可替换成实际待采集的数据
-        keywords = ['单依纯']
+        # 这里keywords可替换成实际待采集的数据，也可以通过 -a keywords=关键词1,关键词2 传入
+        keywords = parse_list_arg(getattr(self, 'keywords', None), ['单依纯'])
+        # 关键词到明星ID的映射，可以通过 -a name_id_map='{"关键词": "ID"}' 传入
+        keyword_id_map = getattr(self, 'name_id_map', None) or name_id_map
+        if isinstance(keyword_id_map, str):
+            keyword_id_map = json.loads(keyword_id_map)
         # 这里的时间可替换成实际需要的时间段
         start_time = datetime.datetime(year=2025, month=6, day=14, hour=0)
         end_time = datetime.datetime(year=2025, month=6, day=15, hour=23)
         # 是否按照小时进行切分，数据量更大; 对于非热门关键词**不需要**按照小时切分
         is_split_by_hour = True
         for keyword in keywords:
-            keyword_id = name_id_map.get(keyword, '')
+            keyword_id = keyword_id_map.get(keyword, '')
             # 初始化关键词计数
             self.keyword_counts[keyword] = 0
+            state = self.last_state(keyword) or {}
+            keyword_start_time = start_time
+            if state.get('newest_time'):
+                newest_hour = datetime.datetime.strptime(state['newest_time'][:13], '%Y-%m-%d %H')
+                keyword_start_time = max(start_time, newest_hour)
             if not is_split_by_hour:
-                _start_time = start_time.strftime("%Y-%m-%d-%H")
+                _start_time = keyword_start_time.strftime("%Y-%m-%d-%H")
                 _end_time = end_time.strftime("%Y-%m-%d-%H")
                 url = f"https://s.weibo.com/weibo?q={keyword}&timescope=custom%3A{_start_time}%3A{_end_time}&page=1"
                 yield Request(url, callback=self.parse, meta={'keyword': keyword, 'keyword_id': keyword_id})
             else:
-                time_cur = start_time
+                time_cur = keyword_start_time
                 while time_cur < end_time:
                     _start_time = time_cur.strftime("%Y-%m-%d-%H")
                     _end_time = (time_cur + datetime.timedelta(hours=1)).strftime("%Y-%m-%d-%H")
@@ -70,16 +82,25 @@ class TweetSpiderByKeyword(Spider):
             self.logger.info(f'no search result. url: {response.url}')
             return
         tweets_infos = re.findall('<div class="from"\s+>(.*?)</div>', html, re.DOTALL)
+        page_tweet_ids = []
         for tweets_info in tweets_infos:
-            tweet_ids = re.findall(r'weibo\.com/\d+/(.+?)\?refer_flag=1001030103_" ', tweets_info)
-            for tweet_id in tweet_ids:
-                # 再次检查是否已达到最大数量
-                if self.keyword_counts[keyword] >= self.max_per_keyword:
-                    self.logger.info(f"关键词 '{keyword}' 已达到最大采集数量 {self.max_per_keyword}，停止爬取")
-                    return
-                    
-                url = f"https://weibo.com/ajax/statuses/show?id={tweet_id}"
-                yield Request(url, callback=self.parse_tweet, meta=response.meta, priority=10)
+            page_tweet_ids.extend(re.findall(r'weibo\.com/\d+/(.+?)\?refer_flag=1001030103_" ', tweets_info))
+        if self.incremental:
+            tweet_ids = self.state.filter_unseen(self.name, keyword, page_tweet_ids)
+        else:
+            tweet_ids = page_tweet_ids
+        for tweet_id in tweet_ids:
+            # 再次检查是否已达到最大数量
+            if self.keyword_counts[keyword] >= self.max_per_keyword:
+                self.logger.info(f"关键词 '{keyword}' 已达到最大采集数量 {self.max_per_keyword}，停止爬取")
+                return
+                
+            url = f"https://weibo.com/ajax/statuses/show?id={tweet_id}"
+            yield Request(url, callback=self.parse_tweet, meta=response.meta, priority=10)
+        # 整页都是已爬过的微博时，后面的页面也基本爬过，不再翻页
+        if page_tweet_ids and not tweet_ids:
+            self.skipped_pages += 1
+            return
         next_page = re.search('<a href="(.*?)" class="next">下一页</a>', html)
         if next_page:
             url = "https://s.weibo.com" + next_page.group(1)
@@ -100,6 +121,9 @@ class TweetSpiderByKeyword(Spider):
         item['keyword'] = keyword
         item['keyword_id'] = response.meta.get('keyword_id', '')
         
+        self.state.mark_seen(self.name, keyword, [item['mblogid']])
+        self.track(keyword, item['mblogid'], item['created_at'])
+        
         # 增加计数
         self.keyword_counts[keyword] += 1
         self.logger.info(f"关键词 '{keyword}' 已采集 {self.keyword_counts[keyword]}/{self.max_per_keyword} 条数据")
@@ -4,15 +4,18 @@ import re
 
 from scrapy import Spider
 from scrapy.http import Request
-from spiders.common import parse_tweet_info, parse_long_tweet
+from spiders.common import parse_tweet_info, parse_long_tweet, parse_list_arg
+from crawl_state import IncrementalMixin
 
 import pymysql
 from pymysql.cursors import DictCursor
 
 
-class TweetSpiderByUserID(Spider):
+class TweetSpiderByUserID(IncrementalMixin, Spider):
     """
     用户推文数据采集
+
+    增量模式下跳过上次最新微博之前的时间段，翻页遇到上次最新的微博后停止
     """
     name = "tweet_spider_by_user_id"
 
@@ -21,8 +24,8 @@ class TweetSpiderByUserID(Spider):
         爬虫入口
         """
         print("tweet_by_user_id start_requests called")
-        # 这里user_ids可替换成实际待采集的数据
-        user_ids = ['6290114447']
+        # 这里user_ids可替换成实际待采集的数据，也可以通过 -a user_ids=ID1,ID2 传入
+        user_ids = parse_list_arg(getattr(self, 'user_ids', None), ['6290114447'])
         print("user_ids:", user_ids)
         # 这里的时间替换成实际需要的时间段，如果要采集用户全部推文 is_crawl_specific_time_span 设置为False
         is_crawl_specific_time_span = True
@@ -36,19 +39,25 @@ class TweetSpiderByUserID(Spider):
         for user_id in user_ids:
             url = f"https://weibo.com/ajax/statuses/searchProfile?uid={user_id}&page=1&hasori=1&hastext=1&haspic=1&hasvideo=1&hasmusic=1&hasret=1"
             print("yield url:", url)
+            # 上次爬到的最新微博，翻页遇到它或更早的微博时停止
+            state = self.last_state(user_id) or {}
+            meta = {'user_id': user_id, 'page_num': 1,
+                    'stop_id': state.get('newest_id'), 'stop_time': state.get('newest_time')}
             if not is_crawl_specific_time_span:
                 # 在meta中传递user_id
-                yield Request(url, callback=self.parse, meta={'user_id': user_id, 'page_num': 1})
+                yield Request(url, callback=self.parse, meta=meta)
             else:
-                # 切分成10天进行
+                # 切分成10天进行，已爬过的时间段直接跳过
                 tmp_start_time = start_time
+                if meta['stop_time']:
+                    tmp_start_time = max(start_time, datetime.datetime.strptime(meta['stop_time'][:10], '%Y-%m-%d'))
                 while tmp_start_time <= end_time:
                     tmp_end_time = tmp_start_time + datetime.timedelta(days=10)
                     tmp_end_time = min(tmp_end_time, end_time)
                     tmp_url = url + f'&starttime={int(tmp_start_time.timestamp())}&endtime={int(tmp_end_time.timestamp())}'
                     print("yield url (with time):", tmp_url)
                     # 在meta中传递user_id
-                    yield Request(tmp_url, callback=self.parse, meta={'user_id': user_id, 'page_num': 1})
+                    yield Request(tmp_url, callback=self.parse, meta=dict(meta))
                     tmp_start_time = tmp_end_time + datetime.timedelta(days=1)
 
     def parse(self, response, **kwargs):
@@ -61,8 +70,15 @@ class TweetSpiderByUserID(Spider):
             data = json.loads(response.text)
             tweets = data['data']['list']
             print("DEBUG: tweets count:", len(tweets))
+            reached_seen = False
             for tweet in tweets:
                 item = parse_tweet_info(tweet)
+                # 置顶微博不按时间排序，不参与增量判断
+                if not tweet.get('isTop'):
+                    if self.is_seen(item, response.meta):
+                        reached_seen = True
+                        break
+                    self.track(response.meta['user_id'], item['mblogid'], item['created_at'])
                 # 从meta中获取user_id并添加到item中
                 item['user_id'] = response.meta['user_id']
                 del item['user']
@@ -74,10 +90,19 @@ class TweetSpiderByUserID(Spider):
                 else:
                     # 输出包含user_id的item
                     yield item
-            if tweets:
-                user_id, page_num = response.meta['user_id'], response.meta['page_num']
+            if reached_seen:
+                self.skipped_pages += 1
+            elif tweets:
+                page_num = response.meta['page_num']
                 url = response.url.replace(f'page={page_num}', f'page={page_num + 1}')
-                yield Request(url, callback=self.parse, meta={'user_id': user_id, 'page_num': page_num + 1})
+                yield Request(url, callback=self.parse, meta=dict(response.meta, page_num=page_num + 1))
         except Exception as e:
             print("DEBUG: Error in tweet_by_user_id parse:", e)
-            print("DEBUG: response.text (full):", response.text)
\ No newline at end of file
+            print("DEBUG: response.text (full):", response.text)
+
+    @staticmethod
+    def is_seen(item, meta):
+        """是否已经爬到上次最新的微博"""
+        if meta.get('stop_id') and item['mblogid'] == meta['stop_id']:
+            return True
+        return bool(meta.get('stop_time')) and item['created_at'] < meta['stop_time']
\ No newline at end of file
@@ -4,7 +4,7 @@
 import json
 from scrapy import Spider
 from scrapy.http import Request
-from spiders.common import parse_user_info
+from spiders.common import parse_user_info, parse_list_arg
 
 
 class UserSpider(Spider):
@@ -19,8 +19,8 @@ class UserSpider(Spider):
         爬虫入口
         """
         print("UserSpider start_requests called")
-        # 这里user_ids可替换成实际待采集的数据
-        user_ids = ['6290114447']
+        # 这里user_ids可替换成实际待采集的数据，也可以通过 -a user_ids=ID1,ID2 传入
+        user_ids = parse_list_arg(getattr(self, 'user_ids', None), ['6290114447'])
         print("user_ids:", user_ids)
         urls = [f'https://weibo.com/ajax/profile/info?uid={user_id}' for user_id in user_ids]
         for url in urls:
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 测试用的小词表：情感分析器和清洗器的测试文本只用到这些字
+TINY_VOCAB_CHARS = "我喜欢你讨厌他们好差不错真的太棒了垃圾支持加油哈这是一条评论"
+
+
+@pytest.fixture
+def tiny_bert(tmp_path):
+    """离线构造一个很小的BERT分类模型和分词器，代替bert-base-chinese"""
+    torch = pytest.importorskip('torch')
+    transformers = pytest.importorskip('transformers')
+
+    vocab_file = tmp_path / 'vocab.txt'
+    vocab_file.write_text('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + list(TINY_VOCAB_CHARS)),
+                          encoding='utf-8')
+    tokenizer = transformers.BertTokenizer(str(vocab_file))
+
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=len(TINY_VOCAB_CHARS) + 5,
+        hidden_size=16,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        intermediate_size=32,
+        max_position_embeddings=64,
+        num_labels=3,
+        initializer_range=0.5
+    )
+    model = transformers.BertForSequenceClassification(config).eval()
+    return tokenizer, model
+
+
+@pytest.fixture
+def registered_bert(tiny_bert, tmp_path, monkeypatch):
+    """把小模型放入进程内模型注册表，ModelManager().get_bert_model() 直接返回它
+
+    工作目录切到临时目录，ModelManager 创建的 models/weights 不会落在仓库里
+    """
+    from api.models.model_manager import ModelManager, get_model_registry
+
+    monkeypatch.chdir(tmp_path)
+    key = ModelManager().registry_key
+    registry = get_model_registry()
+    registry.unload(key)
+    registry.get(key, lambda: tiny_bert)
+    yield tiny_bert
+    registry.unload(key)
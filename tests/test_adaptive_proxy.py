@@ -0,0 +1,124 @@
+import warnings
+
+import pytest
+
+pytest.importorskip('scrapy')
+
+from scrapy.exceptions import ScrapyDeprecationWarning
+from scrapy.http import Request, Response
+from scrapy.utils.test import get_crawler
+
+from api.datacrawl.datacrawl.weibo_spider import adaptive_proxy, middlewares
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(adaptive_proxy.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def make_middleware(**settings):
+    settings = dict({'PROXY_LIST': ['http://p1', 'http://p2'], 'ADAPTIVE_START_CONCURRENCY': 2,
+                     'ADAPTIVE_RETRY_TIMES': 1}, **settings)
+    crawler = get_crawler(settings_dict=settings)
+    return adaptive_proxy.AdaptiveProxyMiddleware.from_crawler(crawler), crawler
+
+
+def test_middlewares_reexport_the_shared_implementation():
+    assert middlewares.AdaptiveProxyMiddleware is adaptive_proxy.AdaptiveProxyMiddleware
+    assert middlewares.ProxyPool is adaptive_proxy.ProxyPool
+
+
+def test_middleware_methods_do_not_require_spider_argument():
+    from scrapy.core.downloader.middleware import DownloaderMiddlewareManager
+
+    crawler = get_crawler(settings_dict={
+        'DOWNLOADER_MIDDLEWARES': {'api.datacrawl.datacrawl.weibo_spider.middlewares.AdaptiveProxyMiddleware': 560},
+    })
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', ScrapyDeprecationWarning)
+        manager = DownloaderMiddlewareManager.from_crawler(crawler)
+    assert any(isinstance(mw, adaptive_proxy.AdaptiveProxyMiddleware) for mw in manager.middlewares)
+    assert not [w for w in caught if 'AdaptiveProxyMiddleware' in str(w.message)]
+
+
+def test_proxy_cooldown_doubles_and_proxy_rejoins(clock):
+    pool = adaptive_proxy.ProxyPool(['a', 'b'], cooldown=10, max_cooldown=15, max_failures=2)
+
+    assert pool.failure('a') is False
+    assert pool.failure('a') is True
+    assert pool.available() == ['b']
+
+    clock[0] += 10
+    # 冷却到期后以一半的成功率重新参与选择
+    assert pool.available() == ['a', 'b']
+    assert pool.proxies['a']['success'] == 0.5
+
+    pool.failure('a')
+    pool.failure('a')
+    # 第二次冷却翻倍为20秒，但不超过max_cooldown
+    assert pool.proxies['a']['until'] == clock[0] + 15
+    pool.failure('b')
+    pool.failure('b')
+    assert pool.choose() is None
+
+
+def test_endpoint_limiter_halves_on_throttle_and_wakes_waiters(clock):
+    limiter = adaptive_proxy.EndpointLimiter(start=2, minimum=1, backoff=5)
+
+    assert limiter.acquire('comments') is None
+    assert limiter.acquire('comments') is None
+    waiter = limiter.acquire('comments')
+    fired = []
+    waiter.addCallback(fired.append)
+
+    limiter.release('comments')
+    assert fired == [None]
+    assert limiter.get('comments')['limit'] == pytest.approx(2.5)
+
+    started = clock[0]
+    clock[0] += 1
+    limiter.release('comments', throttled=True, started=started)
+    state = limiter.get('comments')
+    assert state['limit'] == pytest.approx(1.25)
+    assert state['paused_until'] == clock[0] + 5
+    # 减半之前发出的请求再被限流时不重复减半
+    limiter.release('comments', throttled=True, started=started)
+    assert state['limit'] == pytest.approx(1.25)
+    assert state['throttled'] == 2
+
+    # 暂停期间其它接口不受影响
+    assert limiter.acquire('statuses') is None
+
+
+def test_throttled_response_retries_with_another_proxy(clock):
+    middleware, crawler = make_middleware()
+    request = Request('https://weibo.com/ajax/statuses/mymblog?uid=1')
+
+    assert middleware.process_request(request) is None
+    assert request.meta['adaptive_endpoint'] == 'statuses'
+    assert request.meta['proxy'] in ('http://p1', 'http://p2')
+
+    retry = middleware.process_response(request, Response(request.url, status=429))
+    assert isinstance(retry, Request)
+    assert retry.dont_filter and retry.meta['adaptive_retry_times'] == 1
+    assert crawler.stats.get_value('adaptive/throttled/429') == 1
+    assert middleware.limiter.get('statuses')['limit'] == 1
+
+    clock[0] += 10
+    assert middleware.process_request(retry) is None
+    # 重试次数用完后把限流响应交给爬虫
+    response = Response(retry.url, status=418)
+    assert middleware.process_response(retry, response) is response
+
+
+def test_exception_records_proxy_failure(clock):
+    middleware, _ = make_middleware(PROXY_LIST=['http://p1'])
+    request = Request('https://weibo.com/ajax/comments/show?id=1')
+    middleware.process_request(request)
+
+    assert middleware.process_exception(request, ConnectionError()) is None
+    state = middleware.pool.proxies['http://p1']
+    assert state['errors'] == 1 and state['failures'] == 1
+    assert middleware.limiter.get('comments')['active'] == 0
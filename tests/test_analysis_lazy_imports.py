@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_in_fresh_interpreter(code):
+    """在新进程中执行，避免其他测试已导入的模块影响 sys.modules"""
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.split()
+
+
+def test_importing_package_does_not_load_heavy_modules():
+    loaded = run_in_fresh_interpreter(
+        "import sys, api.analysis\n"
+        "print(*[m for m in ('torch', 'transformers', 'pandas', 'matplotlib', 'seaborn') if m in sys.modules])"
+    )
+    assert loaded == []
+
+
+def test_analyzer_class_is_imported_on_first_access():
+    loaded = run_in_fresh_interpreter(
+        "import sys, api.analysis\n"
+        "cls = api.analysis.HeatAnalyzer\n"
+        "from api.analysis.heat.heat_analyzer import HeatAnalyzer\n"
+        "print(cls is HeatAnalyzer, 'HeatAnalyzer' in vars(api.analysis), 'torch' in sys.modules)"
+    )
+    # 访问后缓存到包的命名空间；热度分析器不依赖torch
+    assert loaded == ['True', 'True', 'False']
+
+
+def test_unknown_attribute_raises_attribute_error():
+    import api.analysis
+
+    with pytest.raises(AttributeError):
+        api.analysis.NoSuchAnalyzer
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+
+from api.models.backend_benchmark import compare, probe_predictions
+
+
+def clustered_embeddings(seed=0, per_class=8, dim=32, spread=0.3):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(3, dim))
+    labels = np.repeat(np.arange(3), per_class)
+    vectors = centers[labels] + spread * rng.normal(size=(len(labels), dim))
+    return vectors.astype(np.float32), labels
+
+
+def test_probe_measures_accuracy_for_headless_model():
+    reference, labels = clustered_embeddings()
+
+    metrics = compare(reference, reference.copy(), labels)
+
+    assert metrics['method'] == 'probe'
+    assert metrics['accuracy'] == 1.0
+    assert metrics['agreement'] == 1.0
+
+
+def test_probe_detects_degraded_backend():
+    reference, labels = clustered_embeddings()
+    rng = np.random.default_rng(1)
+    degraded = reference + 3.0 * rng.normal(size=reference.shape).astype(np.float32)
+
+    metrics = compare(reference, degraded, labels)
+
+    assert metrics['accuracy'] < 1.0
+    assert metrics['agreement'] < 1.0
+    assert metrics['mean_cosine'] < 0.9
+
+
+def test_probe_is_leave_one_out():
+    # 每类两条样本且同类样本相距很远：若不留一，每条样本都会被自己所在的类中心吸引而全部分对；
+    # 留一后类中心只剩另一条同类样本，反而离另一类的中心更近
+    reference = np.array([[1.0, 0.0], [0.0, 1.0], [0.9, 0.1], [0.1, 0.9]], dtype=np.float32)
+    labels = np.array([0, 0, 1, 1])
+
+    predictions = probe_predictions(reference, reference, labels)
+
+    assert predictions.tolist() == [1, 1, 0, 0]
+
+
+def test_classification_head_uses_argmax():
+    reference = np.array([[2.0, 0.0, 0.0], [0.0, 0.0, 2.0]], dtype=np.float32)
+    outputs = np.array([[1.0, 0.5, 0.0], [0.0, 1.0, 0.5]], dtype=np.float32)
+
+    metrics = compare(reference, outputs, np.array([0, 2]))
+
+    assert metrics['method'] == 'head'
+    assert metrics['agreement'] == 0.5
+    assert metrics['accuracy'] == 0.5
@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+from api.analysis.black_fan_benchmark import (CELEBRITY_ID, build_dataset, compare, run_deep_page, run_legacy,
+                                              run_new)
+from api.analysis.sentiment.black_fan_analyzer import BlackFanAnalyzer
+from api.database.db_utils import get_engine_registry
+
+FANS = 3000
+
+
+@pytest.fixture
+def db_url(tmp_path, monkeypatch):
+    # 分析器在当前目录下创建结果保存目录
+    monkeypatch.chdir(tmp_path)
+    build_dataset(str(tmp_path / 'black_fans.db'), FANS)
+    url = f'sqlite:///{tmp_path}/black_fans.db'
+    yield url
+    get_engine_registry().dispose(url)
+
+
+def test_pandas_report_matches_row_by_row_baseline(db_url):
+    # 块比总行数小，覆盖分块读取后合并类别的路径
+    analyzer = BlackFanAnalyzer(db_url, chunk_size=700, aggregation='pandas')
+
+    assert compare(run_legacy(analyzer, CELEBRITY_ID), run_new(analyzer, CELEBRITY_ID)) == []
+
+
+def test_analyze_black_fans_saves_report(db_url, tmp_path):
+    analyzer = BlackFanAnalyzer(db_url, aggregation='pandas')
+
+    result = analyzer.analyze_black_fans(CELEBRITY_ID)
+
+    assert result['status'] == 'success'
+    data = result['data']
+    assert data['total_count'] == FANS
+    assert sum(data['score_distribution']['distribution'].values()) == FANS
+    assert sum(data['gender_distribution'].values()) == FANS
+    assert sum(item['count'] for item in data['time_distribution']['hour_distribution']) == FANS
+    assert len(data['trend_analysis']) == analyzer.timewindow
+    saved = list((tmp_path / 'static' / 'analysis' / 'black_fans').glob(f'analysis_{CELEBRITY_ID}_*.json'))
+    assert len(saved) == 1
+    assert json.loads(saved[0].read_text(encoding='utf-8'))['results']['total_count'] == FANS
+
+
+def test_unknown_celebrity_reports_error(db_url):
+    analyzer = BlackFanAnalyzer(db_url, aggregation='pandas')
+
+    assert analyzer.analyze_black_fans('no-such-star') == {'status': 'error', 'message': '未找到黑粉数据'}
+
+
+def test_sql_aggregation_matches_pandas_and_baseline(db_url):
+    sql = BlackFanAnalyzer(db_url, aggregation='sql')
+    pandas = BlackFanAnalyzer(db_url, aggregation='pandas')
+
+    sql_report = run_new(sql, CELEBRITY_ID)
+    assert compare(run_legacy(sql, CELEBRITY_ID), sql_report) == []
+    assert compare(run_new(pandas, CELEBRITY_ID), sql_report) == []
+
+
+def _walk_pages(analyzer, limit):
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = analyzer.get_top_black_fans(CELEBRITY_ID, limit=limit, cursor=cursor)
+        seen.extend(item['user_id'] for item in page['items'])
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            return seen, pages
+
+
+def test_keyset_pages_walk_the_full_ranking(db_url):
+    analyzer = BlackFanAnalyzer(db_url, aggregation='sql')
+    with analyzer.engine.begin() as conn:
+        # comment_count可以为NULL：排行榜第一组同分，评论数有5也有NULL，另外每7个用户一个NULL
+        conn.exec_driver_sql("UPDATE black_fans SET comment_count = NULL WHERE CAST(user_id AS INTEGER) % 7 = 0")
+        conn.exec_driver_sql("UPDATE black_fans SET black_fan_score = 1.5, comment_count = 5 WHERE user_id IN ('1', '2')")
+        conn.exec_driver_sql(
+            "UPDATE black_fans SET black_fan_score = 1.5, comment_count = NULL WHERE user_id IN ('3', '4', '5')"
+        )
+        expected = [row.user_id for row in conn.exec_driver_sql("""
+            SELECT user_id FROM black_fans WHERE celebrity_id = ?
+            ORDER BY black_fan_score DESC, COALESCE(comment_count, 0) DESC, user_id DESC
+        """, (CELEBRITY_ID,))]
+    assert expected[:5] == ['2', '1', '5', '4', '3']
+
+    seen, pages = _walk_pages(analyzer, 250)
+    assert seen == expected
+    assert pages == FANS // 250
+
+    # 每页2行时游标会落在NULL行上，NULL行既不能被跳过也不能让游标解析失败
+    seen, _ = _walk_pages(analyzer, 2)
+    assert seen == expected
+    assert analyzer.get_top_black_fans(CELEBRITY_ID, limit=3)['items'][2]['comment_count'] == 0
+    # 第2000名之后的一页：键集分页与OFFSET取到同一页（run_deep_page内部断言）
+    assert set(run_deep_page(analyzer, 2000)) == {'offset_ms', 'keyset_ms'}
+
+
+def test_keyset_page_seeks_into_the_rank_index(db_url):
+    from sqlalchemy import event
+
+    analyzer = BlackFanAnalyzer(db_url, aggregation='sql')
+    cursor = analyzer.get_top_black_fans(CELEBRITY_ID, limit=2000)['next_cursor']
+    executed = []
+
+    def capture(conn, dbapi_cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    event.listen(analyzer.engine, 'before_cursor_execute', capture)
+    try:
+        analyzer.get_top_black_fans(CELEBRITY_ID, limit=20, cursor=cursor)
+    finally:
+        event.remove(analyzer.engine, 'before_cursor_execute', capture)
+
+    # 对实际执行的翻页语句取查询计划：必须按分数范围定位到排行索引，而不是从第一名开始扫描
+    statement, parameters = executed[-1]
+    with analyzer.engine.connect() as conn:
+        plan = [row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+    assert any('idx_black_fans_celebrity_rank' in step and 'black_fan_score<' in step for step in plan), plan
+
+
+@pytest.mark.parametrize('cursor', ['not-base64!', 'W10=', 'WyJ4IiwgMSwgIjEiXQ=='])
+def test_malformed_cursor_raises_value_error(db_url, cursor):
+    analyzer = BlackFanAnalyzer(db_url, aggregation='sql')
+
+    with pytest.raises(ValueError):
+        analyzer.get_top_black_fans(CELEBRITY_ID, cursor=cursor)
+
+
+def test_unknown_aggregation_mode_is_rejected(db_url):
+    with pytest.raises(ValueError):
+        BlackFanAnalyzer(db_url, aggregation='spark')
@@ -0,0 +1,47 @@
+from api.data_processing import cache as cache_module
+from api.data_processing.cache import BoundedCache
+
+
+def test_evicts_least_recently_used_entry():
+    cache = BoundedCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # a变为最近使用
+    cache.put('c', 3)
+
+    assert 'b' not in cache
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions']['entries'] == 1
+
+
+def test_byte_limit_evicts_oldest_entries():
+    cache = BoundedCache(max_entries=100, max_bytes=30, sizeof=lambda obj: 5)
+    for key in 'abcd':
+        cache.put(key, key)
+
+    # 每条10字节，上限30字节只能保留最近的3条
+    assert len(cache) == 3
+    assert 'a' not in cache
+    assert cache.stats()['evictions']['bytes'] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    cache = BoundedCache(max_entries=10, ttl=60)
+    cache.put('a', 1)
+
+    now[0] += 59
+    assert cache.get('a') == 1
+    now[0] += 2
+    assert cache.get('a', 'expired') == 'expired'
+    assert cache.stats()['evictions']['ttl'] == 1
+    assert len(cache) == 0
+
+
+def test_overwrite_keeps_byte_accounting():
+    cache = BoundedCache(max_entries=10, sizeof=lambda obj: 1)
+    cache.put('a', 1)
+    cache.put('a', 2)
+    assert cache.get('a') == 2
+    assert cache.stats()['bytes'] == 2
@@ -0,0 +1,91 @@
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('transformers')
+
+from api.data_processing.data_cleaner import DataCleaner
+
+COMMENTS = ['转发微博', '//@某人: 转发', 'http://t.cn/abc', '', '哈', '6', 'yyds', '好～～～', '今天天气很好', '嗯', '哈']
+
+
+def make_cleaner(monkeypatch, cascade, semantic):
+    """semantic: 文本 -> 模型判定结果，用来代替BERT前向"""
+    cleaner = DataCleaner(cascade=cascade)
+    seen = []
+
+    def fake_semantic(texts):
+        seen.append(list(texts))
+        return [semantic(text) for text in texts]
+
+    monkeypatch.setattr(cleaner, 'has_semantic_meaning_batch', fake_semantic)
+    return cleaner, seen
+
+
+@pytest.mark.parametrize('semantic', [lambda text: True, lambda text: False, lambda text: len(text) % 2 == 0])
+def test_cascade_matches_model_or_rule_path_except_obvious_junk(monkeypatch, semantic):
+    cascade, _ = make_cleaner(monkeypatch, True, semantic)
+    legacy, _ = make_cleaner(monkeypatch, False, semantic)
+
+    got = cascade.is_meaningful_comment_batch(COMMENTS)
+    expected = legacy.is_meaningful_comment_batch(COMMENTS)
+
+    # 纯转发、//@转发链、纯链接和空文本由规则直接判为无意义，不再被模型结果翻转；其余与原流程一致
+    for text, cascade_result, legacy_result in zip(COMMENTS, got, expected):
+        if cascade._rule_decision(text) is False:
+            assert cascade_result is False
+        else:
+            assert cascade_result == legacy_result, text
+
+
+def test_only_ambiguous_texts_reach_model(monkeypatch):
+    cleaner, seen = make_cleaner(monkeypatch, True, lambda text: True)
+
+    results = cleaner.is_meaningful_comment_batch(COMMENTS)
+
+    assert results[:4] == [False] * 4
+    assert seen == [['哈', '嗯', '哈']]
+    stats = cleaner.get_stage_stats()
+    assert stats['counts'] == {'cache': 0, 'rule_meaningless': 4, 'rule_meaningful': 4, 'model': 3}
+    assert stats['fractions']['model'] == pytest.approx(3 / len(COMMENTS))
+
+    # 第二次全部命中缓存，不再经过规则层和模型
+    cleaner.is_meaningful_comment_batch(COMMENTS)
+    assert len(seen) == 1
+    assert cleaner.get_stage_stats()['counts']['cache'] == len(COMMENTS)
+
+
+def test_cleaner_reloads_bert_after_retry_window(monkeypatch, tmp_path, tiny_bert):
+    from pathlib import Path
+
+    from api.models.model_manager import get_model_registry
+
+    registry = get_model_registry()
+    monkeypatch.setattr(registry, 'retry_after', 60)
+    cleaner = DataCleaner(model_path=str(tmp_path / 'bert'))
+    key = f"bert:{Path(cleaner.model_path).resolve()}"
+    loads = []
+
+    def flaky_load(model_path):
+        loads.append(model_path)
+        if len(loads) == 1:
+            raise OSError('无法下载')
+        return tiny_bert
+
+    monkeypatch.setattr(cleaner, '_init_bert_model', flaky_load)
+    try:
+        # 首次加载失败，重试间隔内不再调用加载函数
+        assert cleaner.has_semantic_meaning_batch(['今天天气很好']) == [False]
+        assert cleaner.model is None
+        assert len(loads) == 1
+
+        # 间隔过后同一个清洗器重新加载成功
+        monkeypatch.setattr(registry, 'retry_after', 0)
+        assert cleaner.model is tiny_bert[1]
+        assert len(loads) == 2
+
+        # 清洗器不持有模型引用，注册表卸载后下次使用重新加载
+        registry.unload(key)
+        assert cleaner.tokenizer is tiny_bert[0]
+        assert len(loads) == 3
+    finally:
+        registry.unload(key)
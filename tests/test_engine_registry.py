@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from api.database.db_utils import EngineRegistry, MeteredQueuePool, get_engine, get_engine_registry
+
+
+@pytest.fixture
+def registry():
+    registry = EngineRegistry()
+    yield registry
+    registry.dispose()
+
+
+def test_one_engine_per_url_even_under_concurrent_first_use(registry, tmp_path):
+    url = f'sqlite:///{tmp_path}/a.db'
+    engines = []
+    start = threading.Barrier(8)
+
+    def worker():
+        start.wait()
+        engines.append(registry.get(url))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(engine) for engine in engines}) == 1
+    assert registry.get(url) is engines[0]
+    assert registry.get(f'sqlite:///{tmp_path}/b.db') is not engines[0]
+    assert len(registry.stats()) == 2
+
+
+def test_sqlite_file_engine_is_pooled_with_wal(registry, tmp_path):
+    engine = registry.get(f'sqlite:///{tmp_path}/a.db')
+
+    assert isinstance(engine.pool, MeteredQueuePool)
+    with engine.connect() as conn:
+        assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert conn.execute(text('PRAGMA busy_timeout')).scalar() > 0
+
+    # 内存库每个连接是独立的数据库，不能换成QueuePool
+    assert not isinstance(registry.get('sqlite://').pool, MeteredQueuePool)
+
+
+def test_pool_metrics_count_checkouts_and_timeouts(registry, tmp_path):
+    url = f'sqlite:///{tmp_path}/a.db'
+    engine = registry.get(url, pool_size=1, max_overflow=0, pool_timeout=0.05)
+
+    held = engine.connect()
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    held.close()
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+
+    stats = registry.stats()[url]
+    assert stats['checkouts'] == 2 and stats['checked_out'] == 0
+    assert stats['peak_checked_out'] == 1
+    assert stats['timeouts'] == 1
+    assert stats['max_wait_ms'] >= 50
+    assert stats['pool_size'] == 1 and stats['idle'] == 1
+
+    # engine.dispose() 重建连接池后统计继续累计
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert registry.stats()[url]['checkouts'] == 3
+
+
+def test_dispose_removes_engine(registry, tmp_path):
+    url = f'sqlite:///{tmp_path}/a.db'
+    engine = registry.get(url)
+
+    registry.dispose(url)
+
+    assert registry.stats() == {}
+    assert registry.get(url) is not engine
+
+
+def test_analyzers_share_the_process_engine(tmp_path):
+    from api.analysis.heat.heat_analyzer import HeatAnalyzer
+    from api.report.data_collector import ReportDataCollector
+
+    url = f'sqlite:///{tmp_path}/shared.db'
+    try:
+        heat = HeatAnalyzer(url)
+        collector = ReportDataCollector(url)
+        assert heat.engine is collector.engine is get_engine(url)
+    finally:
+        get_engine_registry().dispose(url)
@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip('torch')
+
+from sqlalchemy import text
+
+from api.analysis.fan_analysis import FanAnalyzer
+from api.analysis.fan_benchmark import CELEBRITY_ID, KeywordSentimentAnalyzer, build_dataset, run_legacy
+
+USERS = 300
+
+
+@pytest.fixture
+def analyzer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db_path = tmp_path / 'fans.db'
+    build_dataset(str(db_path), users=USERS, comments_per_user=4, posts=50)
+    db_url = f'sqlite:///{db_path}'
+    sentiment_analyzer = KeywordSentimentAnalyzer(db_url, cache_path=None)
+    return FanAnalyzer(db_url, chunk_size=64, sentiment_analyzer=sentiment_analyzer)
+
+
+def black_fan_rows(analyzer):
+    with analyzer.engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT user_id, celebrity_id, black_fan_score, comment_count FROM black_fans ORDER BY user_id"
+        )).fetchall()
+    return [(row.user_id, row.celebrity_id, round(row.black_fan_score, 6), row.comment_count) for row in rows]
+
+
+def test_bulk_detection_matches_per_fan_pipeline(analyzer):
+    run_legacy(analyzer, limit=USERS)
+    expected = black_fan_rows(analyzer)
+    with analyzer.engine.begin() as conn:
+        conn.execute(text("DELETE FROM black_fans"))
+
+    stats = analyzer.detect_black_fans(CELEBRITY_ID)
+
+    assert black_fan_rows(analyzer) == expected
+    assert stats['total_fans'] == USERS
+    assert stats['black_fan_count'] == len(expected)
+    # 合成数据中每10个用户有1个集中发负面评论的黑粉
+    assert {user_id for user_id, *_ in expected} == {str(i) for i in range(0, USERS, 10)}
+
+
+def test_detection_is_idempotent_and_chunked(analyzer, monkeypatch):
+    upserts = []
+    upsert = analyzer._upsert_black_fans
+
+    def spy(rows, *args, **kwargs):
+        upserts.append(len(rows))
+        return upsert(rows, *args, **kwargs)
+
+    monkeypatch.setattr(analyzer, '_upsert_black_fans', spy)
+    first = analyzer.detect_black_fans(CELEBRITY_ID)
+    rows = black_fan_rows(analyzer)
+    second = analyzer.detect_black_fans(CELEBRITY_ID)
+
+    # 每批用户一次upsert，重复检测只更新已有记录
+    assert len(upserts) == 2 * -(-USERS // analyzer.chunk_size)
+    assert first == second
+    assert black_fan_rows(analyzer) == rows
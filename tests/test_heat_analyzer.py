@@ -0,0 +1,76 @@
+import os
+import shutil
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from api.analysis.heat.heat_analyzer import HeatAnalyzer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CELEBRITY_ID = 'c1'
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """仓库自带数据库的副本（真实表结构），写入三天的微博和评论"""
+    path = tmp_path / 'celebrity_sentiment.db'
+    shutil.copy(f'{ROOT}/data/celebrity_sentiment.db', path)
+
+    today = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO celebrity (weibo_id, name) VALUES (?, ?)", (CELEBRITY_ID, '测试明星'))
+    for offset in range(3):
+        day = today - timedelta(days=offset)
+        for i in range(offset + 1):
+            post_id = f'p{offset}_{i}'
+            conn.execute(
+                "INSERT INTO post (post_id, celebrity_id, content, likes, reposts, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (post_id, CELEBRITY_ID, '内容', 10, 4, day.isoformat(sep=' '))
+            )
+            conn.execute(
+                "INSERT INTO comment (comment_id, post_id, content, created_at) VALUES (?, ?, ?, ?)",
+                (f'{post_id}_c', post_id, '评论', day.isoformat(sep=' '))
+            )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def stored_counts(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("""
+        SELECT date, post_count, comment_count, like_count, repost_count
+        FROM heat_data WHERE celebrity_id = ? AND post_count > 0 ORDER BY date
+    """, (CELEBRITY_ID,)).fetchall()
+    conn.close()
+    return rows
+
+
+def expected_counts():
+    today = datetime.now().date()
+    # offset天前有 offset+1 条微博，每条10赞、4转发、1条评论
+    return [
+        (str(today - timedelta(days=offset)), offset + 1, offset + 1, 10 * (offset + 1), 4 * (offset + 1))
+        for offset in (2, 1, 0)
+    ]
+
+
+@pytest.mark.parametrize('incremental', [True, False])
+def test_update_heat_data_on_real_schema(db_path, incremental):
+    analyzer = HeatAnalyzer(f'sqlite:///{db_path}')
+
+    assert analyzer.update_heat_data(CELEBRITY_ID, days=7, incremental=incremental) is True
+    assert stored_counts(db_path) == expected_counts()
+
+
+def test_incremental_update_is_idempotent(db_path):
+    analyzer = HeatAnalyzer(f'sqlite:///{db_path}')
+    assert analyzer.update_heat_data(CELEBRITY_ID, days=7)
+    conn = sqlite3.connect(db_path)
+    first = conn.execute("SELECT date, total_heat, heat_change FROM heat_data ORDER BY date").fetchall()
+
+    assert analyzer.update_heat_data(CELEBRITY_ID, days=7)
+    assert conn.execute("SELECT date, total_heat, heat_change FROM heat_data ORDER BY date").fetchall() == first
+    conn.close()
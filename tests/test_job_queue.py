@@ -0,0 +1,186 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from api.database.db_utils import get_engine_registry
+from api.database.models import AnalysisJob
+from api.jobs import JobQueue
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    url = f'sqlite:///{tmp_path}/jobs.db'
+    queues = []
+
+    def factory(workers=None, **kwargs):
+        queue = JobQueue(url, workers or {'crawl': 1, 'analysis': 2}, **kwargs)
+        queues.append(queue)
+        return queue
+
+    yield factory
+    for queue in queues:
+        queue.shutdown()
+    get_engine_registry().dispose(url)
+
+
+def wait_for(queue, job_id, statuses, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get_job(job_id)
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"任务 {job_id} 未进入 {statuses}: {queue.get_job(job_id)}")
+
+
+def blocking_job(release, started=None):
+    def run(ctx):
+        if started is not None:
+            started.set()
+        assert release.wait(5)
+        return f'{ctx.job_type} {ctx.celebrity_id} 完成'
+    return run
+
+
+def test_duplicate_submission_merges_into_queued_job(make_queue):
+    queue = make_queue()
+    release, started = threading.Event(), threading.Event()
+    # 占住唯一的爬取线程，明星1的任务保持排队
+    busy, _ = queue.submit('crawl', 0, blocking_job(release, started))
+    assert started.wait(5)
+
+    first, created = queue.submit('crawl', 1, blocking_job(release))
+    again, created_again = queue.submit('crawl', '1', blocking_job(release))
+    other, created_other = queue.submit('analysis', 1, blocking_job(release))
+
+    assert created and not created_again and created_other
+    assert again['id'] == first['id'] and again['status'] == 'queued' and 'rerun_pending' not in again
+    assert other['id'] != first['id']
+
+    release.set()
+    done = wait_for(queue, first['id'], ('done',))
+    assert done['progress'] == 1.0 and done['message'] == 'crawl 1 完成'
+    assert done['wait_seconds'] is not None and done['run_seconds'] is not None
+    wait_for(queue, other['id'], ('done',))
+    # 合并到排队任务的提交不会再产生任务
+    assert len(queue.list_jobs(celebrity_id=1)) == 2
+    # 结束后同一明星同类型的任务可以再次入队
+    _, created_after = queue.submit('crawl', 1, lambda ctx: None)
+    assert created_after
+
+
+def test_submission_during_run_triggers_one_follow_up(make_queue):
+    queue = make_queue()
+    release, started = threading.Event(), threading.Event()
+    calls = []
+
+    running, _ = queue.submit('analysis', 5, blocking_job(release, started))
+    assert started.wait(5)
+    wait_for(queue, running['id'], ('running',))
+
+    # 分析执行期间爬虫又抓到新数据，两次提交只在结束后补跑一次，使用最后提交的函数
+    job, created = queue.submit('analysis', 5, lambda ctx: calls.append('first'))
+    job2, created2 = queue.submit('analysis', 5, lambda ctx: calls.append('second'))
+    assert not created and not created2
+    assert job['id'] == job2['id'] == running['id'] and job['rerun_pending']
+
+    release.set()
+    wait_for(queue, running['id'], ('done',))
+    jobs = queue.list_jobs(celebrity_id=5)
+    assert len(jobs) == 2
+    follow_up = wait_for(queue, jobs[0]['id'], ('done',))
+    assert follow_up['id'] != running['id']
+    assert calls == ['second']
+    assert len(queue.list_jobs(celebrity_id=5)) == 2
+
+
+def test_pool_size_bounds_running_jobs(make_queue):
+    queue = make_queue({'analysis': 2})
+    release = threading.Event()
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def job(ctx):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        release.wait(5)
+        with lock:
+            running[0] -= 1
+
+    jobs = [queue.submit('analysis', star, job)[0] for star in range(5)]
+    wait_for(queue, jobs[0]['id'], ('running',))
+    wait_for(queue, jobs[1]['id'], ('running',))
+    time.sleep(0.05)
+    assert [queue.get_job(j['id'])['status'] for j in jobs[2:]] == ['queued'] * 3
+
+    release.set()
+    for j in jobs:
+        wait_for(queue, j['id'], ('done',))
+    assert peak[0] == 2
+
+
+def test_failed_job_records_error_and_frees_slot(make_queue):
+    queue = make_queue()
+
+    def broken(ctx):
+        ctx.progress('抓取', 0.5)
+        raise RuntimeError('cookie失效')
+
+    job, _ = queue.submit('crawl', 7, broken)
+    failed = wait_for(queue, job['id'], ('failed',))
+
+    assert failed['message'] == 'cookie失效'
+    assert failed['stage'] == '抓取' and failed['progress'] == 0.5
+    assert queue.submit('crawl', 7, lambda ctx: None)[1]
+
+
+def test_progress_is_pushed_and_notify_errors_are_ignored(make_queue):
+    events = []
+
+    def notify(event, data):
+        events.append((event, data['status'], data['stage'], data['progress']))
+        raise ConnectionError('客户端已断开')
+
+    queue = make_queue(notify=notify)
+
+    def job(ctx):
+        ctx.progress('分析', 2.0, '全部完成')
+
+    job_info, _ = queue.submit('analysis', 3, job)
+    wait_for(queue, job_info['id'], ('done',))
+
+    assert events[0] == ('job_update', 'queued', None, 0.0)
+    assert ('job_update', 'running', '分析', 1.0) in events
+    assert events[-1][1] == 'done'
+
+
+def test_restart_marks_unfinished_jobs_failed(make_queue):
+    queue = make_queue()
+    session = queue.Session()
+    for status in ('queued', 'running', 'done'):
+        session.add(AnalysisJob(celebrity_id='1', job_type='crawl', status=status, created_at=datetime.now()))
+    session.commit()
+    session.close()
+
+    restarted = make_queue()
+
+    jobs = sorted(restarted.list_jobs(), key=lambda job: job['id'])
+    assert [job['status'] for job in jobs] == ['failed', 'failed', 'done']
+    assert jobs[0]['message'] == '服务重启，任务中断' and jobs[0]['finished_at']
+    assert jobs[2]['message'] is None
+    assert [job['id'] for job in restarted.list_jobs(status='failed')] == [jobs[1]['id'], jobs[0]['id']]
+
+
+def test_rejects_unknown_type_and_closed_pool(make_queue):
+    queue = make_queue()
+    with pytest.raises(ValueError):
+        queue.submit('export', 1, lambda ctx: None)
+
+    queue.shutdown()
+    with pytest.raises(RuntimeError):
+        queue.submit('crawl', 1, lambda ctx: None)
+    job = queue.list_jobs(celebrity_id=1)[0]
+    assert job['status'] == 'failed' and job['message'].startswith('任务无法执行')
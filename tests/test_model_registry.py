@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+pytest.importorskip('torch')
+
+from api.models.model_manager import ModelRegistry
+
+
+def test_concurrent_first_access_loads_once():
+    registry = ModelRegistry()
+    loads = []
+    barrier = threading.Barrier(8)
+
+    def loader():
+        loads.append(1)
+        return object()
+
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(registry.get('m', loader))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert len(set(map(id, results))) == 1
+    assert registry.is_loaded('m')
+
+
+def test_failed_load_is_retried_after_window():
+    registry = ModelRegistry(retry_after=60)
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise OSError('无法下载')
+
+    with pytest.raises(OSError):
+        registry.get('m', broken)
+    errors = []
+    for _ in range(2):
+        with pytest.raises(RuntimeError) as excinfo:
+            registry.get('m', broken)
+        errors.append(excinfo.value)
+    # 重试间隔内不再调用加载函数，每次抛出新的异常并链接到原始失败原因
+    assert len(calls) == 1
+    assert errors[0] is not errors[1]
+    assert all(isinstance(error.__cause__, OSError) for error in errors)
+    assert errors[0].__cause__ is errors[1].__cause__
+
+    # 超过重试间隔后重新执行加载函数
+    registry.retry_after = 0
+    with pytest.raises(OSError):
+        registry.get('m', broken)
+    assert len(calls) == 2
+    assert registry.get('m', lambda: 'ok') == 'ok'
+
+
+def test_unload_clears_failure():
+    registry = ModelRegistry()
+
+    def broken():
+        raise OSError('无法下载')
+
+    with pytest.raises(OSError):
+        registry.get('m', broken)
+    with pytest.raises(RuntimeError):
+        registry.get('m', lambda: 'ok')
+
+    # 卸载后清除失败记录，可以立即重新加载
+    registry.unload('m')
+    assert registry.get('m', lambda: 'ok') == 'ok'
+    assert registry.memory_report()['models']['m']['parameter_bytes'] == 0
+
+
+def test_unload_waits_for_inflight_load():
+    registry = ModelRegistry()
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_loader():
+        started.set()
+        release.wait(5)
+        return 'model'
+
+    loader_thread = threading.Thread(target=registry.get, args=('m', slow_loader))
+    loader_thread.start()
+    started.wait(5)
+
+    unload_thread = threading.Thread(target=registry.unload, args=('m',))
+    unload_thread.start()
+    unload_thread.join(0.2)
+    # 加载进行中，卸载被同一把锁挡住
+    assert unload_thread.is_alive()
+
+    release.set()
+    loader_thread.join(5)
+    unload_thread.join(5)
+    assert not registry.is_loaded('m')
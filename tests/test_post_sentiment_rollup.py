@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('torch')
+
+from sqlalchemy import text
+
+from api.analysis.sentiment import sentiment_analyzer as sentiment_module
+from api.analysis.sentiment.sentiment_analyzer import PostSentimentAnalyzer
+from api.database.db_utils import get_engine
+from api.database.models import Base
+
+TODAY = datetime.now().replace(hour=10, minute=0, second=0, microsecond=0)
+POSTS = [('p1', TODAY), ('p2', TODAY), ('p3', TODAY - timedelta(days=1))]
+
+
+def positive(score):
+    return {'sentiment': '正面', 'confidence': score, 'strength': 0.0,
+            'scores': {'负面': 0.0, '中性': 1.0 - score, '正面': score}}
+
+
+@pytest.fixture
+def analyzer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db_url = f'sqlite:///{tmp_path / "sentiment.db"}'
+    engine = get_engine(db_url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO celebrity (weibo_id, name) VALUES ('c1', '明星')"))
+        for post_id, created_at in POSTS:
+            conn.execute(text("""
+                INSERT INTO post (post_id, celebrity_id, content, likes, reposts, comments_count,
+                                  created_at, is_deleted, sentiment_score)
+                VALUES (:post_id, 'c1', '内容', 0, 0, 0, :created_at, 0, 0)
+            """), {'post_id': post_id, 'created_at': created_at})
+    return PostSentimentAnalyzer(db_url)
+
+
+def daily_sentiment(analyzer):
+    with analyzer.engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT date, sentiment_sum, sentiment_count FROM daily_stats WHERE celebrity_id = 'c1' ORDER BY date"
+        )).fetchall()
+    return [(str(row.date), round(row.sentiment_sum, 6), row.sentiment_count) for row in rows]
+
+
+def test_single_post_write_refreshes_its_day(analyzer):
+    result = analyzer.analyze_post_sentiment('p1', positive(0.8))
+
+    assert result['status'] == 'success'
+    assert daily_sentiment(analyzer) == [(str(TODAY.date()), 0.8, 2)]
+
+
+def test_batch_refreshes_daily_stats_once(analyzer, monkeypatch):
+    monkeypatch.setattr(analyzer.comment_analyzer, 'analyze_sentiment_batch',
+                        lambda texts: [positive(0.5) for _ in texts])
+    refreshes = []
+    refresh = sentiment_module.refresh_daily_stats
+
+    def spy(engine, keys):
+        refreshes.append(set(keys))
+        return refresh(engine, keys)
+
+    monkeypatch.setattr(sentiment_module, 'refresh_daily_stats', spy)
+
+    result = analyzer.analyze_posts_batch([post_id for post_id, _ in POSTS])
+
+    assert result['data']['success'] == 3
+    assert refreshes == [{('c1', TODAY.date()), ('c1', TODAY.date() - timedelta(days=1))}]
+    assert daily_sentiment(analyzer) == [
+        (str(TODAY.date() - timedelta(days=1)), 0.5, 1),
+        (str(TODAY.date()), 1.0, 2),
+    ]
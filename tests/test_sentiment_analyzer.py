@@ -0,0 +1,92 @@
+import pytest
+
+pytest.importorskip('torch')
+
+from api.analysis.sentiment.sentiment_analyzer import SentimentAnalyzer
+
+TEXTS = ['我喜欢你', '好差', '这是一条评论真的太棒了', '垃圾', '支持加油哈哈哈哈', '讨厌他们']
+
+
+def make_analyzer(**kwargs):
+    return SentimentAnalyzer('sqlite://', cache_path=None, **kwargs)
+
+
+def test_batch_matches_one_by_one_and_keeps_order(registered_bert):
+    analyzer = make_analyzer(max_batch_size=2)
+
+    batched = analyzer.analyze_sentiment_batch(TEXTS)
+    single = [analyzer.analyze_sentiment(text) for text in TEXTS]
+
+    assert len(batched) == len(TEXTS)
+    for got, expected in zip(batched, single):
+        assert got['sentiment'] == expected['sentiment']
+        for label in analyzer.sentiment_labels:
+            assert got['scores'][label] == pytest.approx(expected['scores'][label], abs=1e-5)
+        assert got['strength'] == pytest.approx(expected['strength'], abs=1e-4)
+
+
+def test_batches_are_bucketed_by_length(registered_bert, monkeypatch):
+    analyzer = make_analyzer(max_batch_size=2)
+    batch_lengths = []
+    predict = analyzer._predict_batch
+
+    def spy(features, *bert):
+        batch_lengths.append([len(feature['input_ids']) for feature in features])
+        return predict(features, *bert)
+
+    monkeypatch.setattr(analyzer, '_predict_batch', spy)
+    analyzer.analyze_sentiment_batch(TEXTS)
+
+    # 每批不超过max_batch_size，且批次按长度递增：后一批最短的不短于前一批最长的
+    assert [len(batch) for batch in batch_lengths] == [2, 2, 2]
+    for previous, current in zip(batch_lengths, batch_lengths[1:]):
+        assert min(current) >= max(previous)
+
+
+def test_failed_batch_yields_unknown_rows_only_for_that_batch(registered_bert, monkeypatch):
+    analyzer = make_analyzer(max_batch_size=3)
+    predict = analyzer._predict_batch
+    calls = []
+
+    def flaky(features, *bert):
+        calls.append(len(features))
+        if len(calls) == 1:
+            raise RuntimeError('boom')
+        return predict(features, *bert)
+
+    monkeypatch.setattr(analyzer, '_predict_batch', flaky)
+    results = analyzer.analyze_sentiment_batch(TEXTS)
+
+    unknown = [result for result in results if result['sentiment'] == '未知']
+    assert len(unknown) == 3
+    assert all(result['confidence'] == 0.0 for result in unknown)
+
+
+def test_empty_input(tmp_path, monkeypatch):
+    # ModelManager 会在工作目录下创建 models/weights
+    monkeypatch.chdir(tmp_path)
+    assert make_analyzer().analyze_sentiment_batch([]) == []
+
+
+def test_failed_model_load_is_not_retried(tmp_path, monkeypatch):
+    from api.models.model_manager import ModelManager, get_model_registry
+
+    monkeypatch.chdir(tmp_path)
+    loads = []
+
+    def broken_loader(self):
+        loads.append(1)
+        raise OSError('下载失败')
+
+    monkeypatch.setattr(ModelManager, '_load_backend', broken_loader)
+    analyzer = make_analyzer()
+    registry = get_model_registry()
+    registry.unload(analyzer.model_manager.registry_key)
+    try:
+        first = analyzer.analyze_sentiment_batch(TEXTS)
+        second = analyzer.analyze_sentiment_batch(['另一条'])
+    finally:
+        registry.unload(analyzer.model_manager.registry_key)
+
+    assert loads == [1]
+    assert all(result['sentiment'] == '未知' for result in first + second)
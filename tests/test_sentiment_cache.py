@@ -0,0 +1,55 @@
+import pytest
+
+from api.analysis.sentiment.sentiment_cache import SentimentCache
+
+
+def test_results_persist_across_instances_and_versions(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    key = SentimentCache.fingerprint('好差')
+
+    cache = SentimentCache(path, 'v1')
+    cache.put_many({key: (0.7, 0.2, 0.1)})
+    cache.close()
+
+    reopened = SentimentCache(path, 'v1')
+    assert reopened.get_many([key]) == {key: pytest.approx((0.7, 0.2, 0.1))}
+    assert reopened.stats()['disk_hits'] == 1
+
+    # 模型版本变化后旧结果不再命中
+    other_version = SentimentCache(path, 'v2')
+    assert other_version.get_many([key]) == {}
+    assert other_version.stats()['misses'] == 1
+
+
+def test_evicted_entries_fall_back_to_disk(tmp_path):
+    cache = SentimentCache(str(tmp_path / 'cache.db'), 'v1', memory_size=2)
+    keys = [SentimentCache.fingerprint(text) for text in ('a', 'b', 'c')]
+    cache.put_many({key: (float(i), 0.0, 0.0) for i, key in enumerate(keys)})
+
+    assert cache.stats()['memory_entries'] == 2
+    found = cache.get_many(keys)
+    assert [found[key][0] for key in keys] == [0.0, 1.0, 2.0]
+    stats = cache.stats()
+    assert stats['memory_hits'] == 2 and stats['disk_hits'] == 1
+
+
+def test_analyzer_only_sends_unique_misses_to_model(registered_bert, tmp_path, monkeypatch):
+    pytest.importorskip('torch')
+    from api.analysis.sentiment.sentiment_analyzer import SentimentAnalyzer
+
+    analyzer = SentimentAnalyzer('sqlite://', cache_path=str(tmp_path / 'sentiment_cache.db'))
+    seen = []
+    infer = analyzer._infer_logits
+
+    def spy(texts):
+        seen.append(list(texts))
+        return infer(texts)
+
+    monkeypatch.setattr(analyzer, '_infer_logits', spy)
+
+    first = analyzer.analyze_sentiment_batch(['我喜欢你', '好差', '我喜欢你'])
+    second = analyzer.analyze_sentiment_batch(['好差', '我喜欢你'])
+
+    assert seen == [['我喜欢你', '好差']]
+    assert first[0] == first[2]
+    assert second == [first[1], first[0]]
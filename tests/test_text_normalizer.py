@@ -0,0 +1,78 @@
+import random
+import re
+
+from api.data_processing.text_normalizer import AhoCorasick, CommentNormalizer
+
+SYMBOLS = {'，': '逗号', '。': '句号', '？': '问号', '！': '感叹号', '...': '省略号', '～': '波浪号', '~': '波浪号', '…': '省略号'}
+NUMBERS = {'233': '笑', '520': '我爱你', '88': '拜拜'}
+ABBR = {'yyds': '永远的神', 'awsl': '啊我死了'}
+
+
+def baseline_clean_comment(comment):
+    """基线 DataCleaner.clean_comment 的原样拷贝"""
+    if not comment:
+        return ""
+    comment = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', comment)
+    comment = re.sub(r'@[\w\u4e00-\u9fff]+', '', comment)
+    comment = re.sub(r'\[.*?\]', '', comment)
+    comment = re.sub(r'<[^>]+>', '', comment)
+    comment = re.sub(r'\s+', ' ', comment).strip()
+    return comment
+
+
+def make_normalizer():
+    return CommentNormalizer(SYMBOLS, NUMBERS, ABBR)
+
+
+def test_clean_matches_baseline_on_overlapping_patterns():
+    normalizer = make_normalizer()
+    cases = [
+        '[http://x.com]',
+        '看这里 [链接 https://t.cn/abc] 哈哈',
+        '@[用户] 你好',
+        '<a href="http://x.com">[微笑]</a>',
+        '@张三<b>加油</b>',
+        '  多余   空白\t\n',
+        '',
+    ]
+    for case in cases:
+        assert normalizer.clean(case) == baseline_clean_comment(case), case
+    assert normalizer.clean('[http://x.com]') == '['
+
+
+def test_clean_matches_baseline_on_random_text():
+    normalizer = make_normalizer()
+    alphabet = list('[]<>@ :/.ab中文') + ['http://', 'https://', '\t']
+    rng = random.Random(0)
+    comments = [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 25))) for _ in range(2000)]
+
+    assert normalizer.clean_batch(comments) == [baseline_clean_comment(c) for c in comments]
+
+
+def test_repeated_symbols_are_matched_literally():
+    normalizer = make_normalizer()
+    assert normalizer.has_meaningful_symbols('.........')
+    assert normalizer.has_meaningful_symbols('好～～～')
+    # 基线把 "..." 当正则拼接，5个字符以上的普通文本也会命中；现在不再命中
+    assert not normalizer.has_meaningful_symbols('今天天气很好')
+
+
+def test_number_and_abbreviation_rules():
+    normalizer = make_normalizer()
+    assert normalizer.has_meaningful_number('5201314')
+    assert normalizer.has_meaningful_number('12121212')
+    assert not normalizer.has_meaningful_number('2024')
+    assert normalizer.has_meaningful_abbr('真的YYDS')
+    assert not normalizer.has_meaningful_abbr('hello')
+
+
+def test_aho_corasick_agrees_with_substring_search():
+    words = ['he', 'she', 'his', 'hers', 'ush', 'a']
+    matcher = AhoCorasick(words)
+    rng = random.Random(1)
+    for _ in range(2000):
+        text = ''.join(rng.choice('hesiurx') for _ in range(rng.randint(0, 12)))
+        found = matcher.search(text)
+        assert (found is not None) == any(word in text for word in words), text
+        if found is not None:
+            assert found in text
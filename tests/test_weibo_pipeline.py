@@ -0,0 +1,109 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('scrapy')
+
+from sqlalchemy import text
+from twisted.internet import defer
+
+from api.database.models import Base
+from api.datacrawl.datacrawl.weibo_spider import pipelines
+from api.datacrawl.datacrawl.weibo_spider.pipelines import WeiboPipeline
+
+
+def spider(name):
+    return SimpleNamespace(name=name, logger=logging.getLogger('test_spider'))
+
+
+def tweet(post_id, content='今天的演出太精彩了', likes=1):
+    return {'post_id': post_id, 'user_id': 'c1', 'content': content, 'likes': likes,
+            'created_at': '2024-01-02T10:00:00'}
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pipeline = WeiboPipeline({'database': str(tmp_path / 'weibo.db')}, batch_size=2, max_pending=1)
+    pipeline.open_spider(spider('tweet'))
+    Base.metadata.create_all(pipeline.engine)
+    yield pipeline
+    pipeline.engine.dispose()
+
+
+@pytest.fixture
+def manual_threads(monkeypatch):
+    """代替deferToThread：记录批次，由测试决定何时完成"""
+    calls = []
+
+    def defer_to_thread(func, *args):
+        d = defer.Deferred()
+        calls.append((d, func, args))
+        return d
+
+    monkeypatch.setattr(pipelines.threads, 'deferToThread', defer_to_thread)
+    return calls
+
+
+def fetch_posts(pipeline):
+    with pipeline.engine.connect() as conn:
+        return conn.execute(text("SELECT post_id, likes, sentiment_score FROM post ORDER BY post_id")).fetchall()
+
+
+def test_flush_upserts_plain_rows_and_keeps_sentiment(pipeline):
+    assert pipeline._flush('tweet', [tweet('p1'), tweet('p2'), tweet('p3', content='')]) == 2
+
+    with pipeline.engine.begin() as conn:
+        conn.execute(text("UPDATE post SET sentiment_score = 0.9 WHERE post_id = 'p1'"))
+    pipeline._flush('tweet', [tweet('p1', likes=5)])
+
+    # 重复爬取更新计数，但不覆盖分析模块写入的情感分数
+    assert [tuple(row) for row in fetch_posts(pipeline)] == [('p1', 5, 0.9), ('p2', 1, 0.0)]
+    with pipeline.engine.connect() as conn:
+        assert conn.execute(text("SELECT post_count, like_count FROM daily_stats")).fetchall() == [(2, 6)]
+
+
+def test_backpressure_blocks_until_a_batch_finishes(pipeline, manual_threads):
+    s = spider('tweet')
+    assert pipeline.process_item(tweet('p1'), s) == tweet('p1')
+
+    # 第二条凑满一批并派发，进行中的批次达到max_pending，返回未完成的Deferred
+    waiting = pipeline.process_item(tweet('p2'), s)
+    assert isinstance(waiting, defer.Deferred) and not waiting.called
+    assert len(manual_threads) == 1
+
+    d, func, args = manual_threads[0]
+    d.callback(func(*args))
+    assert waiting.called
+    assert pipeline.pending == 0 and pipeline.stats['tweet'] == 2
+    assert len(fetch_posts(pipeline)) == 2
+
+
+def test_close_spider_flushes_partial_batch_and_counts_failures(pipeline, manual_threads):
+    s = spider('tweet')
+    pipeline.process_item(tweet('p1'), s)
+
+    closed = pipeline.close_spider(s)
+    assert not closed.called and len(manual_threads) == 1
+
+    d, _, _ = manual_threads[0]
+    d.errback(RuntimeError('数据库不可用'))
+    assert closed.called
+    assert pipeline.stats['failed_batches'] == 1 and pipeline.pending == 0
+
+
+def test_flush_retries_before_giving_up(pipeline, monkeypatch):
+    attempts = []
+    monkeypatch.setattr(pipelines.time, 'sleep', lambda seconds: None)
+
+    def flaky(items):
+        attempts.append(len(items))
+        if len(attempts) < 3:
+            raise RuntimeError('database is locked')
+        return len(items)
+
+    monkeypatch.setattr(pipeline, '_write_posts', flaky)
+    assert pipeline._flush('tweet', [tweet('p1')]) == 1
+    assert len(attempts) == 3